@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Compara dois resultados de benchmarks/run.py e aponta regressões
+
+    python benchmarks/compare.py benchmarks/results/abc123.json \\
+        benchmarks/results/def456.json --threshold 0.15
+
+Sai com código 1 se alguma métrica piorar mais que o limite (útil em CI).
+"""
+
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Tuple
+
+# (métrica, maior_é_melhor)
+TOOL_METRICS = [
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("upstream_calls_per_call", False),
+]
+THROUGHPUT_METRICS = [("calls_per_second", True), ("p95_ms", False)]
+
+# Diferenças absolutas abaixo disso são ruído (ms ou chamadas)
+MIN_ABSOLUTE_DELTA = 0.5
+
+
+def _change(before: float, after: float) -> float:
+    if not before:
+        return 0.0 if not after else float("inf")
+    return (after - before) / before
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[Tuple[str, str, float, float, float, bool]]:
+    """Lista (escopo, métrica, antes, depois, variação, regressão)"""
+    rows = []
+
+    def add(scope: str, metric: str, before, after, higher_is_better: bool) -> None:
+        if before is None or after is None:
+            return
+        change = _change(before, after)
+        worse = -change if higher_is_better else change
+        regression = worse > threshold and abs(after - before) >= MIN_ABSOLUTE_DELTA
+        rows.append((scope, metric, before, after, change, regression))
+
+    for tool, stats in current.get("tools", {}).items():
+        previous = baseline.get("tools", {}).get(tool)
+        if not previous:
+            continue
+        for metric, higher_is_better in TOOL_METRICS:
+            add(tool, metric, previous.get(metric), stats.get(metric), higher_is_better)
+
+    previous_levels = {
+        level["concurrency"]: level for level in baseline.get("throughput", [])
+    }
+    for level in current.get("throughput", []):
+        previous = previous_levels.get(level["concurrency"])
+        if not previous:
+            continue
+        scope = f"concorrência {level['concurrency']}"
+        for metric, higher_is_better in THROUGHPUT_METRICS:
+            add(
+                scope, metric, previous.get(metric), level.get(metric), higher_is_better
+            )
+
+    for scope, metric in (("cold_start", "p50_ms"), ("processo", "peak_rss_mb")):
+        before = baseline.get(scope) if scope != "processo" else baseline
+        after = current.get(scope) if scope != "processo" else current
+        if before and after:
+            add(scope, metric, before.get(metric), after.get(metric), False)
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compara resultados de benchmark")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.15,
+        help="Piora relativa tolerada (0.15 = 15%%)",
+    )
+    args = parser.parse_args()
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(args.current, encoding="utf-8") as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, args.threshold)
+    print(
+        f"{baseline['meta'].get('commit')} → {current['meta'].get('commit')} "
+        f"(limite {args.threshold:.0%})"
+    )
+    for scope, metric, before, after, change, regression in rows:
+        flag = "  ❌" if regression else ""
+        print(
+            f"{scope:<28}{metric:<26}{before:>10.2f}{after:>10.2f}{change:>+9.1%}{flag}"
+        )
+
+    regressions = [row for row in rows if row[-1]]
+    if regressions:
+        print(f"\n{len(regressions)} regressão(ões) acima do limite")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+#!/usr/bin/env python3
+"""
+Benchmark ponta a ponta das tools MCP contra a Web API falsa
+
+Sobe o servidor falso (src/fake_spotify.py) em um processo separado, aponta o
+SpotifyService para ele e chama as tools do app FastMCP em processo. Mede:
+
+- latência por tool (p50/p95/p99) e chamadas à API por invocação;
+- vazão com clientes concorrentes;
+- tempo de cold start do main.py via stdio (até responder list_tools);
+- pico de memória (RSS) do processo.
+
+O resultado é gravado em JSON (benchmarks/results/<commit>.json por padrão)
+para comparação entre commits com benchmarks/compare.py.
+
+    python benchmarks/run.py --tracks 5000 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+from typing import Any, Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+sys.path.insert(0, ROOT)
+
+# Argumentos das tools medidas; recebem IDs reais da biblioteca falsa
+SCENARIOS: Dict[str, Callable[[Dict[str, str]], Dict[str, Any]]] = {
+    "play_music": lambda ids: {"request": {"track_uri": ids["track_uri"]}},
+    "pause_music": lambda ids: {},
+    "set_volume": lambda ids: {"request": {"volume": 40}},
+    "get_current_track": lambda ids: {},
+    "search_tracks": lambda ids: {"request": {"query": "amor", "limit": 10}},
+    "get_saved_tracks": lambda ids: {"limit": 50},
+    "get_playlists": lambda ids: {},
+    "get_playlist_tracks": lambda ids: {"playlist_id": ids["playlist_id"]},
+    "get_audio_features": lambda ids: {"track_id": ids["track_id"]},
+    "check_track_in_favorites": lambda ids: {"track_id": ids["track_id"]},
+    "add_to_queue": lambda ids: {"track_uri": ids["track_uri"]},
+    "get_recently_played": lambda ids: {"limit": 50},
+    "get_listening_analytics": lambda ids: {"limit": 50},
+    "get_listening_aggregates": lambda ids: {},
+    "build_flow_queue": lambda ids: {
+        "playlist_id": ids["playlist_id"],
+        "action": "none",
+    },
+}
+
+# Mistura usada no teste de vazão (leituras interativas + controle)
+THROUGHPUT_MIX = [
+    "get_current_track",
+    "search_tracks",
+    "get_saved_tracks",
+    "play_music",
+    "check_track_in_favorites",
+]
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _summary(samples: List[float]) -> Dict[str, float]:
+    return {
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3) if samples else 0.0,
+        "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3) if samples else 0.0,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=ROOT,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class FakeApiProcess:
+    """Web API falsa em um processo próprio (não disputa o GIL com o servidor)"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        command = [
+            sys.executable,
+            "-m",
+            "src.fake_spotify",
+            "--port",
+            str(self.port),
+            "--tracks",
+            str(args.tracks),
+            "--playlists",
+            str(args.playlists),
+            "--playlist-size",
+            str(args.playlist_size),
+            "--latency",
+            str(args.latency),
+            "--jitter",
+            str(args.jitter),
+        ]
+        if args.rate_limit:
+            command += ["--rate-limit", str(args.rate_limit)]
+        self.process = subprocess.Popen(command, cwd=ROOT)
+
+    def wait_ready(self, timeout: float = 30.0) -> None:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Servidor falso encerrou durante a inicialização")
+            try:
+                urllib.request.urlopen(f"{self.url}/_fake/stats", timeout=1)
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise RuntimeError("Servidor falso não respondeu a tempo")
+
+    def request(self, method: str, path: str, data=None, token=None) -> Any:
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        body = urllib.parse.urlencode(data).encode() if data else None
+        request = urllib.request.Request(
+            f"{self.url}{path}", data=body, headers=headers, method=method
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return json.loads(response.read() or b"null")
+
+    def stop(self) -> None:
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+def prepare_environment(fake: FakeApiProcess, workdir: str) -> Dict[str, str]:
+    """Emite um token, grava o cache e retorna as variáveis para o servidor"""
+    token_cache = os.path.join(workdir, "token_cache")
+    env = {
+        "SPOTIFY_CLIENT_ID": "benchmark-client-id",
+        "SPOTIFY_CLIENT_SECRET": "benchmark-client-secret",
+        "SPOTIFY_API_BASE_URL": f"{fake.url}/v1/",
+        "SPOTIFY_ACCOUNTS_URL": fake.url,
+        "SPOTIFY_TOKEN_CACHE_PATH": token_cache,
+        "SPOTIFY_CACHE_DIR": os.path.join(workdir, "cache"),
+    }
+    # As variáveis precisam estar definidas antes do primeiro import de src.config
+    os.environ.update(env)
+    from src.config import SPOTIFY_SCOPES
+
+    token = fake.request(
+        "POST",
+        "/api/token",
+        {"grant_type": "refresh_token", "refresh_token": "benchmark"},
+    )
+    token["scope"] = " ".join(SPOTIFY_SCOPES)
+    with open(token_cache, "w", encoding="utf-8") as f:
+        json.dump(token, f)
+    return {**env, "access_token": token["access_token"]}
+
+
+def sample_ids(fake: FakeApiProcess, token: str) -> Dict[str, str]:
+    """IDs reais da biblioteca falsa usados nos argumentos das tools"""
+    saved = fake.request("GET", "/v1/me/tracks?limit=1", token=token)
+    playlists = fake.request("GET", "/v1/me/playlists?limit=1", token=token)
+    track = saved["items"][0]["track"]
+    return {
+        "track_id": track["id"],
+        "track_uri": track["uri"],
+        "playlist_id": playlists["items"][0]["id"],
+    }
+
+
+def _is_error(result) -> bool:
+    data = result.data if hasattr(result, "data") else None
+    return bool(result.is_error or (isinstance(data, dict) and "error" in data))
+
+
+async def measure_tools(
+    app, ids: Dict[str, str], tools: List[str], iterations: int
+) -> Dict[str, Any]:
+    """Latência sequencial e chamadas à API por invocação de cada tool"""
+    from fastmcp import Client
+
+    from src.metrics import metrics
+
+    results = {}
+    async with Client(app) as client:
+        for tool in tools:
+            arguments = SCENARIOS[tool](ids)
+            await client.call_tool(tool, arguments, raise_on_error=False)  # aquece
+            metrics.reset()
+            samples = []
+            errors = 0
+            for _ in range(iterations):
+                start = time.perf_counter()
+                result = await client.call_tool(tool, arguments, raise_on_error=False)
+                samples.append(time.perf_counter() - start)
+                errors += _is_error(result)
+            stats = metrics.snapshot()["tools"].get(tool, {})
+            results[tool] = {
+                "iterations": iterations,
+                "errors": errors,
+                "upstream_calls_per_call": round(
+                    stats.get("upstream_calls", 0) / max(1, stats.get("calls", 1)), 2
+                ),
+                **_summary(samples),
+            }
+    return results
+
+
+async def measure_throughput(
+    app, ids: Dict[str, str], concurrency: int, total_calls: int
+) -> Dict[str, Any]:
+    """Vazão com N clientes MCP concorrentes executando a mistura de tools"""
+    from fastmcp import Client
+
+    clients = [Client(app) for _ in range(concurrency)]
+    for client in clients:
+        await client.__aenter__()
+
+    samples: List[float] = []
+    errors = 0
+    counter = iter(range(total_calls))
+
+    async def worker(client) -> None:
+        nonlocal errors
+        for number in counter:
+            tool = THROUGHPUT_MIX[number % len(THROUGHPUT_MIX)]
+            start = time.perf_counter()
+            result = await client.call_tool(
+                tool, SCENARIOS[tool](ids), raise_on_error=False
+            )
+            samples.append(time.perf_counter() - start)
+            errors += _is_error(result)
+
+    try:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for client in clients))
+        elapsed = time.perf_counter() - start
+    finally:
+        for client in clients:
+            await client.__aexit__(None, None, None)
+
+    return {
+        "concurrency": concurrency,
+        "calls": total_calls,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "calls_per_second": round(total_calls / elapsed, 2) if elapsed else 0.0,
+        **_summary(samples),
+    }
+
+
+async def measure_cold_start(env: Dict[str, str], runs: int) -> Dict[str, Any]:
+    """Tempo até o main.py (stdio) responder initialize + list_tools"""
+    from fastmcp import Client
+    from fastmcp.client.transports import PythonStdioTransport
+
+    process_env = {**os.environ, **env}
+    samples = []
+    for _ in range(runs):
+        transport = PythonStdioTransport(
+            os.path.join(ROOT, "main.py"), env=process_env, cwd=ROOT
+        )
+        start = time.perf_counter()
+        async with Client(transport) as client:
+            await client.list_tools()
+            samples.append(time.perf_counter() - start)
+    return {"runs": runs, **_summary(samples)}
+
+
+def measure_id_parser(count: int) -> Dict[str, Any]:
+    """Entradas por segundo do parser de IDs/URIs/URLs (usado pelas tools em lote)
+
+    `cold`: todas as entradas distintas (cada uma passa pelas regex);
+    `warm`: entradas repetidas, como nas listas de URIs das tools em lote.
+    """
+    import random
+
+    from src.spotify_ids import spotify_id
+
+    alphabet = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+    rng = random.Random(42)
+    formats = (
+        "{id}",
+        "spotify:track:{id}",
+        "https://open.spotify.com/track/{id}?si=abc",
+        "https://open.spotify.com/intl-pt/track/{id}",
+    )
+    inputs = [
+        formats[i % len(formats)].format(
+            id="".join(rng.choice(alphabet) for _ in range(22))
+        )
+        for i in range(count)
+    ]
+
+    def rate() -> float:
+        start = time.perf_counter()
+        for value in inputs:
+            spotify_id(value, "track")
+        return count / (time.perf_counter() - start)
+
+    spotify_id.cache_clear()
+    cold = rate()
+    warm = rate()
+    return {
+        "inputs": count,
+        "cold_per_second": round(cold),
+        "warm_per_second": round(warm),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark das tools MCP")
+    parser.add_argument("--tracks", type=int, default=2000)
+    parser.add_argument("--playlists", type=int, default=20)
+    parser.add_argument("--playlist-size", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument(
+        "--tools",
+        nargs="+",
+        default=list(SCENARIOS),
+        choices=list(SCENARIOS),
+        help="Tools medidas individualmente",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        nargs="+",
+        default=[1, 8, 32],
+        help="Níveis de clientes concorrentes no teste de vazão",
+    )
+    parser.add_argument("--throughput-calls", type=int, default=200)
+    parser.add_argument("--cold-start-runs", type=int, default=3)
+    parser.add_argument(
+        "--parser-inputs",
+        type=int,
+        default=50000,
+        help="Entradas do benchmark do parser de IDs (0 desativa)",
+    )
+    parser.add_argument("--output", default=None, help="Arquivo JSON de saída")
+    return parser.parse_args()
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fake = FakeApiProcess(args)
+    try:
+        fake.wait_ready()
+        with tempfile.TemporaryDirectory() as workdir:
+            env = prepare_environment(fake, workdir)
+            ids = sample_ids(fake, env.pop("access_token"))
+
+            import_start = time.perf_counter()
+            from src.mcp_server import app
+
+            import_ms = round((time.perf_counter() - import_start) * 1000, 1)
+
+            tools = await measure_tools(app, ids, args.tools, args.iterations)
+            throughput = [
+                await measure_throughput(app, ids, level, args.throughput_calls)
+                for level in args.concurrency
+            ]
+            cold_start = (
+                await measure_cold_start(env, args.cold_start_runs)
+                if args.cold_start_runs
+                else None
+            )
+            upstream = fake.request("GET", "/_fake/stats")
+    finally:
+        fake.stop()
+
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {
+                "tracks": args.tracks,
+                "playlists": args.playlists,
+                "playlist_size": args.playlist_size,
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "rate_limit": args.rate_limit,
+                "iterations": args.iterations,
+            },
+        },
+        "import_ms": import_ms,
+        "tools": tools,
+        "throughput": throughput,
+        "cold_start": cold_start,
+        "id_parser": (
+            measure_id_parser(args.parser_inputs) if args.parser_inputs else None
+        ),
+        "upstream": {
+            "requests": upstream["requests"],
+            "rate_limited": upstream["rate_limited"],
+        },
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    report = asyncio.run(run(args))
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{report['meta']['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{'tool':<28}{'p50 ms':>10}{'p95 ms':>10}{'api/call':>10}{'erros':>7}")
+    for tool, stats in report["tools"].items():
+        print(
+            f"{tool:<28}{stats['p50_ms']:>10.2f}{stats['p95_ms']:>10.2f}"
+            f"{stats['upstream_calls_per_call']:>10.2f}{stats['errors']:>7}"
+        )
+    for level in report["throughput"]:
+        print(
+            f"concorrência {level['concurrency']:>3}: "
+            f"{level['calls_per_second']:.1f} chamadas/s (p95 {level['p95_ms']:.1f} ms)"
+        )
+    if report["cold_start"]:
+        print(f"cold start main.py: p50 {report['cold_start']['p50_ms']:.0f} ms")
+    if report["id_parser"]:
+        print(
+            f"parser de IDs: {report['id_parser']['cold_per_second']:,} entradas/s "
+            f"(novas), {report['id_parser']['warm_per_second']:,} (repetidas)"
+        )
+    print(f"pico de RSS: {report['peak_rss_mb']} MB")
+    print(f"resultado: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,40 @@
 #!/usr/bin/env python3
 """
 Script principal para executar o Spotipy MCP Server
+
+Uso:
+    python main.py                     # stdio (padrão, um processo por cliente)
+    python main.py --transport http    # HTTP em HOST:PORT, várias sessões
+    python main.py --transport sse     # SSE em HOST:PORT
 """
 
+import argparse
 import sys
 import os
 
 # Adicionar o diretório src ao path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
 
 # Importar e executar o servidor
-from mcp_server import app
+from config import HOST, MCP_TRANSPORT, PORT
+from mcp_server import run_server
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Spotipy MCP Server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "http", "sse"],
+        default=MCP_TRANSPORT,
+        help="Transporte MCP (padrão: MCP_TRANSPORT ou stdio)",
+    )
+    args = parser.parse_args()
+
     # Não imprimir mensagens quando usado via STDIO (MCP)
-    import sys
-    if not sys.stdin.isatty():
-        # Executar silenciosamente para MCP
-        app.run()
-    else:
+    if args.transport != "stdio":
+        print(
+            f"🎵 Iniciando Spotipy MCP Server em http://{HOST}:{PORT} ({args.transport})"
+        )
+    elif sys.stdin.isatty():
         # Executar com mensagens para terminal
         print("🎵 Iniciando Spotipy MCP Server...")
-        app.run()
+    run_server(args.transport)
@@ -0,0 +1,286 @@
+"""
+Agregados de escuta mantidos incrementalmente e persistidos no cache local
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Versão do formato do arquivo; mudanças incompatíveis descartam o cache
+AGGREGATES_VERSION = 1
+
+
+def _parse_played_at(played_at: str) -> Optional[datetime]:
+    """Converte o timestamp ISO 8601 do Spotify (ex.: 2024-01-01T12:00:00.000Z)"""
+    try:
+        return datetime.fromisoformat(played_at.replace("Z", "+00:00"))
+    except (AttributeError, ValueError):
+        return None
+
+
+class ListeningAggregates:
+    """Contadores de escuta atualizados a cada nova reprodução ou música salva.
+
+    Os contadores (por artista, música, gênero, hora do dia e dia) só crescem
+    com reproduções inéditas: cada reprodução é identificada pelo played_at e
+    apenas itens mais novos que a última reprodução ingerida são contados.
+    Assim, consultas de resumo não recalculam nada: o artista e a música mais
+    tocados são mantidos em O(1) e os top-k saem direto dos contadores.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._reset()
+        if path:
+            self._load()
+
+    def _reset(self) -> None:
+        self.artists: Counter = Counter()
+        self.tracks: Counter = Counter()
+        self.genres: Counter = Counter()
+        self.hours: Counter = Counter()
+        self.days: Counter = Counter()
+        self.saved_artists: Counter = Counter()
+        self.track_labels: Dict[str, str] = {}
+        self.artist_genres: Dict[str, List[str]] = {}
+        self.saved_tracks: set = set()
+        # Artista de cada música salva, para descontar ao remover dos favoritos
+        self.saved_track_artists: Dict[str, str] = {}
+        self.total_plays = 0
+        self.last_played_at: Optional[str] = None
+        self._top_artist: Tuple[Optional[str], int] = (None, 0)
+        self._top_track: Tuple[Optional[str], int] = (None, 0)
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Atualizações incrementais
+    # ------------------------------------------------------------------
+
+    def ingest_recent(self, plays: Iterable[Dict[str, Any]]) -> int:
+        """Conta reproduções mais novas que a última ingerida.
+
+        Espera itens compactos com "uri", "name", "artist" e "played_at" (o
+        formato de get_recently_played). Retorna quantas eram inéditas.
+        """
+        with self._lock:
+            watermark = self.last_played_at
+            fresh = sorted(
+                (p for p in plays if p.get("played_at")),
+                key=lambda p: p["played_at"],
+            )
+            added = 0
+            for play in fresh:
+                if watermark and play["played_at"] <= watermark:
+                    continue
+                self._record_play(play)
+                self.last_played_at = play["played_at"]
+                added += 1
+            if added:
+                self._dirty = True
+            return added
+
+    def _record_play(self, play: Dict[str, Any]) -> None:
+        artist = play.get("artist") or "N/A"
+        uri = play.get("uri") or f"{play.get('name')} - {artist}"
+        self.track_labels[uri] = f"{play.get('name')} - {artist}"
+
+        self.total_plays += 1
+        self.artists[artist] += 1
+        self.tracks[uri] += 1
+        for genre in self.artist_genres.get(artist, ()):
+            self.genres[genre] += 1
+
+        played_at = _parse_played_at(play["played_at"])
+        if played_at:
+            self.hours[played_at.hour] += 1
+            self.days[played_at.date().isoformat()] += 1
+
+        if self.artists[artist] > self._top_artist[1]:
+            self._top_artist = (artist, self.artists[artist])
+        if self.tracks[uri] > self._top_track[1]:
+            self._top_track = (uri, self.tracks[uri])
+
+    def record_artist_genres(self, artist: str, genres: Iterable[str]) -> None:
+        """Registra os gêneros de um artista e credita reproduções já contadas"""
+        with self._lock:
+            known = self.artist_genres.setdefault(artist, [])
+            new_genres = [g for g in genres if g not in known]
+            if not new_genres:
+                return
+            known.extend(new_genres)
+            plays = self.artists.get(artist, 0)
+            if plays:
+                for genre in new_genres:
+                    self.genres[genre] += plays
+            self._dirty = True
+
+    def record_saved(self, tracks: Iterable[Dict[str, Any]]) -> int:
+        """Registra músicas salvas (favoritos) ainda não vistas
+
+        Uma música já registrada sem artista ganha o artista quando ele vier.
+        """
+        with self._lock:
+            added = 0
+            for track in tracks:
+                uri = track.get("uri")
+                if not uri:
+                    continue
+                artist = track.get("artist")
+                if uri in self.saved_tracks:
+                    if artist and uri not in self.saved_track_artists:
+                        self.saved_track_artists[uri] = artist
+                        self.saved_artists[artist] += 1
+                        self._dirty = True
+                    continue
+                self.saved_tracks.add(uri)
+                if artist:
+                    self.saved_track_artists[uri] = artist
+                    self.saved_artists[artist] += 1
+                added += 1
+            if added:
+                self._dirty = True
+            return added
+
+    def record_unsaved(self, uri: str, artist: Optional[str] = None) -> None:
+        """Remove uma música dos favoritos contabilizados"""
+        with self._lock:
+            if uri not in self.saved_tracks:
+                return
+            self.saved_tracks.discard(uri)
+            artist = self.saved_track_artists.pop(uri, None) or artist
+            if artist and self.saved_artists.get(artist):
+                self.saved_artists[artist] -= 1
+                if not self.saved_artists[artist]:
+                    del self.saved_artists[artist]
+            self._dirty = True
+
+    # ------------------------------------------------------------------
+    # Consultas
+    # ------------------------------------------------------------------
+
+    def most_played_artist(self) -> Dict[str, Any]:
+        """Artista mais reproduzido (O(1))"""
+        name, count = self._top_artist
+        return {"name": name or "N/A", "count": count}
+
+    def most_played_track(self) -> Dict[str, Any]:
+        """Música mais reproduzida (O(1))"""
+        uri, count = self._top_track
+        if not uri:
+            return {"name": "N/A", "count": 0}
+        return {"name": self.track_labels.get(uri, uri), "uri": uri, "count": count}
+
+    def summary(self, top: int = 10) -> Dict[str, Any]:
+        """Resumo dos contadores com os top-k de cada dimensão"""
+        with self._lock:
+            return {
+                "total_plays": self.total_plays,
+                "total_saved_tracks": len(self.saved_tracks),
+                "last_played_at": self.last_played_at,
+                "most_played_artist": self.most_played_artist(),
+                "most_played_track": self.most_played_track(),
+                "top_artists": [
+                    {"name": name, "count": count}
+                    for name, count in self.artists.most_common(top)
+                ],
+                "top_tracks": [
+                    {
+                        "name": self.track_labels.get(uri, uri),
+                        "uri": uri,
+                        "count": count,
+                    }
+                    for uri, count in self.tracks.most_common(top)
+                ],
+                "top_genres": [
+                    {"name": genre, "count": count}
+                    for genre, count in self.genres.most_common(top)
+                ],
+                "top_saved_artists": [
+                    {"name": name, "count": count}
+                    for name, count in self.saved_artists.most_common(top)
+                ],
+                "plays_by_hour": {
+                    str(hour): self.hours.get(hour, 0) for hour in range(24)
+                },
+                "plays_by_day": dict(sorted(self.days.items())),
+            }
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Cache de analytics ignorado ({self.path}): {e}")
+            return
+
+        if data.get("version") != AGGREGATES_VERSION:
+            return
+
+        self.artists.update(data.get("artists", {}))
+        self.tracks.update(data.get("tracks", {}))
+        self.genres.update(data.get("genres", {}))
+        self.hours.update({int(h): c for h, c in data.get("hours", {}).items()})
+        self.days.update(data.get("days", {}))
+        self.saved_artists.update(data.get("saved_artists", {}))
+        self.track_labels.update(data.get("track_labels", {}))
+        self.artist_genres.update(data.get("artist_genres", {}))
+        self.saved_tracks.update(data.get("saved_tracks", []))
+        self.saved_track_artists.update(data.get("saved_track_artists", {}))
+        self.total_plays = data.get("total_plays", 0)
+        self.last_played_at = data.get("last_played_at")
+        if self.artists:
+            self._top_artist = self.artists.most_common(1)[0]
+        if self.tracks:
+            self._top_track = self.tracks.most_common(1)[0]
+
+    def save(self) -> None:
+        """Grava os contadores no disco se houve mudança (escrita atômica)"""
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {
+                "version": AGGREGATES_VERSION,
+                "artists": self.artists,
+                "tracks": self.tracks,
+                "genres": self.genres,
+                "hours": {str(h): c for h, c in self.hours.items()},
+                "days": self.days,
+                "saved_artists": self.saved_artists,
+                "track_labels": self.track_labels,
+                "artist_genres": self.artist_genres,
+                "saved_tracks": sorted(self.saved_tracks),
+                "saved_track_artists": self.saved_track_artists,
+                "total_plays": self.total_plays,
+                "last_played_at": self.last_played_at,
+            }
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except OSError as e:
+                logger.warning(f"Erro ao salvar cache de analytics: {e}")
+
+    def clear(self) -> None:
+        """Zera os contadores e remove o arquivo persistido"""
+        with self._lock:
+            self._reset()
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,218 @@
+"""
+Execução de várias operações do service em uma chamada MCP
+
+Cada operação é um dict com:
+
+- "id" (opcional, padrão é a posição na lista): nome usado nas referências;
+- "method": método do SpotifyService;
+- "args" (opcional): argumentos nomeados;
+- "depends_on" (opcional): IDs que precisam terminar antes.
+
+Argumentos do tipo "$id.caminho" são trocados pelo resultado de uma operação
+anterior (ex.: "$busca.tracks.0.uri"; números indexam listas) e criam a
+dependência automaticamente. Leituras sem dependência pendente rodam em
+paralelo; as demais operações (comandos de playback, escritas) rodam uma de
+cada vez, na ordem da lista. Cada requisição à Web API continua passando pelo
+escalonador, com a prioridade do método chamado.
+"""
+
+import contextvars
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import AbstractSet, Any, Callable, Dict, List, Set
+
+try:
+    from .scheduler import priority, tool_priority
+except ImportError:
+    from scheduler import priority, tool_priority
+
+_REFERENCE = re.compile(r"^\$([\w-]+)((?:\.[\w-]+)*)$")
+
+OK = "ok"
+ERROR = "error"
+SKIPPED = "skipped"
+
+# Nome da tool MCP que executa o lote
+BATCH_TOOL = "execute_batch"
+
+
+def _references(value: Any) -> Set[str]:
+    """IDs citados em "$id..." dentro dos argumentos (em qualquer nível)"""
+    if isinstance(value, str):
+        match = _REFERENCE.match(value)
+        return {match.group(1)} if match else set()
+    if isinstance(value, dict):
+        return set().union(*(_references(v) for v in value.values()))
+    if isinstance(value, (list, tuple)):
+        return set().union(*(_references(v) for v in value))
+    return set()
+
+
+def _lookup(result: Any, path: str, reference: str) -> Any:
+    for part in filter(None, path.split(".")):
+        try:
+            if isinstance(result, (list, tuple)):
+                result = result[int(part)]
+            else:
+                result = result[part]
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise ValueError(f"Referência não encontrada: {reference}")
+    return result
+
+
+def _substitute(value: Any, results: Dict[str, Any]) -> Any:
+    if isinstance(value, str):
+        match = _REFERENCE.match(value)
+        if not match:
+            return value
+        return _lookup(results[match.group(1)], match.group(2), value)
+    if isinstance(value, dict):
+        return {k: _substitute(v, results) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_substitute(v, results) for v in value]
+    return value
+
+
+def plan(
+    operations: List[Dict[str, Any]],
+    allowed: AbstractSet[str],
+    reads: AbstractSet[str] = frozenset(),
+) -> List[Dict[str, Any]]:
+    """Valida as operações e resolve IDs e dependências (sem ciclos)
+
+    Métodos fora de `reads` esperam o anterior também fora dele terminar
+    (`after`), mesmo que ele falhe: a ordem da lista vale para as escritas.
+    """
+    steps = []
+    seen: Set[str] = set()
+    last_write = None
+    for position, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            raise ValueError(f"Operação {position} deve ser um objeto")
+        op_id = str(operation.get("id", position))
+        method = operation.get("method")
+        args = operation.get("args") or {}
+        if op_id in seen:
+            raise ValueError(f"ID de operação repetido: {op_id}")
+        if method not in allowed:
+            raise ValueError(f"Método não permitido em lote: {method}")
+        if not isinstance(args, dict):
+            raise ValueError(f"args da operação {op_id} deve ser um objeto")
+        depends_on = set(map(str, operation.get("depends_on") or [])) | _references(
+            args
+        )
+        # Só operações anteriores: garante que não há ciclos
+        unknown = depends_on - seen
+        if unknown:
+            raise ValueError(
+                f"Operação {op_id} depende de operações inexistentes ou "
+                f"posteriores: {', '.join(sorted(unknown))}"
+            )
+        seen.add(op_id)
+        after = set()
+        if method not in reads:
+            after = {last_write} if last_write is not None else set()
+            last_write = op_id
+        steps.append(
+            {
+                "id": op_id,
+                "method": method,
+                "args": args,
+                "depends_on": depends_on,
+                "after": after,
+            }
+        )
+    return steps
+
+
+def called_tools(tool_name: str, result: Any) -> List[str]:
+    """A tool chamada e, no lote, cada método que chegou a ser executado
+
+    Operações puladas ou com erro antes de rodar (referência inválida) não
+    contam: só as marcadas com "started" por `run_batch`.
+
+    `result` é o ToolResult do FastMCP. Usado pelos middlewares que reagem a
+    tools de escrita (invalidação de recursos, consulta do player).
+    """
+    if tool_name != BATCH_TOOL:
+        return [tool_name]
+    structured = getattr(result, "structured_content", None)
+    results = structured.get("results") if isinstance(structured, dict) else None
+    return [tool_name] + [
+        outcome["method"]
+        for outcome in results or ()
+        if isinstance(outcome, dict) and outcome.get("started")
+    ]
+
+
+def run_batch(
+    steps: List[Dict[str, Any]],
+    call: Callable[[str, Dict[str, Any]], Any],
+    concurrency: int,
+) -> List[Dict[str, Any]]:
+    """Executa as operações planejadas; resultados na ordem da lista"""
+    outcomes: Dict[str, Dict[str, Any]] = {}
+    values: Dict[str, Any] = {}
+    pending = list(steps)
+    running = {}
+
+    def execute(step: Dict[str, Any], args: Dict[str, Any]) -> Any:
+        with priority(tool_priority(step["method"])):
+            return call(step["method"], args)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        while pending or running:
+            for step in list(pending):
+                if any(
+                    dep not in outcomes
+                    for dep in step["depends_on"] | step.get("after", set())
+                ):
+                    continue
+                pending.remove(step)
+                failed = [
+                    dep for dep in step["depends_on"] if outcomes[dep]["status"] != OK
+                ]
+                if failed:
+                    outcomes[step["id"]] = {
+                        "status": SKIPPED,
+                        "error": f"Dependência falhou: {', '.join(sorted(failed))}",
+                    }
+                    continue
+                try:
+                    args = _substitute(step["args"], values)
+                except ValueError as e:
+                    outcomes[step["id"]] = {"status": ERROR, "error": str(e)}
+                    continue
+                # Cada operação leva o contexto da tool (usuário, métricas)
+                future = pool.submit(
+                    contextvars.copy_context().run, execute, step, args
+                )
+                running[future] = (step, time.perf_counter())
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step, started = running.pop(future)
+                elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+                try:
+                    values[step["id"]] = future.result()
+                    outcomes[step["id"]] = {
+                        "status": OK,
+                        "started": True,
+                        "result": values[step["id"]],
+                        "elapsed_ms": elapsed_ms,
+                    }
+                except Exception as e:
+                    outcomes[step["id"]] = {
+                        "status": ERROR,
+                        "started": True,
+                        "error": str(e),
+                        "elapsed_ms": elapsed_ms,
+                    }
+
+    return [
+        {"id": step["id"], "method": step["method"], **outcomes[step["id"]]}
+        for step in steps
+    ]
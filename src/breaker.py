@@ -0,0 +1,220 @@
+"""
+Circuit breaker por endpoint da Web API
+
+Alguns endpoints ficam indisponíveis para o app ou para a conta inteira:
+audio features e recomendações respondem 403/404 para apps novos ou contas
+sem Premium, e repetir a chamada só gasta uma ida à rede (e fatia do limite
+de taxa) para falhar de novo. Depois de `threshold` respostas 403/404
+seguidas o circuito do endpoint abre: durante `cooldown` segundos as
+requisições recebem a última resposta de erro guardada (cache negativo),
+sem sair do processo. Passado o intervalo, uma única requisição de teste
+(meio-aberto) vai à Web API; sucesso fecha o circuito, nova falha reabre.
+"""
+
+import threading
+import time
+from typing import Callable, Dict, FrozenSet, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from .metrics import MetricsRegistry, endpoint_label
+except ImportError:
+    from metrics import MetricsRegistry, endpoint_label
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Endpoints em que 403/404 indica o endpoint indisponível, não um ID inexistente
+GUARDED_ENDPOINTS: FrozenSet[str] = frozenset(
+    {
+        "GET /audio-features",
+        "GET /audio-features/{id}",
+        "GET /audio-analysis/{id}",
+        "GET /recommendations",
+        "GET /recommendations/available-genre-seeds",
+        "GET /artists/{id}/related-artists",
+    }
+)
+FAILURE_STATUSES: FrozenSet[int] = frozenset({403, 404})
+
+
+class _Failure:
+    def __init__(self, response: requests.Response):
+        self.status_code = response.status_code
+        self.reason = response.reason
+        self.content = response.content
+        self.headers = dict(response.headers)
+
+    def replay(self, url: str) -> requests.Response:
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.reason = self.reason
+        response._content = self.content
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.url = url
+        return response
+
+
+class CircuitBreaker:
+    """Estado de um endpoint: fechado, aberto ou meio-aberto (um teste por vez)"""
+
+    def __init__(
+        self,
+        threshold: int,
+        cooldown: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = max(1, threshold)
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probing = False
+        self.last_failure: Optional[_Failure] = None
+
+    @property
+    def is_open(self) -> bool:
+        """Requisições seriam recusadas agora (sem contar o teste pendente)"""
+        if self.state == OPEN:
+            return self.clock() - self.opened_at < self.cooldown
+        return self.state == HALF_OPEN and self.probing
+
+    def allow(self) -> bool:
+        """Libera a requisição; no fim do intervalo, libera um único teste"""
+        if self.state == CLOSED:
+            return True
+        if self.is_open:
+            return False
+        self.state = HALF_OPEN
+        self.probing = True
+        return True
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self.probing = False
+        self.last_failure = None
+
+    def record_failure(self, response: requests.Response) -> bool:
+        """Registra um 403/404; retorna True se o circuito abriu agora"""
+        self.last_failure = _Failure(response)
+        self.failures += 1
+        self.probing = False
+        if self.state == HALF_OPEN or self.failures >= self.threshold:
+            was_open = self.state == OPEN
+            self.state = OPEN
+            self.opened_at = self.clock()
+            return not was_open
+        return False
+
+    def release(self) -> None:
+        """Teste inconclusivo (erro de rede, 5xx): o próximo pedido testa de novo"""
+        self.probing = False
+
+
+class EndpointBreakers:
+    """Um CircuitBreaker por endpoint protegido, para um cliente Spotipy.
+
+    Uma instância por usuário: 403 por falta de Premium vale para a conta,
+    não para os outros usuários do servidor.
+    """
+
+    def __init__(
+        self,
+        threshold: int,
+        cooldown: float,
+        registry: Optional[MetricsRegistry] = None,
+        endpoints: FrozenSet[str] = GUARDED_ENDPOINTS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.registry = registry
+        self.endpoints = endpoints
+        self.clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _event(self, name: str) -> None:
+        if self.registry is not None:
+            self.registry.record_event(name)
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            if breaker is None:
+                breaker = self._breakers[endpoint] = CircuitBreaker(
+                    self.threshold, self.cooldown, self.clock
+                )
+            return breaker
+
+    def is_open(self, endpoint: str) -> bool:
+        with self._lock:
+            breaker = self._breakers.get(endpoint)
+            return breaker is not None and breaker.is_open
+
+    def states(self) -> Dict[str, str]:
+        with self._lock:
+            return {
+                endpoint: (
+                    HALF_OPEN
+                    if breaker.state == OPEN and not breaker.is_open
+                    else breaker.state
+                )
+                for endpoint, breaker in self._breakers.items()
+            }
+
+    def send(self, request, method: str, url: str, *args, **kwargs):
+        if self.cooldown <= 0:
+            return request(method, url, *args, **kwargs)
+        endpoint = endpoint_label(method, url)
+        if endpoint not in self.endpoints:
+            return request(method, url, *args, **kwargs)
+
+        breaker = self.breaker(endpoint)
+        with self._lock:
+            allowed = breaker.allow()
+            failure = breaker.last_failure
+        if not allowed:
+            self._event("circuit_short_circuited")
+            return failure.replay(url)
+
+        try:
+            response = request(method, url, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                breaker.release()
+            raise
+
+        opened = closed = False
+        with self._lock:
+            if response.status_code in FAILURE_STATUSES:
+                opened = breaker.record_failure(response)
+            elif response.status_code < 400:
+                closed = breaker.state != CLOSED
+                breaker.record_success()
+            else:
+                # Outros erros (5xx, 429) não dizem nada sobre o endpoint
+                breaker.release()
+        if opened:
+            self._event("circuit_opened")
+        if closed:
+            self._event("circuit_closed")
+        return response
+
+    def install(self, client) -> None:
+        """Passa as requisições do cliente Spotipy pelos circuitos"""
+        session = getattr(client, "_session", None)
+        if session is None or getattr(session.request, "__breaker__", False):
+            return
+        request = session.request
+
+        def guarded(method, url, *args, **kwargs):
+            return self.send(request, method, url, *args, **kwargs)
+
+        guarded.__breaker__ = True
+        session.request = guarded
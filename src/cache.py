@@ -0,0 +1,138 @@
+"""
+Cache em memória com expiração (TTL) e descarte LRU
+
+O cache de catálogo guarda dados que não dependem do usuário (músicas,
+artistas, álbuns, audio features) e é compartilhado por todos os clientes do
+processo. Dados pessoais (biblioteca, playback, histórico) nunca entram nele.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+try:
+    from .config import (
+        CATALOG_CACHE_SIZE,
+        CATALOG_CACHE_TTL,
+        PLAYLIST_CACHE_SIZE,
+        RELATED_CACHE_SIZE,
+        RELATED_CACHE_TTL,
+        RESOLVE_CACHE_SIZE,
+        RESOLVE_CACHE_TTL,
+        SEARCH_CACHE_SIZE,
+        SEARCH_CACHE_TTL,
+    )
+    from .metrics import metrics
+except ImportError:
+    from config import (
+        CATALOG_CACHE_SIZE,
+        CATALOG_CACHE_TTL,
+        PLAYLIST_CACHE_SIZE,
+        RELATED_CACHE_SIZE,
+        RELATED_CACHE_TTL,
+        RESOLVE_CACHE_SIZE,
+        RESOLVE_CACHE_TTL,
+        SEARCH_CACHE_SIZE,
+        SEARCH_CACHE_TTL,
+    )
+    from metrics import metrics
+
+
+class TTLCache:
+    """Cache thread-safe com validade por entrada e limite de tamanho (LRU)"""
+
+    def __init__(self, name: str, max_size: int, ttl: float):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        metrics.register_gauge(
+            "spotify_mcp_cache_entries",
+            lambda: len(self),
+            {"cache": name},
+            "Entradas mantidas em cache",
+        )
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _lookup(self, key: Hashable, now: float) -> Tuple[bool, Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at < now:
+            del self._data[key]
+            return False, None
+        self._data.move_to_end(key)
+        return True, value
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+        metrics.record_cache(self.name, hit=found)
+        return value
+
+    def get_many(self, keys: Iterable[Hashable]) -> Dict[Hashable, Any]:
+        """Retorna apenas as chaves presentes e válidas"""
+        found = {}
+        misses = 0
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                hit, value = self._lookup(key, now)
+                if hit:
+                    found[key] = value
+                else:
+                    misses += 1
+        metrics.record_cache(self.name, hit=True, count=len(found))
+        metrics.record_cache(self.name, hit=False, count=misses)
+        return found
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[Hashable, Any], ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove e devolve o valor (None se ausente ou expirado)"""
+        with self._lock:
+            found, value = self._lookup(key, time.monotonic())
+            if found:
+                del self._data[key]
+        return value
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+# Dados de catálogo compartilhados entre usuários e sessões
+catalog_cache = TTLCache("catalog", CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL)
+
+# Itens de playlists por (playlist_id, snapshot_id): um snapshot nunca muda,
+# então uma playlist com o mesmo snapshot não precisa ser buscada de novo
+playlist_cache = TTLCache("playlist_snapshots", PLAYLIST_CACHE_SIZE, CATALOG_CACHE_TTL)
+
+# Resultados de search_all por mercado: contas do mesmo país compartilham
+search_cache = TTLCache("search", SEARCH_CACHE_SIZE, SEARCH_CACHE_TTL)
+
+# Melhor candidato da busca por (mercado, artista, título) normalizados
+resolve_cache = TTLCache("resolve", RESOLVE_CACHE_SIZE, RESOLVE_CACHE_TTL)
+
+# Arestas do grafo de artistas: IDs dos relacionados de cada artista (os nós
+# ficam no cache de catálogo, como "artist:<id>")
+related_cache = TTLCache("related_artists", RELATED_CACHE_SIZE, RELATED_CACHE_TTL)
@@ -0,0 +1,91 @@
+"""
+Agrupamento de comandos de playback repetidos
+
+Agentes costumam mandar rajadas como `set_volume` 40, 45, 50 ou vários
+`skip_to_next` seguidos. Com a janela ligada (PLAYBACK_COALESCE_WINDOW, em
+segundos), comandos iguais que chegam enquanto o primeiro aguarda a janela
+viram uma única ação: volume e posição ficam com o último valor, pulos são
+somados. Todos os chamadores recebem o resultado do estado final aplicado.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+try:
+    from .metrics import MetricsRegistry
+except ImportError:
+    from metrics import MetricsRegistry
+
+
+def keep_last(current: Any, new: Any) -> Any:
+    return new
+
+
+def add(current: Any, new: Any) -> Any:
+    return current + new
+
+
+class _Batch:
+    def __init__(self, value: Any):
+        self.value = value
+        self.count = 1
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.done = threading.Event()
+
+
+class CommandCoalescer:
+    """Junta comandos com a mesma chave recebidos dentro de `window` segundos.
+
+    O primeiro comando de uma rajada espera a janela e executa `apply` com o
+    valor combinado por `merge`; os seguintes só aguardam esse resultado. Com
+    `window` igual a 0 cada comando é executado na hora.
+    """
+
+    def __init__(self, window: float, registry: Optional[MetricsRegistry] = None):
+        self.window = window
+        self.registry = registry
+        self._open: Dict[Hashable, _Batch] = {}
+        self._lock = threading.Lock()
+
+    def submit(
+        self,
+        key: Hashable,
+        value: Any,
+        apply: Callable[[Any], Dict[str, Any]],
+        merge: Callable[[Any, Any], Any] = keep_last,
+    ) -> Dict[str, Any]:
+        if self.window <= 0:
+            return apply(value)
+
+        with self._lock:
+            batch = self._open.get(key)
+            leader = batch is None
+            if leader:
+                batch = self._open[key] = _Batch(value)
+            else:
+                batch.value = merge(batch.value, value)
+                batch.count += 1
+
+        if leader:
+            time.sleep(self.window)
+            with self._lock:
+                del self._open[key]
+            try:
+                batch.result = apply(batch.value)
+            except Exception as e:
+                batch.error = e
+            finally:
+                batch.done.set()
+            if batch.count > 1 and self.registry is not None:
+                self.registry.record_event("playback_coalesced", batch.count - 1)
+        else:
+            batch.done.wait()
+
+        if batch.error is not None:
+            raise batch.error
+        result = dict(batch.result)
+        if batch.count > 1:
+            result["coalesced"] = batch.count
+        return result
@@ -0,0 +1,151 @@
+"""
+Execução concorrente das tools: pool de threads e contrapressão
+
+As tools do servidor são funções síncronas (Spotipy usa requests). O FastMCP
+executa funções síncronas direto no event loop, então uma chamada lenta à Web
+API bloquearia todas as sessões do processo. Aqui as tools síncronas passam a
+rodar em um pool limitado de threads, e chamadas que encontrariam a fila de
+espera cheia são recusadas na hora, em vez de acumular latência para todos os
+clientes.
+"""
+
+import functools
+import inspect
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import anyio
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+try:
+    from .metrics import MetricsRegistry
+except ImportError:
+    from metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class ToolWorkerPool(Middleware):
+    """Pool de threads das tools síncronas, com limite de chamadas em espera.
+
+    Até `workers` tools executam ao mesmo tempo; outras `max_pending` podem
+    aguardar um worker livre. Passando disso, a chamada falha com uma
+    mensagem de servidor ocupado para o cliente tentar de novo. As variáveis
+    de contexto (ex.: a chamada em curso nas métricas) são copiadas para a
+    thread, então a atribuição de chamadas à API continua valendo.
+
+    Com `classify` (nome da tool -> classe) e `class_workers`, as classes
+    listadas ganham threads próprias: um export longo não ocupa os workers de
+    que um `pause_music` precisa.
+
+    Use `lifespan` como lifespan do FastMCP (instala o pool nas tools ao
+    iniciar qualquer transporte) e registre a instância como middleware.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        max_pending: int,
+        registry: Optional[MetricsRegistry] = None,
+        classify: Optional[Callable[[str], str]] = None,
+        class_workers: Optional[Dict[str, int]] = None,
+    ):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.registry = registry
+        self.classify = classify
+        self.class_workers = dict(class_workers or {}) if classify else {}
+        self.limiters: Dict[Optional[str], anyio.CapacityLimiter] = {}
+        if registry is not None:
+            registry.register_gauge(
+                "spotify_mcp_tool_workers",
+                lambda: self.workers + sum(self.class_workers.values()),
+                help_text="Tamanho do pool de workers das tools",
+            )
+            registry.register_gauge(
+                "spotify_mcp_tool_workers_busy",
+                lambda: self.busy,
+                help_text="Workers executando tools",
+            )
+            registry.register_gauge(
+                "spotify_mcp_tool_calls_waiting",
+                lambda: self.waiting,
+                help_text="Chamadas de tool aguardando um worker",
+            )
+
+    @property
+    def limiter(self) -> Optional[anyio.CapacityLimiter]:
+        """Limitador das tools sem threads próprias"""
+        return self.limiters.get(None)
+
+    @property
+    def busy(self) -> int:
+        return sum(int(lim.borrowed_tokens) for lim in self.limiters.values())
+
+    @property
+    def waiting(self) -> int:
+        return sum(lim.statistics().tasks_waiting for lim in self.limiters.values())
+
+    def _class_of(self, tool_name: str) -> Optional[str]:
+        if not self.classify:
+            return None
+        name = self.classify(tool_name)
+        return name if name in self.class_workers else None
+
+    def wrap(
+        self, fn: Callable[..., Any], tool_class: Optional[str] = None
+    ) -> Callable[..., Any]:
+        """Transforma uma tool síncrona em assíncrona executada no pool"""
+
+        @functools.wraps(fn)
+        async def offloaded(*args, **kwargs):
+            return await anyio.to_thread.run_sync(
+                functools.partial(fn, *args, **kwargs),
+                limiter=self.limiters.get(tool_class),
+            )
+
+        offloaded.__offloaded__ = True
+        return offloaded
+
+    async def install(self, app) -> int:
+        """Passa as tools síncronas do app para o pool; retorna quantas"""
+        installed = 0
+        for tool in (await app.get_tools()).values():
+            fn = getattr(tool, "fn", None)
+            if fn is None or getattr(fn, "__offloaded__", False):
+                continue
+            if inspect.iscoroutinefunction(fn):
+                continue
+            tool.fn = self.wrap(fn, self._class_of(tool.name))
+            installed += 1
+        return installed
+
+    @asynccontextmanager
+    async def lifespan(self, app) -> AsyncIterator[dict]:
+        # O limitador pertence ao event loop em execução
+        self.limiters = {None: anyio.CapacityLimiter(self.workers)}
+        for name, size in self.class_workers.items():
+            self.limiters[name] = anyio.CapacityLimiter(size)
+        installed = await self.install(app)
+        if installed:
+            logger.debug(f"{installed} tools síncronas usando {self.workers} workers")
+        try:
+            yield {}
+        finally:
+            self.limiters = {}
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        limiter = self.limiters.get(self._class_of(context.message.name))
+        if limiter is not None and (
+            limiter.borrowed_tokens >= limiter.total_tokens
+            and limiter.statistics().tasks_waiting >= self.max_pending
+        ):
+            if self.registry is not None:
+                self.registry.record_event("tool_call_rejected")
+            raise ToolError(
+                "Servidor ocupado: muitas chamadas simultâneas. "
+                "Tente novamente em instantes."
+            )
+        return await call_next(context)
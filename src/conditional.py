@@ -0,0 +1,134 @@
+"""
+Requisições condicionais (ETag / If-None-Match) à Web API
+
+Respostas GET com ETag ficam guardadas junto com o corpo. A próxima
+requisição para a mesma URL envia If-None-Match; se a Web API responder
+304 Not Modified, o Spotipy recebe o corpo guardado como se fosse um 200,
+sem baixar nem transferir o payload de novo (playlists grandes, perfil...).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from .metrics import MetricsRegistry
+except ImportError:
+    from metrics import MetricsRegistry
+
+
+def request_key(url: str, params: Optional[Dict[str, Any]]) -> str:
+    """URL completa e canônica (os parâmetros None não são enviados)"""
+    items = sorted((k, v) for k, v in (params or {}).items() if v is not None)
+    return f"{url}?{urlencode(items, doseq=True)}" if items else url
+
+
+class _Stored:
+    def __init__(self, response: requests.Response):
+        self.etag = response.headers["ETag"]
+        self.content = response.content
+        self.headers = dict(response.headers)
+        self.encoding = response.encoding
+
+    def replay(self, not_modified: requests.Response) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response._content = self.content
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = self.encoding
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.elapsed = not_modified.elapsed
+        response.raw = not_modified.raw
+        return response
+
+
+class ConditionalRequestCache:
+    """Corpos de respostas com ETag, limitados a `max_bytes` (LRU).
+
+    Uma instância por cliente Spotipy: cada usuário tem a própria sessão e
+    os corpos guardados nunca passam de um usuário para outro.
+    """
+
+    def __init__(self, max_bytes: int, registry: Optional[MetricsRegistry] = None):
+        self.max_bytes = max_bytes
+        self.registry = registry
+        self.size = 0
+        self._entries: "OrderedDict[str, _Stored]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[_Stored]:
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None:
+                self._entries.move_to_end(key)
+            return stored
+
+    def store(self, key: str, response: requests.Response) -> None:
+        stored = _Stored(response)
+        if len(stored.content) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.content)
+            self._entries[key] = stored
+            self.size += len(stored.content)
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.content)
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old.content)
+
+    def _record(self, hit: bool) -> None:
+        if self.registry is not None:
+            self.registry.record_cache("http_etag", hit=hit)
+
+    def send(self, request, method: str, url: str, *args, **kwargs):
+        if method.upper() != "GET" or self.max_bytes <= 0:
+            return request(method, url, *args, **kwargs)
+
+        key = request_key(url, kwargs.get("params"))
+        stored = self.get(key)
+        if stored is not None:
+            kwargs["headers"] = {
+                **(kwargs.get("headers") or {}),
+                "If-None-Match": stored.etag,
+            }
+        response = request(method, url, *args, **kwargs)
+
+        if response.status_code == 304 and stored is not None:
+            self._record(hit=True)
+            return stored.replay(response)
+        if stored is not None:
+            self._record(hit=False)
+        if response.status_code == 200 and response.headers.get("ETag"):
+            self.store(key, response)
+        elif stored is not None:
+            self.discard(key)
+        return response
+
+    def install(self, client) -> None:
+        """Envia os GETs do cliente Spotipy como requisições condicionais"""
+        session = getattr(client, "_session", None)
+        if session is None or getattr(session.request, "__conditional__", False):
+            return
+        request = session.request
+
+        def conditional(method, url, *args, **kwargs):
+            return self.send(request, method, url, *args, **kwargs)
+
+        conditional.__conditional__ = True
+        session.request = conditional
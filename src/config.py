@@ -21,12 +21,19 @@ SPOTIFY_REDIRECT_URI = os.getenv(
     "SPOTIFY_REDIRECT_URI", "http://localhost:8000/callback"
 )
 
+# Endereços da Web API e do serviço de contas (apontáveis para um servidor
+# local, ex.: python -m src.fake_spotify, em testes de carga offline)
+SPOTIFY_API_BASE_URL = os.getenv("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1/")
+SPOTIFY_ACCOUNTS_URL = os.getenv("SPOTIFY_ACCOUNTS_URL", "https://accounts.spotify.com")
+
 # Escopos do Spotify
 SPOTIFY_SCOPES = [
     "user-read-playback-state",
     "user-modify-playback-state",
     "user-read-currently-playing",
     "playlist-read-private",
+    "playlist-modify-private",  # Criar e editar playlists
+    "playlist-modify-public",
     "user-library-read",
     "user-library-modify",  # Necessário para adicionar/remover favoritos
     "user-top-read",
@@ -45,6 +52,105 @@ DEBUG = os.getenv("DEBUG", "false").lower() == "true"  # Desabilitado por padrã
 MCP_SERVER_NAME = os.getenv("MCP_SERVER_NAME", "spotipy-mcp-server")
 MCP_SERVER_VERSION = os.getenv("MCP_SERVER_VERSION", "1.0.0")
 
+# Transporte: "stdio" (um processo por cliente) ou "http"/"sse" (processo
+# único servindo várias sessões em HOST:PORT)
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+# Threads que executam as tools e chamadas que podem aguardar uma thread livre
+MCP_WORKERS = int(os.getenv("MCP_WORKERS", "16"))
+MCP_MAX_PENDING = int(os.getenv("MCP_MAX_PENDING", "64"))
+# Conexões HTTP simultâneas aceitas (0 = sem limite; excedentes recebem 503)
+MCP_MAX_CONNECTIONS = int(os.getenv("MCP_MAX_CONNECTIONS", "0"))
+# Conexões mantidas no pool HTTP com a Web API (compartilhado entre sessões)
+SPOTIFY_POOL_SIZE = int(os.getenv("SPOTIFY_POOL_SIZE", str(MCP_WORKERS)))
+
+# Prioridade das chamadas à Web API: controle de playback > leituras > lote.
+# Tools de controle e de lote têm threads próprias; cada classe tem um limite
+# de requisições simultâneas e uma fatia do limite de taxa do app
+# (SPOTIFY_RATE_LIMIT em requisições/s; 0 = sem limite de taxa)
+SCHEDULER_CONTROL_CONCURRENCY = int(os.getenv("SCHEDULER_CONTROL_CONCURRENCY", "4"))
+SCHEDULER_INTERACTIVE_CONCURRENCY = int(
+    os.getenv("SCHEDULER_INTERACTIVE_CONCURRENCY", str(MCP_WORKERS))
+)
+SCHEDULER_BULK_CONCURRENCY = int(os.getenv("SCHEDULER_BULK_CONCURRENCY", "4"))
+SPOTIFY_RATE_LIMIT = float(os.getenv("SPOTIFY_RATE_LIMIT", "0"))
+SCHEDULER_RATE_SHARES = {
+    name: float(share)
+    for name, share in (
+        item.split("=", 1)
+        for item in os.getenv(
+            "SCHEDULER_RATE_SHARES", "control=0.2,interactive=0.5,bulk=0.3"
+        ).split(",")
+        if "=" in item
+    )
+}
+
+# Janela (segundos) para agrupar rajadas de volume, seek e pulos em um só
+# comando; 0 desativa
+PLAYBACK_COALESCE_WINDOW = float(os.getenv("PLAYBACK_COALESCE_WINDOW", "0"))
+
+# Consulta do player em segundo plano (só com assinantes dos recursos de
+# playback): intervalo tocando, pausado e mínimo (perto do fim da faixa)
+PLAYBACK_POLL_INTERVAL = float(os.getenv("PLAYBACK_POLL_INTERVAL", "5"))
+PLAYBACK_PAUSED_POLL_INTERVAL = float(os.getenv("PLAYBACK_PAUSED_POLL_INTERVAL", "15"))
+PLAYBACK_MIN_POLL_INTERVAL = float(os.getenv("PLAYBACK_MIN_POLL_INTERVAL", "1"))
+
+# Cache dos recursos spotify:// (validade de cada recurso multiplicada pela
+# escala; 0 desativa) e número máximo de entradas (usuário x recurso)
+RESOURCE_CACHE_TTL_SCALE = float(os.getenv("RESOURCE_CACHE_TTL_SCALE", "1"))
+RESOURCE_CACHE_SIZE = int(os.getenv("RESOURCE_CACHE_SIZE", "1000"))
+
+# Circuit breaker dos endpoints que a Web API desativa por app/conta (audio
+# features, recomendações): respostas 403/404 seguidas que abrem o circuito e
+# segundos até a requisição de teste (0 desativa)
+CIRCUIT_BREAKER_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_THRESHOLD", "3"))
+CIRCUIT_BREAKER_COOLDOWN = float(os.getenv("CIRCUIT_BREAKER_COOLDOWN", "300"))
+
+# Janela (segundos) para juntar buscas individuais por ID (audio features,
+# favoritos, músicas, artistas, álbuns) em chamadas multi-ID; 0 junta só as
+# buscas que chegam enquanto o lote ainda está aberto
+LOADER_BATCH_WINDOW = float(os.getenv("LOADER_BATCH_WINDOW", "0.002"))
+
+# Hidratação em lote (hydrate_tracks/artists/albums): IDs aceitos por chamada
+# e lotes buscados ao mesmo tempo
+HYDRATE_MAX_IDS = int(os.getenv("HYDRATE_MAX_IDS", "1000"))
+HYDRATE_CONCURRENCY = int(os.getenv("HYDRATE_CONCURRENCY", "4"))
+
+# Cache de search_all (por consulta normalizada, tipos, limite e mercado):
+# entradas e validade em segundos
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1000"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "600"))
+
+# Resolução de listas "artista - título" (resolve_tracks): linhas por chamada,
+# buscas simultâneas, confiança mínima (0 a 1), candidatos por busca e cache
+# de resoluções (entradas e validade em segundos)
+RESOLVE_MAX_TRACKS = int(os.getenv("RESOLVE_MAX_TRACKS", "200"))
+RESOLVE_CONCURRENCY = int(os.getenv("RESOLVE_CONCURRENCY", "4"))
+RESOLVE_MIN_CONFIDENCE = float(os.getenv("RESOLVE_MIN_CONFIDENCE", "0.7"))
+RESOLVE_CANDIDATES = int(os.getenv("RESOLVE_CANDIDATES", "5"))
+RESOLVE_CACHE_SIZE = int(os.getenv("RESOLVE_CACHE_SIZE", "5000"))
+RESOLVE_CACHE_TTL = float(os.getenv("RESOLVE_CACHE_TTL", "86400"))
+
+# execute_batch: operações por chamada e operações executadas ao mesmo tempo
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+# Escrita em playlists: músicas por chamada e repetições de um lote que falhou
+PLAYLIST_WRITE_MAX_ITEMS = int(os.getenv("PLAYLIST_WRITE_MAX_ITEMS", "10000"))
+PLAYLIST_WRITE_RETRIES = int(os.getenv("PLAYLIST_WRITE_RETRIES", "2"))
+
+# Índice de playlists (find_track_in_playlists, find_playlist_duplicates):
+# segundos até conferir os snapshots de novo e playlists lidas ao mesmo tempo
+PLAYLIST_INDEX_MAX_AGE = float(os.getenv("PLAYLIST_INDEX_MAX_AGE", "300"))
+PLAYLIST_INDEX_CONCURRENCY = int(os.getenv("PLAYLIST_INDEX_CONCURRENCY", "4"))
+
+# Grafo de artistas (explore_artist_graph, find_artist_path): saltos máximos,
+# artistas visitados por consulta, buscas simultâneas e cache de relacionados
+ARTIST_GRAPH_MAX_HOPS = int(os.getenv("ARTIST_GRAPH_MAX_HOPS", "3"))
+ARTIST_GRAPH_MAX_ARTISTS = int(os.getenv("ARTIST_GRAPH_MAX_ARTISTS", "500"))
+ARTIST_GRAPH_CONCURRENCY = int(os.getenv("ARTIST_GRAPH_CONCURRENCY", "4"))
+RELATED_CACHE_SIZE = int(os.getenv("RELATED_CACHE_SIZE", "10000"))
+RELATED_CACHE_TTL = float(os.getenv("RELATED_CACHE_TTL", "86400"))
+
 # Configurações de logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
@@ -55,3 +161,31 @@ CAPTURE_STDOUT = os.getenv("CAPTURE_STDOUT", "true").lower() == "true"
 TOKEN_CACHE_PATH = os.getenv(
     "SPOTIFY_TOKEN_CACHE_PATH", str(BASE_DIR / ".spotify_token_cache")
 )
+
+# Diretório do cache local (agregados de analytics, exportações, etc.)
+CACHE_DIR = os.getenv("SPOTIFY_CACHE_DIR", str(BASE_DIR / ".spotify_cache"))
+ANALYTICS_CACHE_PATH = os.path.join(CACHE_DIR, "analytics.json")
+EXPORT_DIR = os.getenv("SPOTIFY_EXPORT_DIR", os.path.join(CACHE_DIR, "exports"))
+
+# Vários usuários em um servidor: tokens por usuário, clientes em memória
+# (descartados por LRU/ociosidade) e cabeçalho HTTP que identifica o usuário
+TOKEN_STORE_PATH = os.getenv(
+    "SPOTIFY_TOKEN_STORE_PATH", os.path.join(CACHE_DIR, "tokens.db")
+)
+MCP_USER_HEADER = os.getenv("MCP_USER_HEADER", "X-Spotify-User")
+# Requisições HTTP sem o cabeçalho usam o usuário "default" (senão são recusadas)
+MCP_ALLOW_DEFAULT_USER = os.getenv("MCP_ALLOW_DEFAULT_USER", "false").lower() == "true"
+MAX_USER_CLIENTS = int(os.getenv("MAX_USER_CLIENTS", "100"))
+USER_CLIENT_IDLE_TTL = float(os.getenv("USER_CLIENT_IDLE_TTL", "1800"))
+
+# Cache de catálogo (músicas, artistas, álbuns, audio features) compartilhado
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "50000"))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "86400"))
+
+# Requisições condicionais: bytes de respostas com ETag guardados por usuário
+# (0 desativa)
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+# Itens de playlists por snapshot_id (conteúdo imutável, compartilhado entre
+# usuários): playlists guardadas e itens máximos por playlist
+PLAYLIST_CACHE_SIZE = int(os.getenv("PLAYLIST_CACHE_SIZE", "50"))
+PLAYLIST_CACHE_MAX_ITEMS = int(os.getenv("PLAYLIST_CACHE_MAX_ITEMS", "5000"))
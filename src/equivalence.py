@@ -0,0 +1,165 @@
+"""
+Índice de equivalência de gravações: IDs diferentes para a mesma música
+
+A mesma gravação aparece com vários IDs (single, álbum, edição deluxe,
+coletânea). O ISRC identifica a gravação e é a chave principal. Sem ISRC de
+um dos lados, título e artista normalizados (como em resolve_tracks) com
+durações próximas servem de reserva. Dois ISRCs diferentes nunca se juntam
+pelo título: remasterizações e versões ao vivo têm ISRC próprio.
+
+O índice é alimentado com as músicas que o servidor já recebe (buscas,
+hidratação, sincronização de playlists, favoritos), sem requisições extras.
+Os grupos são mantidos com union-find, então a consulta é O(1) amortizado.
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from .resolve import normalize
+except ImportError:
+    from resolve import normalize
+
+# Diferença máxima de duração para juntar músicas pelo título (ms)
+DURATION_TOLERANCE_MS = 3000
+
+
+def _track_fields(
+    track: Dict[str, Any],
+) -> Tuple[Optional[str], Optional[str], str, str, Optional[int]]:
+    """ID, ISRC, título, artista e duração de qualquer formato de música
+
+    Aceita o objeto da Web API, o registro compacto da hidratação e o resumo
+    das buscas ({"name", "artist", "uri"}).
+    """
+    track_id = track.get("id")
+    uri = track.get("uri") or ""
+    if not track_id and uri.startswith("spotify:track:"):
+        track_id = uri.rsplit(":", 1)[1]
+    isrc = track.get("isrc") or (track.get("external_ids") or {}).get("isrc")
+    artist = track.get("artist")
+    if not artist:
+        artists = track.get("artists") or [None]
+        artist = artists[0].get("name") if isinstance(artists[0], dict) else artists[0]
+    return (
+        track_id,
+        isrc.strip().upper() if isrc else None,
+        normalize(track.get("name")),
+        normalize(artist),
+        track.get("duration_ms"),
+    )
+
+
+class TrackEquivalenceIndex:
+    """Grupos de IDs da mesma gravação (por ISRC ou título, artista e duração)"""
+
+    def __init__(self, duration_tolerance_ms: int = DURATION_TOLERANCE_MS):
+        self.duration_tolerance_ms = duration_tolerance_ms
+        self._lock = threading.Lock()
+        self._parent: Dict[str, str] = {}
+        self._members: Dict[str, Set[str]] = {}
+        self._isrcs: Dict[str, Optional[str]] = {}
+        self._group_isrc: Dict[str, Optional[str]] = {}
+        self._by_isrc: Dict[str, str] = {}
+        self._by_title: Dict[Tuple[str, str], List[Tuple[str, Optional[int]]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._parent)
+
+    def __contains__(self, track_id: str) -> bool:
+        return track_id in self._parent
+
+    def _find(self, track_id: str) -> str:
+        root = track_id
+        while self._parent[root] != root:
+            root = self._parent[root]
+        while self._parent[track_id] != root:
+            self._parent[track_id], track_id = root, self._parent[track_id]
+        return root
+
+    def _union(self, a: str, b: str) -> None:
+        root_a, root_b = self._find(a), self._find(b)
+        if root_a == root_b:
+            return
+        isrc_a, isrc_b = self._group_isrc[root_a], self._group_isrc[root_b]
+        # Uma música sem ISRC não pode ligar dois grupos de ISRCs diferentes
+        if isrc_a and isrc_b and isrc_a != isrc_b:
+            return
+        # No empate o grupo já existente (b) continua com o mesmo representante
+        if len(self._members[root_a]) <= len(self._members[root_b]):
+            root_a, root_b = root_b, root_a
+        self._parent[root_b] = root_a
+        self._members[root_a] |= self._members.pop(root_b)
+        self._group_isrc[root_a] = isrc_a or isrc_b
+        del self._group_isrc[root_b]
+
+    def add(self, track: Optional[Dict[str, Any]]) -> bool:
+        """Registra uma música; retorna se ela era nova no índice"""
+        if not track:
+            return False
+        track_id, isrc, title, artist, duration = _track_fields(track)
+        if not track_id:
+            return False
+        with self._lock:
+            new = track_id not in self._parent
+            if new:
+                self._parent[track_id] = track_id
+                self._members[track_id] = {track_id}
+                self._isrcs[track_id] = None
+                self._group_isrc[track_id] = None
+            elif self._isrcs[track_id] or not isrc:
+                return False
+            # Um resumo de busca sem ISRC pode ser completado depois
+            self._isrcs[track_id] = isrc
+            root = self._find(track_id)
+            if isrc and not self._group_isrc[root]:
+                self._group_isrc[root] = isrc
+
+            if isrc:
+                self._union(track_id, self._by_isrc.setdefault(isrc, track_id))
+            if title and artist:
+                candidates = self._by_title.setdefault((artist, title), [])
+                for other, other_duration in candidates:
+                    if (
+                        duration is not None
+                        and other_duration is not None
+                        and abs(duration - other_duration) > self.duration_tolerance_ms
+                    ):
+                        continue
+                    self._union(track_id, other)
+                if new:
+                    candidates.append((track_id, duration))
+            return new
+
+    def add_many(self, tracks: Iterable[Optional[Dict[str, Any]]]) -> int:
+        return sum(self.add(track) for track in tracks)
+
+    def root(self, track_id: str) -> str:
+        """Representante do grupo (o próprio ID se a música não é conhecida)"""
+        with self._lock:
+            return self._find(track_id) if track_id in self._parent else track_id
+
+    def equivalents(self, track_id: str) -> List[str]:
+        """Outros IDs da mesma gravação (vazio se a música não é conhecida)"""
+        with self._lock:
+            if track_id not in self._parent:
+                return []
+            members = self._members[self._find(track_id)]
+            return sorted(member for member in members if member != track_id)
+
+    def isrc_of(self, track_id: str) -> Optional[str]:
+        return self._isrcs.get(track_id)
+
+    def repeats(self, track_ids: Iterable[str]) -> List[Optional[str]]:
+        """Para cada posição, o ID anterior da mesma gravação (ou None)
+
+        O primeiro ID de cada gravação fica; os seguintes (o mesmo ID de novo
+        ou outra edição da música) apontam para ele.
+        """
+        seen: Dict[str, str] = {}
+        result: List[Optional[str]] = []
+        for track_id in track_ids:
+            root = self.root(track_id)
+            result.append(seen.get(root))
+            seen.setdefault(root, track_id)
+        return result
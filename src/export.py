@@ -0,0 +1,434 @@
+"""
+Exportação em streaming da biblioteca e do histórico para arquivos locais
+
+Os dados são lidos página a página da Web API e gravados em lotes, então o
+uso de memória não depende do tamanho da biblioteca. Formatos suportados:
+JSON por linha (jsonl, sem dependências), Parquet e Arrow IPC (requerem o
+extra opcional ``pyarrow``).
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depende do ambiente
+    pa = None
+
+try:
+    from .loader import AUDIO_FEATURES_BATCH_SIZE
+except ImportError:
+    from loader import AUDIO_FEATURES_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("jsonl", "parquet", "arrow")
+
+# Campos dos itens de playlist lidos pela exportação e pelo índice de
+# playlists (mesmo formato no cache compartilhado por snapshot_id)
+PLAYLIST_ITEM_FIELDS = (
+    "items(added_at,track(id,uri,name,duration_ms,external_ids,"
+    "artists(id,name),album(id,name))),next"
+)
+
+# Linhas acumuladas antes de gravar um lote (limita a memória usada)
+EXPORT_BATCH_SIZE = 1000
+
+# Colunas de cada conjunto de dados: (nome, tipo)
+DATASET_SCHEMAS: Dict[str, List[Tuple[str, str]]] = {
+    "saved_tracks": [
+        ("id", "string"),
+        ("uri", "string"),
+        ("name", "string"),
+        ("artist", "string"),
+        ("artist_id", "string"),
+        ("album", "string"),
+        ("album_id", "string"),
+        ("duration_ms", "int64"),
+        ("popularity", "int64"),
+        ("explicit", "bool"),
+        ("isrc", "string"),
+        ("added_at", "string"),
+    ],
+    "playlists": [
+        ("id", "string"),
+        ("uri", "string"),
+        ("name", "string"),
+        ("owner", "string"),
+        ("public", "bool"),
+        ("collaborative", "bool"),
+        ("snapshot_id", "string"),
+        ("tracks_total", "int64"),
+    ],
+    "playlist_tracks": [
+        ("playlist_id", "string"),
+        ("position", "int64"),
+        ("id", "string"),
+        ("uri", "string"),
+        ("name", "string"),
+        ("artist", "string"),
+        ("album", "string"),
+        ("duration_ms", "int64"),
+        ("isrc", "string"),
+        ("added_at", "string"),
+    ],
+    "audio_features": [
+        ("id", "string"),
+        ("tempo", "float64"),
+        ("key", "int64"),
+        ("mode", "int64"),
+        ("time_signature", "int64"),
+        ("danceability", "float64"),
+        ("energy", "float64"),
+        ("valence", "float64"),
+        ("acousticness", "float64"),
+        ("instrumentalness", "float64"),
+        ("liveness", "float64"),
+        ("speechiness", "float64"),
+        ("loudness", "float64"),
+        ("duration_ms", "int64"),
+    ],
+    "listening_history": [
+        ("played_at", "string"),
+        ("id", "string"),
+        ("uri", "string"),
+        ("name", "string"),
+        ("artist", "string"),
+        ("album", "string"),
+        ("duration_ms", "int64"),
+        ("context_uri", "string"),
+    ],
+}
+
+DATASETS = tuple(DATASET_SCHEMAS)
+
+
+def _arrow_schema(dataset: str):
+    types = {
+        "string": pa.string(),
+        "int64": pa.int64(),
+        "float64": pa.float64(),
+        "bool": pa.bool_(),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in DATASET_SCHEMAS[dataset]])
+
+
+class DatasetWriter:
+    """Grava linhas de um conjunto de dados em lotes no formato escolhido"""
+
+    def __init__(self, dataset: str, path: str, file_format: str):
+        self.dataset = dataset
+        self.path = path
+        self.file_format = file_format
+        self.columns = [name for name, _ in DATASET_SCHEMAS[dataset]]
+        self.rows = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._file = None
+        self._writer = None
+
+        if file_format == "jsonl":
+            self._file = open(path, "w", encoding="utf-8")
+        else:
+            self._schema = _arrow_schema(dataset)
+            if file_format == "parquet":
+                self._writer = pq.ParquetWriter(path, self._schema)
+            else:
+                self._file = pa.OSFile(path, "wb")
+                self._writer = pa_ipc.new_file(self._file, self._schema)
+
+    def write(self, row: Dict[str, Any]) -> None:
+        self._buffer.append({column: row.get(column) for column in self.columns})
+        self.rows += 1
+        if len(self._buffer) >= EXPORT_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        if self.file_format == "jsonl":
+            self._file.write(
+                "".join(
+                    json.dumps(row, ensure_ascii=False) + "\n" for row in self._buffer
+                )
+            )
+        else:
+            batch = pa.RecordBatch.from_pylist(self._buffer, schema=self._schema)
+            self._writer.write_batch(batch)
+        self._buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def _track_row(track: Dict[str, Any]) -> Dict[str, Any]:
+    artists = track.get("artists") or [{}]
+    album = track.get("album") or {}
+    return {
+        "id": track.get("id"),
+        "uri": track.get("uri"),
+        "name": track.get("name"),
+        "artist": artists[0].get("name"),
+        "artist_id": artists[0].get("id"),
+        "album": album.get("name"),
+        "album_id": album.get("id"),
+        "duration_ms": track.get("duration_ms"),
+        "popularity": track.get("popularity"),
+        "explicit": track.get("explicit"),
+        "isrc": (track.get("external_ids") or {}).get("isrc"),
+    }
+
+
+def _pages(client, page: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Percorre uma resposta paginada seguindo o campo "next" """
+    while page:
+        yield page
+        page = client.next(page) if page.get("next") else None
+
+
+def _fetch_playlist_items(
+    client,
+    playlist_id: str,
+    cache,
+    key: Optional[Tuple[str, str]],
+    max_cached_items: int,
+) -> Iterator[Dict[str, Any]]:
+    first = client.playlist_items(
+        playlist_id,
+        fields=PLAYLIST_ITEM_FIELDS,
+        limit=100,
+        additional_types=("track",),
+    )
+    # Só playlists pequenas o bastante ficam guardadas (memória limitada)
+    keep: Optional[List[Dict[str, Any]]] = [] if key else None
+    for page in _pages(client, first):
+        for item in page["items"]:
+            if keep is not None:
+                keep.append(item)
+                if len(keep) > max_cached_items:
+                    keep = None
+            yield item
+    if keep is not None:
+        cache.set(key, keep)
+
+
+def playlist_items(
+    client,
+    playlist_id: str,
+    snapshot_id: Optional[str],
+    cache=None,
+    max_cached_items: int = 0,
+) -> Tuple[Iterable[Dict[str, Any]], bool]:
+    """Itens de uma playlist e se vieram do cache por (playlist_id, snapshot_id)
+
+    Um snapshot nunca muda, então a mesma playlist com o mesmo snapshot_id
+    não é buscada de novo. Os itens buscados são lidos página a página.
+    """
+    key = (playlist_id, snapshot_id) if cache is not None and snapshot_id else None
+    if key:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached, True
+    return (
+        _fetch_playlist_items(client, playlist_id, cache, key, max_cached_items),
+        False,
+    )
+
+
+class LibraryExporter:
+    """Exporta biblioteca, playlists, audio features e histórico em streaming"""
+
+    def __init__(
+        self,
+        client,
+        output_dir: str,
+        file_format: str = "jsonl",
+        playlist_cache=None,
+        max_cached_items: int = 0,
+    ):
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Formato deve ser um de: {', '.join(EXPORT_FORMATS)}")
+        if file_format != "jsonl" and pa is None:
+            raise ValueError(
+                f"Formato {file_format} requer pyarrow: "
+                "pip install 'spotify-mcp-server[export]'"
+            )
+        self.client = client
+        self.output_dir = output_dir
+        # Itens por (playlist_id, snapshot_id): playlists sem mudança desde a
+        # última leitura não são buscadas de novo
+        self.playlist_cache = playlist_cache
+        self.max_cached_items = max_cached_items
+        self.playlists_skipped = 0
+        self.file_format = file_format
+        self._writers: Dict[str, DatasetWriter] = {}
+        self._pending_features: List[str] = []
+        self._seen_features: set = set()
+
+    def _writer(self, dataset: str) -> DatasetWriter:
+        if dataset not in self._writers:
+            path = os.path.join(self.output_dir, f"{dataset}.{self.file_format}")
+            self._writers[dataset] = DatasetWriter(dataset, path, self.file_format)
+        return self._writers[dataset]
+
+    def _queue_features(self, track_id: Optional[str]) -> None:
+        """Agenda audio features de uma música, gravando a cada 100 IDs"""
+        if "audio_features" not in self._selected or not track_id:
+            return
+        if track_id in self._seen_features:
+            return
+        self._seen_features.add(track_id)
+        self._pending_features.append(track_id)
+        if len(self._pending_features) >= AUDIO_FEATURES_BATCH_SIZE:
+            self._flush_features()
+
+    def _flush_features(self) -> None:
+        if not self._pending_features:
+            return
+        ids, self._pending_features = self._pending_features, []
+        try:
+            features = self.client.audio_features(ids) or []
+        except Exception as e:
+            # Audio features podem requerer Premium (403); não abortar a exportação
+            logger.warning(f"Audio features indisponíveis na exportação: {e}")
+            self._selected.discard("audio_features")
+            return
+        writer = self._writer("audio_features")
+        for feature in features:
+            if feature:
+                writer.write(feature)
+
+    def _export_saved_tracks(self) -> None:
+        writer = self._writer("saved_tracks") if self._wants("saved_tracks") else None
+        first = self.client.current_user_saved_tracks(limit=50)
+        for page in _pages(self.client, first):
+            for item in page["items"]:
+                track = item.get("track")
+                if not track:
+                    continue
+                if writer:
+                    row = _track_row(track)
+                    row["added_at"] = item.get("added_at")
+                    writer.write(row)
+                self._queue_features(track.get("id"))
+
+    def _export_playlists(self, include_tracks: bool) -> None:
+        playlist_writer = (
+            self._writer("playlists") if self._wants("playlists") else None
+        )
+        first = self.client.current_user_playlists(limit=50)
+        for page in _pages(self.client, first):
+            for playlist in page["items"]:
+                if not playlist:
+                    continue
+                if playlist_writer:
+                    playlist_writer.write(
+                        {
+                            "id": playlist.get("id"),
+                            "uri": playlist.get("uri"),
+                            "name": playlist.get("name"),
+                            "owner": (playlist.get("owner") or {}).get("display_name"),
+                            "public": playlist.get("public"),
+                            "collaborative": playlist.get("collaborative"),
+                            "snapshot_id": playlist.get("snapshot_id"),
+                            "tracks_total": (playlist.get("tracks") or {}).get("total"),
+                        }
+                    )
+                if include_tracks:
+                    self._export_playlist_tracks(
+                        playlist["id"], playlist.get("snapshot_id")
+                    )
+
+    def _playlist_items(
+        self, playlist_id: str, snapshot_id: Optional[str]
+    ) -> Iterator[Dict[str, Any]]:
+        items, cached = playlist_items(
+            self.client,
+            playlist_id,
+            snapshot_id,
+            self.playlist_cache,
+            self.max_cached_items,
+        )
+        if cached:
+            self.playlists_skipped += 1
+        yield from items
+
+    def _export_playlist_tracks(
+        self, playlist_id: str, snapshot_id: Optional[str] = None
+    ) -> None:
+        writer = self._writer("playlist_tracks")
+        position = 0
+        for item in self._playlist_items(playlist_id, snapshot_id):
+            track = item.get("track")
+            if track:
+                row = _track_row(track)
+                row.update(
+                    {
+                        "playlist_id": playlist_id,
+                        "position": position,
+                        "added_at": item.get("added_at"),
+                    }
+                )
+                writer.write(row)
+                self._queue_features(track.get("id"))
+            position += 1
+
+    def _export_listening_history(self) -> None:
+        writer = self._writer("listening_history")
+        first = self.client.current_user_recently_played(limit=50)
+        for page in _pages(self.client, first):
+            for item in page["items"]:
+                row = _track_row(item["track"])
+                row["played_at"] = item.get("played_at")
+                row["context_uri"] = (item.get("context") or {}).get("uri")
+                writer.write(row)
+
+    def _wants(self, dataset: str) -> bool:
+        return dataset in self._selected
+
+    def run(self, datasets: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """Executa a exportação e retorna caminho e total de linhas por arquivo"""
+        selected = list(datasets or DATASETS)
+        unknown = [d for d in selected if d not in DATASET_SCHEMAS]
+        if unknown:
+            raise ValueError(
+                f"Conjuntos desconhecidos: {', '.join(unknown)}. "
+                f"Disponíveis: {', '.join(DATASETS)}"
+            )
+        self._selected = set(selected)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        try:
+            # Audio features sozinhas usam as músicas salvas como fonte de IDs
+            features_only = self._wants("audio_features") and not self._wants(
+                "playlist_tracks"
+            )
+            if self._wants("saved_tracks") or features_only:
+                self._export_saved_tracks()
+            if self._wants("playlists") or self._wants("playlist_tracks"):
+                self._export_playlists(self._wants("playlist_tracks"))
+            if self._wants("listening_history"):
+                self._export_listening_history()
+            self._flush_features()
+        finally:
+            for writer in self._writers.values():
+                writer.close()
+
+        result = {
+            "format": self.file_format,
+            "output_dir": self.output_dir,
+            "files": {
+                name: {"path": writer.path, "rows": writer.rows}
+                for name, writer in self._writers.items()
+            },
+        }
+        if self.playlist_cache is not None:
+            result["playlists_unchanged"] = self.playlists_skipped
+        return result
@@ -0,0 +1,989 @@
+"""
+Servidor falso da Web API do Spotify para testes de carga e latência offline
+
+Simula os endpoints usados pelo SpotifyService com uma biblioteca gerada de
+forma determinística (mesma semente, mesmos dados), paginação no formato da
+Web API, respostas 429 com Retry-After, latência injetada e expiração de
+tokens. Uso:
+
+    python -m src.fake_spotify --tracks 10000 --latency 0.05 --port 8900
+
+e aponte o servidor MCP para ele com SPOTIFY_API_BASE_URL e
+SPOTIFY_ACCOUNTS_URL (ex.: http://127.0.0.1:8900/v1/ e http://127.0.0.1:8900).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import math
+import random
+import secrets
+import socket
+import string
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlencode
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, RedirectResponse, Response
+
+GENRES = [
+    "acoustic",
+    "alternative",
+    "blues",
+    "bossanova",
+    "classical",
+    "electronic",
+    "forro",
+    "funk",
+    "hip-hop",
+    "house",
+    "indie",
+    "jazz",
+    "metal",
+    "mpb",
+    "pop",
+    "rock",
+    "samba",
+    "sertanejo",
+    "soul",
+    "techno",
+]
+
+_ID_ALPHABET = string.ascii_letters + string.digits
+_WORDS = (
+    "amor noite sol mar lua vento rio céu fogo chuva estrada cidade sonho "
+    "tempo luz sombra verão saudade caminho estrela"
+).split()
+
+
+class FakeLibrary:
+    """Catálogo e biblioteca de usuário gerados a partir de uma semente"""
+
+    def __init__(
+        self,
+        tracks: int = 1000,
+        saved_tracks: Optional[int] = None,
+        playlists: int = 20,
+        playlist_size: int = 100,
+        seed: int = 42,
+    ):
+        rng = random.Random(seed)
+        self._rng = rng
+        self.user = {
+            "id": "fakeuser",
+            "display_name": "Usuário de Teste",
+            "email": "fake@example.com",
+            "country": "BR",
+            "product": "premium",
+            "followers": {"total": 0},
+            "uri": "spotify:user:fakeuser",
+        }
+
+        self.artists: Dict[str, Dict[str, Any]] = {}
+        for _ in range(max(1, tracks // 10)):
+            artist_id = self._new_id()
+            self.artists[artist_id] = {
+                "id": artist_id,
+                "uri": f"spotify:artist:{artist_id}",
+                "type": "artist",
+                "name": self._title(2).title(),
+                "genres": rng.sample(GENRES, 2),
+                "popularity": rng.randint(0, 100),
+                "followers": {"total": rng.randint(0, 1_000_000)},
+            }
+        artist_ids = list(self.artists)
+
+        self.albums: Dict[str, Dict[str, Any]] = {}
+        for _ in range(max(1, tracks // 8)):
+            album_id = self._new_id()
+            artist = self.artists[rng.choice(artist_ids)]
+            self.albums[album_id] = {
+                "id": album_id,
+                "uri": f"spotify:album:{album_id}",
+                "type": "album",
+                "name": self._title(3).capitalize(),
+                "artists": [self._simple(artist)],
+                "release_date": f"{rng.randint(1960, 2025)}-01-01",
+                "total_tracks": 0,
+                "track_ids": [],
+            }
+        album_ids = list(self.albums)
+
+        self.tracks: Dict[str, Dict[str, Any]] = {}
+        self.audio_features: Dict[str, Dict[str, Any]] = {}
+        for number in range(tracks):
+            track_id = self._new_id()
+            album = self.albums[rng.choice(album_ids)]
+            album["track_ids"].append(track_id)
+            album["total_tracks"] += 1
+            duration_ms = rng.randint(120_000, 360_000)
+            self.tracks[track_id] = {
+                "id": track_id,
+                "uri": f"spotify:track:{track_id}",
+                "type": "track",
+                "name": self._title(rng.randint(1, 4)).capitalize(),
+                "artists": list(album["artists"]),
+                "album": self._simple(album),
+                "duration_ms": duration_ms,
+                "popularity": rng.randint(0, 100),
+                "explicit": rng.random() < 0.1,
+                "external_ids": {"isrc": f"BRFKE{number % 100:02d}{number:05d}"},
+                "track_number": album["total_tracks"],
+            }
+            self.audio_features[track_id] = {
+                "id": track_id,
+                "uri": f"spotify:track:{track_id}",
+                "type": "audio_features",
+                "tempo": round(rng.uniform(60, 180), 3),
+                "key": rng.randint(-1, 11),
+                "mode": rng.randint(0, 1),
+                "time_signature": rng.choice([3, 4, 4, 4, 5]),
+                "danceability": round(rng.random(), 3),
+                "energy": round(rng.random(), 3),
+                "valence": round(rng.random(), 3),
+                "acousticness": round(rng.random(), 3),
+                "instrumentalness": round(rng.random(), 3),
+                "liveness": round(rng.random(), 3),
+                "speechiness": round(rng.random(), 3),
+                "loudness": round(rng.uniform(-30, 0), 3),
+                "duration_ms": duration_ms,
+            }
+        track_ids = list(self.tracks)
+
+        saved_count = tracks if saved_tracks is None else min(saved_tracks, tracks)
+        self.saved_tracks: List[Dict[str, Any]] = [
+            {"added_at": self._timestamp(i), "track_id": track_id}
+            for i, track_id in enumerate(track_ids[:saved_count])
+        ]
+        self.saved_albums = album_ids[: max(1, len(album_ids) // 4)]
+        self.followed_artists = artist_ids[: max(1, len(artist_ids) // 4)]
+
+        self.playlists: Dict[str, Dict[str, Any]] = {}
+        for number in range(playlists):
+            playlist_id = self._new_id()
+            size = min(playlist_size, len(track_ids))
+            self.playlists[playlist_id] = {
+                "id": playlist_id,
+                "uri": f"spotify:playlist:{playlist_id}",
+                "type": "playlist",
+                "name": f"Playlist {number + 1}",
+                "description": "",
+                "owner": {"id": "fakeuser", "display_name": "Usuário de Teste"},
+                "public": number % 2 == 0,
+                "collaborative": False,
+                "snapshot_id": self._new_id(),
+                "track_ids": rng.sample(track_ids, size),
+            }
+
+        self.recently_played = [
+            {"played_at": self._timestamp(i), "track_id": rng.choice(track_ids)}
+            for i in range(50)
+        ]
+        self.devices = [
+            {
+                "id": "fakedevice0000000000000000000000000000",
+                "name": "Computador de Teste",
+                "type": "Computer",
+                "is_active": True,
+                "is_restricted": False,
+                "volume_percent": 50,
+            }
+        ]
+        self.player = {
+            "is_playing": False,
+            "track_id": track_ids[0] if track_ids else None,
+            "progress_ms": 0,
+            "volume_percent": 50,
+            "shuffle_state": False,
+            "repeat_state": "off",
+            "queue": [],
+        }
+
+    def _new_id(self) -> str:
+        return "".join(self._rng.choice(_ID_ALPHABET) for _ in range(22))
+
+    def _title(self, words: int) -> str:
+        return " ".join(self._rng.choice(_WORDS) for _ in range(words))
+
+    @staticmethod
+    def _timestamp(index: int) -> str:
+        played = time.gmtime(1_700_000_000 - index * 600)
+        return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", played)
+
+    @staticmethod
+    def _simple(entity: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            key: entity[key]
+            for key in ("id", "uri", "type", "name", "artists", "release_date")
+            if key in entity
+        }
+
+    def album(self, album_id: str) -> Dict[str, Any]:
+        album = dict(self.albums[album_id])
+        album.pop("track_ids")
+        return album
+
+    def playlist(self, playlist_id: str) -> Dict[str, Any]:
+        playlist = dict(self.playlists[playlist_id])
+        track_ids = playlist.pop("track_ids")
+        playlist["tracks"] = {"total": len(track_ids)}
+        return playlist
+
+
+class _FakeState:
+    """Estado mutável do servidor: tokens, limites e contadores"""
+
+    def __init__(
+        self,
+        library: FakeLibrary,
+        latency: float,
+        jitter: float,
+        rate_limit: Optional[int],
+        rate_window: float,
+        token_ttl: int,
+        require_auth: bool,
+    ):
+        self.library = library
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.token_ttl = token_ttl
+        self.require_auth = require_auth
+        self.tokens: Dict[str, float] = {}
+        self.requests = 0
+        self.rate_limited = 0
+        self.not_modified = 0
+        self.tokens_issued = 0
+        self.endpoints: Dict[str, int] = {}
+        self._window_start = time.monotonic()
+        self._window_count = 0
+        self._rng = random.Random()
+
+    def issue_token(self, refresh_token: Optional[str] = None) -> Dict[str, Any]:
+        access_token = secrets.token_urlsafe(24)
+        self.tokens[access_token] = time.time() + self.token_ttl
+        self.tokens_issued += 1
+        return {
+            "access_token": access_token,
+            "token_type": "Bearer",
+            "expires_in": self.token_ttl,
+            "expires_at": int(time.time()) + self.token_ttl,
+            "refresh_token": refresh_token or secrets.token_urlsafe(24),
+            "scope": "",
+        }
+
+    def check_rate_limit(self) -> Optional[int]:
+        """Retorna os segundos de espera se o limite da janela estourou"""
+        if not self.rate_limit:
+            return None
+        now = time.monotonic()
+        if now - self._window_start >= self.rate_window:
+            self._window_start = now
+            self._window_count = 0
+        self._window_count += 1
+        if self._window_count > self.rate_limit:
+            self.rate_limited += 1
+            remaining = self.rate_window - (now - self._window_start)
+            return max(1, math.ceil(remaining))
+        return None
+
+    def delay(self) -> float:
+        if self.jitter:
+            return max(0.0, self._rng.gauss(self.latency, self.jitter))
+        return self.latency
+
+
+def _error(status: int, message: str) -> JSONResponse:
+    return JSONResponse({"error": {"status": status, "message": message}}, status)
+
+
+def _ids(request: Request) -> List[str]:
+    """IDs de ?ids=a,b ou de ?uris=spotify:track:a,... (endpoints me/library)"""
+    raw = request.query_params.get("ids") or request.query_params.get("uris", "")
+    return [item.split(":")[-1] for item in raw.split(",") if item]
+
+
+def _page(
+    request: Request, items: List[Any], default_limit: int, max_limit: int
+) -> Dict[str, Any]:
+    """Fatia uma lista no formato de paginação por offset da Web API"""
+    params = dict(request.query_params)
+    offset = int(params.get("offset", 0))
+    limit = min(int(params.get("limit", default_limit)), max_limit)
+    total = len(items)
+
+    def link(new_offset: int) -> str:
+        query = urlencode({**params, "offset": new_offset, "limit": limit})
+        return f"{request.url.remove_query_params(list(params))}?{query}"
+
+    return {
+        "href": str(request.url),
+        "items": items[offset : offset + limit],
+        "limit": limit,
+        "offset": offset,
+        "total": total,
+        "next": link(offset + limit) if offset + limit < total else None,
+        "previous": link(max(0, offset - limit)) if offset > 0 else None,
+    }
+
+
+def create_app(
+    library: Optional[FakeLibrary] = None,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    rate_limit: Optional[int] = None,
+    rate_window: float = 1.0,
+    token_ttl: int = 3600,
+    require_auth: bool = True,
+) -> FastAPI:
+    """Cria o app ASGI da Web API falsa.
+
+    latency/jitter: atraso (média/desvio, em segundos) de cada resposta.
+    rate_limit: máximo de requisições por rate_window segundos; o excesso
+    recebe 429 com Retry-After. token_ttl: validade dos tokens emitidos.
+    """
+    state = _FakeState(
+        library or FakeLibrary(),
+        latency,
+        jitter,
+        rate_limit,
+        rate_window,
+        token_ttl,
+        require_auth,
+    )
+    lib = state.library
+    app = FastAPI(title="Fake Spotify Web API")
+    app.state.fake = state
+
+    @app.middleware("http")
+    async def simulate(request: Request, call_next):
+        path = request.url.path
+        if not path.startswith("/v1/"):
+            return await call_next(request)
+
+        if path.endswith("/"):
+            # O Spotipy usa alguns caminhos com barra final (ex.: me/tracks/?ids=)
+            path = request.scope["path"] = path.rstrip("/")
+        state.requests += 1
+        label = f"{request.method} {path}"
+        state.endpoints[label] = state.endpoints.get(label, 0) + 1
+        if state.latency or state.jitter:
+            await asyncio.sleep(state.delay())
+
+        retry_after = state.check_rate_limit()
+        if retry_after is not None:
+            response = _error(429, "API rate limit exceeded")
+            response.headers["Retry-After"] = str(retry_after)
+            return response
+
+        if state.require_auth:
+            auth = request.headers.get("authorization", "")
+            token = auth[7:] if auth.startswith("Bearer ") else None
+            expires_at = state.tokens.get(token)
+            if expires_at is None:
+                return _error(401, "Invalid access token")
+            if expires_at < time.time():
+                return _error(401, "The access token expired")
+        response = await call_next(request)
+        if request.method == "GET" and response.status_code == 200:
+            return await _conditional(request, response)
+        return response
+
+    async def _conditional(request: Request, response: Response) -> Response:
+        # ETag do corpo, como a Web API faz; If-None-Match igual recebe 304
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+        if request.headers.get("if-none-match") == etag:
+            state.not_modified += 1
+            return Response(status_code=304, headers={"ETag": etag})
+        headers = {
+            key: value
+            for key, value in response.headers.items()
+            if key.lower() != "content-length"
+        }
+        headers["ETag"] = etag
+        return Response(body, status_code=200, headers=headers)
+
+    # ------------------------------------------------------------------
+    # Contas (OAuth) e controle do servidor falso
+    # ------------------------------------------------------------------
+
+    @app.get("/authorize")
+    async def authorize(request: Request):
+        # Aprova qualquer pedido de autorização imediatamente
+        params = {"code": secrets.token_urlsafe(16)}
+        if request.query_params.get("state"):
+            params["state"] = request.query_params["state"]
+        redirect_uri = request.query_params.get("redirect_uri", "")
+        return RedirectResponse(f"{redirect_uri}?{urlencode(params)}")
+
+    @app.post("/api/token")
+    async def token(request: Request):
+        form = await request.form()
+        grant_type = form.get("grant_type")
+        if grant_type not in ("authorization_code", "refresh_token"):
+            return JSONResponse({"error": "unsupported_grant_type"}, 400)
+        return state.issue_token(form.get("refresh_token"))
+
+    @app.get("/_fake/stats")
+    async def stats():
+        return {
+            "requests": state.requests,
+            "rate_limited": state.rate_limited,
+            "not_modified": state.not_modified,
+            "tokens_issued": state.tokens_issued,
+            "endpoints": state.endpoints,
+        }
+
+    @app.post("/_fake/expire-tokens")
+    async def expire_tokens():
+        for access_token in state.tokens:
+            state.tokens[access_token] = 0.0
+        return {"expired": len(state.tokens)}
+
+    # ------------------------------------------------------------------
+    # Usuário e biblioteca
+    # ------------------------------------------------------------------
+
+    def track(track_id: str) -> Dict[str, Any]:
+        return lib.tracks[track_id]
+
+    @app.get("/v1/me")
+    async def me():
+        return lib.user
+
+    @app.get("/v1/me/tracks")
+    async def saved_tracks(request: Request):
+        items = [
+            {"added_at": s["added_at"], "track": track(s["track_id"])}
+            for s in lib.saved_tracks
+        ]
+        return _page(request, items, 20, 50)
+
+    @app.get("/v1/me/library/contains")
+    @app.get("/v1/me/tracks/contains")
+    async def saved_tracks_contains(request: Request):
+        saved = {s["track_id"] for s in lib.saved_tracks}
+        return [track_id in saved for track_id in _ids(request)]
+
+    @app.put("/v1/me/library")
+    @app.put("/v1/me/tracks")
+    async def save_tracks(request: Request):
+        saved = {s["track_id"] for s in lib.saved_tracks}
+        for track_id in _ids(request):
+            if track_id in lib.tracks and track_id not in saved:
+                lib.saved_tracks.insert(
+                    0,
+                    {
+                        "added_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                        "track_id": track_id,
+                    },
+                )
+        return Response(status_code=200)
+
+    @app.delete("/v1/me/library")
+    @app.delete("/v1/me/tracks")
+    async def remove_tracks(request: Request):
+        removed = set(_ids(request))
+        lib.saved_tracks[:] = [
+            s for s in lib.saved_tracks if s["track_id"] not in removed
+        ]
+        return Response(status_code=200)
+
+    @app.get("/v1/me/albums")
+    async def saved_albums(request: Request):
+        items = [
+            {"added_at": lib._timestamp(i), "album": lib.album(album_id)}
+            for i, album_id in enumerate(lib.saved_albums)
+        ]
+        return _page(request, items, 20, 50)
+
+    @app.get("/v1/me/following")
+    async def followed_artists(request: Request):
+        limit = min(int(request.query_params.get("limit", 20)), 50)
+        after = request.query_params.get("after")
+        ids = lib.followed_artists
+        start = ids.index(after) + 1 if after in ids else 0
+        chunk = ids[start : start + limit]
+        has_more = start + limit < len(ids)
+        next_url = None
+        if has_more:
+            query = urlencode({"type": "artist", "limit": limit, "after": chunk[-1]})
+            next_url = f"{request.url.remove_query_params(['after'])}?{query}"
+        return {
+            "artists": {
+                "items": [lib.artists[i] for i in chunk],
+                "limit": limit,
+                "total": len(ids),
+                "next": next_url,
+                "cursors": {"after": chunk[-1] if has_more else None},
+            }
+        }
+
+    @app.get("/v1/me/top/{kind}")
+    async def top_items(kind: str, request: Request):
+        if kind == "artists":
+            items = list(lib.artists.values())
+        elif kind == "tracks":
+            items = list(lib.tracks.values())
+        else:
+            return _error(400, "Invalid type")
+        items = sorted(items, key=lambda item: -item["popularity"])[:50]
+        return _page(request, items, 20, 50)
+
+    @app.get("/v1/me/player/recently-played")
+    async def recently_played(request: Request):
+        limit = min(int(request.query_params.get("limit", 20)), 50)
+        items = [
+            {
+                "played_at": play["played_at"],
+                "track": track(play["track_id"]),
+                "context": None,
+            }
+            for play in lib.recently_played[:limit]
+        ]
+        return {"items": items, "limit": limit, "next": None, "cursors": None}
+
+    # ------------------------------------------------------------------
+    # Catálogo
+    # ------------------------------------------------------------------
+
+    @app.get("/v1/tracks/{track_id}")
+    async def get_track(track_id: str):
+        if track_id not in lib.tracks:
+            return _error(404, "Non existing id")
+        return track(track_id)
+
+    @app.get("/v1/tracks")
+    async def get_tracks(request: Request):
+        return {"tracks": [lib.tracks.get(i) for i in _ids(request)[:50]]}
+
+    @app.get("/v1/artists/{artist_id}")
+    async def get_artist(artist_id: str):
+        if artist_id not in lib.artists:
+            return _error(404, "Non existing id")
+        return lib.artists[artist_id]
+
+    @app.get("/v1/artists")
+    async def get_artists(request: Request):
+        return {"artists": [lib.artists.get(i) for i in _ids(request)[:50]]}
+
+    @app.get("/v1/artists/{artist_id}/top-tracks")
+    async def artist_top_tracks(artist_id: str):
+        tracks = [t for t in lib.tracks.values() if t["artists"][0]["id"] == artist_id]
+        return {"tracks": sorted(tracks, key=lambda t: -t["popularity"])[:10]}
+
+    @app.get("/v1/artists/{artist_id}/related-artists")
+    async def related_artists(artist_id: str):
+        if artist_id not in lib.artists:
+            return _error(404, "Non existing id")
+        # Relacionados: artistas com gênero em comum, dos mais populares
+        genres = set(lib.artists[artist_id]["genres"])
+        related = [
+            artist
+            for other, artist in lib.artists.items()
+            if other != artist_id and genres.intersection(artist["genres"])
+        ]
+        related.sort(key=lambda a: (-a["popularity"], a["id"]))
+        return {"artists": related[:20]}
+
+    @app.get("/v1/albums/{album_id}")
+    async def get_album(album_id: str):
+        if album_id not in lib.albums:
+            return _error(404, "Non existing id")
+        return lib.album(album_id)
+
+    @app.get("/v1/albums")
+    async def get_albums(request: Request):
+        return {
+            "albums": [
+                lib.album(i) if i in lib.albums else None for i in _ids(request)[:20]
+            ]
+        }
+
+    @app.get("/v1/albums/{album_id}/tracks")
+    async def album_tracks(album_id: str, request: Request):
+        if album_id not in lib.albums:
+            return _error(404, "Non existing id")
+        items = [track(i) for i in lib.albums[album_id]["track_ids"]]
+        return _page(request, items, 20, 50)
+
+    @app.get("/v1/audio-features")
+    async def audio_features(request: Request):
+        return {
+            "audio_features": [lib.audio_features.get(i) for i in _ids(request)[:100]]
+        }
+
+    @app.get("/v1/audio-features/{track_id}")
+    async def audio_feature(track_id: str):
+        if track_id not in lib.audio_features:
+            return _error(404, "Non existing id")
+        return lib.audio_features[track_id]
+
+    @app.get("/v1/search")
+    async def search(request: Request):
+        query = request.query_params.get("q", "").lower()
+        types = request.query_params.get("type", "track").split(",")
+        sources = {
+            "track": lib.tracks.values,
+            "artist": lib.artists.values,
+            "album": lambda: (lib.album(i) for i in lib.albums),
+            "playlist": lambda: (lib.playlist(i) for i in lib.playlists),
+        }
+        result = {}
+        for kind in types:
+            if kind not in sources:
+                return _error(400, f"Bad search type field {kind}")
+            items = [item for item in sources[kind]() if query in item["name"].lower()]
+            result[f"{kind}s"] = _page(request, items, 10, 50)
+        return result
+
+    @app.get("/v1/recommendations/available-genre-seeds")
+    async def genre_seeds():
+        return {"genres": GENRES}
+
+    @app.get("/v1/recommendations")
+    async def recommendations(request: Request):
+        limit = min(int(request.query_params.get("limit", 20)), 100)
+        rng = random.Random(str(request.query_params))
+        ids = rng.sample(list(lib.tracks), min(limit, len(lib.tracks)))
+        return {"tracks": [track(i) for i in ids], "seeds": []}
+
+    # ------------------------------------------------------------------
+    # Playlists
+    # ------------------------------------------------------------------
+
+    @app.get("/v1/me/playlists")
+    async def my_playlists(request: Request):
+        items = [lib.playlist(i) for i in lib.playlists]
+        return _page(request, items, 20, 50)
+
+    @app.get("/v1/users/{user_id}/playlists")
+    async def user_playlists(user_id: str, request: Request):
+        return await my_playlists(request)
+
+    @app.get("/v1/playlists/{playlist_id}")
+    async def get_playlist(playlist_id: str):
+        if playlist_id not in lib.playlists:
+            return _error(404, "Not found.")
+        return lib.playlist(playlist_id)
+
+    @app.get("/v1/playlists/{playlist_id}/items")
+    @app.get("/v1/playlists/{playlist_id}/tracks")
+    async def playlist_tracks(playlist_id: str, request: Request):
+        if playlist_id not in lib.playlists:
+            return _error(404, "Not found.")
+        items = [
+            {"added_at": lib._timestamp(i), "track": track(track_id)}
+            for i, track_id in enumerate(lib.playlists[playlist_id]["track_ids"])
+        ]
+        return _page(request, items, 100, 100)
+
+    @app.post("/v1/playlists/{playlist_id}/items")
+    @app.post("/v1/playlists/{playlist_id}/tracks")
+    async def add_playlist_tracks(playlist_id: str, request: Request):
+        if playlist_id not in lib.playlists:
+            return _error(404, "Not found.")
+        body = await request.json()
+        # O Spotipy envia a lista de URIs como corpo e a posição na query
+        if isinstance(body, list):
+            body = {"uris": body, "position": request.query_params.get("position")}
+        uris = body.get("uris") or []
+        if len(uris) > 100:
+            return _error(400, "You can add a maximum of 100 tracks per request.")
+        playlist = lib.playlists[playlist_id]
+        ids = [uri.split(":")[-1] for uri in uris]
+        position = body.get("position")
+        if position is not None:
+            position = int(position)
+        if position is None:
+            playlist["track_ids"].extend(ids)
+        else:
+            playlist["track_ids"][position:position] = ids
+        playlist["snapshot_id"] = lib._new_id()
+        return JSONResponse({"snapshot_id": playlist["snapshot_id"]}, 201)
+
+    @app.put("/v1/playlists/{playlist_id}/items")
+    @app.put("/v1/playlists/{playlist_id}/tracks")
+    async def update_playlist_tracks(playlist_id: str, request: Request):
+        if playlist_id not in lib.playlists:
+            return _error(404, "Not found.")
+        body = await request.json()
+        playlist = lib.playlists[playlist_id]
+        track_ids = playlist["track_ids"]
+        if "uris" in body:
+            # Substituição do conteúdo inteiro
+            if len(body["uris"]) > 100:
+                return _error(400, "You can add a maximum of 100 tracks per request.")
+            track_ids[:] = [uri.split(":")[-1] for uri in body["uris"]]
+        else:
+            start = body["range_start"]
+            length = body.get("range_length") or 1
+            before = body["insert_before"]
+            if start + length > len(track_ids) or before > len(track_ids):
+                return _error(400, "Index out of bounds.")
+            moved = track_ids[start : start + length]
+            del track_ids[start : start + length]
+            if before > start:
+                before -= length
+            track_ids[before:before] = moved
+        playlist["snapshot_id"] = lib._new_id()
+        return {"snapshot_id": playlist["snapshot_id"]}
+
+    @app.delete("/v1/playlists/{playlist_id}/items")
+    @app.delete("/v1/playlists/{playlist_id}/tracks")
+    async def remove_playlist_tracks(playlist_id: str, request: Request):
+        if playlist_id not in lib.playlists:
+            return _error(404, "Not found.")
+        body = await request.json()
+        items = body.get("items") or body.get("tracks") or []
+        if len(items) > 100:
+            return _error(400, "Too many tracks requested. Maximum 100 allowed.")
+        playlist = lib.playlists[playlist_id]
+        removed = {item["uri"].split(":")[-1] for item in items}
+        playlist["track_ids"][:] = [
+            track_id for track_id in playlist["track_ids"] if track_id not in removed
+        ]
+        playlist["snapshot_id"] = lib._new_id()
+        return {"snapshot_id": playlist["snapshot_id"]}
+
+    @app.post("/v1/me/playlists")
+    @app.post("/v1/users/{user_id}/playlists")
+    async def create_playlist(request: Request):
+        body = await request.json()
+        playlist_id = lib._new_id()
+        lib.playlists[playlist_id] = {
+            "id": playlist_id,
+            "uri": f"spotify:playlist:{playlist_id}",
+            "type": "playlist",
+            "name": body.get("name", ""),
+            "description": body.get("description", ""),
+            "owner": {"id": "fakeuser", "display_name": "Usuário de Teste"},
+            "public": body.get("public", True),
+            "collaborative": body.get("collaborative", False),
+            "snapshot_id": lib._new_id(),
+            "track_ids": [],
+        }
+        return JSONResponse(lib.playlist(playlist_id), 201)
+
+    # ------------------------------------------------------------------
+    # Player
+    # ------------------------------------------------------------------
+
+    player = lib.player
+
+    def playback_state() -> Dict[str, Any]:
+        current = player["track_id"]
+        return {
+            "device": lib.devices[0],
+            "is_playing": player["is_playing"],
+            "progress_ms": player["progress_ms"],
+            "shuffle_state": player["shuffle_state"],
+            "repeat_state": player["repeat_state"],
+            "item": track(current) if current else None,
+            "currently_playing_type": "track",
+            "context": None,
+            "timestamp": int(time.time() * 1000),
+        }
+
+    @app.get("/v1/me/player")
+    async def current_playback():
+        return playback_state()
+
+    @app.get("/v1/me/player/currently-playing")
+    async def currently_playing():
+        return playback_state()
+
+    @app.get("/v1/me/player/devices")
+    async def devices():
+        return {"devices": lib.devices}
+
+    @app.get("/v1/me/player/queue")
+    async def queue():
+        current = player["track_id"]
+        return {
+            "currently_playing": track(current) if current else None,
+            "queue": [track(uri.split(":")[-1]) for uri in player["queue"]],
+        }
+
+    @app.post("/v1/me/player/queue")
+    async def add_to_queue(request: Request):
+        player["queue"].append(request.query_params.get("uri", ""))
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player")
+    async def transfer(request: Request):
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/play")
+    async def play(request: Request):
+        body = await request.body()
+        if body:
+            uris = (await request.json()).get("uris") or []
+            if uris:
+                player["track_id"] = uris[0].split(":")[-1]
+                player["progress_ms"] = 0
+        player["is_playing"] = True
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/pause")
+    async def pause():
+        player["is_playing"] = False
+        return Response(status_code=204)
+
+    @app.post("/v1/me/player/next")
+    async def next_track():
+        if player["queue"]:
+            player["track_id"] = player["queue"].pop(0).split(":")[-1]
+        player["progress_ms"] = 0
+        return Response(status_code=204)
+
+    @app.post("/v1/me/player/previous")
+    async def previous_track():
+        player["progress_ms"] = 0
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/volume")
+    async def volume(request: Request):
+        player["volume_percent"] = int(request.query_params.get("volume_percent", 0))
+        lib.devices[0]["volume_percent"] = player["volume_percent"]
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/seek")
+    async def seek(request: Request):
+        player["progress_ms"] = int(request.query_params.get("position_ms", 0))
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/shuffle")
+    async def shuffle(request: Request):
+        player["shuffle_state"] = request.query_params.get("state") == "true"
+        return Response(status_code=204)
+
+    @app.put("/v1/me/player/repeat")
+    async def repeat(request: Request):
+        player["repeat_state"] = request.query_params.get("state", "off")
+        return Response(status_code=204)
+
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class FakeSpotifyServer:
+    """Executa a Web API falsa com uvicorn em uma thread (para testes/benchmarks)
+
+    Exemplo:
+        with FakeSpotifyServer(FakeLibrary(tracks=5000), latency=0.02) as server:
+            service = SpotifyService(
+                api_base_url=server.api_base_url,
+                accounts_url=server.accounts_url,
+                auth_manager=server.create_auth_manager(),
+            )
+    """
+
+    def __init__(self, library: Optional[FakeLibrary] = None, port: int = 0, **kwargs):
+        self.app = create_app(library, **kwargs)
+        self.port = port or _free_port()
+        self._server = uvicorn.Server(
+            uvicorn.Config(
+                self.app, host="127.0.0.1", port=self.port, log_level="warning"
+            )
+        )
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def state(self) -> _FakeState:
+        return self.app.state.fake
+
+    @property
+    def accounts_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def api_base_url(self) -> str:
+        return f"{self.accounts_url}/v1/"
+
+    def start(self) -> "FakeSpotifyServer":
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + 10
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("Servidor falso do Spotify não iniciou")
+            time.sleep(0.01)
+        return self
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=10)
+
+    def __enter__(self) -> "FakeSpotifyServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def create_auth_manager(self):
+        """SpotifyOAuth com um token já emitido pelo servidor falso"""
+        from spotipy.cache_handler import MemoryCacheHandler
+        from spotipy.oauth2 import SpotifyOAuth
+
+        auth_manager = SpotifyOAuth(
+            client_id="fake-client-id",
+            client_secret="fake-client-secret",
+            redirect_uri=f"{self.accounts_url}/callback",
+            cache_handler=MemoryCacheHandler(self.state.issue_token()),
+            open_browser=False,
+        )
+        auth_manager.OAUTH_TOKEN_URL = f"{self.accounts_url}/api/token"
+        auth_manager.OAUTH_AUTHORIZE_URL = f"{self.accounts_url}/authorize"
+        return auth_manager
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Web API falsa do Spotify")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--saved-tracks", type=int, default=None)
+    parser.add_argument("--playlists", type=int, default=20)
+    parser.add_argument("--playlist-size", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=None)
+    parser.add_argument("--rate-window", type=float, default=1.0)
+    parser.add_argument("--token-ttl", type=int, default=3600)
+    parser.add_argument("--no-auth", action="store_true")
+    args = parser.parse_args()
+
+    library = FakeLibrary(
+        tracks=args.tracks,
+        saved_tracks=args.saved_tracks,
+        playlists=args.playlists,
+        playlist_size=args.playlist_size,
+        seed=args.seed,
+    )
+    app = create_app(
+        library,
+        latency=args.latency,
+        jitter=args.jitter,
+        rate_limit=args.rate_limit,
+        rate_window=args.rate_window,
+        token_ttl=args.token_ttl,
+        require_auth=not args.no_auth,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Ordenação de músicas por transições suaves de batida (BPM), tom e energia
+"""
+
+import time
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence
+
+# Pesos padrão do custo de transição: 1 unidade equivale a 1 BPM de diferença
+TEMPO_WEIGHT = 1.0
+KEY_WEIGHT = 4.0  # Cada passo na roda Camelot custa o mesmo que 4 BPM
+ENERGY_WEIGHT = 20.0  # Diferença de energia (0-1) escalada
+
+# Janela de vizinhos (ordenados por BPM) avaliados em cada passo
+NEIGHBOR_WINDOW = 12
+NEIGHBOR_COUNT = 8
+
+# Custo usado quando o tom de uma das músicas é desconhecido
+UNKNOWN_KEY_STEPS = 2
+
+
+def camelot_position(key: Optional[int], mode: Optional[int]) -> Optional[int]:
+    """Converte tom/modo do Spotify para a posição (1-12) na roda Camelot.
+
+    O Spotify usa notação de classe de altura (0 = C, 1 = C#, ..., 11 = B) e
+    modo 1 para maior e 0 para menor. Retorna None para tom desconhecido (-1).
+    """
+    if key is None or mode is None or key < 0:
+        return None
+    if mode == 0:
+        # Tom menor compartilha a posição do relativo maior (3 semitons acima)
+        key = (key + 3) % 12
+    return ((key * 7) % 12 + 7) % 12 + 1
+
+
+def _camelot(track: Dict[str, Any]) -> Optional[int]:
+    if "camelot" in track:
+        return track["camelot"]
+    return camelot_position(track.get("key"), track.get("mode"))
+
+
+def key_distance(a: Dict[str, Any], b: Dict[str, Any]) -> int:
+    """Distância harmônica (em passos da roda Camelot) entre duas músicas"""
+    pos_a, pos_b = _camelot(a), _camelot(b)
+    if pos_a is None or pos_b is None:
+        return UNKNOWN_KEY_STEPS
+    diff = abs(pos_a - pos_b)
+    steps = min(diff, 12 - diff)
+    if a.get("mode") != b.get("mode"):
+        steps += 1
+    return steps
+
+
+def tempo_distance(tempo_a: float, tempo_b: float) -> float:
+    """Diferença de BPM considerando meia e dupla velocidade (ex.: 70 ↔ 140)"""
+    return min(
+        abs(tempo_a - tempo_b),
+        abs(tempo_a - tempo_b * 2),
+        abs(tempo_a * 2 - tempo_b),
+    )
+
+
+def transition_cost(
+    a: Dict[str, Any],
+    b: Dict[str, Any],
+    tempo_weight: float = TEMPO_WEIGHT,
+    key_weight: float = KEY_WEIGHT,
+    energy_weight: float = ENERGY_WEIGHT,
+) -> float:
+    """Custo de tocar a música b logo após a música a (simétrico)"""
+    cost = tempo_weight * tempo_distance(a["tempo"], b["tempo"])
+    cost += key_weight * key_distance(a, b)
+    energy_a, energy_b = a.get("energy"), b.get("energy")
+    if energy_a is not None and energy_b is not None:
+        cost += energy_weight * abs(energy_a - energy_b)
+    return cost
+
+
+def _greedy_order(nodes: Sequence[Dict[str, Any]], cost, start: int) -> List[int]:
+    """Vizinho mais próximo restrito a uma janela de BPM entre os não visitados.
+
+    Mantém os não visitados ordenados por BPM, então cada passo avalia no
+    máximo 2 * NEIGHBOR_WINDOW candidatos em vez de todas as músicas.
+    """
+    remaining = sorted((node["tempo"], i) for i, node in enumerate(nodes))
+    remaining.remove((nodes[start]["tempo"], start))
+
+    order = [start]
+    current = start
+    while remaining:
+        center = bisect_left(remaining, (nodes[current]["tempo"], -1))
+        low = max(0, center - NEIGHBOR_WINDOW)
+        high = min(len(remaining), center + NEIGHBOR_WINDOW)
+        best_pos = low
+        best_cost = None
+        for pos in range(low, high):
+            candidate_cost = cost(nodes[current], nodes[remaining[pos][1]])
+            if best_cost is None or candidate_cost < best_cost:
+                best_cost = candidate_cost
+                best_pos = pos
+        current = remaining.pop(best_pos)[1]
+        order.append(current)
+    return order
+
+
+def _neighbor_lists(nodes: Sequence[Dict[str, Any]], cost) -> List[List[int]]:
+    """Lista de candidatos mais baratos para cada música (usada pelo 2-opt)"""
+    by_tempo = sorted(range(len(nodes)), key=lambda i: nodes[i]["tempo"])
+    rank = [0] * len(nodes)
+    for position, index in enumerate(by_tempo):
+        rank[index] = position
+
+    neighbors = []
+    for i, node in enumerate(nodes):
+        low = max(0, rank[i] - NEIGHBOR_WINDOW)
+        high = min(len(nodes), rank[i] + NEIGHBOR_WINDOW + 1)
+        candidates = [
+            (cost(node, nodes[by_tempo[pos]]), by_tempo[pos])
+            for pos in range(low, high)
+            if by_tempo[pos] != i
+        ]
+        candidates.sort()
+        neighbors.append([index for _, index in candidates[:NEIGHBOR_COUNT]])
+    return neighbors
+
+
+def _two_opt(
+    order: List[int],
+    nodes: Sequence[Dict[str, Any]],
+    cost,
+    deadline: float,
+    max_passes: int,
+) -> int:
+    """Melhora o caminho (aberto) com 2-opt restrito às listas de vizinhos.
+
+    Como o custo é simétrico, inverter um trecho só altera as duas arestas
+    das pontas, então cada movimento é avaliado em O(1). Retorna o número de
+    movimentos aplicados.
+    """
+    n = len(order)
+    if n < 4:
+        return 0
+
+    neighbors = _neighbor_lists(nodes, cost)
+    position = [0] * n
+    for index, node in enumerate(order):
+        position[node] = index
+
+    def edge(i: int, j: int) -> float:
+        return cost(nodes[order[i]], nodes[order[j]]) if 0 <= j < n else 0.0
+
+    def reverse(i: int, j: int) -> None:
+        order[i : j + 1] = order[i : j + 1][::-1]
+        for k in range(i, j + 1):
+            position[order[k]] = k
+
+    moves = 0
+    for _ in range(max_passes):
+        improved = False
+        for i in range(n):
+            if i % 64 == 0 and time.monotonic() > deadline:
+                return moves
+            a = order[i]
+            for c in neighbors[a]:
+                j = position[c]
+                if j > i + 1:
+                    # a→b ... c→d  vira  a→c ... b→d
+                    delta = (
+                        cost(nodes[a], nodes[c])
+                        + edge(i + 1, j + 1)
+                        - edge(i, i + 1)
+                        - edge(j, j + 1)
+                    )
+                    if delta < -1e-9:
+                        reverse(i + 1, j)
+                        moves += 1
+                        improved = True
+                        break
+                elif j < i - 1:
+                    # c→e ... a→b  vira  c→a ... e→b
+                    delta = (
+                        cost(nodes[c], nodes[a])
+                        + edge(j + 1, i + 1)
+                        - edge(j, j + 1)
+                        - edge(i, i + 1)
+                    )
+                    if delta < -1e-9:
+                        reverse(j + 1, i)
+                        moves += 1
+                        improved = True
+                        break
+        if not improved:
+            break
+    return moves
+
+
+def order_by_flow(
+    tracks: Sequence[Dict[str, Any]],
+    time_budget: float = 2.0,
+    max_passes: int = 20,
+    tempo_weight: float = TEMPO_WEIGHT,
+    key_weight: float = KEY_WEIGHT,
+    energy_weight: float = ENERGY_WEIGHT,
+) -> Dict[str, Any]:
+    """Ordena músicas minimizando saltos de BPM, tom e energia.
+
+    Cada item precisa de "tempo" e pode ter "key", "mode" e "energy" (como
+    retornados pelo endpoint audio-features). Músicas sem tempo vão para o
+    final, na ordem original. A ordem começa pela música mais calma (menor
+    energia e BPM), passa por uma construção gulosa e depois por 2-opt até
+    convergir ou estourar o orçamento de tempo.
+    """
+
+    def cost(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+        return transition_cost(a, b, tempo_weight, key_weight, energy_weight)
+
+    nodes = []
+    missing = []
+    for track in tracks:
+        if track.get("tempo"):
+            node = dict(track)
+            node["camelot"] = camelot_position(track.get("key"), track.get("mode"))
+            nodes.append(node)
+        else:
+            missing.append(track)
+
+    if not nodes:
+        return {
+            "tracks": list(missing),
+            "total_cost": 0.0,
+            "greedy_cost": 0.0,
+            "moves": 0,
+        }
+
+    deadline = time.monotonic() + time_budget
+    start = min(
+        range(len(nodes)),
+        key=lambda i: (nodes[i].get("energy") or 0.0, nodes[i]["tempo"]),
+    )
+    order = _greedy_order(nodes, cost, start)
+    greedy_cost = path_cost([nodes[i] for i in order], cost)
+    moves = _two_opt(order, nodes, cost, deadline, max_passes)
+
+    ordered = [nodes[i] for i in order]
+    total_cost = path_cost(ordered, cost)
+    for node in ordered:
+        node.pop("camelot", None)
+    return {
+        "tracks": ordered + list(missing),
+        "total_cost": round(total_cost, 2),
+        "greedy_cost": round(greedy_cost, 2),
+        "moves": moves,
+    }
+
+
+def path_cost(tracks: Sequence[Dict[str, Any]], cost=transition_cost) -> float:
+    """Soma dos custos de transição de uma sequência de músicas"""
+    return sum(cost(tracks[i], tracks[i + 1]) for i in range(len(tracks) - 1))
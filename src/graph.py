@@ -0,0 +1,156 @@
+"""
+Grafo de artistas relacionados com expansão em largura (BFS) por camadas
+
+Cada artista é um nó (gêneros e popularidade vêm do registro compacto do
+cache de catálogo) e a lista de relacionados da Web API são as arestas que
+saem dele. `expand` percorre o grafo camada por camada a partir dos artistas
+iniciais: as arestas já em cache são lidas na hora e as que faltam são
+buscadas em paralelo, com um limite de buscas simultâneas e de artistas
+visitados. Caminho mais curto e vizinhança por gênero são respondidos a
+partir do resultado, em memória.
+
+As arestas seguem as listas de relacionados, que não são simétricas: B pode
+estar entre os relacionados de A sem que A esteja entre os de B.
+"""
+
+import contextvars
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+RelatedFetcher = Callable[[str], List[str]]
+
+
+def _fetch_layer(
+    artist_ids: List[str], fetch: RelatedFetcher, concurrency: int
+) -> Dict[str, Any]:
+    """Relacionados de cada artista (ou a exceção da busca)"""
+
+    def attempt(artist_id: str) -> Any:
+        try:
+            return fetch(artist_id)
+        except Exception as e:
+            return e
+
+    if len(artist_ids) == 1 or concurrency <= 1:
+        return {artist_id: attempt(artist_id) for artist_id in artist_ids}
+    workers = max(1, min(concurrency, len(artist_ids)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Cada busca leva o contexto da tool (usuário, prioridade, métricas)
+        futures = {
+            artist_id: pool.submit(contextvars.copy_context().run, attempt, artist_id)
+            for artist_id in artist_ids
+        }
+        return {artist_id: future.result() for artist_id, future in futures.items()}
+
+
+def expand(
+    seeds: Iterable[str],
+    hops: int,
+    fetch: RelatedFetcher,
+    concurrency: int,
+    max_artists: int,
+    cached: Callable[[str], Optional[List[str]]] = lambda _: None,
+    target: Optional[str] = None,
+) -> Dict[str, Any]:
+    """BFS de até `hops` saltos; para na camada em que `target` aparece
+
+    Retorna a distância e o antecessor de cada artista visitado, as arestas
+    lidas, as buscas que falharam e quantas listas vieram do cache.
+    """
+    distance: Dict[str, int] = {}
+    parent: Dict[str, Optional[str]] = {}
+    for seed in seeds:
+        distance.setdefault(seed, 0)
+        parent.setdefault(seed, None)
+    edges: Dict[str, List[str]] = {}
+    failed: Dict[str, str] = {}
+    stats = {"fetched": 0, "cached": 0}
+    truncated = False
+
+    frontier = list(distance)
+    for depth in range(hops):
+        if not frontier or (target is not None and target in distance):
+            break
+        known = {artist_id: cached(artist_id) for artist_id in frontier}
+        pending = [artist_id for artist_id, ids in known.items() if ids is None]
+        stats["cached"] += len(frontier) - len(pending)
+        stats["fetched"] += len(pending)
+        known.update(_fetch_layer(pending, fetch, concurrency) if pending else {})
+
+        next_frontier = []
+        # A ordem da camada (e dos relacionados) mantém o resultado estável
+        for artist_id in frontier:
+            outcome = known[artist_id]
+            if isinstance(outcome, Exception):
+                failed[artist_id] = str(outcome)
+                continue
+            edges[artist_id] = outcome
+            for neighbour in outcome:
+                if neighbour in distance:
+                    continue
+                if len(distance) >= max_artists:
+                    truncated = True
+                    break
+                distance[neighbour] = depth + 1
+                parent[neighbour] = artist_id
+                next_frontier.append(neighbour)
+        frontier = next_frontier
+
+    return {
+        "distance": distance,
+        "parent": parent,
+        "edges": edges,
+        "failed": failed,
+        "truncated": truncated,
+        **stats,
+    }
+
+
+def path_to(graph: Dict[str, Any], target: str) -> Optional[List[str]]:
+    """Caminho mais curto dos artistas iniciais até `target` (ou None)"""
+    parent = graph["parent"]
+    if target not in parent:
+        return None
+    path = [target]
+    while parent[path[-1]] is not None:
+        path.append(parent[path[-1]])
+    return path[::-1]
+
+
+def matches_genre(genres: Iterable[str], genre: Optional[str]) -> bool:
+    """Gênero contido em algum dos gêneros do artista ("rock" em "brazilian rock")"""
+    if not genre:
+        return True
+    wanted = genre.strip().casefold()
+    return any(wanted in g.casefold() for g in genres or ())
+
+
+def neighbourhood(
+    graph: Dict[str, Any],
+    records: Dict[str, Optional[Dict[str, Any]]],
+    genre: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Artistas visitados (sem os iniciais), por distância e popularidade"""
+    artists = []
+    for artist_id, distance in graph["distance"].items():
+        record = records.get(artist_id)
+        if not distance or not record:
+            continue
+        if not matches_genre(record.get("genres"), genre):
+            continue
+        artists.append(
+            {
+                **record,
+                "distance": distance,
+                "via": graph["parent"][artist_id],
+            }
+        )
+    artists.sort(key=lambda a: (a["distance"], -(a.get("popularity") or 0)))
+    return artists
+
+
+def genre_counts(artists: Iterable[Dict[str, Any]], top: int = 10) -> List[Dict]:
+    """Gêneros mais comuns entre os artistas"""
+    counts = Counter(g for artist in artists for g in artist.get("genres") or ())
+    return [{"name": name, "count": count} for name, count in counts.most_common(top)]
@@ -0,0 +1,135 @@
+"""
+Hidratação em lote de músicas, artistas e álbuns
+
+Agentes costumam ter uma lista de URIs (fila, histórico, busca) e precisar
+dos metadados de todas. `hydrate` remove repetições, consulta o cache de
+catálogo e busca apenas o que falta, em lotes dos endpoints multi-ID com
+concorrência limitada. Cada entidade vira um registro compacto, que é o que
+fica no cache de catálogo.
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+try:
+    from .cache import catalog_cache
+    from .loader import BatchLoader
+    from .spotify_ids import spotify_id
+except ImportError:
+    from cache import catalog_cache
+    from loader import BatchLoader
+    from spotify_ids import spotify_id
+
+
+def compact_track(track: Dict[str, Any]) -> Dict[str, Any]:
+    album = track.get("album") or {}
+    artists = track.get("artists") or []
+    return {
+        "id": track["id"],
+        "uri": track["uri"],
+        "name": track.get("name"),
+        "artists": [artist.get("name") for artist in artists],
+        "artist_ids": [artist.get("id") for artist in artists],
+        "album": album.get("name"),
+        "album_id": album.get("id"),
+        "release_date": album.get("release_date"),
+        "duration_ms": track.get("duration_ms"),
+        "popularity": track.get("popularity"),
+        "explicit": track.get("explicit"),
+        "isrc": (track.get("external_ids") or {}).get("isrc"),
+    }
+
+
+def compact_artist(artist: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": artist["id"],
+        "uri": artist["uri"],
+        "name": artist.get("name"),
+        "genres": artist.get("genres", []),
+        "popularity": artist.get("popularity"),
+        "followers": (artist.get("followers") or {}).get("total"),
+    }
+
+
+def compact_album(album: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": album["id"],
+        "uri": album["uri"],
+        "name": album.get("name"),
+        "artists": [artist.get("name") for artist in album.get("artists") or []],
+        "album_type": album.get("album_type"),
+        "release_date": album.get("release_date"),
+        "total_tracks": album.get("total_tracks"),
+        "label": album.get("label"),
+        "popularity": album.get("popularity"),
+        "upc": (album.get("external_ids") or {}).get("upc"),
+    }
+
+
+def catalog_fetcher(
+    kind: str,
+    fetch_many: Callable[[List[str]], List[Optional[Dict[str, Any]]]],
+    compact: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> Callable[[List[str]], Dict[str, Dict[str, Any]]]:
+    """fetch_many de um BatchLoader que compacta e guarda no cache de catálogo"""
+
+    def fetch(ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        records = {item["id"]: compact(item) for item in fetch_many(ids) or [] if item}
+        catalog_cache.set_many({f"{kind}:{i}": r for i, r in records.items()})
+        return records
+
+    return fetch
+
+
+def hydrate(
+    kind: str,
+    values: Sequence[str],
+    loader: BatchLoader,
+    concurrency: int,
+    max_items: int,
+) -> Dict[str, Any]:
+    """Registros compactos na ordem de entrada (None para inválidos/ausentes)"""
+    if len(values) > max_items:
+        raise ValueError(f"Máximo de {max_items} IDs por chamada")
+
+    ids: List[Optional[str]] = []
+    invalid = []
+    for value in values:
+        try:
+            ids.append(spotify_id(value, kind))
+        except ValueError:
+            ids.append(None)
+            invalid.append(value)
+
+    unique = [i for i in dict.fromkeys(ids) if i]
+    cached = catalog_cache.get_many(f"{kind}:{i}" for i in unique)
+    records = {key.split(":", 1)[1]: value for key, value in cached.items()}
+    missing = [i for i in unique if i not in records]
+
+    chunks = [
+        missing[start : start + loader.max_batch]
+        for start in range(0, len(missing), loader.max_batch)
+    ]
+    if chunks:
+        workers = max(1, min(concurrency, len(chunks)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Cada lote leva o contexto da tool (usuário, prioridade, métricas)
+            futures = [
+                pool.submit(contextvars.copy_context().run, loader.load_many, chunk)
+                for chunk in chunks
+            ]
+            for chunk, future in zip(chunks, futures):
+                for entity_id, record in zip(chunk, future.result()):
+                    if record:
+                        records[entity_id] = record
+
+    return {
+        f"{kind}s": [records.get(i) if i else None for i in ids],
+        "requested": len(values),
+        "unique": len(unique),
+        "cached": len(cached),
+        "fetched": len(missing),
+        "not_found": [i for i in missing if i not in records],
+        "invalid": invalid,
+    }
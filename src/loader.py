@@ -0,0 +1,114 @@
+"""
+Agrupamento automático de buscas por ID (estilo DataLoader)
+
+Vários caminhos do service buscam uma entidade por vez: audio features de
+uma música, se uma música está nos favoritos, detalhes de um artista. Com
+tools rodando em paralelo (pool de workers), essas buscas chegam quase
+juntas e cada uma vira uma requisição. O BatchLoader junta os `load(id)`
+recebidos dentro de uma janela curta em uma única chamada aos endpoints
+multi-ID da Web API (até `max_batch` IDs), e cada chamador recebe apenas o
+seu resultado.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+try:
+    from .metrics import MetricsRegistry
+except ImportError:
+    from metrics import MetricsRegistry
+
+# Tamanho máximo de lote de cada endpoint multi-ID
+TRACKS_BATCH_SIZE = 50
+ARTISTS_BATCH_SIZE = 50
+SAVED_CONTAINS_BATCH_SIZE = 50
+ALBUMS_BATCH_SIZE = 20
+AUDIO_FEATURES_BATCH_SIZE = 100
+
+
+class _Batch:
+    def __init__(self):
+        self.keys: List[Hashable] = []
+        self.key_set = set()
+        self.results: Dict[Hashable, Any] = {}
+        self.error: Optional[BaseException] = None
+        self.full = threading.Event()
+        self.done = threading.Event()
+
+
+class BatchLoader:
+    """Junta buscas individuais em chamadas de até `max_batch` IDs.
+
+    `fetch_many` recebe a lista de IDs e retorna um dict ID -> resultado (IDs
+    ausentes resultam em None). O primeiro chamador de um lote espera até
+    `window` segundos (ou o lote encher) e executa a busca; os demais só
+    aguardam o resultado. Com `window` igual a 0 o lote fecha assim que o
+    primeiro chamador termina de enfileirar os seus IDs.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fetch_many: Callable[[List[Hashable]], Dict[Hashable, Any]],
+        max_batch: int,
+        window: float = 0.0,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        self.name = name
+        self.fetch_many = fetch_many
+        self.max_batch = max(1, max_batch)
+        self.window = window
+        self.registry = registry
+        self._open: Optional[_Batch] = None
+        self._lock = threading.Lock()
+
+    def load(self, key: Hashable) -> Any:
+        return self.load_many([key])[0]
+
+    def load_many(self, keys: Iterable[Hashable]) -> List[Any]:
+        """Resultados na ordem das chaves (repetidas são buscadas uma vez)"""
+        keys = list(keys)
+        led: List[_Batch] = []
+        joined: Dict[Hashable, _Batch] = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                batch = self._open
+                if batch is None:
+                    batch = self._open = _Batch()
+                    led.append(batch)
+                if key not in batch.key_set:
+                    batch.key_set.add(key)
+                    batch.keys.append(key)
+                joined[key] = batch
+                if len(batch.keys) >= self.max_batch:
+                    batch.full.set()
+                    self._open = None
+
+        for batch in led:
+            self._run(batch)
+        for batch in set(joined.values()):
+            batch.done.wait()
+
+        results = []
+        for key in keys:
+            batch = joined[key]
+            if batch.error is not None:
+                raise batch.error
+            results.append(batch.results.get(key))
+        return results
+
+    def _run(self, batch: _Batch) -> None:
+        if self.window > 0:
+            batch.full.wait(self.window)
+        with self._lock:
+            if self._open is batch:
+                self._open = None
+        try:
+            batch.results = self.fetch_many(list(batch.keys)) or {}
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+        if self.registry is not None:
+            self.registry.record_event(f"loader_{self.name}_batches")
+            self.registry.record_event(f"loader_{self.name}_keys", len(batch.keys))
@@ -4,24 +4,144 @@ FastMCP Server para integração com Spotify
 """
 
 import logging
-from typing import Any, Dict, List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
 
+import anyio
 from fastmcp import FastMCP
 from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 
 try:
-    from .config import MCP_SERVER_NAME, MCP_SERVER_VERSION
-    from .service import spotify_service
+    from .concurrency import ToolWorkerPool
+    from .config import (
+        ARTIST_GRAPH_MAX_HOPS,
+        HOST,
+        MCP_ALLOW_DEFAULT_USER,
+        MCP_MAX_CONNECTIONS,
+        MCP_MAX_PENDING,
+        MCP_SERVER_NAME,
+        MCP_SERVER_VERSION,
+        MCP_TRANSPORT,
+        MCP_USER_HEADER,
+        MCP_WORKERS,
+        PLAYBACK_MIN_POLL_INTERVAL,
+        PLAYBACK_PAUSED_POLL_INTERVAL,
+        PLAYBACK_POLL_INTERVAL,
+        PORT,
+        RESOLVE_MIN_CONFIDENCE,
+        RESOURCE_CACHE_SIZE,
+        RESOURCE_CACHE_TTL_SCALE,
+        SCHEDULER_BULK_CONCURRENCY,
+        SCHEDULER_CONTROL_CONCURRENCY,
+    )
+    from .metrics import OPENMETRICS_CONTENT_TYPE, MetricsMiddleware, metrics
+    from .playback import CURRENT_URI, QUEUE_URI, PlaybackPoller
+    from .resources import ResourceCache
+    from .scheduler import BULK, CONTROL, PriorityMiddleware, tool_priority
+    from .service import spotify_service, user_clients
+    from .users import UserRoutingMiddleware, current_user
 except ImportError:
-    from config import MCP_SERVER_NAME, MCP_SERVER_VERSION
-    from service import spotify_service
+    from concurrency import ToolWorkerPool
+    from config import (
+        ARTIST_GRAPH_MAX_HOPS,
+        HOST,
+        MCP_ALLOW_DEFAULT_USER,
+        MCP_MAX_CONNECTIONS,
+        MCP_MAX_PENDING,
+        MCP_SERVER_NAME,
+        MCP_SERVER_VERSION,
+        MCP_TRANSPORT,
+        MCP_USER_HEADER,
+        MCP_WORKERS,
+        PLAYBACK_MIN_POLL_INTERVAL,
+        PLAYBACK_PAUSED_POLL_INTERVAL,
+        PLAYBACK_POLL_INTERVAL,
+        PORT,
+        RESOLVE_MIN_CONFIDENCE,
+        RESOURCE_CACHE_SIZE,
+        RESOURCE_CACHE_TTL_SCALE,
+        SCHEDULER_BULK_CONCURRENCY,
+        SCHEDULER_CONTROL_CONCURRENCY,
+    )
+    from metrics import OPENMETRICS_CONTENT_TYPE, MetricsMiddleware, metrics
+    from playback import CURRENT_URI, QUEUE_URI, PlaybackPoller
+    from resources import ResourceCache
+    from scheduler import BULK, CONTROL, PriorityMiddleware, tool_priority
+    from service import spotify_service, user_clients
+    from users import UserRoutingMiddleware, current_user
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tools síncronas rodam em um pool de threads compartilhado por todas as sessões
+# (controle de playback e trabalho em lote têm threads próprias)
+worker_pool = ToolWorkerPool(
+    MCP_WORKERS,
+    MCP_MAX_PENDING,
+    metrics,
+    classify=tool_priority,
+    class_workers={
+        CONTROL: SCHEDULER_CONTROL_CONCURRENCY,
+        BULK: SCHEDULER_BULK_CONCURRENCY,
+    },
+)
+
+# Cada requisição usa o cliente Spotify do usuário identificado no cabeçalho
+user_routing = UserRoutingMiddleware(MCP_USER_HEADER, MCP_ALLOW_DEFAULT_USER)
+
+# Estado do player consultado em segundo plano para quem assina os recursos
+playback_poller = PlaybackPoller(
+    {
+        CURRENT_URI: lambda user_id: spotify_service.for_user(
+            user_id
+        ).get_current_track(),
+        QUEUE_URI: lambda user_id: spotify_service.for_user(user_id).get_queue(),
+    },
+    metrics,
+    playing_interval=PLAYBACK_POLL_INTERVAL,
+    paused_interval=PLAYBACK_PAUSED_POLL_INTERVAL,
+    min_interval=PLAYBACK_MIN_POLL_INTERVAL,
+    resolve_user=user_routing.resolve_user,
+)
+
+# Recursos spotify:// servidos do cache, revalidados em segundo plano
+resource_cache = ResourceCache(
+    spotify_service.for_user,
+    metrics,
+    ttl_scale=RESOURCE_CACHE_TTL_SCALE,
+    max_entries=RESOURCE_CACHE_SIZE,
+    resolve_user=user_routing.resolve_user,
+)
+
+
+@asynccontextmanager
+async def lifespan(server: FastMCP) -> AsyncIterator[dict]:
+    async with worker_pool.lifespan(server), playback_poller.lifespan(server):
+        yield {}
+
+
 # Criar instância do FastMCP
-app = FastMCP(name=MCP_SERVER_NAME, version=MCP_SERVER_VERSION)
+app = FastMCP(
+    name=MCP_SERVER_NAME,
+    version=MCP_SERVER_VERSION,
+    lifespan=lifespan,
+)
+playback_poller.install(app)
+
+app.add_middleware(user_routing)
+# Latência e chamadas à API de todas as tools
+app.add_middleware(MetricsMiddleware(metrics))
+# Prioridade das chamadas à Web API de cada tool (controle > leitura > lote)
+app.add_middleware(PriorityMiddleware())
+# Comandos de playback antecipam a consulta do player para os inscritos
+app.add_middleware(playback_poller)
+# Tools de escrita invalidam os recursos que alteram
+app.add_middleware(resource_cache)
+# Recusa chamadas quando o pool e a fila de espera estão cheios
+app.add_middleware(worker_pool)
 
 
 class PlayMusicRequest(BaseModel):
@@ -67,20 +187,11 @@ def get_current_track() -> Dict[str, Any]:
 def play_music(request: PlayMusicRequest) -> Dict[str, str]:
     """Tocar música no Spotify"""
     try:
-        import time
-
-        start_time = time.time()
-
-        result = spotify_service.play_music(
+        return spotify_service.play_music(
             track_uri=request.track_uri,
             playlist_uri=request.playlist_uri,
             album_uri=request.album_uri,
         )
-
-        elapsed_time = time.time() - start_time
-        logger.info(f"play_music executado em {elapsed_time:.2f}s")
-
-        return result
     except Exception as e:
         logger.error(f"Erro em play_music: {e}")
         return {"error": str(e)}
@@ -96,7 +207,7 @@ def pause_music() -> Dict[str, str]:
 
 
 @app.tool()
-def next_track() -> Dict[str, str]:
+def next_track() -> Dict[str, Any]:
     """Avançar para próxima música"""
     try:
         return spotify_service.next_track()
@@ -105,7 +216,7 @@ def next_track() -> Dict[str, str]:
 
 
 @app.tool()
-def previous_track() -> Dict[str, str]:
+def previous_track() -> Dict[str, Any]:
     """Voltar para música anterior"""
     try:
         return spotify_service.previous_track()
@@ -114,7 +225,7 @@ def previous_track() -> Dict[str, str]:
 
 
 @app.tool()
-def set_volume(request: VolumeRequest) -> Dict[str, str]:
+def set_volume(request: VolumeRequest) -> Dict[str, Any]:
     """Ajustar volume (0-100)"""
     try:
         return spotify_service.set_volume(request.volume)
@@ -141,9 +252,7 @@ def get_playlists() -> Dict[str, List[Dict[str, Any]]]:
 
 
 @app.tool()
-def get_recommendations(
-    request: RecommendationsRequest,
-) -> Dict[str, List[Dict[str, Any]]]:
+def get_recommendations(request: RecommendationsRequest) -> Dict[str, Any]:
     """Obter recomendações baseadas em artistas, músicas ou gêneros"""
     try:
         return spotify_service.get_recommendations(
@@ -281,6 +390,37 @@ def get_listening_analytics(limit: int = 50) -> Dict[str, Any]:
         return {"error": str(e)}
 
 
+@app.tool()
+def get_listening_aggregates(top: int = 10) -> Dict[str, Any]:
+    """Obter contadores acumulados de escuta (artistas, músicas, gêneros, horas, dias)
+
+    Não faz chamadas à API: os contadores são atualizados incrementalmente
+    pelas tools de histórico, analytics e favoritos e ficam no cache local.
+    """
+    try:
+        return spotify_service.get_listening_aggregates(top)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def export_library(
+    datasets: Optional[List[str]] = None,
+    file_format: str = "jsonl",
+    output_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Exportar biblioteca e histórico para arquivos locais (jsonl, parquet ou arrow)
+
+    Conjuntos: saved_tracks, playlists, playlist_tracks, audio_features,
+    listening_history (padrão: todos). Retorna os caminhos e o total de linhas.
+    output_dir é relativo ao diretório de exportação do usuário.
+    """
+    try:
+        return spotify_service.export_library(datasets, file_format, output_dir)
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @app.tool()
 def search_and_add_to_queue(query: str, limit: int = 10) -> Dict[str, Any]:
     """Buscar músicas e adicionar todas à fila de reprodução"""
@@ -308,6 +448,33 @@ def search_and_play_all(query: str, limit: int = 10) -> Dict[str, Any]:
         return {"error": str(e)}
 
 
+@app.tool()
+def build_flow_queue(
+    track_uris: Optional[List[str]] = None,
+    playlist_id: Optional[str] = None,
+    query: Optional[str] = None,
+    use_saved_tracks: bool = False,
+    limit: int = 100,
+    action: str = "play",
+) -> Dict[str, Any]:
+    """Ordenar músicas por batida (BPM), tom e energia para transições suaves
+
+    Fonte: track_uris, playlist_id, query ou use_saved_tracks. action pode ser
+    "play" (toca a sequência), "queue" (adiciona à fila) ou "none" (só ordena).
+    """
+    try:
+        return spotify_service.build_flow_queue(
+            track_uris=track_uris,
+            playlist_id=playlist_id,
+            query=query,
+            use_saved_tracks=use_saved_tracks,
+            limit=limit,
+            action=action,
+        )
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @app.tool()
 def add_to_queue(track_uri: str) -> Dict[str, Any]:
     """Adicionar música à fila de reprodução"""
@@ -425,18 +592,136 @@ def search_playlists(query: str, limit: int = 10) -> Dict[str, Any]:
         return {"error": str(e)}
 
 
+@app.tool()
+def search_all(
+    query: str, types: Optional[List[str]] = None, limit: int = 10
+) -> Dict[str, Any]:
+    """Buscar músicas, artistas, álbuns e playlists em uma única requisição
+
+    `types` restringe a busca (padrão: track, artist, album, playlist);
+    `limit` vale para cada tipo. Consultas repetidas vêm do cache.
+    """
+    try:
+        return spotify_service.search_all(query, types, limit)
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @app.tool()
 def get_playlist_tracks(playlist_id: str, limit: int = 50) -> Dict[str, Any]:
-    """Obter músicas de uma playlist específica"""
+    """Obter músicas de uma playlist específica (ID, URI ou URL da playlist)"""
     try:
         return spotify_service.get_playlist_tracks(playlist_id, limit)
     except Exception as e:
         return {"error": str(e)}
 
 
+@app.tool()
+def create_playlist(
+    name: str,
+    track_uris: Optional[List[str]] = None,
+    description: str = "",
+    public: bool = False,
+) -> Dict[str, Any]:
+    """Criar uma playlist, já com as músicas na ordem da lista (IDs, URIs ou URLs)"""
+    try:
+        return spotify_service.create_playlist(name, track_uris, description, public)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def add_tracks_to_playlist(
+    playlist_id: str, track_uris: List[str], position: Optional[int] = None
+) -> Dict[str, Any]:
+    """Incluir músicas em uma playlist, na ordem (no fim ou a partir de position)
+
+    Listas longas são enviadas em lotes de 100. Se um lote falhar,
+    resume_from indica de onde continuar.
+    """
+    try:
+        return spotify_service.add_tracks_to_playlist(playlist_id, track_uris, position)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def replace_playlist_tracks(playlist_id: str, track_uris: List[str]) -> Dict[str, Any]:
+    """Substituir todas as músicas de uma playlist pela lista, na ordem"""
+    try:
+        return spotify_service.replace_playlist_tracks(playlist_id, track_uris)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def remove_tracks_from_playlist(
+    playlist_id: str, track_uris: List[str]
+) -> Dict[str, Any]:
+    """Remover todas as ocorrências das músicas de uma playlist"""
+    try:
+        return spotify_service.remove_tracks_from_playlist(playlist_id, track_uris)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def reorder_playlist_tracks(
+    playlist_id: str, range_start: int, insert_before: int, range_length: int = 1
+) -> Dict[str, Any]:
+    """Mover range_length músicas a partir de range_start para antes de insert_before"""
+    try:
+        return spotify_service.reorder_playlist_tracks(
+            playlist_id, range_start, insert_before, range_length
+        )
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def find_track_in_playlists(track: str, refresh: bool = False) -> Dict[str, Any]:
+    """Em quais das suas playlists (e posições) está uma música (ID, URI ou URL)
+
+    Usa um índice das playlists sincronizado por snapshot_id: só playlists
+    alteradas são lidas de novo. refresh=True confere os snapshots na hora.
+    """
+    try:
+        return spotify_service.find_track_in_playlists(track, refresh)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def find_playlist_duplicates(
+    playlist_id: Optional[str] = None, refresh: bool = False
+) -> Dict[str, Any]:
+    """Encontrar músicas repetidas dentro das playlists e presentes em várias
+
+    Com playlist_id, só as repetições dessa playlist e as músicas dela que
+    também estão em outras playlists.
+    """
+    try:
+        return spotify_service.find_playlist_duplicates(playlist_id, refresh)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def find_equivalent_tracks(track: str, search: bool = False) -> Dict[str, Any]:
+    """Outras edições da mesma gravação (single, álbum, deluxe, coletânea)
+
+    Usa o índice por ISRC montado com as músicas já vistas pelo servidor.
+    search=True consulta também a busca "isrc:" do Spotify.
+    """
+    try:
+        return spotify_service.find_equivalent_tracks(track, search)
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @app.tool()
 def get_album_tracks(album_id: str) -> Dict[str, Any]:
-    """Obter músicas de um álbum específico"""
+    """Obter músicas de um álbum específico (ID, URI ou URL do álbum)"""
     try:
         return spotify_service.get_album_tracks(album_id)
     except Exception as e:
@@ -445,7 +730,7 @@ def get_album_tracks(album_id: str) -> Dict[str, Any]:
 
 @app.tool()
 def get_artist_top_tracks(artist_id: str) -> Dict[str, Any]:
-    """Obter músicas mais populares de um artista"""
+    """Obter músicas mais populares de um artista (ID, URI ou URL)"""
     try:
         return spotify_service.get_artist_top_tracks(artist_id)
     except Exception as e:
@@ -454,7 +739,7 @@ def get_artist_top_tracks(artist_id: str) -> Dict[str, Any]:
 
 @app.tool()
 def get_artist_albums(artist_id: str, limit: int = 20) -> Dict[str, Any]:
-    """Obter álbuns de um artista"""
+    """Obter álbuns de um artista (ID, URI ou URL)"""
     try:
         return spotify_service.get_artist_albums(artist_id, limit)
     except Exception as e:
@@ -463,13 +748,130 @@ def get_artist_albums(artist_id: str, limit: int = 20) -> Dict[str, Any]:
 
 @app.tool()
 def get_related_artists(artist_id: str) -> Dict[str, Any]:
-    """Obter artistas relacionados"""
+    """Obter artistas relacionados (ID, URI ou URL do artista)"""
     try:
         return spotify_service.get_related_artists(artist_id)
     except Exception as e:
         return {"error": str(e)}
 
 
+@app.tool()
+def explore_artist_graph(
+    artist_id: str, hops: int = 2, genre: Optional[str] = None, limit: int = 50
+) -> Dict[str, Any]:
+    """Artistas a até `hops` saltos de relacionados de um artista
+
+    Filtra por gênero opcional ("rock" inclui "brazilian rock") e ordena por
+    distância e popularidade. As listas de relacionados ficam em cache.
+    """
+    try:
+        return spotify_service.explore_artist_graph(artist_id, hops, genre, limit)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def find_artist_path(
+    source_artist_id: str,
+    target_artist_id: str,
+    max_hops: int = ARTIST_GRAPH_MAX_HOPS,
+) -> Dict[str, Any]:
+    """Menor sequência de artistas relacionados ligando um artista a outro"""
+    try:
+        return spotify_service.find_artist_path(
+            source_artist_id, target_artist_id, max_hops
+        )
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def hydrate_tracks(tracks: List[str]) -> Dict[str, Any]:
+    """Obter metadados compactos de várias músicas de uma vez (até centenas de
+    IDs, URIs ou URLs), na ordem recebida; None para IDs inválidos ou ausentes"""
+    try:
+        return spotify_service.hydrate_tracks(tracks)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def hydrate_artists(artists: List[str]) -> Dict[str, Any]:
+    """Obter metadados compactos (gêneros, popularidade, seguidores) de vários
+    artistas de uma vez, na ordem recebida"""
+    try:
+        return spotify_service.hydrate_artists(artists)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def hydrate_albums(albums: List[str]) -> Dict[str, Any]:
+    """Obter metadados compactos de vários álbuns de uma vez, na ordem recebida"""
+    try:
+        return spotify_service.hydrate_albums(albums)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def resolve_tracks(
+    tracks: List[str],
+    min_confidence: float = RESOLVE_MIN_CONFIDENCE,
+    action: str = "none",
+) -> Dict[str, Any]:
+    """Converter uma lista de músicas em texto ("artista - título") em URIs
+
+    Retorna a URI e a confiança (0 a 1) de cada linha, na ordem recebida, e a
+    lista `uris` com as resolvidas. action pode ser "none" (só resolve),
+    "play" (toca as músicas) ou "queue" (adiciona à fila).
+    """
+    try:
+        return spotify_service.resolve_tracks(tracks, min_confidence, action)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def execute_batch(operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Executar várias operações em uma única chamada
+
+    Cada operação: {"id": "busca", "method": "search_tracks", "args": {...},
+    "depends_on": [...]} (id e depends_on opcionais). `method` é o nome de uma
+    tool (ex.: search_tracks, check_track_in_favorites, add_to_queue,
+    set_volume). Argumentos como "$busca.tracks.0.uri" usam o resultado de
+    uma operação anterior. Leituras independentes rodam em paralelo;
+    comandos de playback e escritas rodam um de cada vez, na ordem da lista.
+    """
+    try:
+        return spotify_service.execute_batch(operations)
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def get_server_metrics() -> Dict[str, Any]:
+    """Obter métricas do servidor: latência por tool (p50/p95/p99), chamadas à
+    API por invocação, bytes recebidos, acertos de cache e retries"""
+    try:
+        return metrics.snapshot()
+    except Exception as e:
+        return {"error": str(e)}
+
+
+@app.tool()
+def get_authorization_url() -> Dict[str, str]:
+    """Obter o link de autorização do Spotify para o usuário desta sessão
+
+    Abra o link no navegador; o retorno em /callback salva o token do usuário.
+    """
+    try:
+        state = user_clients.begin_authorization(current_user.get())
+        return spotify_service.get_authorization_url(state)
+    except Exception as e:
+        return {"error": str(e)}
+
+
 @app.tool()
 def auto_transfer_playback() -> Dict[str, str]:
     """Transferir playback automaticamente para um dispositivo disponível"""
@@ -490,6 +892,7 @@ def spotify_assistant() -> str:
     - search_tracks: Buscar músicas por nome
     - search_and_play_all: Buscar e reproduzir todas em sequência
     - search_and_add_to_queue: Buscar e adicionar todas à fila
+    - build_flow_queue: Ordenar músicas por BPM/tom/energia e tocar em sequência
     - get_current_track: Obter música atual
     - add_to_queue: Adicionar música à fila
     - skip_to_next: Próxima música
@@ -506,6 +909,7 @@ def spotify_assistant() -> str:
     - search_artists: Buscar artistas
     - search_albums: Buscar álbuns
     - search_playlists: Buscar playlists
+    - search_all: Buscar todos os tipos em uma requisição
     - get_genres: Gêneros musicais
     - get_audio_features: Características de áudio (tempo, dançabilidade, etc.)
     - get_track_tempo: Obter batida (BPM) de uma música
@@ -523,6 +927,8 @@ def spotify_assistant() -> str:
 
     📊 **Tools de Analytics e Gráficos:**
     - get_listening_analytics: Dados analíticos completos para gráficos HTML
+    - get_listening_aggregates: Contadores acumulados de escuta (sem chamadas à API)
+    - export_library: Exportar biblioteca e histórico (jsonl/parquet/arrow)
     - get_recently_played: Músicas reproduzidas recentemente
     - get_top_tracks: Músicas mais tocadas
     - get_top_artists: Artistas mais ouvidos
@@ -538,10 +944,23 @@ def spotify_assistant() -> str:
     🎵 **Tools de Conteúdo:**
     - get_playlists: Playlists do usuário
     - get_playlist_tracks: Músicas de playlist
+    - create_playlist: Criar playlist (já com músicas)
+    - add_tracks_to_playlist / replace_playlist_tracks /
+      remove_tracks_from_playlist / reorder_playlist_tracks: Editar playlists
+      em lotes de 100
+    - find_track_in_playlists: Em quais playlists está uma música
+    - find_playlist_duplicates: Músicas repetidas nas playlists
+    - find_equivalent_tracks: Outras edições da mesma gravação (ISRC)
     - get_album_tracks: Músicas de álbum
     - get_artist_top_tracks: Top músicas do artista
     - get_artist_albums: Álbuns do artista
     - get_related_artists: Artistas relacionados
+    - explore_artist_graph: Vizinhança de artistas relacionados (por gênero)
+    - find_artist_path: Caminho de relacionados entre dois artistas
+    - hydrate_tracks / hydrate_artists / hydrate_albums: Metadados de várias
+      entidades de uma vez (listas de IDs, URIs ou URLs)
+    - resolve_tracks: Converter listas "artista - título" em URIs
+    - execute_batch: Várias operações em uma chamada (com dependências)
 
     🔧 **Tools de Autenticação:**
     - authenticate: Autenticar com Spotify
@@ -549,6 +968,10 @@ def spotify_assistant() -> str:
     - check_token_validity: Verificar se o token é válido
     - ensure_valid_token: Garantir token válido (reautentica se necessário)
     - smart_authenticate: Autenticação inteligente (verifica e renova automaticamente)
+    - get_authorization_url: Link de autorização para o usuário da sessão (modo HTTP)
+
+    📈 **Tools de Diagnóstico:**
+    - get_server_metrics: Latência por tool e chamadas à API do Spotify
 
     📚 **Recursos Disponíveis:**
     - spotify://playback/current: Estado atual de reprodução
@@ -563,6 +986,7 @@ def spotify_assistant() -> str:
     - spotify://user/saved-tracks: Músicas salvas
     - spotify://user/saved-albums: Álbuns salvos
     - spotify://user/followed-artists: Artistas seguidos
+    - spotify://server/metrics: Métricas do servidor (latência e chamadas à API)
 
     🎯 **Como usar:**
     1. Use as tools de controle para reprodução
@@ -902,6 +1326,9 @@ def spotify_analytics_generator() -> str:
     - get_top_artists(limit): Artistas mais ouvidos
     - get_saved_tracks(limit): Músicas salvas
     - get_playlists(): Playlists do usuário
+    - export_library(datasets, file_format): Exportar biblioteca e histórico para
+      arquivos jsonl/parquet/arrow (para bibliotecas grandes, prefira carregar
+      os arquivos em vez de passar JSON pelas tools)
 
     📈 **Tipos de Gráficos Gerados:**
 
@@ -1053,7 +1480,7 @@ def current_playback() -> Dict[str, Any]:
             "name": "Reprodução Atual",
             "description": "Estado atual de reprodução do Spotify",
             "mimeType": "application/json",
-            "data": spotify_service.get_current_track(),
+            "data": playback_poller.read(CURRENT_URI),
         }
     except Exception as e:
         return {
@@ -1072,7 +1499,9 @@ def user_playlists() -> Dict[str, Any]:
             "name": "Minhas Playlists",
             "description": "Playlists do usuário no Spotify",
             "mimeType": "application/json",
-            "data": spotify_service.get_playlists(),
+            **resource_cache.read(
+                "spotify://playlists/user", lambda service: service.get_playlists()
+            ),
         }
     except Exception as e:
         return {
@@ -1091,7 +1520,9 @@ def available_devices() -> Dict[str, Any]:
             "name": "Dispositivos Disponíveis",
             "description": "Dispositivos disponíveis para reprodução",
             "mimeType": "application/json",
-            "data": spotify_service.get_devices(),
+            **resource_cache.read(
+                "spotify://devices/available", lambda service: service.get_devices()
+            ),
         }
     except Exception as e:
         return {
@@ -1110,7 +1541,9 @@ def music_genres() -> Dict[str, Any]:
             "name": "Gêneros Musicais",
             "description": "Gêneros musicais disponíveis para recomendações",
             "mimeType": "application/json",
-            "data": spotify_service.get_genres(),
+            **resource_cache.read(
+                "spotify://genres/available", lambda service: service.get_genres()
+            ),
         }
     except Exception as e:
         return {
@@ -1129,7 +1562,9 @@ def user_profile() -> Dict[str, Any]:
             "name": "Perfil do Usuário",
             "description": "Informações do perfil do usuário no Spotify",
             "mimeType": "application/json",
-            "data": spotify_service.get_user_profile(),
+            **resource_cache.read(
+                "spotify://user/profile", lambda service: service.get_user_profile()
+            ),
         }
     except Exception as e:
         return {
@@ -1148,7 +1583,7 @@ def playback_queue() -> Dict[str, Any]:
             "name": "Fila de Reprodução",
             "description": "Fila de reprodução atual do Spotify",
             "mimeType": "application/json",
-            "data": spotify_service.get_queue(),
+            "data": playback_poller.read(QUEUE_URI),
         }
     except Exception as e:
         return {
@@ -1167,7 +1602,10 @@ def user_top_tracks() -> Dict[str, Any]:
             "name": "Minhas Músicas Mais Tocadas",
             "description": "Músicas mais reproduzidas pelo usuário",
             "mimeType": "application/json",
-            "data": spotify_service.get_top_tracks(20, "medium_term"),
+            **resource_cache.read(
+                "spotify://user/top-tracks",
+                lambda service: service.get_top_tracks(20, "medium_term"),
+            ),
         }
     except Exception as e:
         return {
@@ -1186,7 +1624,10 @@ def user_top_artists() -> Dict[str, Any]:
             "name": "Meus Artistas Mais Ouvidos",
             "description": "Artistas mais reproduzidos pelo usuário",
             "mimeType": "application/json",
-            "data": spotify_service.get_top_artists(20, "medium_term"),
+            **resource_cache.read(
+                "spotify://user/top-artists",
+                lambda service: service.get_top_artists(20, "medium_term"),
+            ),
         }
     except Exception as e:
         return {
@@ -1205,7 +1646,10 @@ def user_recently_played() -> Dict[str, Any]:
             "name": "Músicas Reproduzidas Recentemente",
             "description": "Histórico de reprodução recente do usuário",
             "mimeType": "application/json",
-            "data": spotify_service.get_recently_played(20),
+            **resource_cache.read(
+                "spotify://user/recently-played",
+                lambda service: service.get_recently_played(20),
+            ),
         }
     except Exception as e:
         return {
@@ -1224,7 +1668,10 @@ def user_saved_tracks() -> Dict[str, Any]:
             "name": "Minhas Músicas Salvas",
             "description": "Músicas salvas na biblioteca do usuário",
             "mimeType": "application/json",
-            "data": spotify_service.get_saved_tracks(20),
+            **resource_cache.read(
+                "spotify://user/saved-tracks",
+                lambda service: service.get_saved_tracks(20),
+            ),
         }
     except Exception as e:
         return {
@@ -1243,7 +1690,10 @@ def user_saved_albums() -> Dict[str, Any]:
             "name": "Meus Álbuns Salvos",
             "description": "Álbuns salvos na biblioteca do usuário",
             "mimeType": "application/json",
-            "data": spotify_service.get_saved_albums(20),
+            **resource_cache.read(
+                "spotify://user/saved-albums",
+                lambda service: service.get_saved_albums(20),
+            ),
         }
     except Exception as e:
         return {
@@ -1262,7 +1712,10 @@ def user_followed_artists() -> Dict[str, Any]:
             "name": "Artistas que eu Sigo",
             "description": "Artistas seguidos pelo usuário no Spotify",
             "mimeType": "application/json",
-            "data": spotify_service.get_followed_artists(20),
+            **resource_cache.read(
+                "spotify://user/followed-artists",
+                lambda service: service.get_followed_artists(20),
+            ),
         }
     except Exception as e:
         return {
@@ -1273,12 +1726,74 @@ def user_followed_artists() -> Dict[str, Any]:
         }
 
 
+@app.resource("spotify://server/metrics")
+def server_metrics() -> Dict[str, Any]:
+    """Recurso: Métricas do servidor"""
+    try:
+        return {
+            "name": "Métricas do Servidor",
+            "description": "Latência por tool e chamadas à Web API do Spotify",
+            "mimeType": "application/json",
+            "data": metrics.snapshot(),
+        }
+    except Exception as e:
+        return {
+            "name": "Métricas do Servidor",
+            "description": "Latência por tool e chamadas à Web API do Spotify",
+            "mimeType": "application/json",
+            "data": {"error": str(e)},
+        }
+
+
+@app.custom_route("/metrics", methods=["GET"])
+async def openmetrics(request: Request) -> PlainTextResponse:
+    """Endpoint Prometheus/OpenMetrics (disponível nos transportes HTTP e SSE)"""
+    return PlainTextResponse(
+        metrics.render_openmetrics(), media_type=OPENMETRICS_CONTENT_TYPE
+    )
+
+
+@app.custom_route("/callback", methods=["GET"])
+async def oauth_callback(request: Request) -> PlainTextResponse:
+    """Retorno do OAuth do Spotify: salva o token do usuário que pediu o link"""
+    user_id = user_clients.complete_authorization(request.query_params.get("state"))
+    code = request.query_params.get("code")
+    if not user_id or not code:
+        return PlainTextResponse("Autorização inválida ou expirada", status_code=400)
+    try:
+        result = await anyio.to_thread.run_sync(
+            spotify_service.for_user(user_id).complete_authorization, code
+        )
+    except ValueError as e:
+        return PlainTextResponse(str(e), status_code=400)
+    return PlainTextResponse(f"✅ {result['message']}. Você já pode fechar esta aba.")
+
+
 # Nota: FastMCP não suporta templates de recursos dinâmicos
 # Os recursos estáticos já estão definidos acima
 
 
+def run_server(transport: Optional[str] = None) -> None:
+    """Inicia o servidor no transporte escolhido (stdio, http ou sse).
+
+    Em http/sse um único processo atende várias sessões MCP em HOST:PORT,
+    compartilhando o cliente Spotify, o pool de conexões e os caches.
+    """
+    transport = transport or MCP_TRANSPORT
+    if transport == "stdio":
+        app.run()
+        return
+    if transport not in ("http", "streamable-http", "sse"):
+        raise ValueError(f"Transporte inválido: {transport} (use stdio, http ou sse)")
+
+    uvicorn_config = {"timeout_graceful_shutdown": 5}
+    if MCP_MAX_CONNECTIONS:
+        uvicorn_config["limit_concurrency"] = MCP_MAX_CONNECTIONS
+    app.run(transport=transport, host=HOST, port=PORT, uvicorn_config=uvicorn_config)
+
+
 if __name__ == "__main__":
     logger.info(f"🚀 Iniciando {MCP_SERVER_NAME} v{MCP_SERVER_VERSION}")
     logger.info("📡 Servidor MCP rodando com FastMCP")
 
-    app.run()
+    run_server()
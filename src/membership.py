@@ -0,0 +1,152 @@
+"""
+Índice reverso de playlists: em quais playlists (e posições) está cada música
+
+O índice é montado a partir do conteúdo das playlists do usuário e mantido
+por snapshot_id: numa nova sincronização só as playlists com snapshot
+diferente são lidas de novo, e só as músicas cujas posições mudaram são
+atualizadas no índice. A consulta por música é um acesso a dict (O(1)).
+"""
+
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def _positions(track_ids: Iterable[Optional[str]]) -> Dict[str, List[int]]:
+    positions: Dict[str, List[int]] = {}
+    for position, track_id in enumerate(track_ids):
+        if track_id:
+            positions.setdefault(track_id, []).append(position)
+    return positions
+
+
+class PlaylistMembershipIndex:
+    """Música -> {playlist: posições}, atualizado por playlist e snapshot_id"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.playlists: Dict[str, Dict[str, Any]] = {}
+        self.labels: Dict[str, str] = {}
+        self._index: Dict[str, Dict[str, List[int]]] = {}
+        self.synced_at: Optional[float] = None
+        # Muda a cada invalidação (uma sincronização em curso fica velha)
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def snapshot_of(self, playlist_id: str) -> Optional[str]:
+        playlist = self.playlists.get(playlist_id)
+        return playlist["snapshot_id"] if playlist else None
+
+    def invalidate(self) -> None:
+        """Força a próxima consulta a conferir os snapshots de novo"""
+        with self._lock:
+            self.generation += 1
+            self.synced_at = None
+
+    def mark_synced(self, generation: int) -> None:
+        """Marca o índice como conferido, salvo se foi invalidado no meio"""
+        with self._lock:
+            if generation == self.generation:
+                self.synced_at = time.monotonic()
+
+    def update(
+        self,
+        playlist_id: str,
+        name: str,
+        snapshot_id: Optional[str],
+        track_ids: List[Optional[str]],
+        labels: Optional[Dict[str, str]] = None,
+    ) -> int:
+        """Aplica o novo conteúdo de uma playlist; retorna músicas alteradas"""
+        with self._lock:
+            old = self.playlists.get(playlist_id)
+            old_positions = _positions(old["track_ids"]) if old else {}
+            new_positions = _positions(track_ids)
+            changed = 0
+            for track_id in old_positions.keys() - new_positions.keys():
+                self._drop(track_id, playlist_id)
+                changed += 1
+            for track_id, positions in new_positions.items():
+                if old_positions.get(track_id) != positions:
+                    self._index.setdefault(track_id, {})[playlist_id] = positions
+                    changed += 1
+            self.playlists[playlist_id] = {
+                "name": name,
+                "snapshot_id": snapshot_id,
+                "track_ids": list(track_ids),
+            }
+            self.labels.update(labels or {})
+            return changed
+
+    def remove(self, playlist_id: str) -> None:
+        """Tira do índice uma playlist apagada ou que deixou de ser seguida"""
+        with self._lock:
+            old = self.playlists.pop(playlist_id, None)
+            if old:
+                for track_id in _positions(old["track_ids"]):
+                    self._drop(track_id, playlist_id)
+
+    def _drop(self, track_id: str, playlist_id: str) -> None:
+        entry = self._index.get(track_id)
+        if entry is None:
+            return
+        entry.pop(playlist_id, None)
+        if not entry:
+            del self._index[track_id]
+            self.labels.pop(track_id, None)
+
+    def lookup(self, track_id: str) -> List[Dict[str, Any]]:
+        """Playlists e posições de uma música"""
+        with self._lock:
+            return [
+                {
+                    "id": playlist_id,
+                    "name": self.playlists[playlist_id]["name"],
+                    "positions": list(positions),
+                }
+                for playlist_id, positions in (self._index.get(track_id) or {}).items()
+            ]
+
+    def duplicates(self, playlist_id: Optional[str] = None) -> Dict[str, Any]:
+        """Músicas repetidas dentro de uma playlist e presentes em várias"""
+        within = []
+        across = []
+        with self._lock:
+            entries: Iterable[Tuple[str, Dict[str, List[int]]]] = (
+                self._index.items()
+                if playlist_id is None
+                else (
+                    (track_id, self._index[track_id])
+                    for track_id in _positions(
+                        self.playlists.get(playlist_id, {}).get("track_ids", [])
+                    )
+                )
+            )
+            for track_id, entry in entries:
+                name = self.labels.get(track_id)
+                for owner, positions in entry.items():
+                    if len(positions) > 1 and playlist_id in (None, owner):
+                        within.append(
+                            {
+                                "track_id": track_id,
+                                "name": name,
+                                "playlist_id": owner,
+                                "playlist": self.playlists[owner]["name"],
+                                "positions": list(positions),
+                            }
+                        )
+                if len(entry) > 1:
+                    across.append(
+                        {
+                            "track_id": track_id,
+                            "name": name,
+                            "playlists": [
+                                {"id": owner, "name": self.playlists[owner]["name"]}
+                                for owner in entry
+                            ],
+                        }
+                    )
+        across.sort(key=lambda item: -len(item["playlists"]))
+        return {"within": within, "across": across}
@@ -0,0 +1,578 @@
+"""
+Métricas do servidor: latência por tool e contabilidade de chamadas à Web API
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastmcp.server.middleware import Middleware
+
+# Limites superiores (em segundos) dos buckets do histograma de latência
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.075,
+    0.1,
+    0.25,
+    0.5,
+    0.75,
+    1.0,
+    2.5,
+    5.0,
+    7.5,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# Segmentos de caminho que são IDs (base62 do Spotify) viram "{id}"
+_ID_SEGMENT = re.compile(r"^[A-Za-z0-9]{22}$")
+_ID_PARENTS = {"users", "playlists", "tracks", "albums", "artists", "shows"}
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class Histogram:
+    """Histograma de latência com buckets fixos e quantis interpolados"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # último = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estima o quantil q (0-1) interpolando dentro do bucket"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.max
+            if cumulative + bucket_count >= rank and bucket_count:
+                fraction = (rank - cumulative) / bucket_count
+                return min(lower + (upper - lower) * fraction, self.max)
+            cumulative += bucket_count
+            lower = upper
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        """Resumo em milissegundos"""
+        return {
+            "p50": round(self.quantile(0.50) * 1000, 2),
+            "p95": round(self.quantile(0.95) * 1000, 2),
+            "p99": round(self.quantile(0.99) * 1000, 2),
+            "avg": round(self.sum / self.count * 1000, 2) if self.count else 0.0,
+            "max": round(self.max * 1000, 2),
+        }
+
+
+@dataclass
+class ToolCall:
+    """Contabilidade de uma única invocação de tool"""
+
+    tool: str
+    upstream_calls: int = 0
+    bytes_received: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    error: bool = False
+    # Tool que fez esta chamada (operações de execute_batch); também é contada
+    parent: Optional["ToolCall"] = None
+
+    def chain(self) -> Iterator["ToolCall"]:
+        call: Optional[ToolCall] = self
+        while call is not None:
+            yield call
+            call = call.parent
+
+
+@dataclass
+class ToolStats:
+    latency: Histogram = field(default_factory=Histogram)
+    calls: int = 0
+    errors: int = 0
+    upstream_calls: int = 0
+    bytes_received: int = 0
+    cache_hits: int = 0
+    retries: int = 0
+    max_upstream_calls: int = 0
+
+
+@dataclass
+class EndpointStats:
+    latency: Histogram = field(default_factory=Histogram)
+    calls: int = 0
+    bytes_received: int = 0
+    retries: int = 0
+    statuses: Counter = field(default_factory=Counter)
+
+
+_current_call: ContextVar[Optional[ToolCall]] = ContextVar(
+    "spotify_mcp_current_call", default=None
+)
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, Any]) -> str:
+    if not labels:
+        return ""
+    inner = ",".join(f'{key}="{_escape_label(value)}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def endpoint_label(method: str, url: str) -> str:
+    """Normaliza a URL da Web API para um rótulo estável (ex.: GET /tracks/{id})"""
+    path = url.split("?", 1)[0]
+    if "/v1/" in path:
+        path = path.split("/v1/", 1)[1]
+    else:
+        path = path.split("://", 1)[-1].split("/", 1)[-1]
+    segments = [s for s in path.split("/") if s]
+    for i, segment in enumerate(segments):
+        parent = segments[i - 1] if i else ""
+        if _ID_SEGMENT.match(segment) or (i == 1 and parent in _ID_PARENTS):
+            segments[i] = "{id}"
+    return f"{method.upper()} /{'/'.join(segments)}"
+
+
+class MetricsRegistry:
+    """Registro central de métricas (thread-safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.tools: Dict[str, ToolStats] = {}
+        self.upstream: Dict[str, EndpointStats] = {}
+        self.cache_hits: Counter = Counter()
+        self.cache_misses: Counter = Counter()
+        self.events: Counter = Counter()
+        self._gauges: Dict[Tuple[str, Tuple], Tuple[Callable[[], float], str]] = {}
+        self.in_flight = 0
+
+    # ------------------------------------------------------------------
+    # Registro
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def tool_call(self, tool: str) -> Iterator[ToolCall]:
+        """Contabiliza as chamadas à API feitas durante a execução de uma tool.
+
+        Defina ``call.error = True`` dentro do bloco para contar como erro;
+        exceções também contam.
+        """
+        call = ToolCall(tool, parent=_current_call.get())
+        token = _current_call.set(call)
+        start = time.perf_counter()
+        with self._lock:
+            self.in_flight += call.parent is None
+        try:
+            yield call
+        except BaseException:
+            call.error = True
+            raise
+        finally:
+            _current_call.reset(token)
+            self._record_tool_call(call, time.perf_counter() - start)
+
+    def _record_tool_call(self, call: ToolCall, elapsed: float) -> None:
+        with self._lock:
+            self.in_flight -= call.parent is None
+            stats = self.tools.setdefault(call.tool, ToolStats())
+            stats.latency.observe(elapsed)
+            stats.calls += 1
+            stats.errors += int(call.error)
+            stats.upstream_calls += call.upstream_calls
+            stats.bytes_received += call.bytes_received
+            stats.cache_hits += call.cache_hits
+            stats.retries += call.retries
+            stats.max_upstream_calls = max(
+                stats.max_upstream_calls, call.upstream_calls
+            )
+
+    def record_upstream(
+        self,
+        method: str,
+        url: str,
+        status: int,
+        elapsed: float,
+        bytes_received: int,
+        retries: int = 0,
+    ) -> None:
+        label = endpoint_label(method, url)
+        with self._lock:
+            stats = self.upstream.setdefault(label, EndpointStats())
+            stats.latency.observe(elapsed)
+            stats.calls += 1
+            stats.bytes_received += bytes_received
+            stats.retries += retries
+            stats.statuses[status] += 1
+
+        current = _current_call.get()
+        for call in current.chain() if current is not None else ():
+            call.upstream_calls += 1
+            call.bytes_received += bytes_received
+            call.retries += retries
+
+    def record_cache(self, cache: str, hit: bool, count: int = 1) -> None:
+        if count <= 0:
+            return
+        with self._lock:
+            if hit:
+                self.cache_hits[cache] += count
+            else:
+                self.cache_misses[cache] += count
+        current = _current_call.get()
+        if current is not None and hit:
+            for call in current.chain():
+                call.cache_hits += count
+
+    def record_event(self, name: str, count: int = 1) -> None:
+        with self._lock:
+            self.events[name] += count
+
+    def register_gauge(
+        self,
+        name: str,
+        callback: Callable[[], float],
+        labels: Optional[Dict[str, str]] = None,
+        help_text: str = "",
+    ) -> None:
+        """Registra um valor lido sob demanda (ex.: tamanho de um cache)"""
+        key = (name, tuple(sorted((labels or {}).items())))
+        self._gauges[key] = (callback, help_text)
+
+    def _gauge_values(self) -> List[Tuple[str, Tuple, float, str]]:
+        values = []
+        for (name, labels), (callback, help_text) in list(self._gauges.items()):
+            try:
+                values.append((name, labels, float(callback()), help_text))
+            except Exception:
+                continue
+        return values
+
+    def gauges(self) -> Dict[str, float]:
+        return {
+            name + _format_labels(dict(labels)): value
+            for name, labels, value, _ in self._gauge_values()
+        }
+
+    # ------------------------------------------------------------------
+    # Consulta
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumo das métricas, com as tools que mais chamam a API primeiro"""
+        with self._lock:
+            tools = {
+                name: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "latency_ms": stats.latency.snapshot(),
+                    "upstream_calls": stats.upstream_calls,
+                    "upstream_calls_per_call": round(
+                        stats.upstream_calls / stats.calls, 2
+                    ),
+                    "max_upstream_calls": stats.max_upstream_calls,
+                    "bytes_received": stats.bytes_received,
+                    "cache_hits": stats.cache_hits,
+                    "retries": stats.retries,
+                }
+                for name, stats in sorted(
+                    self.tools.items(),
+                    key=lambda item: item[1].upstream_calls,
+                    reverse=True,
+                )
+            }
+            upstream = {
+                label: {
+                    "calls": stats.calls,
+                    "latency_ms": stats.latency.snapshot(),
+                    "bytes_received": stats.bytes_received,
+                    "retries": stats.retries,
+                    "status_codes": {
+                        str(code): count for code, count in stats.statuses.items()
+                    },
+                }
+                for label, stats in sorted(
+                    self.upstream.items(),
+                    key=lambda item: item[1].calls,
+                    reverse=True,
+                )
+            }
+            caches = {
+                name: {
+                    "hits": self.cache_hits.get(name, 0),
+                    "misses": self.cache_misses.get(name, 0),
+                }
+                for name in sorted(set(self.cache_hits) | set(self.cache_misses))
+            }
+            events = dict(self.events)
+
+        return {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "tools": tools,
+            "upstream": upstream,
+            "caches": caches,
+            "events": events,
+            "in_flight": self.in_flight,
+            "gauges": self.gauges(),
+        }
+
+    def render_openmetrics(self) -> str:
+        """Exporta as métricas no formato texto OpenMetrics (Prometheus)"""
+        lines: List[str] = []
+
+        def family(name: str, kind: str, help_text: str) -> None:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {help_text}")
+
+        def sample(name: str, labels: Dict[str, Any], value: float) -> None:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        def histogram(name: str, labels: Dict[str, Any], hist: Histogram) -> None:
+            cumulative = 0
+            for bound, count in zip(hist.buckets, hist.counts):
+                cumulative += count
+                sample(
+                    f"{name}_bucket", {**labels, "le": _format_value(bound)}, cumulative
+                )
+            sample(f"{name}_bucket", {**labels, "le": "+Inf"}, hist.count)
+            sample(f"{name}_count", labels, hist.count)
+            sample(f"{name}_sum", labels, hist.sum)
+
+        with self._lock:
+            tools = list(self.tools.items())
+            upstream = list(self.upstream.items())
+
+            family("spotify_mcp_tool_calls", "counter", "Chamadas de tool")
+            for tool, stats in tools:
+                sample("spotify_mcp_tool_calls_total", {"tool": tool}, stats.calls)
+            family("spotify_mcp_tool_errors", "counter", "Chamadas de tool com erro")
+            for tool, stats in tools:
+                sample("spotify_mcp_tool_errors_total", {"tool": tool}, stats.errors)
+            family(
+                "spotify_mcp_tool_upstream_calls",
+                "counter",
+                "Requisições à Web API feitas pelas tools",
+            )
+            for tool, stats in tools:
+                sample(
+                    "spotify_mcp_tool_upstream_calls_total",
+                    {"tool": tool},
+                    stats.upstream_calls,
+                )
+            family(
+                "spotify_mcp_tool_duration_seconds",
+                "histogram",
+                "Latência das tools",
+            )
+            for tool, stats in tools:
+                histogram(
+                    "spotify_mcp_tool_duration_seconds", {"tool": tool}, stats.latency
+                )
+            family(
+                "spotify_mcp_tool_calls_in_flight",
+                "gauge",
+                "Tools em execução no momento",
+            )
+            sample("spotify_mcp_tool_calls_in_flight", {}, self.in_flight)
+
+            family(
+                "spotify_mcp_upstream_requests",
+                "counter",
+                "Requisições à Web API por endpoint e status",
+            )
+            for endpoint, stats in upstream:
+                for status, count in sorted(stats.statuses.items()):
+                    sample(
+                        "spotify_mcp_upstream_requests_total",
+                        {"endpoint": endpoint, "status": status},
+                        count,
+                    )
+            family(
+                "spotify_mcp_upstream_duration_seconds",
+                "histogram",
+                "Latência da Web API por endpoint",
+            )
+            for endpoint, stats in upstream:
+                histogram(
+                    "spotify_mcp_upstream_duration_seconds",
+                    {"endpoint": endpoint},
+                    stats.latency,
+                )
+            family(
+                "spotify_mcp_upstream_received_bytes",
+                "counter",
+                "Bytes recebidos da Web API",
+            )
+            for endpoint, stats in upstream:
+                sample(
+                    "spotify_mcp_upstream_received_bytes_total",
+                    {"endpoint": endpoint},
+                    stats.bytes_received,
+                )
+            family(
+                "spotify_mcp_upstream_retries",
+                "counter",
+                "Retentativas feitas pelo cliente HTTP",
+            )
+            for endpoint, stats in upstream:
+                sample(
+                    "spotify_mcp_upstream_retries_total",
+                    {"endpoint": endpoint},
+                    stats.retries,
+                )
+
+            family(
+                "spotify_mcp_rate_limited",
+                "counter",
+                "Respostas 429 (Too Many Requests) da Web API",
+            )
+            sample(
+                "spotify_mcp_rate_limited_total", {}, self.events.get("rate_limited", 0)
+            )
+            family("spotify_mcp_token_refresh", "counter", "Renovações de token OAuth")
+            sample(
+                "spotify_mcp_token_refresh_total",
+                {"result": "success"},
+                self.events.get("token_refresh", 0),
+            )
+            sample(
+                "spotify_mcp_token_refresh_total",
+                {"result": "failure"},
+                self.events.get("token_refresh_failed", 0),
+            )
+            family("spotify_mcp_cache_requests", "counter", "Consultas aos caches")
+            for cache in sorted(set(self.cache_hits) | set(self.cache_misses)):
+                sample(
+                    "spotify_mcp_cache_requests_total",
+                    {"cache": cache, "result": "hit"},
+                    self.cache_hits.get(cache, 0),
+                )
+                sample(
+                    "spotify_mcp_cache_requests_total",
+                    {"cache": cache, "result": "miss"},
+                    self.cache_misses.get(cache, 0),
+                )
+            started_at = self.started_at
+
+        family(
+            "spotify_mcp_start_time_seconds", "gauge", "Início da coleta de métricas"
+        )
+        sample("spotify_mcp_start_time_seconds", {}, started_at)
+
+        gauges: Dict[str, List[Tuple[Tuple, float]]] = {}
+        gauge_help: Dict[str, str] = {}
+        for name, labels, value, help_text in self._gauge_values():
+            gauges.setdefault(name, []).append((labels, value))
+            gauge_help.setdefault(name, help_text or name)
+        for name, samples in sorted(gauges.items()):
+            family(name, "gauge", gauge_help[name])
+            for labels, value in samples:
+                sample(name, dict(labels), value)
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self.started_at = time.time()
+            self.tools.clear()
+            self.upstream.clear()
+            self.cache_hits.clear()
+            self.cache_misses.clear()
+            self.events.clear()
+
+
+def instrument_client(client, registry: "MetricsRegistry") -> None:
+    """Registra cada resposta HTTP do cliente Spotipy no registro de métricas"""
+    session = getattr(client, "_session", None)
+    hooks = getattr(session, "hooks", None)
+    if hooks is None:
+        return
+
+    def on_response(response, *args, **kwargs):
+        retry_state = getattr(response.raw, "retries", None)
+        history = getattr(retry_state, "history", None) or ()
+        rate_limited = sum(1 for attempt in history if attempt.status == 429)
+        rate_limited += int(response.status_code == 429)
+        if rate_limited:
+            registry.record_event("rate_limited", rate_limited)
+        registry.record_upstream(
+            response.request.method,
+            response.url,
+            response.status_code,
+            response.elapsed.total_seconds(),
+            len(response.content or b""),
+            retries=len(history),
+        )
+
+    hooks["response"].append(on_response)
+
+
+def instrument_auth_manager(auth_manager, registry: "MetricsRegistry") -> None:
+    """Conta renovações de token (bem-sucedidas e falhas) do SpotifyOAuth"""
+    refresh = auth_manager.refresh_access_token
+
+    def counted_refresh(refresh_token):
+        try:
+            token_info = refresh(refresh_token)
+        except Exception:
+            registry.record_event("token_refresh_failed")
+            raise
+        registry.record_event("token_refresh")
+        return token_info
+
+    auth_manager.refresh_access_token = counted_refresh
+
+
+class MetricsMiddleware(Middleware):
+    """Mede latência e chamadas à API de cada tool executada pelo FastMCP"""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+
+    async def on_call_tool(self, context, call_next):
+        with self.registry.tool_call(context.message.name) as call:
+            result = await call_next(context)
+            # As tools devolvem {"error": ...} em vez de levantar exceções
+            structured = getattr(result, "structured_content", None)
+            call.error = isinstance(structured, dict) and "error" in structured
+            return result
+
+
+# Registro global usado pelo service e pelo servidor MCP
+metrics = MetricsRegistry()
@@ -0,0 +1,307 @@
+"""
+Estado de playback mantido em segundo plano
+
+Um único poller consulta o player do Spotify apenas para os usuários com
+assinaturas (resources/subscribe) em spotify://playback/current ou
+spotify://playback/queue. O resultado fica em um snapshot em memória, usado
+nas leituras desses recursos, e cada mudança gera uma notificação
+resources/updated para os inscritos, em vez de cada cliente consultar o
+player por conta própria.
+
+O intervalo se adapta ao player: perto do fim da faixa a próxima consulta
+acontece logo após a troca de música, com o player pausado as consultas
+ficam espaçadas, e sem inscritos o poller fica parado.
+"""
+
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+import anyio
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from pydantic import AnyUrl
+
+try:
+    from .batch import called_tools
+    from .metrics import MetricsRegistry
+    from .scheduler import CONTROL, tool_priority
+    from .users import DEFAULT_USER, current_user
+except ImportError:
+    from batch import called_tools
+    from metrics import MetricsRegistry
+    from scheduler import CONTROL, tool_priority
+    from users import DEFAULT_USER, current_user
+
+logger = logging.getLogger(__name__)
+
+CURRENT_URI = "spotify://playback/current"
+QUEUE_URI = "spotify://playback/queue"
+
+# Após um comando de playback o Spotify leva um instante para refletir a mudança
+_AFTER_COMMAND_DELAY = 0.5
+
+
+class _Snapshot:
+    def __init__(self):
+        self.data: Dict[str, Any] = {}
+        self.fetched_at: Dict[str, float] = {}
+        self.next_poll = 0.0
+
+
+class PlaybackPoller(Middleware):
+    """Poller adaptativo do player com snapshot e notificações por usuário.
+
+    `sources` mapeia cada URI de recurso para a função que busca o dado de um
+    usuário (executada em thread). Registre a instância como middleware (os
+    comandos de playback antecipam a próxima consulta), use `lifespan` no
+    FastMCP e chame `install(app)` para habilitar resources/subscribe.
+    """
+
+    def __init__(
+        self,
+        sources: Dict[str, Callable[[str], Any]],
+        registry: Optional[MetricsRegistry] = None,
+        playing_interval: float = 5.0,
+        paused_interval: float = 15.0,
+        min_interval: float = 1.0,
+        seek_tolerance_ms: int = 3000,
+        resolve_user: Callable[[], str] = current_user.get,
+    ):
+        self.sources = sources
+        self.registry = registry
+        self.playing_interval = playing_interval
+        self.paused_interval = paused_interval
+        self.min_interval = min_interval
+        self.seek_tolerance_ms = seek_tolerance_ms
+        self.resolve_user = resolve_user
+        self._subscribers: Dict[Tuple[str, str], Set[Any]] = {}
+        self._snapshots: Dict[str, _Snapshot] = {}
+        self._lock = threading.RLock()
+        self._wake: Optional[anyio.Event] = None
+        self.running = False
+        if registry is not None:
+            registry.register_gauge(
+                "spotify_mcp_playback_subscriptions",
+                lambda: sum(len(s) for s in self._subscribers.values()),
+                help_text="Assinaturas ativas nos recursos de playback",
+            )
+
+    # Assinaturas
+
+    def subscribed_uris(self, user_id: str) -> List[str]:
+        with self._lock:
+            return [uri for user, uri in self._subscribers if user == user_id]
+
+    def subscribed_users(self) -> Set[str]:
+        with self._lock:
+            return {user for user, _ in self._subscribers}
+
+    def subscribe(self, uri: str, session: Any, user_id: str) -> bool:
+        if uri not in self.sources:
+            return False
+        with self._lock:
+            self._subscribers.setdefault((user_id, uri), set()).add(session)
+        self._schedule(user_id, 0.0)
+        return True
+
+    def unsubscribe(self, uri: str, session: Any, user_id: str) -> None:
+        with self._lock:
+            sessions = self._subscribers.get((user_id, uri))
+            if sessions is not None:
+                sessions.discard(session)
+                if not sessions:
+                    del self._subscribers[(user_id, uri)]
+            if user_id not in self.subscribed_users():
+                self._snapshots.pop(user_id, None)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _schedule(self, user_id: str, delay: float) -> None:
+        with self._lock:
+            snapshot = self._snapshots.setdefault(user_id, _Snapshot())
+            snapshot.next_poll = min(snapshot.next_poll, time.monotonic() + delay)
+        if self._wake is not None:
+            self._wake.set()
+
+    # Snapshot
+
+    def next_interval(self, current: Any) -> float:
+        """Próxima consulta: logo após o fim da faixa, ou espaçada se pausado"""
+        track = current.get("track") if isinstance(current, dict) else None
+        if not track or not current.get("is_playing"):
+            return self.paused_interval
+        remaining = (track["duration_ms"] - track["progress_ms"]) / 1000
+        return max(self.min_interval, min(self.playing_interval, remaining + 0.5))
+
+    def _changed(self, uri: str, old: Any, new: Any, elapsed: float) -> bool:
+        if uri != CURRENT_URI or not isinstance(old, dict) or not isinstance(new, dict):
+            return old != new
+        old_track, new_track = old.get("track"), new.get("track")
+        if not old_track or not new_track:
+            return old != new
+        same = {**old_track, "progress_ms": None} == {**new_track, "progress_ms": None}
+        if not same or old.get("is_playing") != new.get("is_playing"):
+            return True
+        # O progresso avança sozinho; só um salto (seek) conta como mudança
+        expected = old_track["progress_ms"] + (
+            elapsed * 1000 if old["is_playing"] else 0
+        )
+        return abs(new_track["progress_ms"] - expected) > self.seek_tolerance_ms
+
+    def refresh(
+        self, user_id: str, uris: List[str]
+    ) -> Tuple[List[str], Dict[str, Any]]:
+        """Busca os recursos do usuário: URIs que mudaram e dados buscados"""
+        fetched = {uri: self.sources[uri](user_id) for uri in uris}
+        now = time.monotonic()
+        if self.registry is not None:
+            self.registry.record_event("playback_poll")
+        with self._lock:
+            snapshot = self._snapshots.setdefault(user_id, _Snapshot())
+            changed = [
+                uri
+                for uri, value in fetched.items()
+                if uri in snapshot.data
+                and self._changed(
+                    uri,
+                    snapshot.data[uri],
+                    value,
+                    now - snapshot.fetched_at[uri],
+                )
+            ]
+            for uri, value in fetched.items():
+                snapshot.data[uri] = value
+                snapshot.fetched_at[uri] = now
+            if CURRENT_URI in fetched:
+                snapshot.next_poll = now + self.next_interval(fetched[CURRENT_URI])
+        return changed, fetched
+
+    def read(self, uri: str, user_id: Optional[str] = None) -> Any:
+        """Dado do recurso: do snapshot se ainda válido, senão da Web API"""
+        user_id = user_id or self.resolve_user() or DEFAULT_USER
+        now = time.monotonic()
+        with self._lock:
+            snapshot = self._snapshots.get(user_id)
+            if snapshot is not None and uri in snapshot.data:
+                # Sem assinatura ninguém atualiza o dado: vale só por pouco tempo
+                polled = uri == CURRENT_URI or uri in self.subscribed_uris(user_id)
+                polled = polled and user_id in self.subscribed_users()
+                valid_until = (
+                    snapshot.next_poll
+                    if polled
+                    else snapshot.fetched_at[uri] + self.min_interval
+                )
+                if now < valid_until:
+                    if self.registry is not None:
+                        self.registry.record_cache("playback", hit=True)
+                    return snapshot.data[uri]
+        if self.registry is not None:
+            self.registry.record_cache("playback", hit=False)
+        # O snapshot pode sumir (unsubscribe) logo depois da busca
+        _, fetched = self.refresh(user_id, [uri])
+        return fetched[uri]
+
+    # Loop de consulta
+
+    async def _notify(self, user_id: str, uris: List[str]) -> None:
+        for uri in uris:
+            with self._lock:
+                sessions = list(self._subscribers.get((user_id, uri), ()))
+            for session in sessions:
+                try:
+                    await session.send_resource_updated(AnyUrl(uri))
+                except Exception as e:
+                    logger.debug(f"Sessão descartada ao notificar {uri}: {e}")
+                    self.unsubscribe(uri, session, user_id)
+
+    async def _poll_due(self) -> Optional[float]:
+        """Consulta os usuários vencidos; retorna a espera até a próxima rodada"""
+        users = self.subscribed_users()
+        if not users:
+            return None
+        for user_id in users:
+            with self._lock:
+                snapshot = self._snapshots.setdefault(user_id, _Snapshot())
+                due = snapshot.next_poll <= time.monotonic()
+            if not due:
+                continue
+            # O estado atual sempre é buscado: ele define o próximo intervalo
+            uris = [CURRENT_URI] + [
+                uri for uri in self.subscribed_uris(user_id) if uri != CURRENT_URI
+            ]
+            try:
+                changed, _ = await anyio.to_thread.run_sync(self.refresh, user_id, uris)
+            except Exception as e:
+                logger.warning(f"Falha ao consultar o playback de {user_id}: {e}")
+                with self._lock:
+                    snapshot.next_poll = time.monotonic() + self.paused_interval
+                continue
+            await self._notify(user_id, changed)
+        with self._lock:
+            next_poll = min(
+                self._snapshots[user].next_poll
+                for user in users
+                if user in self._snapshots
+            )
+        return max(0.0, next_poll - time.monotonic())
+
+    async def run(self) -> None:
+        while True:
+            self._wake = anyio.Event()
+            delay = await self._poll_due()
+            self.running = delay is not None
+            if delay is None:
+                await self._wake.wait()
+            else:
+                with anyio.move_on_after(delay):
+                    await self._wake.wait()
+
+    @asynccontextmanager
+    async def lifespan(self, app) -> AsyncIterator[dict]:
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(self.run)
+            try:
+                yield {}
+            finally:
+                tg.cancel_scope.cancel()
+                self._wake = None
+                self.running = False
+
+    def install(self, app) -> None:
+        """Registra resources/subscribe e unsubscribe no servidor MCP"""
+        server = app._mcp_server
+
+        @server.subscribe_resource()
+        async def on_subscribe(uri: AnyUrl) -> None:
+            session = server.request_context.session
+            self.subscribe(str(uri), session, self.resolve_user())
+
+        @server.unsubscribe_resource()
+        async def on_unsubscribe(uri: AnyUrl) -> None:
+            session = server.request_context.session
+            self.unsubscribe(str(uri), session, self.resolve_user())
+
+        # O servidor de baixo nível anuncia subscribe=False mesmo com handler
+        get_capabilities = server.get_capabilities
+
+        def capabilities(*args, **kwargs):
+            caps = get_capabilities(*args, **kwargs)
+            if caps.resources is not None:
+                caps.resources.subscribe = True
+            return caps
+
+        server.get_capabilities = capabilities
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        result = await call_next(context)
+        # Comandos de playback (também dentro de um lote) antecipam a consulta
+        # de quem acompanha o player
+        user_id = self.resolve_user()
+        tools = called_tools(context.message.name, result)
+        if any(tool_priority(tool) == CONTROL for tool in tools) and (
+            user_id in self.subscribed_users()
+        ):
+            self._schedule(user_id, _AFTER_COMMAND_DELAY)
+        return result
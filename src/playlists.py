@@ -0,0 +1,222 @@
+"""
+Escrita em lote em playlists (criar, incluir, reordenar, remover)
+
+A Web API aceita até 100 itens por requisição de inclusão ou remoção. O
+PlaylistWriter divide listas longas em lotes de 100 e envia os lotes em
+sequência, então a ordem final é a ordem da lista (também com `position`).
+O snapshot_id devolvido por cada escrita é encadeado para a próxima.
+
+Um lote que falha é repetido sozinho. Antes de repetir, o snapshot atual da
+playlist é consultado: se mudou, a escrita chegou ao Spotify (só a resposta
+se perdeu) e o lote não é reenviado. Se um lote de inclusão esgota as
+tentativas, os seguintes não são enviados (a ordem ficaria errada) e o
+resultado indica de onde retomar.
+"""
+
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import spotipy
+
+# Itens por requisição nos endpoints de escrita de playlists
+PLAYLIST_WRITE_CHUNK = 100
+
+
+def _retryable(error: Exception) -> bool:
+    """Falhas transitórias (rede, 429, 5xx); erros do pedido não se repetem"""
+    if isinstance(error, spotipy.SpotifyException):
+        return error.http_status == 429 or error.http_status >= 500
+    return True
+
+
+class PlaylistWriter:
+    """Envia escritas de playlist em lotes ordenados com repetição por lote"""
+
+    def __init__(
+        self,
+        client: spotipy.Spotify,
+        retries: int = 2,
+        backoff: float = 0.5,
+        chunk_size: int = PLAYLIST_WRITE_CHUNK,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.sleep = sleep
+
+    def snapshot(self, playlist_id: str) -> str:
+        return self.client.playlist(playlist_id, fields="snapshot_id")["snapshot_id"]
+
+    def _commit(
+        self,
+        playlist_id: str,
+        snapshot: Optional[str],
+        write: Callable[[Optional[str]], Dict[str, Any]],
+        idempotent: bool = False,
+    ) -> Tuple[str, int]:
+        """Executa uma escrita; retorna o novo snapshot e quantas repetições"""
+        attempt = 0
+        while True:
+            try:
+                return write(snapshot)["snapshot_id"], attempt
+            except Exception as e:
+                if attempt >= self.retries or not _retryable(e):
+                    raise
+                # Sem o snapshot anterior não há como saber se a escrita
+                # chegou, e repetir poderia duplicar ou mover itens de novo
+                if snapshot is None and not idempotent:
+                    raise
+                attempt += 1
+                self.sleep(self.backoff * 2 ** (attempt - 1))
+                if not idempotent:
+                    current = self.snapshot(playlist_id)
+                    if current != snapshot:
+                        return current, attempt
+
+    def _chunks(self, uris: List[str]) -> List[Tuple[int, List[str]]]:
+        return [
+            (start, uris[start : start + self.chunk_size])
+            for start in range(0, len(uris), self.chunk_size)
+        ]
+
+    def _write_in_order(
+        self,
+        playlist_id: str,
+        chunks: List[Tuple[int, List[str]]],
+        snapshot: Optional[str],
+        write_chunk: Callable[[int, List[str]], Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        result = {
+            "playlist_id": playlist_id,
+            "snapshot_id": snapshot,
+            "requested": sum(len(chunk) for _, chunk in chunks),
+            "added": 0,
+            "chunks": 0,
+            "retried_chunks": [],
+            "failed_chunk": None,
+            "resume_from": None,
+        }
+        for start, chunk in chunks:
+            try:
+                snapshot, retried = self._commit(
+                    playlist_id, snapshot, lambda _: write_chunk(start, chunk)
+                )
+            except Exception as e:
+                result["failed_chunk"] = {
+                    "start": start,
+                    "count": len(chunk),
+                    "error": str(e),
+                }
+                result["resume_from"] = start
+                break
+            result["chunks"] += 1
+            result["added"] += len(chunk)
+            result["snapshot_id"] = snapshot
+            if retried:
+                result["retried_chunks"].append(start)
+        return result
+
+    def add(
+        self,
+        playlist_id: str,
+        uris: List[str],
+        position: Optional[int] = None,
+        snapshot: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Inclui as URIs na ordem (no fim ou a partir de `position`)"""
+        if snapshot is None and uris:
+            snapshot = self.snapshot(playlist_id)
+        return self._write_in_order(
+            playlist_id,
+            self._chunks(uris),
+            snapshot,
+            lambda start, chunk: self.client.playlist_add_items(
+                playlist_id,
+                chunk,
+                position=None if position is None else position + start,
+            ),
+        )
+
+    def replace(
+        self, playlist_id: str, uris: List[str], snapshot: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Substitui o conteúdo da playlist pelas URIs, na ordem"""
+        if snapshot is None:
+            snapshot = self.snapshot(playlist_id)
+
+        def write_chunk(start: int, chunk: List[str]) -> Dict[str, Any]:
+            if start == 0:
+                return self.client.playlist_replace_items(playlist_id, chunk)
+            return self.client.playlist_add_items(playlist_id, chunk)
+
+        # Uma lista vazia ainda precisa de uma requisição (esvazia a playlist)
+        chunks = self._chunks(uris) or [(0, [])]
+        return self._write_in_order(playlist_id, chunks, snapshot, write_chunk)
+
+    def remove(
+        self, playlist_id: str, uris: List[str], snapshot: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Remove todas as ocorrências das URIs (lotes independentes)"""
+        unique = list(dict.fromkeys(uris))
+        result = {
+            "playlist_id": playlist_id,
+            "snapshot_id": snapshot,
+            "requested": len(unique),
+            "removed": 0,
+            "chunks": 0,
+            "retried_chunks": [],
+            "failed_uris": [],
+            "errors": [],
+        }
+        for start, chunk in self._chunks(unique):
+            try:
+                snapshot, retried = self._commit(
+                    playlist_id,
+                    snapshot,
+                    lambda current: self.client.playlist_remove_all_occurrences_of_items(
+                        playlist_id, chunk, snapshot_id=current
+                    ),
+                    idempotent=True,
+                )
+            except Exception as e:
+                # A ordem não importa na remoção: os outros lotes continuam
+                result["failed_uris"].extend(chunk)
+                result["errors"].append({"start": start, "error": str(e)})
+                continue
+            result["chunks"] += 1
+            result["removed"] += len(chunk)
+            result["snapshot_id"] = snapshot
+            if retried:
+                result["retried_chunks"].append(start)
+        return result
+
+    def reorder(
+        self,
+        playlist_id: str,
+        range_start: int,
+        insert_before: int,
+        range_length: int = 1,
+        snapshot: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Move um bloco de itens (uma requisição, qualquer tamanho)"""
+        if snapshot is None:
+            snapshot = self.snapshot(playlist_id)
+        snapshot, retried = self._commit(
+            playlist_id,
+            snapshot,
+            lambda current: self.client.playlist_reorder_items(
+                playlist_id,
+                range_start=range_start,
+                insert_before=insert_before,
+                range_length=range_length,
+                snapshot_id=current,
+            ),
+        )
+        return {
+            "playlist_id": playlist_id,
+            "snapshot_id": snapshot,
+            "moved": range_length,
+            "retried": bool(retried),
+        }
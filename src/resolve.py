@@ -0,0 +1,139 @@
+"""
+Resolução de listas de músicas em texto ("artista - título") para URIs
+
+Cada linha passa por três fontes, da mais barata para a mais cara:
+
+1. o índice local da biblioteca (músicas já ouvidas, dos agregados de escuta);
+2. o cache de resoluções (compartilhado entre usuários do mesmo mercado, já
+   que a busca devolve faixas diferentes conforme o país da conta);
+3. a busca da Web API, com várias linhas buscadas ao mesmo tempo.
+
+Os candidatos são pontuados por semelhança de título e artista depois de
+normalizar acentos, maiúsculas, pontuação e sufixos como "(Remastered)" ou
+"feat. X". A confiança vai de 0 a 1; quando a linha traz o artista, um
+candidato de artista diferente (cover, música homônima) não é aceito.
+"""
+
+import re
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Separadores aceitos entre artista e título
+_SEPARATOR = re.compile(r"\s+[-–—]\s+")
+# Trechos que não mudam a música: "(Remastered 2011)", "[Live]", "feat. X"
+_NOISE = re.compile(
+    r"[\(\[][^\)\]]*[\)\]]|\s-\s.*(remaster|version|live|edit|mix).*$"
+    r"|\b(feat|ft|featuring)\.?\s.*$"
+)
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+# Peso do título na confiança quando o artista é conhecido
+TITLE_WEIGHT = 0.6
+# Semelhança mínima do artista informado: abaixo dela o candidato é outra
+# música com o mesmo título (cover, homônima), por mais igual que seja o título
+MIN_ARTIST_SIMILARITY = 0.6
+
+
+def parse_line(line: str) -> Tuple[Optional[str], str]:
+    """Separa "artista - título"; sem separador, a linha toda é o título"""
+    parts = _SEPARATOR.split(line.strip(), maxsplit=1)
+    if len(parts) == 2 and parts[0] and parts[1]:
+        return parts[0], parts[1]
+    return None, line.strip()
+
+
+def normalize(text: Optional[str]) -> str:
+    """Texto sem acentos, sufixos de versão, pontuação e espaços extras"""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _NOISE.sub(" ", text)
+    text = _PUNCTUATION.sub(" ", text)
+    return " ".join(text.split())
+
+
+def similarity(a: str, b: str) -> float:
+    """Semelhança entre dois textos já normalizados (0 a 1)"""
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    ratio = SequenceMatcher(None, a, b).ratio()
+    # "the beatles" x "beatles", "hey jude" x "hey jude 2009 mix"
+    if a in b.split() or b in a.split() or f" {a} " in f" {b} ":
+        ratio = max(ratio, 0.9)
+    tokens_a, tokens_b = set(a.split()), set(b.split())
+    overlap = len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+    return round(max(ratio, overlap), 4)
+
+
+def score(
+    artist: str, title: str, candidate_title: str, candidate_artists: Iterable[str]
+) -> float:
+    """Confiança de um candidato (artista e título já normalizados)
+
+    Com o artista informado, candidatos de outro artista valem 0.
+    """
+    title_score = similarity(title, normalize(candidate_title))
+    if not artist:
+        return title_score
+    artist_score = max(
+        (similarity(artist, normalize(name)) for name in candidate_artists),
+        default=0.0,
+    )
+    if artist_score < MIN_ARTIST_SIMILARITY:
+        return 0.0
+    return round(TITLE_WEIGHT * title_score + (1 - TITLE_WEIGHT) * artist_score, 4)
+
+
+def best_match(
+    artist: str, title: str, candidates: Iterable[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """Melhor candidato ({uri, name, artists}) com a confiança calculada"""
+    best = None
+    for candidate in candidates:
+        confidence = score(artist, title, candidate["name"], candidate["artists"])
+        if confidence and (best is None or confidence > best["confidence"]):
+            best = {
+                "uri": candidate["uri"],
+                "name": candidate["name"],
+                "artist": ", ".join(candidate["artists"]),
+                "confidence": confidence,
+            }
+    return best
+
+
+def search_queries(artist: Optional[str], title: str) -> List[str]:
+    """Consultas da busca remota, da mais específica para a mais ampla"""
+    if not artist:
+        return [f'track:"{title}"', title]
+    return [f'track:"{title}" artist:"{artist}"', f"{artist} {title}"]
+
+
+class LibraryIndex:
+    """Músicas conhecidas do usuário indexadas pelo título normalizado.
+
+    Construído a partir de rótulos "nome - artista" por URI (o formato de
+    ListeningAggregates.track_labels).
+    """
+
+    def __init__(self, labels: Dict[str, str]):
+        self.size = len(labels)
+        self._by_title: Dict[str, List[Dict[str, Any]]] = {}
+        for uri, label in labels.items():
+            if not uri.startswith("spotify:track:"):
+                continue
+            name, _, artist = label.rpartition(" - ")
+            if not name:
+                continue
+            entry = {"uri": uri, "name": name, "artists": [artist]}
+            self._by_title.setdefault(normalize(name), []).append(entry)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._by_title.values())
+
+    def lookup(self, artist: str, title: str) -> Optional[Dict[str, Any]]:
+        """Candidato com o mesmo título normalizado (artista pontuado)"""
+        return best_match(artist, title, self._by_title.get(title, ()))
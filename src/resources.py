@@ -0,0 +1,180 @@
+"""
+Cache dos recursos spotify:// (perfil, playlists, top-N, biblioteca...)
+
+Cada recurso tem uma validade própria. Depois dela o valor ainda é servido
+por uma janela de tolerância enquanto uma thread de fundo busca a versão
+nova (stale-while-revalidate); só sem nenhum valor utilizável a leitura
+espera a Web API. Toda resposta leva `etag` (hash do conteúdo), `fetched_at`
+e `stale`, para o cliente saber se o contexto mudou sem comparar os dados.
+
+Os recursos de playback ficam de fora: eles vêm do snapshot do
+PlaybackPoller.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+try:
+    from .batch import called_tools
+    from .cache import TTLCache
+    from .metrics import MetricsRegistry
+    from .scheduler import BULK, priority
+    from .users import current_user
+except ImportError:
+    from batch import called_tools
+    from cache import TTLCache
+    from metrics import MetricsRegistry
+    from scheduler import BULK, priority
+    from users import current_user
+
+logger = logging.getLogger(__name__)
+
+# Validade e tolerância (segundos) de cada recurso
+RESOURCE_TTLS: Dict[str, Tuple[float, float]] = {
+    "spotify://user/profile": (3600, 86400),
+    "spotify://genres/available": (86400, 7 * 86400),
+    "spotify://user/top-tracks": (3600, 86400),
+    "spotify://user/top-artists": (3600, 86400),
+    "spotify://playlists/user": (300, 3600),
+    "spotify://user/saved-tracks": (300, 3600),
+    "spotify://user/saved-albums": (300, 3600),
+    "spotify://user/followed-artists": (600, 3600),
+    "spotify://user/recently-played": (60, 600),
+    "spotify://devices/available": (10, 60),
+}
+
+# Tools que alteram o conteúdo de um recurso (a próxima leitura busca de novo)
+INVALIDATED_BY: Dict[str, Tuple[str, ...]] = {
+    "add_track_to_favorites": ("spotify://user/saved-tracks",),
+    "remove_track_from_favorites": ("spotify://user/saved-tracks",),
+    "search_and_add_to_favorites": ("spotify://user/saved-tracks",),
+    "add_track_to_favorites_by_uri": ("spotify://user/saved-tracks",),
+    "remove_track_from_favorites_by_uri": ("spotify://user/saved-tracks",),
+    "auto_transfer_playback": ("spotify://devices/available",),
+    # A lista de playlists traz o total de músicas de cada uma
+    "create_playlist": ("spotify://playlists/user",),
+    "add_tracks_to_playlist": ("spotify://playlists/user",),
+    "replace_playlist_tracks": ("spotify://playlists/user",),
+    "remove_tracks_from_playlist": ("spotify://playlists/user",),
+    "reorder_playlist_tracks": ("spotify://playlists/user",),
+}
+
+
+def content_etag(data: Any) -> str:
+    """Versão do conteúdo no estilo ETag fraco (muda só se os dados mudarem)"""
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return f'W/"{hashlib.sha1(payload).hexdigest()[:16]}"'
+
+
+class _Entry:
+    def __init__(self, data: Any, fetched_at: float):
+        self.data = data
+        self.fetched_at = fetched_at
+        self.wall_time = time.time()
+        self.etag = content_etag(data)
+
+
+class ResourceCache(Middleware):
+    """Cache por usuário dos recursos MCP com revalidação em segundo plano.
+
+    `service_for` devolve o serviço Spotify de um usuário; cada leitura passa
+    uma função que busca o dado a partir desse serviço. `ttl_scale`
+    multiplica as validades (0 desativa o cache). Registre a instância como
+    middleware para que as tools de escrita invalidem os recursos afetados.
+    """
+
+    def __init__(
+        self,
+        service_for: Callable[[str], Any],
+        registry: Optional[MetricsRegistry] = None,
+        ttls: Optional[Dict[str, Tuple[float, float]]] = None,
+        ttl_scale: float = 1.0,
+        max_entries: int = 1000,
+        resolve_user: Callable[[], str] = current_user.get,
+    ):
+        self.service_for = service_for
+        self.registry = registry
+        self.ttls = dict(RESOURCE_TTLS if ttls is None else ttls)
+        self.ttl_scale = ttl_scale
+        self.resolve_user = resolve_user
+        longest = max((sum(t) for t in self.ttls.values()), default=0)
+        self._entries = TTLCache("resources", max_entries, longest * ttl_scale)
+        self._refreshing: Set[Tuple[str, str]] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="resource-refresh"
+        )
+
+    def _limits(self, uri: str) -> Tuple[float, float]:
+        ttl, max_stale = self.ttls.get(uri, (0, 0))
+        return ttl * self.ttl_scale, max_stale * self.ttl_scale
+
+    def _load(self, user_id: str, uri: str, fetch: Callable[[Any], Any]) -> _Entry:
+        entry = _Entry(fetch(self.service_for(user_id)), time.monotonic())
+        ttl, max_stale = self._limits(uri)
+        if ttl > 0:
+            self._entries.set((user_id, uri), entry, ttl + max_stale)
+        return entry
+
+    def _revalidate(self, user_id: str, uri: str, fetch: Callable[[Any], Any]) -> None:
+        key = (user_id, uri)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                # Atualização de fundo não compete com comandos e leituras
+                with priority(BULK):
+                    self._load(user_id, uri, fetch)
+                if self.registry is not None:
+                    self.registry.record_event("resource_revalidated")
+            except Exception as e:
+                logger.warning(f"Falha ao atualizar {uri} de {user_id}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def read(
+        self, uri: str, fetch: Callable[[Any], Any], user_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Campos `data`, `etag`, `fetched_at` e `stale` do recurso"""
+        user_id = user_id or self.resolve_user()
+        ttl, _ = self._limits(uri)
+        entry = self._entries.get((user_id, uri)) if ttl > 0 else None
+        stale = False
+        if entry is None:
+            entry = self._load(user_id, uri, fetch)
+        elif time.monotonic() - entry.fetched_at >= ttl:
+            stale = True
+            self._revalidate(user_id, uri, fetch)
+        return {
+            "data": entry.data,
+            "etag": entry.etag,
+            "fetched_at": datetime.fromtimestamp(entry.wall_time, timezone.utc)
+            .isoformat(timespec="seconds")
+            .replace("+00:00", "Z"),
+            "stale": stale,
+        }
+
+    def invalidate(self, uri: str, user_id: Optional[str] = None) -> None:
+        self._entries.delete((user_id or self.resolve_user(), uri))
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        result = await call_next(context)
+        # Um lote invalida o que cada operação executada invalidaria
+        for tool in called_tools(context.message.name, result):
+            for uri in INVALIDATED_BY.get(tool, ()):
+                self.invalidate(uri)
+        return result
@@ -0,0 +1,253 @@
+"""
+Escalonador das chamadas à Web API do Spotify por prioridade
+
+Três classes, da mais para a menos urgente:
+
+- control: comandos de playback (play, pause, próxima, volume, seek...);
+- interactive: leituras feitas por uma pessoa esperando a resposta;
+- bulk: trabalho em lote (exportação, analytics, montagem de filas longas).
+
+Cada classe tem seu próprio limite de requisições simultâneas e sua fatia do
+limite de taxa (SPOTIFY_RATE_LIMIT, requisições por segundo para todo o app).
+Uma classe pode usar a fatia ociosa das classes abaixo dela, nunca das de cima:
+um export rodando não consome a reserva de um `pause_music`.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+
+try:
+    from .config import (
+        SCHEDULER_BULK_CONCURRENCY,
+        SCHEDULER_CONTROL_CONCURRENCY,
+        SCHEDULER_INTERACTIVE_CONCURRENCY,
+        SCHEDULER_RATE_SHARES,
+        SPOTIFY_RATE_LIMIT,
+    )
+    from .metrics import MetricsRegistry, metrics
+except ImportError:
+    from config import (
+        SCHEDULER_BULK_CONCURRENCY,
+        SCHEDULER_CONTROL_CONCURRENCY,
+        SCHEDULER_INTERACTIVE_CONCURRENCY,
+        SCHEDULER_RATE_SHARES,
+        SPOTIFY_RATE_LIMIT,
+    )
+    from metrics import MetricsRegistry, metrics
+
+CONTROL = "control"
+INTERACTIVE = "interactive"
+BULK = "bulk"
+# Da maior para a menor prioridade
+PRIORITIES = (CONTROL, INTERACTIVE, BULK)
+
+CONTROL_TOOLS = frozenset(
+    {
+        "play_music",
+        "pause_music",
+        "next_track",
+        "previous_track",
+        "set_volume",
+        "skip_to_next",
+        "skip_to_previous",
+        "seek_to_position",
+        "add_to_queue",
+        "auto_transfer_playback",
+    }
+)
+BULK_TOOLS = frozenset(
+    {
+        "export_library",
+        "get_listening_analytics",
+        "build_flow_queue",
+    }
+)
+
+# Prioridade da tool em execução (propagada para as threads do pool)
+current_priority: ContextVar[Optional[str]] = ContextVar(
+    "spotify_mcp_priority", default=None
+)
+
+
+def tool_priority(tool_name: str) -> str:
+    if tool_name in CONTROL_TOOLS:
+        return CONTROL
+    if tool_name in BULK_TOOLS:
+        return BULK
+    return INTERACTIVE
+
+
+def request_priority(method: str, url: str) -> str:
+    """Classe de uma requisição HTTP à Web API.
+
+    Escritas no player são sempre `control` (ex.: o play ao fim de
+    search_and_play_all); as demais herdam a classe da tool em execução.
+    """
+    if method.upper() != "GET" and "/me/player" in urlparse(url).path:
+        return CONTROL
+    return current_priority.get() or INTERACTIVE
+
+
+@contextmanager
+def priority(level: str) -> Iterator[None]:
+    """Executa o bloco com a prioridade indicada (ex.: tarefas de fundo)"""
+    token = current_priority.set(level)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class _TokenBucket:
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        if self.rate <= 0:
+            return float("inf")
+        return max(0.0, (1.0 - self.tokens) / self.rate)
+
+
+class UpstreamScheduler:
+    """Controla quando cada requisição à Web API pode sair.
+
+    `rate` é o total de requisições por segundo (0 desativa o limite de
+    taxa) e `shares` a fração de cada classe. As requisições aguardam em
+    threads (o Spotipy é síncrono).
+    """
+
+    def __init__(
+        self,
+        concurrency: Dict[str, int],
+        rate: float = 0.0,
+        shares: Optional[Dict[str, float]] = None,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        self.concurrency = {p: max(1, concurrency.get(p, 1)) for p in PRIORITIES}
+        self.rate = rate
+        shares = shares or {}
+        total = sum(shares.get(p, 0.0) for p in PRIORITIES) or 1.0
+        self._buckets = (
+            {p: _TokenBucket(rate * shares.get(p, 0.0) / total) for p in PRIORITIES}
+            if rate > 0
+            else {}
+        )
+        self.in_flight = {p: 0 for p in PRIORITIES}
+        self.waiting = {p: 0 for p in PRIORITIES}
+        self.wait_seconds = {p: 0.0 for p in PRIORITIES}
+        self._cond = threading.Condition()
+        if registry is not None:
+            for p in PRIORITIES:
+                labels = {"priority": p}
+                registry.register_gauge(
+                    "spotify_mcp_upstream_in_flight",
+                    lambda p=p: self.in_flight[p],
+                    labels,
+                    "Requisições à Web API em andamento por prioridade",
+                )
+                registry.register_gauge(
+                    "spotify_mcp_upstream_waiting",
+                    lambda p=p: self.waiting[p],
+                    labels,
+                    "Requisições à Web API aguardando vez por prioridade",
+                )
+                registry.register_gauge(
+                    "spotify_mcp_upstream_queue_seconds",
+                    lambda p=p: round(self.wait_seconds[p], 6),
+                    labels,
+                    "Tempo total de espera no escalonador por prioridade",
+                )
+
+    def _take_token(self, level: str, now: float) -> Optional[float]:
+        """Consome uma ficha; sem ficha, retorna quanto esperar"""
+        if not self._buckets:
+            return None
+        # A própria fatia primeiro, depois as das classes menos urgentes
+        candidates = PRIORITIES[PRIORITIES.index(level) :]
+        for p in candidates:
+            bucket = self._buckets[p]
+            bucket.refill(now)
+            if bucket.tokens >= 1.0:
+                bucket.tokens -= 1.0
+                return None
+        delay = min(self._buckets[p].wait_time() for p in candidates)
+        return delay if delay != float("inf") else 1.0
+
+    @contextmanager
+    def slot(self, level: str) -> Iterator[None]:
+        """Reserva vaga e taxa para uma requisição da classe indicada"""
+        if level not in self.concurrency:
+            level = INTERACTIVE
+        started = time.monotonic()
+        with self._cond:
+            self.waiting[level] += 1
+            try:
+                while True:
+                    if self.in_flight[level] < self.concurrency[level]:
+                        delay = self._take_token(level, time.monotonic())
+                        if delay is None:
+                            break
+                    else:
+                        delay = None
+                    self._cond.wait(delay)
+            finally:
+                self.waiting[level] -= 1
+            self.in_flight[level] += 1
+            self.wait_seconds[level] += time.monotonic() - started
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.in_flight[level] -= 1
+                self._cond.notify_all()
+
+    def install(self, client) -> None:
+        """Faz todas as requisições do cliente Spotipy passarem pelo escalonador"""
+        session = getattr(client, "_session", None)
+        if session is None or getattr(session.request, "__scheduled__", False):
+            return
+        request = session.request
+
+        def scheduled(method, url, *args, **kwargs):
+            with self.slot(request_priority(method, url)):
+                return request(method, url, *args, **kwargs)
+
+        scheduled.__scheduled__ = True
+        session.request = scheduled
+
+
+class PriorityMiddleware(Middleware):
+    """Define a prioridade das chamadas à Web API feitas por cada tool"""
+
+    async def on_call_tool(self, context: MiddlewareContext, call_next):
+        token = current_priority.set(tool_priority(context.message.name))
+        try:
+            return await call_next(context)
+        finally:
+            current_priority.reset(token)
+
+
+# Compartilhado por todos os usuários: o limite de taxa é do app (client id)
+upstream_scheduler = UpstreamScheduler(
+    {
+        CONTROL: SCHEDULER_CONTROL_CONCURRENCY,
+        INTERACTIVE: SCHEDULER_INTERACTIVE_CONCURRENCY,
+        BULK: SCHEDULER_BULK_CONCURRENCY,
+    },
+    rate=SPOTIFY_RATE_LIMIT,
+    shares=SCHEDULER_RATE_SHARES,
+    registry=metrics,
+)
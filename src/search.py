@@ -0,0 +1,102 @@
+"""
+Busca em vários tipos com uma requisição
+
+A Web API aceita `type=track,artist,album,playlist` em uma única busca. As
+projeções compactas aqui são as mesmas das tools search_tracks/artists/
+albums/playlists, e o resultado dividido por tipo fica no cache de buscas
+com uma chave normalizada (maiúsculas e espaços extras não geram outra
+requisição).
+"""
+
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Tipos aceitos por search_all, na ordem em que aparecem no resultado
+SEARCH_TYPES = ("track", "artist", "album", "playlist")
+
+
+def track_summary(track: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": track["name"],
+        "artist": track["artists"][0]["name"],
+        "album": track["album"]["name"],
+        "uri": track["uri"],
+        "duration_ms": track["duration_ms"],
+    }
+
+
+def artist_summary(artist: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": artist["name"],
+        "uri": artist["uri"],
+        "genres": artist["genres"],
+        "popularity": artist["popularity"],
+    }
+
+
+def album_summary(album: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": album["name"],
+        "artist": album["artists"][0]["name"],
+        "uri": album["uri"],
+        "release_date": album["release_date"],
+    }
+
+
+def playlist_summary(playlist: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": playlist["name"],
+        "owner": playlist["owner"]["display_name"],
+        "uri": playlist["uri"],
+        "tracks_total": playlist["tracks"]["total"],
+    }
+
+
+SUMMARIES: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "track": track_summary,
+    "artist": artist_summary,
+    "album": album_summary,
+    "playlist": playlist_summary,
+}
+
+
+def search_types(types: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """Tipos validados, sem repetição e na ordem de SEARCH_TYPES"""
+    if types is None:
+        return SEARCH_TYPES
+    if isinstance(types, str):
+        types = types.split(",")
+    requested = {t.strip().lower() for t in types if t and t.strip()}
+    unknown = requested.difference(SEARCH_TYPES)
+    if unknown:
+        raise ValueError(
+            f"Tipo de busca inválido: {', '.join(sorted(unknown))} "
+            f"(use {', '.join(SEARCH_TYPES)})"
+        )
+    if not requested:
+        raise ValueError("Informe ao menos um tipo de busca")
+    return tuple(t for t in SEARCH_TYPES if t in requested)
+
+
+def normalize_query(query: str) -> str:
+    """Consulta em forma canônica (Unicode NFKC, casefold, espaços simples)"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def search_key(
+    query: str, types: Tuple[str, ...], limit: int, market: str
+) -> Tuple[Any, ...]:
+    """Chave do cache; o mercado entra porque a busca depende do país da conta"""
+    return (normalize_query(query), types, limit, market)
+
+
+def split_results(
+    results: Dict[str, Any], types: Tuple[str, ...]
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Divide a resposta da busca em listas compactas por tipo"""
+    split = {}
+    for kind in types:
+        items = (results.get(f"{kind}s") or {}).get("items") or []
+        # A busca de playlists pode trazer itens nulos
+        split[f"{kind}s"] = [SUMMARIES[kind](item) for item in items if item]
+    return split
@@ -3,69 +3,425 @@
 Service layer para integração com Spotify
 """
 
+import contextvars
 import logging
 import os
-from typing import Any, Dict, List, Optional
-from urllib.parse import urlparse
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
 
 import spotipy
+from requests.adapters import HTTPAdapter
 from spotipy.oauth2 import CacheFileHandler, SpotifyOAuth
 
 try:
+    from .analytics import ListeningAggregates
+    from .batch import ERROR, OK, SKIPPED, plan, run_batch
+    from .breaker import FAILURE_STATUSES, GUARDED_ENDPOINTS, EndpointBreakers
+    from .cache import (
+        catalog_cache,
+        playlist_cache,
+        related_cache,
+        resolve_cache,
+        search_cache,
+    )
+    from .coalescer import CommandCoalescer, add
+    from .conditional import ConditionalRequestCache
     from .config import (
+        ANALYTICS_CACHE_PATH,
+        ARTIST_GRAPH_CONCURRENCY,
+        ARTIST_GRAPH_MAX_ARTISTS,
+        ARTIST_GRAPH_MAX_HOPS,
+        BATCH_CONCURRENCY,
+        BATCH_MAX_OPERATIONS,
+        CACHE_DIR,
+        CIRCUIT_BREAKER_COOLDOWN,
+        CIRCUIT_BREAKER_THRESHOLD,
+        EXPORT_DIR,
+        HTTP_CACHE_MAX_BYTES,
+        HYDRATE_CONCURRENCY,
+        HYDRATE_MAX_IDS,
+        LOADER_BATCH_WINDOW,
+        MAX_USER_CLIENTS,
+        PLAYBACK_COALESCE_WINDOW,
+        PLAYLIST_CACHE_MAX_ITEMS,
+        PLAYLIST_INDEX_CONCURRENCY,
+        PLAYLIST_INDEX_MAX_AGE,
+        PLAYLIST_WRITE_MAX_ITEMS,
+        PLAYLIST_WRITE_RETRIES,
+        RESOLVE_CANDIDATES,
+        RESOLVE_CONCURRENCY,
+        RESOLVE_MAX_TRACKS,
+        RESOLVE_MIN_CONFIDENCE,
+        SPOTIFY_ACCOUNTS_URL,
+        SPOTIFY_API_BASE_URL,
         SPOTIFY_CLIENT_ID,
         SPOTIFY_CLIENT_SECRET,
+        SPOTIFY_POOL_SIZE,
         SPOTIFY_REDIRECT_URI,
         SPOTIFY_SCOPES,
+        TOKEN_CACHE_PATH,
+        TOKEN_STORE_PATH,
+        USER_CLIENT_IDLE_TTL,
+    )
+    from .equivalence import TrackEquivalenceIndex
+    from .export import LibraryExporter, playlist_items
+    from .flow import order_by_flow
+    from .graph import expand, genre_counts, neighbourhood, path_to
+    from .hydrate import (
+        catalog_fetcher,
+        compact_album,
+        compact_artist,
+        compact_track,
+        hydrate,
+    )
+    from .loader import (
+        ALBUMS_BATCH_SIZE,
+        ARTISTS_BATCH_SIZE,
+        AUDIO_FEATURES_BATCH_SIZE,
+        SAVED_CONTAINS_BATCH_SIZE,
+        TRACKS_BATCH_SIZE,
+        BatchLoader,
+    )
+    from .membership import PlaylistMembershipIndex
+    from .metrics import instrument_auth_manager, instrument_client, metrics
+    from .playlists import PlaylistWriter
+    from .resolve import (
+        LibraryIndex,
+        best_match,
+        normalize,
+        parse_line,
+        search_queries,
+    )
+    from .scheduler import INTERACTIVE, current_priority, upstream_scheduler
+    from .search import (
+        album_summary,
+        artist_summary,
+        playlist_summary,
+        search_key,
+        search_types,
+        split_results,
+        track_summary,
+    )
+    from .spotify_ids import spotify_id, spotify_ids, spotify_uri
+    from .users import (
+        DEFAULT_USER,
+        SQLiteTokenStore,
+        UserClientRegistry,
+        UserServiceProxy,
     )
 except ImportError:
+    from analytics import ListeningAggregates
+    from batch import ERROR, OK, SKIPPED, plan, run_batch
+    from breaker import FAILURE_STATUSES, GUARDED_ENDPOINTS, EndpointBreakers
+    from cache import (
+        catalog_cache,
+        playlist_cache,
+        related_cache,
+        resolve_cache,
+        search_cache,
+    )
+    from coalescer import CommandCoalescer, add
+    from conditional import ConditionalRequestCache
     from config import (
+        ANALYTICS_CACHE_PATH,
+        ARTIST_GRAPH_CONCURRENCY,
+        ARTIST_GRAPH_MAX_ARTISTS,
+        ARTIST_GRAPH_MAX_HOPS,
+        BATCH_CONCURRENCY,
+        BATCH_MAX_OPERATIONS,
+        CACHE_DIR,
+        CIRCUIT_BREAKER_COOLDOWN,
+        CIRCUIT_BREAKER_THRESHOLD,
+        EXPORT_DIR,
+        HTTP_CACHE_MAX_BYTES,
+        HYDRATE_CONCURRENCY,
+        HYDRATE_MAX_IDS,
+        LOADER_BATCH_WINDOW,
+        MAX_USER_CLIENTS,
+        PLAYBACK_COALESCE_WINDOW,
+        PLAYLIST_CACHE_MAX_ITEMS,
+        PLAYLIST_INDEX_CONCURRENCY,
+        PLAYLIST_INDEX_MAX_AGE,
+        PLAYLIST_WRITE_MAX_ITEMS,
+        PLAYLIST_WRITE_RETRIES,
+        RESOLVE_CANDIDATES,
+        RESOLVE_CONCURRENCY,
+        RESOLVE_MAX_TRACKS,
+        RESOLVE_MIN_CONFIDENCE,
+        SPOTIFY_ACCOUNTS_URL,
+        SPOTIFY_API_BASE_URL,
         SPOTIFY_CLIENT_ID,
         SPOTIFY_CLIENT_SECRET,
+        SPOTIFY_POOL_SIZE,
         SPOTIFY_REDIRECT_URI,
         SPOTIFY_SCOPES,
+        TOKEN_CACHE_PATH,
+        TOKEN_STORE_PATH,
+        USER_CLIENT_IDLE_TTL,
+    )
+    from equivalence import TrackEquivalenceIndex
+    from export import LibraryExporter, playlist_items
+    from flow import order_by_flow
+    from graph import expand, genre_counts, neighbourhood, path_to
+    from hydrate import (
+        catalog_fetcher,
+        compact_album,
+        compact_artist,
+        compact_track,
+        hydrate,
+    )
+    from loader import (
+        ALBUMS_BATCH_SIZE,
+        ARTISTS_BATCH_SIZE,
+        AUDIO_FEATURES_BATCH_SIZE,
+        SAVED_CONTAINS_BATCH_SIZE,
+        TRACKS_BATCH_SIZE,
+        BatchLoader,
+    )
+    from membership import PlaylistMembershipIndex
+    from metrics import instrument_auth_manager, instrument_client, metrics
+    from playlists import PlaylistWriter
+    from resolve import (
+        LibraryIndex,
+        best_match,
+        normalize,
+        parse_line,
+        search_queries,
+    )
+    from scheduler import INTERACTIVE, current_priority, upstream_scheduler
+    from search import (
+        album_summary,
+        artist_summary,
+        playlist_summary,
+        search_key,
+        search_types,
+        split_results,
+        track_summary,
+    )
+    from spotify_ids import spotify_id, spotify_ids, spotify_uri
+    from users import (
+        DEFAULT_USER,
+        SQLiteTokenStore,
+        UserClientRegistry,
+        UserServiceProxy,
     )
 
 # Configurar logging
 logger = logging.getLogger(__name__)
 
+# Limites dos endpoints em lote da Web API
+SEARCH_PAGE_SIZE = 50
+SAVED_TRACKS_PAGE_SIZE = 50
+PLAYLIST_PAGE_SIZE = 100
+# Quantidade máxima de URIs enviadas em uma única chamada de start_playback
+MAX_PLAYBACK_URIS = 100
+
+# Endpoints com circuit breaker que têm alternativa local
+RECOMMENDATIONS_ENDPOINT = "GET /recommendations"
+AUDIO_FEATURES_ENDPOINT = "GET /audio-features"
+
+# Métodos que execute_batch pode chamar (autenticação e o próprio lote ficam
+# de fora)
+BATCH_METHODS = frozenset(
+    {
+        "get_current_track",
+        "play_music",
+        "pause_music",
+        "next_track",
+        "previous_track",
+        "skip_to_next",
+        "skip_to_previous",
+        "set_volume",
+        "search_tracks",
+        "search_all",
+        "search_artists",
+        "search_albums",
+        "search_playlists",
+        "get_playlists",
+        "get_playlist_tracks",
+        "get_user_albums",
+        "get_saved_tracks",
+        "get_saved_albums",
+        "get_followed_artists",
+        "get_top_artists",
+        "get_top_tracks",
+        "get_recently_played",
+        "get_devices",
+        "transfer_playback",
+        "auto_transfer_playback",
+        "toggle_shuffle",
+        "toggle_repeat",
+        "seek_to_position",
+        "get_queue",
+        "add_to_queue",
+        "get_recommendations",
+        "get_genres",
+        "get_user_profile",
+        "get_audio_features",
+        "get_track_tempo",
+        "get_audio_features_by_uri",
+        "get_track_tempo_by_uri",
+        "add_track_to_favorites",
+        "remove_track_from_favorites",
+        "add_track_to_favorites_by_uri",
+        "remove_track_from_favorites_by_uri",
+        "check_track_in_favorites",
+        "check_track_in_favorites_by_uri",
+        "get_listening_analytics",
+        "get_listening_aggregates",
+        "search_and_add_to_queue",
+        "search_and_add_to_favorites",
+        "search_and_play_all",
+        "build_flow_queue",
+        "get_album_tracks",
+        "get_artist_top_tracks",
+        "get_artist_albums",
+        "get_related_artists",
+        "hydrate_tracks",
+        "hydrate_artists",
+        "hydrate_albums",
+        "resolve_tracks",
+        "create_playlist",
+        "add_tracks_to_playlist",
+        "replace_playlist_tracks",
+        "remove_tracks_from_playlist",
+        "reorder_playlist_tracks",
+        "find_track_in_playlists",
+        "find_playlist_duplicates",
+        "find_equivalent_tracks",
+        "explore_artist_graph",
+        "find_artist_path",
+    }
+)
+# Métodos do lote que só leem (rodam em paralelo); os demais seguem a ordem
+BATCH_READ_METHODS = frozenset(
+    method
+    for method in BATCH_METHODS
+    if method.startswith(("get_", "search_", "check_", "find_", "hydrate_", "explore_"))
+    and not method.startswith("search_and_")
+)
+
 # Autenticação simplificada: sem decorators, sempre via navegador (open_browser=True)
 
 
 class SpotifyService:
     """Serviço para integração com Spotify"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        api_base_url: Optional[str] = None,
+        accounts_url: Optional[str] = None,
+        auth_manager: Optional[SpotifyOAuth] = None,
+        user_id: str = DEFAULT_USER,
+        token_store: Optional[SQLiteTokenStore] = None,
+    ):
         self.client: Optional[spotipy.Spotify] = None
+        self.user_id = user_id
+        self.token_store = token_store
+        # Permite apontar para outra Web API (ex.: servidor falso de testes)
+        self.api_base_url = (api_base_url or SPOTIFY_API_BASE_URL).rstrip("/") + "/"
+        self.accounts_url = (accounts_url or SPOTIFY_ACCOUNTS_URL).rstrip("/")
+        # Contadores de escuta persistidos no cache local (isolados por usuário)
+        self.aggregates = ListeningAggregates(self._analytics_path())
+        # Rajadas de volume/seek/pulos viram um comando só (se configurado)
+        self.coalescer = CommandCoalescer(PLAYBACK_COALESCE_WINDOW, metrics)
+        # Endpoints indisponíveis para a conta falham localmente por um tempo
+        self.breakers = EndpointBreakers(
+            CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_COOLDOWN, metrics
+        )
+        # Em quais playlists está cada música (sincronizado por snapshot_id)
+        self.playlist_index = PlaylistMembershipIndex()
+        self._playlist_index_lock = threading.Lock()
+        # IDs da mesma gravação (ISRC), com as músicas que o servidor já recebe
+        self.equivalence = TrackEquivalenceIndex()
+        self._create_loaders()
+        if auth_manager is not None:
+            instrument_auth_manager(auth_manager, metrics)
+            self.client = self._build_client(auth_manager)
+            return
         # Tentar inicializar o cliente se houver cache válido
         # self._try_initialize_from_cache()
         self._initialize_client()
 
+    def _create_loaders(self) -> None:
+        """Buscas por ID que se juntam em chamadas multi-ID (por usuário)"""
+
+        def by_id(items: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+            return {item["id"]: item for item in items or [] if item}
+
+        def audio_features(ids: List[str]) -> Dict[str, Any]:
+            fetched = by_id(self.client.audio_features(ids))
+            catalog_cache.set_many(
+                {f"audio_features:{i}": feature for i, feature in fetched.items()}
+            )
+            return fetched
+
+        def saved_contains(ids: List[str]) -> Dict[str, bool]:
+            return dict(
+                zip(ids, self.client.current_user_saved_tracks_contains(tracks=ids))
+            )
+
+        def tracks(ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+            found = self.client.tracks(ids)["tracks"]
+            self.equivalence.add_many(found)
+            return found
+
+        def loader(name, fetch_many, max_batch) -> BatchLoader:
+            return BatchLoader(
+                name, fetch_many, max_batch, LOADER_BATCH_WINDOW, metrics
+            )
+
+        # Catálogo: registros compactos, guardados no cache compartilhado
+        self.track_loader = loader(
+            "tracks",
+            catalog_fetcher("track", tracks, compact_track),
+            TRACKS_BATCH_SIZE,
+        )
+        self.artist_loader = loader(
+            "artists",
+            catalog_fetcher(
+                "artist",
+                lambda ids: self.client.artists(ids)["artists"],
+                compact_artist,
+            ),
+            ARTISTS_BATCH_SIZE,
+        )
+        self.album_loader = loader(
+            "albums",
+            catalog_fetcher(
+                "album", lambda ids: self.client.albums(ids)["albums"], compact_album
+            ),
+            ALBUMS_BATCH_SIZE,
+        )
+        self.audio_features_loader = loader(
+            "audio_features", audio_features, AUDIO_FEATURES_BATCH_SIZE
+        )
+        self.saved_tracks_loader = loader(
+            "saved_contains", saved_contains, SAVED_CONTAINS_BATCH_SIZE
+        )
+
+    def _analytics_path(self) -> str:
+        if self.user_id == DEFAULT_USER:
+            return ANALYTICS_CACHE_PATH
+        return os.path.join(CACHE_DIR, "users", self.user_id, "analytics.json")
+
+    def close(self) -> None:
+        """Persiste os dados locais do usuário (chamado ao descartar o cliente)"""
+        self.aggregates.save()
+
     def _extract_track_id(self, track_or_uri: str) -> str:
         """Extrai o track_id a partir de um ID, URI ou URL do Spotify.
 
         Aceita formatos:
         - "spotify:track:ID"
-        - "https://open.spotify.com/track/ID?si=..."
+        - "https://open.spotify.com/track/ID?si=..." (também /intl-xx/)
         - "ID" (já o próprio track id)
         """
-        if not track_or_uri:
-            return track_or_uri
-
-        if track_or_uri.startswith("spotify:track:"):
-            return track_or_uri.split(":")[-1]
-
-        if "open.spotify.com/track/" in track_or_uri:
-            try:
-                parsed = urlparse(track_or_uri)
-                parts = [p for p in parsed.path.split("/") if p]
-                if len(parts) >= 2 and parts[0] == "track":
-                    return parts[1]
-            except Exception:
-                # Silenciar parsing falho e retornar original
-                return track_or_uri
-
-        return track_or_uri
+        return spotify_id(track_or_uri, "track")
 
     def _create_auth_manager(
         self,
@@ -73,23 +429,47 @@ class SpotifyService:
         client_secret: Optional[str] = None,
         redirect_uri: Optional[str] = None,
     ) -> SpotifyOAuth:
-        # Usar caminho absoluto do cache, evitando depender do CWD
-        try:
-            from .config import TOKEN_CACHE_PATH
-        except ImportError:
-            from config import TOKEN_CACHE_PATH
-        cache_handler = CacheFileHandler(cache_path=TOKEN_CACHE_PATH)
-        return (
-            SpotifyOAuth(
-                client_id=client_id or SPOTIFY_CLIENT_ID,
-                client_secret=client_secret or SPOTIFY_CLIENT_SECRET,
-                redirect_uri=redirect_uri or SPOTIFY_REDIRECT_URI,
-                scope=",".join(SPOTIFY_SCOPES),
-                cache_handler=cache_handler,
-                open_browser=True,
-            ),
-            cache_handler,
+        # Token do usuário no store; sem store, caminho absoluto do cache
+        # (evita depender do CWD)
+        if self.token_store is not None:
+            cache_handler = self.token_store.cache_handler(self.user_id)
+        else:
+            cache_handler = CacheFileHandler(cache_path=TOKEN_CACHE_PATH)
+        auth_manager = SpotifyOAuth(
+            client_id=client_id or SPOTIFY_CLIENT_ID,
+            client_secret=client_secret or SPOTIFY_CLIENT_SECRET,
+            redirect_uri=redirect_uri or SPOTIFY_REDIRECT_URI,
+            scope=",".join(SPOTIFY_SCOPES),
+            cache_handler=cache_handler,
+            # Só o usuário local pode abrir o navegador na máquina do servidor
+            open_browser=self.user_id == DEFAULT_USER,
         )
+        auth_manager.OAUTH_AUTHORIZE_URL = f"{self.accounts_url}/authorize"
+        auth_manager.OAUTH_TOKEN_URL = f"{self.accounts_url}/api/token"
+        instrument_auth_manager(auth_manager, metrics)
+        return auth_manager, cache_handler
+
+    def _build_client(self, auth_manager: SpotifyOAuth) -> spotipy.Spotify:
+        """Cria o cliente Spotipy com as respostas HTTP registradas nas métricas"""
+        client = spotipy.Spotify(auth_manager=auth_manager)
+        client.prefix = self.api_base_url
+        # Pool de conexões do tamanho do pool de workers (sessões concorrentes)
+        retries = client._session.get_adapter("https://").max_retries
+        adapter = HTTPAdapter(
+            pool_connections=SPOTIFY_POOL_SIZE,
+            pool_maxsize=SPOTIFY_POOL_SIZE,
+            max_retries=retries,
+        )
+        client._session.mount("http://", adapter)
+        client._session.mount("https://", adapter)
+        instrument_client(client, metrics)
+        upstream_scheduler.install(client)
+        # GETs condicionais: 304 servido do corpo guardado (por usuário)
+        self.http_cache = ConditionalRequestCache(HTTP_CACHE_MAX_BYTES, metrics)
+        self.http_cache.install(client)
+        # Por fora de tudo: circuito aberto responde sem esperar vaga nem taxa
+        self.breakers.install(client)
+        return client
 
     def _try_initialize_from_cache(self) -> None:
         """Tenta inicializar o cliente usando cache existente"""
@@ -107,7 +487,7 @@ class SpotifyService:
             token_info = cache_handler.get_cached_token()
             if token_info and not auth_manager.is_token_expired(token_info):
                 # Cache válido, inicializar cliente
-                self.client = spotipy.Spotify(auth_manager=auth_manager)
+                self.client = self._build_client(auth_manager)
                 logger.info("Cliente Spotipy inicializado com cache válido")
             else:
                 logger.info(
@@ -133,18 +513,40 @@ class SpotifyService:
             auth_manager, cache_handler = self._create_auth_manager()
 
             token_info = cache_handler.get_cached_token()
-            if not token_info or auth_manager.is_token_expired(token_info):
+            if self.user_id != DEFAULT_USER:
+                # Demais usuários autorizam via get_authorization_url (/callback)
+                if not token_info:
+                    logger.info(f"Usuário {self.user_id} ainda não autorizado")
+                    self.client = None
+                    return
+            elif not token_info or auth_manager.is_token_expired(token_info):
                 # Dispara fluxo via navegador; se usuário concluir, segue
                 try:
                     auth_manager.get_access_token(as_dict=False)
                 except Exception as auth_error:
                     logger.warning(f"Autenticação necessária: {auth_error}")
-            self.client = spotipy.Spotify(auth_manager=auth_manager)
+            self.client = self._build_client(auth_manager)
 
         except Exception as e:
             logger.error(f"❌ Erro ao inicializar Spotipy: {e}")
             self.client = None
 
+    def get_authorization_url(self, state: str) -> Dict[str, str]:
+        """URL de autorização do Spotify para o usuário desta sessão"""
+        auth_manager, _ = self._create_auth_manager()
+        auth_manager.state = state
+        return {"user": self.user_id, "url": auth_manager.get_authorize_url()}
+
+    def complete_authorization(self, code: str) -> Dict[str, str]:
+        """Troca o código do /callback por um token e conecta o cliente"""
+        try:
+            auth_manager, _ = self._create_auth_manager()
+            auth_manager.get_access_token(code, as_dict=False, check_cache=False)
+            self.client = self._build_client(auth_manager)
+            return {"message": f"Usuário {self.user_id} autenticado com sucesso"}
+        except Exception as e:
+            raise ValueError(f"Erro na autenticação: {str(e)}")
+
     def is_connected(self) -> bool:
         """Verifica se o cliente está conectado"""
         return self.client is not None
@@ -158,7 +560,7 @@ class SpotifyService:
                 client_id, client_secret, redirect_uri
             )
             auth_manager.get_access_token(as_dict=False)
-            self.client = spotipy.Spotify(auth_manager=auth_manager)
+            self.client = self._build_client(auth_manager)
             return {"message": "Autenticação realizada com sucesso"}
         except Exception as e:
             raise ValueError(f"Erro na autenticação: {str(e)}")
@@ -173,7 +575,7 @@ class SpotifyService:
 
             auth_manager, _ = self._create_auth_manager()
             auth_manager.get_access_token(as_dict=False)
-            self.client = spotipy.Spotify(auth_manager=auth_manager)
+            self.client = self._build_client(auth_manager)
             return {"message": "Reautenticação realizada com sucesso"}
         except Exception as e:
             raise ValueError(f"Erro na reautenticação: {str(e)}")
@@ -239,13 +641,11 @@ class SpotifyService:
             logger.info("Token inválido detectado. Iniciando reautenticação...")
 
             # Limpar cache se existir
+            if self.token_store is not None and self.user_id != DEFAULT_USER:
+                self.token_store.delete(self.user_id)
             # Remover cache usando caminho absoluto
-            try:
-                from .config import TOKEN_CACHE_PATH
-            except ImportError:
-                from config import TOKEN_CACHE_PATH
             cache_file = TOKEN_CACHE_PATH
-            if os.path.exists(cache_file):
+            if self.user_id == DEFAULT_USER and os.path.exists(cache_file):
                 try:
                     os.remove(cache_file)
                     logger.info("Cache de token removido")
@@ -350,6 +750,29 @@ class SpotifyService:
         except Exception as e:
             raise ValueError(f"Erro ao obter música atual: {str(e)}")
 
+    def _ensure_active_device(self) -> None:
+        """Garante um dispositivo ativo, transferindo o playback se necessário"""
+        # Verificar se há dispositivos ativos
+        devices = self.client.devices()
+        active_devices = [d for d in devices["devices"] if d["is_active"]]
+
+        if not active_devices:
+            # Se não há dispositivos ativos, tentar transferir para o primeiro disponível
+            available_devices = [
+                d
+                for d in devices["devices"]
+                if d["type"] in ["Computer", "Smartphone", "Tablet"]
+            ]
+            if available_devices:
+                # Transferir para o primeiro dispositivo disponível
+                device_id = available_devices[0]["id"]
+                self.client.transfer_playback(device_id=device_id)
+                logger.info(
+                    f"Playback transferido para: {available_devices[0]['name']}"
+                )
+            else:
+                raise ValueError("Nenhum dispositivo disponível para reprodução")
+
     def play_music(
         self,
         track_uri: Optional[str] = None,
@@ -361,34 +784,17 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            # Verificar se há dispositivos ativos
-            devices = self.client.devices()
-            active_devices = [d for d in devices["devices"] if d["is_active"]]
-
-            if not active_devices:
-                # Se não há dispositivos ativos, tentar transferir para o primeiro disponível
-                available_devices = [
-                    d
-                    for d in devices["devices"]
-                    if d["type"] in ["Computer", "Smartphone", "Tablet"]
-                ]
-                if available_devices:
-                    # Transferir para o primeiro dispositivo disponível
-                    device_id = available_devices[0]["id"]
-                    self.client.transfer_playback(device_id=device_id)
-                    logger.info(
-                        f"Playback transferido para: {available_devices[0]['name']}"
-                    )
-                else:
-                    raise ValueError("Nenhum dispositivo disponível para reprodução")
+            self._ensure_active_device()
 
             # Agora tentar tocar a música
             if track_uri:
-                self.client.start_playback(uris=[track_uri])
+                self.client.start_playback(uris=[spotify_uri(track_uri, "track")])
             elif playlist_uri:
-                self.client.start_playback(context_uri=playlist_uri)
+                self.client.start_playback(
+                    context_uri=spotify_uri(playlist_uri, "playlist")
+                )
             elif album_uri:
-                self.client.start_playback(context_uri=album_uri)
+                self.client.start_playback(context_uri=spotify_uri(album_uri, "album"))
             else:
                 self.client.start_playback()
 
@@ -413,10 +819,12 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            self.client.next_track()
-            return {"message": "Próxima música"}
+            skipped = self.coalescer.submit("next", 1, self._skip_forward, add)
         except Exception as e:
             raise ValueError(f"Erro ao avançar música: {str(e)}")
+        if skipped["skipped"] > 1:
+            return {**skipped, "message": f"Avançou {skipped['skipped']} músicas"}
+        return {**skipped, "message": "Próxima música"}
 
     def previous_track(self) -> Dict[str, str]:
         """Música anterior"""
@@ -424,10 +832,12 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            self.client.previous_track()
-            return {"message": "Música anterior"}
+            skipped = self.coalescer.submit("previous", 1, self._skip_back, add)
         except Exception as e:
             raise ValueError(f"Erro ao voltar música: {str(e)}")
+        if skipped["skipped"] > 1:
+            return {**skipped, "message": f"Voltou {skipped['skipped']} músicas"}
+        return {**skipped, "message": "Música anterior"}
 
     def skip_to_next(self) -> Dict[str, str]:
         """Pular para próxima música"""
@@ -435,8 +845,10 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            self.client.next_track()
-            return {"message": "Pulou para próxima música"}
+            skipped = self.coalescer.submit("next", 1, self._skip_forward, add)
+            if skipped["skipped"] > 1:
+                return {**skipped, "message": f"Pulou {skipped['skipped']} músicas"}
+            return {**skipped, "message": "Pulou para próxima música"}
         except Exception as e:
             error_msg = str(e).lower()
             if "restriction violated" in error_msg or "403" in error_msg:
@@ -453,8 +865,10 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            self.client.previous_track()
-            return {"message": "Pulou para música anterior"}
+            skipped = self.coalescer.submit("previous", 1, self._skip_back, add)
+            if skipped["skipped"] > 1:
+                return {**skipped, "message": f"Voltou {skipped['skipped']} músicas"}
+            return {**skipped, "message": "Pulou para música anterior"}
         except Exception as e:
             error_msg = str(e).lower()
             if "restriction violated" in error_msg or "403" in error_msg:
@@ -474,11 +888,25 @@ class SpotifyService:
             raise ValueError("Volume deve estar entre 0 e 100")
 
         try:
-            self.client.volume(volume)
-            return {"message": f"Volume ajustado para {volume}%"}
+            return self.coalescer.submit("volume", volume, self._apply_volume)
         except Exception as e:
             raise ValueError(f"Erro ao ajustar volume: {str(e)}")
 
+    def _apply_volume(self, volume: int) -> Dict[str, Any]:
+        self.client.volume(volume)
+        return {"message": f"Volume ajustado para {volume}%", "volume": volume}
+
+    def _skip_forward(self, count: int) -> Dict[str, Any]:
+        # A Web API não tem "pular N": os pulos agrupados saem em sequência
+        for _ in range(count):
+            self.client.next_track()
+        return {"skipped": count}
+
+    def _skip_back(self, count: int) -> Dict[str, Any]:
+        for _ in range(count):
+            self.client.previous_track()
+        return {"skipped": count}
+
     def search_tracks(
         self, query: str, limit: int = 10
     ) -> Dict[str, List[Dict[str, Any]]]:
@@ -488,21 +916,36 @@ class SpotifyService:
 
         try:
             results = self.client.search(q=query, type="track", limit=limit)
-            tracks = []
-            for track in results["tracks"]["items"]:
-                tracks.append(
-                    {
-                        "name": track["name"],
-                        "artist": track["artists"][0]["name"],
-                        "album": track["album"]["name"],
-                        "uri": track["uri"],
-                        "duration_ms": track["duration_ms"],
-                    }
-                )
-            return {"tracks": tracks}
+            self.equivalence.add_many(results["tracks"]["items"])
+            return {"tracks": [track_summary(t) for t in results["tracks"]["items"]]}
         except Exception as e:
             raise ValueError(f"Erro na busca: {str(e)}")
 
+    def search_all(
+        self, query: str, types: Optional[List[str]] = None, limit: int = 10
+    ) -> Dict[str, Any]:
+        """Buscar músicas, artistas, álbuns e playlists em uma requisição"""
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        kinds = search_types(types)
+        key = search_key(query, kinds, limit, self._market())
+        if not key[0]:
+            raise ValueError("Informe o termo da busca")
+
+        cached = search_cache.get(key)
+        if cached is not None:
+            return {"query": query, "types": list(kinds), "cached": True, **cached}
+
+        try:
+            results = self.client.search(q=query, type=",".join(kinds), limit=limit)
+            self.equivalence.add_many((results.get("tracks") or {}).get("items") or [])
+            split = split_results(results, kinds)
+        except Exception as e:
+            raise ValueError(f"Erro na busca: {str(e)}")
+        search_cache.set(key, split)
+        return {"query": query, "types": list(kinds), "cached": False, **split}
+
     def get_playlists(self) -> Dict[str, List[Dict[str, Any]]]:
         """Obter playlists do usuário"""
         if not self.client:
@@ -514,13 +957,17 @@ class SpotifyService:
         except Exception as e:
             raise ValueError(f"Erro ao obter playlists: {str(e)}")
 
-    def get_playlist_tracks(self, playlist_id: str) -> Dict[str, List[Dict[str, Any]]]:
+    def get_playlist_tracks(
+        self, playlist_id: str, limit: int = 100
+    ) -> Dict[str, List[Dict[str, Any]]]:
         """Obter músicas de uma playlist específica"""
         if not self.client:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            playlist = self.client.playlist_tracks(playlist_id)
+            playlist = self.client.playlist_tracks(
+                spotify_id(playlist_id, "playlist"), limit=limit
+            )
             tracks = []
             for item in playlist["items"]:
                 track = item["track"]
@@ -538,6 +985,326 @@ class SpotifyService:
         except Exception as e:
             raise ValueError(f"Erro ao obter músicas da playlist: {str(e)}")
 
+    @contextmanager
+    def _playlist_writer(self) -> Iterator[PlaylistWriter]:
+        """Escritor de playlists que invalida o índice de playlists ao sair
+
+        Mesmo com falha ou escrita parcial, a próxima consulta ao índice
+        confere os snapshots alterados.
+        """
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+        try:
+            yield PlaylistWriter(self.client, retries=PLAYLIST_WRITE_RETRIES)
+        finally:
+            self.playlist_index.invalidate()
+
+    @staticmethod
+    def _playlist_uris(track_uris: List[str]) -> List[str]:
+        if len(track_uris) > PLAYLIST_WRITE_MAX_ITEMS:
+            raise ValueError(
+                f"Máximo de {PLAYLIST_WRITE_MAX_ITEMS} músicas por chamada"
+            )
+        return [spotify_uri(uri, "track") for uri in track_uris]
+
+    @staticmethod
+    def _playlist_write_error(action: str, error: Exception) -> ValueError:
+        if "403" in str(error) or "Insufficient client scope" in str(error):
+            return ValueError(
+                "Permissão insuficiente. Reautentique com escopo "
+                "'playlist-modify-private' e 'playlist-modify-public'"
+            )
+        return ValueError(f"Erro ao {action}: {str(error)}")
+
+    def create_playlist(
+        self,
+        name: str,
+        track_uris: Optional[List[str]] = None,
+        description: str = "",
+        public: bool = False,
+    ) -> Dict[str, Any]:
+        """Criar uma playlist e incluir as músicas em lotes de 100, na ordem"""
+        with self._playlist_writer() as writer:
+            try:
+                uris = self._playlist_uris(track_uris or [])
+                playlist = self.client.current_user_playlist_create(
+                    name, public=public, description=description
+                )
+                result = writer.add(
+                    playlist["id"], uris, snapshot=playlist["snapshot_id"]
+                )
+                result["playlist"] = {
+                    "id": playlist["id"],
+                    "uri": playlist["uri"],
+                    "name": playlist["name"],
+                    "url": (playlist.get("external_urls") or {}).get("spotify"),
+                }
+                return result
+            except Exception as e:
+                raise self._playlist_write_error("criar playlist", e)
+
+    def add_tracks_to_playlist(
+        self, playlist_id: str, track_uris: List[str], position: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Incluir músicas em uma playlist (lotes de 100, ordem preservada)
+
+        Sem `position` as músicas vão para o fim. Se um lote falhar depois das
+        repetições, `resume_from` indica o índice de `track_uris` a partir do
+        qual chamar de novo (com `position` avançado do mesmo tanto).
+        """
+        with self._playlist_writer() as writer:
+            try:
+                return writer.add(
+                    spotify_id(playlist_id, "playlist"),
+                    self._playlist_uris(track_uris),
+                    position=position,
+                )
+            except Exception as e:
+                raise self._playlist_write_error("incluir músicas na playlist", e)
+
+    def replace_playlist_tracks(
+        self, playlist_id: str, track_uris: List[str]
+    ) -> Dict[str, Any]:
+        """Substituir todas as músicas de uma playlist pela lista, na ordem"""
+        with self._playlist_writer() as writer:
+            try:
+                return writer.replace(
+                    spotify_id(playlist_id, "playlist"), self._playlist_uris(track_uris)
+                )
+            except Exception as e:
+                raise self._playlist_write_error("substituir músicas da playlist", e)
+
+    def remove_tracks_from_playlist(
+        self, playlist_id: str, track_uris: List[str]
+    ) -> Dict[str, Any]:
+        """Remover todas as ocorrências das músicas de uma playlist"""
+        with self._playlist_writer() as writer:
+            try:
+                return writer.remove(
+                    spotify_id(playlist_id, "playlist"), self._playlist_uris(track_uris)
+                )
+            except Exception as e:
+                raise self._playlist_write_error("remover músicas da playlist", e)
+
+    def reorder_playlist_tracks(
+        self,
+        playlist_id: str,
+        range_start: int,
+        insert_before: int,
+        range_length: int = 1,
+    ) -> Dict[str, Any]:
+        """Mover um bloco de músicas para outra posição da playlist"""
+        with self._playlist_writer() as writer:
+            try:
+                return writer.reorder(
+                    spotify_id(playlist_id, "playlist"),
+                    range_start,
+                    insert_before,
+                    range_length,
+                )
+            except Exception as e:
+                raise self._playlist_write_error("reordenar a playlist", e)
+
+    def _load_playlist_contents(self, playlist: Dict[str, Any]) -> tuple:
+        """IDs das músicas (na ordem, None para itens sem ID) e rótulos"""
+        items, _ = playlist_items(
+            self.client,
+            playlist["id"],
+            playlist.get("snapshot_id"),
+            playlist_cache,
+            PLAYLIST_CACHE_MAX_ITEMS,
+        )
+        track_ids = []
+        labels = {}
+        for item in items:
+            track = item.get("track") or {}
+            self.equivalence.add(track)
+            track_id = track.get("id")
+            track_ids.append(track_id)
+            if track_id:
+                artists = track.get("artists") or [{}]
+                labels[track_id] = f"{track.get('name')} - {artists[0].get('name')}"
+        return track_ids, labels
+
+    def sync_playlist_index(self, force: bool = False) -> Dict[str, Any]:
+        """Atualizar o índice de playlists (só as com snapshot_id novo)"""
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        index = self.playlist_index
+        with self._playlist_index_lock:
+            if (
+                not force
+                and index.synced_at is not None
+                and time.monotonic() - index.synced_at < PLAYLIST_INDEX_MAX_AGE
+            ):
+                return {"refreshed": 0, "removed": 0, "cached": True}
+
+            generation = index.generation
+            try:
+                playlists = []
+                page = self.client.current_user_playlists(limit=50)
+                while page:
+                    playlists.extend(p for p in page["items"] if p)
+                    page = self.client.next(page) if page.get("next") else None
+
+                current = {p["id"] for p in playlists}
+                removed = [pid for pid in list(index.playlists) if pid not in current]
+                for playlist_id in removed:
+                    index.remove(playlist_id)
+
+                changed = [
+                    p
+                    for p in playlists
+                    if not p.get("snapshot_id")
+                    or index.snapshot_of(p["id"]) != p["snapshot_id"]
+                ]
+                tracks_changed = 0
+                if changed:
+                    workers = max(1, min(PLAYLIST_INDEX_CONCURRENCY, len(changed)))
+                    with ThreadPoolExecutor(max_workers=workers) as pool:
+                        # Cada playlist leva o contexto da tool (usuário, prioridade)
+                        futures = [
+                            pool.submit(
+                                contextvars.copy_context().run,
+                                self._load_playlist_contents,
+                                playlist,
+                            )
+                            for playlist in changed
+                        ]
+                        for playlist, future in zip(changed, futures):
+                            track_ids, labels = future.result()
+                            tracks_changed += index.update(
+                                playlist["id"],
+                                playlist.get("name"),
+                                playlist.get("snapshot_id"),
+                                track_ids,
+                                labels,
+                            )
+                index.mark_synced(generation)
+                return {
+                    "playlists": len(playlists),
+                    "refreshed": len(changed),
+                    "removed": len(removed),
+                    "tracks_changed": tracks_changed,
+                    "cached": False,
+                }
+            except Exception as e:
+                raise ValueError(f"Erro ao sincronizar playlists: {str(e)}")
+
+    def find_track_in_playlists(
+        self, track: str, refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Em quais playlists do usuário (e em que posições) está uma música"""
+        track_id = spotify_id(track, "track")
+        sync = self.sync_playlist_index(force=refresh)
+        playlists = self.playlist_index.lookup(track_id)
+        return {
+            "track_id": track_id,
+            "name": self.playlist_index.labels.get(track_id),
+            "playlists": playlists,
+            "in_playlists": len(playlists),
+            "sync": sync,
+        }
+
+    def find_playlist_duplicates(
+        self, playlist_id: Optional[str] = None, refresh: bool = False
+    ) -> Dict[str, Any]:
+        """Músicas repetidas dentro das playlists e presentes em mais de uma
+
+        Com playlist_id, só as repetições daquela playlist e as músicas dela
+        que também estão em outras.
+        """
+        if playlist_id:
+            playlist_id = spotify_id(playlist_id, "playlist")
+        sync = self.sync_playlist_index(force=refresh)
+        if playlist_id and playlist_id not in self.playlist_index.playlists:
+            raise ValueError("Playlist não encontrada nas playlists do usuário")
+        result = self.playlist_index.duplicates(playlist_id)
+        result["equivalent"] = self._equivalent_playlist_tracks(playlist_id)
+        result["sync"] = sync
+        return result
+
+    def _equivalent_playlist_tracks(
+        self, playlist_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Gravações presentes nas playlists com mais de um ID (single x álbum)"""
+        index = self.playlist_index
+        groups: Dict[str, Dict[str, Dict[str, str]]] = {}
+        for owner, playlist in list(index.playlists.items()):
+            for track_id in playlist["track_ids"]:
+                if track_id:
+                    recording = self.equivalence.root(track_id)
+                    groups.setdefault(recording, {}).setdefault(track_id, {})[owner] = (
+                        playlist["name"]
+                    )
+
+        equivalent = []
+        for editions in groups.values():
+            if len(editions) < 2:
+                continue
+            if playlist_id and not any(playlist_id in p for p in editions.values()):
+                continue
+            equivalent.append(
+                {
+                    "isrc": next(
+                        filter(None, map(self.equivalence.isrc_of, editions)), None
+                    ),
+                    "tracks": [
+                        {
+                            "track_id": track_id,
+                            "name": index.labels.get(track_id),
+                            "playlists": [
+                                {"id": owner, "name": name}
+                                for owner, name in playlists.items()
+                            ],
+                        }
+                        for track_id, playlists in editions.items()
+                    ],
+                }
+            )
+        return equivalent
+
+    def find_equivalent_tracks(
+        self, track: str, search: bool = False
+    ) -> Dict[str, Any]:
+        """Outros IDs da mesma gravação (single, álbum, deluxe, coletânea)
+
+        Responde pelo índice de equivalência. Uma música ainda sem ISRC no
+        índice é hidratada (cache de catálogo ou uma requisição); com
+        search=True, a busca "isrc:" da Web API completa o índice.
+        """
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        track_id = spotify_id(track, "track")
+        try:
+            if self.equivalence.isrc_of(track_id) is None:
+                self._hydrate("track", [track_id], self.track_loader)
+            isrc = self.equivalence.isrc_of(track_id)
+            if search and isrc:
+                results = self.client.search(
+                    q=f"isrc:{isrc}", type="track", limit=SEARCH_PAGE_SIZE
+                )
+                self.equivalence.add_many(results["tracks"]["items"])
+        except Exception as e:
+            raise ValueError(f"Erro ao buscar edições equivalentes: {str(e)}")
+
+        equivalents = self.equivalence.equivalents(track_id)
+        return {
+            "track_id": track_id,
+            "isrc": isrc,
+            "equivalents": [
+                {
+                    "id": i,
+                    "uri": f"spotify:track:{i}",
+                    "isrc": self.equivalence.isrc_of(i),
+                }
+                for i in equivalents
+            ],
+            "searched": bool(search and isrc),
+        }
+
     def get_user_albums(self) -> Dict[str, List[Dict[str, Any]]]:
         """Obter álbuns salvos do usuário"""
         if not self.client:
@@ -549,16 +1316,17 @@ class SpotifyService:
         except Exception as e:
             raise ValueError(f"Erro ao obter álbuns: {str(e)}")
 
-    def get_saved_tracks(self) -> Dict[str, List[Dict[str, Any]]]:
+    def get_saved_tracks(self, limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
         """Obter músicas salvas do usuário"""
         if not self.client:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            tracks = self.client.current_user_saved_tracks()
+            tracks = self.client.current_user_saved_tracks(limit=limit)
             saved_tracks = []
             for item in tracks["items"]:
                 track = item["track"]
+                self.equivalence.add(track)
                 saved_tracks.append(
                     {
                         "name": track["name"],
@@ -568,17 +1336,26 @@ class SpotifyService:
                         "duration_ms": track["duration_ms"],
                     }
                 )
+            self.aggregates.record_saved(saved_tracks)
+            self.aggregates.save()
             return {"tracks": saved_tracks}
         except Exception as e:
             raise ValueError(f"Erro ao obter músicas salvas: {str(e)}")
 
-    def get_top_artists(self) -> Dict[str, List[Dict[str, Any]]]:
+    def get_top_artists(
+        self, limit: int = 20, time_range: str = "medium_term"
+    ) -> Dict[str, List[Dict[str, Any]]]:
         """Obter artistas favoritos do usuário"""
         if not self.client:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            artists = self.client.current_user_top_artists()
+            artists = self.client.current_user_top_artists(
+                limit=limit, time_range=time_range
+            )
+            for artist in artists["items"]:
+                self.aggregates.record_artist_genres(artist["name"], artist["genres"])
+            self.aggregates.save()
             return {"artists": artists["items"]}
         except Exception as e:
             if "403" in str(e) or "Insufficient client scope" in str(e):
@@ -587,13 +1364,17 @@ class SpotifyService:
                 )
             raise ValueError(f"Erro ao obter artistas: {str(e)}")
 
-    def get_top_tracks(self) -> Dict[str, List[Dict[str, Any]]]:
+    def get_top_tracks(
+        self, limit: int = 20, time_range: str = "medium_term"
+    ) -> Dict[str, List[Dict[str, Any]]]:
         """Obter músicas mais tocadas do usuário"""
         if not self.client:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            tracks = self.client.current_user_top_tracks()
+            tracks = self.client.current_user_top_tracks(
+                limit=limit, time_range=time_range
+            )
             top_tracks = []
             for track in tracks["items"]:
                 top_tracks.append(
@@ -710,11 +1491,14 @@ class SpotifyService:
             raise ValueError("Posição deve ser maior ou igual a 0")
 
         try:
-            self.client.seek_track(position_ms)
-            return {"message": f"Pulado para {position_ms}ms"}
+            return self.coalescer.submit("seek", position_ms, self._apply_seek)
         except Exception as e:
             raise ValueError(f"Erro ao pular posição: {str(e)}")
 
+    def _apply_seek(self, position_ms: int) -> Dict[str, Any]:
+        self.client.seek_track(position_ms)
+        return {"message": f"Pulado para {position_ms}ms", "position_ms": position_ms}
+
     def get_queue(self) -> Dict[str, Any]:
         """Obter fila de reprodução atual"""
         if not self.client:
@@ -732,7 +1516,7 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            self.client.add_to_queue(track_uri)
+            self.client.add_to_queue(spotify_uri(track_uri, "track"))
             return {"message": "Música adicionada à fila"}
         except Exception as e:
             raise ValueError(f"Erro ao adicionar à fila: {str(e)}")
@@ -751,10 +1535,10 @@ class SpotifyService:
         try:
             seeds = {}
             if seed_artists:
-                artists = seed_artists.split(",")[:5]
+                artists = spotify_ids(seed_artists.split(",")[:5], "artist")
                 seeds["seed_artists"] = artists
             if seed_tracks:
-                tracks = seed_tracks.split(",")[:5]
+                tracks = spotify_ids(seed_tracks.split(",")[:5], "track")
                 seeds["seed_tracks"] = tracks
             if seed_genres:
                 genres = seed_genres.split(",")[:5]
@@ -768,7 +1552,17 @@ class SpotifyService:
             if total_seeds > 5:
                 raise ValueError("Máximo de 5 seeds permitido no total")
 
-            recommendations = self.client.recommendations(**seeds, limit=limit)
+            # Endpoint indisponível para a conta: sugestões montadas localmente
+            if self.breakers.is_open(RECOMMENDATIONS_ENDPOINT):
+                return self._fallback_recommendations(seeds, limit)
+            try:
+                recommendations = self.client.recommendations(**seeds, limit=limit)
+            except spotipy.SpotifyException as e:
+                if e.http_status in FAILURE_STATUSES and self.breakers.is_open(
+                    RECOMMENDATIONS_ENDPOINT
+                ):
+                    return self._fallback_recommendations(seeds, limit)
+                raise
             tracks = []
             for track in recommendations["tracks"]:
                 tracks.append(
@@ -792,6 +1586,51 @@ class SpotifyService:
                 )
             raise ValueError(f"Erro interno: {str(e)}")
 
+    def _fallback_recommendations(
+        self, seeds: Dict[str, List[str]], limit: int
+    ) -> Dict[str, Any]:
+        """Recomendações sem o endpoint /recommendations: músicas populares dos
+        artistas semente (e dos artistas das músicas semente) e busca por gênero"""
+        seed_uris = {f"spotify:track:{i}" for i in seeds.get("seed_tracks", [])}
+        artist_ids = list(seeds.get("seed_artists", []))
+        if seeds.get("seed_tracks"):
+            for track in self.track_loader.load_many(seeds["seed_tracks"]):
+                if track and track["artist_ids"]:
+                    artist_ids.append(track["artist_ids"][0])
+
+        candidates: List[Dict[str, Any]] = []
+        for artist_id in dict.fromkeys(artist_ids):
+            candidates.extend(self.client.artist_top_tracks(artist_id)["tracks"])
+        for genre in seeds.get("seed_genres", []):
+            results = self.client.search(
+                q=f'genre:"{genre}"', type="track", limit=min(limit, SEARCH_PAGE_SIZE)
+            )
+            candidates.extend(results["tracks"]["items"])
+
+        tracks = []
+        seen = set(seed_uris)
+        for track in sorted(candidates, key=lambda t: -(t.get("popularity") or 0)):
+            if not track or track["uri"] in seen:
+                continue
+            seen.add(track["uri"])
+            tracks.append(
+                {
+                    "name": track["name"],
+                    "artist": track["artists"][0]["name"],
+                    "album": track["album"]["name"],
+                    "uri": track["uri"],
+                    "duration_ms": track["duration_ms"],
+                }
+            )
+            if len(tracks) >= limit:
+                break
+        return {
+            "tracks": tracks,
+            "fallback": True,
+            "message": "API de recomendações indisponível; sugestões baseadas "
+            "nas músicas populares dos seeds",
+        }
+
     def get_genres(self) -> Dict[str, List[str]]:
         """Obter gêneros musicais disponíveis"""
         # Lista de gêneros musicais comuns do Spotify
@@ -946,14 +1785,14 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            features = self.client.audio_features(track_id)
-            if not features or not features[0]:
+            track_id = spotify_id(track_id, "track")
+            feature = self._fetch_audio_features([track_id]).get(track_id)
+            if not feature:
                 return {
                     "features": None,
                     "message": "Características de áudio não disponíveis",
                 }
 
-            feature = features[0]
             return {
                 "features": {
                     "tempo": feature.get("tempo"),  # Batida (BPM)
@@ -994,11 +1833,12 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            features = self.client.audio_features(track_id)
-            if not features or not features[0]:
+            track_id = spotify_id(track_id, "track")
+            feature = self._fetch_audio_features([track_id]).get(track_id)
+            if not feature:
                 return {"tempo": None, "message": "Tempo não disponível"}
 
-            tempo = features[0].get("tempo")
+            tempo = feature.get("tempo")
             return {
                 "tempo": tempo,
                 "bpm": tempo,  # BPM (Beats Per Minute)
@@ -1049,18 +1889,44 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            self.client.current_user_saved_tracks_add(tracks=[track_id])
+            self._save_favorite(spotify_id(track_id, "track"))
             return {"message": "Música adicionada aos favoritos com sucesso"}
         except Exception as e:
             raise ValueError(f"Erro ao adicionar aos favoritos: {str(e)}")
 
+    def _save_favorite(self, track_id: str, artist: Optional[str] = None) -> None:
+        """Salva nos favoritos e atualiza os agregados (com o artista)"""
+        self.client.current_user_saved_tracks_add(tracks=[track_id])
+        if artist is None:
+            artist = self._track_artist(track_id)
+        self.aggregates.record_saved(
+            [{"uri": f"spotify:track:{track_id}", "artist": artist}]
+        )
+        self.aggregates.save()
+
+    def _track_artist(self, track_id: str) -> Optional[str]:
+        """Artista principal (cache de catálogo ou uma busca em lote)"""
+        try:
+            record = catalog_cache.get(f"track:{track_id}") or self.track_loader.load(
+                track_id
+            )
+        except Exception as e:
+            logger.warning(f"Artista da música {track_id} indisponível: {e}")
+            return None
+        artists = (record or {}).get("artists") or [None]
+        return artists[0]
+
     def remove_track_from_favorites(self, track_id: str) -> Dict[str, str]:
         """Remover música dos favoritos (liked songs)"""
         if not self.client:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
+            track_id = spotify_id(track_id, "track")
             self.client.current_user_saved_tracks_delete(tracks=[track_id])
+            # O artista registrado ao salvar é descontado pelos agregados
+            self.aggregates.record_unsaved(f"spotify:track:{track_id}")
+            self.aggregates.save()
             return {"message": "Música removida dos favoritos com sucesso"}
         except Exception as e:
             raise ValueError(f"Erro ao remover dos favoritos: {str(e)}")
@@ -1095,14 +1961,26 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            result = self.client.current_user_saved_tracks_contains(tracks=[track_id])
-            is_saved = result[0] if result else False
+            track_id = spotify_id(track_id, "track")
+            # Outras edições conhecidas vão na mesma consulta (lotes de 50)
+            equivalents = self.equivalence.equivalents(track_id)
+            saved = self.saved_tracks_loader.load_many([track_id] + equivalents)
+            is_saved = bool(saved[0])
+            saved_equivalents = [
+                f"spotify:track:{i}"
+                for i, found in zip(equivalents, saved[1:])
+                if found
+            ]
 
-            return {
+            result = {
                 "is_saved": is_saved,
                 "track_id": track_id,
+                "saved_equivalents": saved_equivalents,
                 "message": f"Música {'está' if is_saved else 'não está'} nos favoritos",
             }
+            if saved_equivalents and not is_saved:
+                result["message"] += " (outra edição da mesma gravação está)"
+            return result
         except Exception as e:
             raise ValueError(f"Erro ao verificar favoritos: {str(e)}")
 
@@ -1172,6 +2050,9 @@ class SpotifyService:
             try:
                 top_artists = self.client.current_user_top_artists(limit=limit)
                 for artist in top_artists["items"]:
+                    self.aggregates.record_artist_genres(
+                        artist["name"], artist["genres"]
+                    )
                     analytics["top_artists"].append(
                         {
                             "name": artist["name"],
@@ -1188,6 +2069,7 @@ class SpotifyService:
                 saved = self.client.current_user_saved_tracks(limit=limit)
                 for item in saved["items"]:
                     track = item["track"]
+                    self.equivalence.add(track)
                     analytics["saved_tracks"].append(
                         {
                             "name": track["name"],
@@ -1215,6 +2097,11 @@ class SpotifyService:
             except Exception as e:
                 logger.warning(f"Erro ao obter playlists: {e}")
 
+            # Atualizar contadores incrementais com o que chegou de novo
+            self.aggregates.ingest_recent(analytics["recently_played"])
+            self.aggregates.record_saved(analytics["saved_tracks"])
+            self.aggregates.save()
+
             # Resumo estatístico
             analytics["summary"] = {
                 "total_recently_played": len(analytics["recently_played"]),
@@ -1222,42 +2109,64 @@ class SpotifyService:
                 "total_top_artists": len(analytics["top_artists"]),
                 "total_saved_tracks": len(analytics["saved_tracks"]),
                 "total_playlists": len(analytics["playlists"]),
-                "most_played_artist": self._get_most_played_artist(
-                    analytics["recently_played"]
-                ),
-                "most_played_track": self._get_most_played_track(
-                    analytics["recently_played"]
-                ),
+                "most_played_artist": self.aggregates.most_played_artist(),
+                "most_played_track": self.aggregates.most_played_track(),
             }
+            analytics["aggregates"] = self.aggregates.summary()
 
             return analytics
 
         except Exception as e:
             raise ValueError(f"Erro ao obter dados analíticos: {str(e)}")
 
-    def _get_most_played_artist(self, tracks: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Obter artista mais reproduzido"""
-        artist_counts = {}
-        for track in tracks:
-            artist = track["artist"]
-            artist_counts[artist] = artist_counts.get(artist, 0) + 1
-
-        if artist_counts:
-            most_played = max(artist_counts.items(), key=lambda x: x[1])
-            return {"name": most_played[0], "count": most_played[1]}
-        return {"name": "N/A", "count": 0}
-
-    def _get_most_played_track(self, tracks: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Obter música mais reproduzida"""
-        track_counts = {}
-        for track in tracks:
-            track_key = f"{track['name']} - {track['artist']}"
-            track_counts[track_key] = track_counts.get(track_key, 0) + 1
-
-        if track_counts:
-            most_played = max(track_counts.items(), key=lambda x: x[1])
-            return {"name": most_played[0], "count": most_played[1]}
-        return {"name": "N/A", "count": 0}
+    def get_listening_aggregates(self, top: int = 10) -> Dict[str, Any]:
+        """Obter contadores de escuta acumulados (sem chamadas à API)
+
+        Os contadores são atualizados por get_recently_played,
+        get_listening_analytics, get_saved_tracks e pelas tools de favoritos.
+        """
+        return self.aggregates.summary(top)
+
+    def _export_dir(self, output_dir: Optional[str]) -> str:
+        """Diretório da exportação, sempre dentro de EXPORT_DIR/<usuário>
+
+        Caminhos relativos partem do diretório do usuário; absolutos (ou com
+        "..") que saiam dele são recusados.
+        """
+        base = os.path.realpath(os.path.join(EXPORT_DIR, self.user_id))
+        if not output_dir:
+            return os.path.join(base, time.strftime("%Y%m%d-%H%M%S"))
+        target = os.path.realpath(os.path.join(base, output_dir))
+        if os.path.commonpath([base, target]) != base:
+            raise ValueError(f"output_dir deve ficar dentro de {base}")
+        return target
+
+    def export_library(
+        self,
+        datasets: Optional[List[str]] = None,
+        file_format: str = "jsonl",
+        output_dir: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Exportar biblioteca, playlists, audio features e histórico para disco
+
+        Os dados são lidos página a página e gravados em lotes (jsonl, parquet
+        ou arrow), sem acumular a biblioteca inteira em memória.
+        """
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        try:
+            target_dir = self._export_dir(output_dir)
+            exporter = LibraryExporter(
+                self.client,
+                target_dir,
+                file_format,
+                playlist_cache=playlist_cache,
+                max_cached_items=PLAYLIST_CACHE_MAX_ITEMS,
+            )
+            return exporter.run(datasets)
+        except Exception as e:
+            raise ValueError(f"Erro ao exportar biblioteca: {str(e)}")
 
     def search_and_add_to_queue(self, query: str, limit: int = 10) -> Dict[str, Any]:
         """Buscar músicas e adicionar todas à fila de reprodução"""
@@ -1276,6 +2185,10 @@ class SpotifyService:
                     "tracks_found": 0,
                 }
 
+            # Edições diferentes da mesma música (single, álbum) entram uma vez
+            found = len(tracks)
+            tracks, duplicates = self._skip_repeats(tracks)
+
             # Adicionar cada música à fila
             added_count = 0
             failed_tracks = []
@@ -1296,14 +2209,18 @@ class SpotifyService:
 
             # Preparar resultado
             result = {
-                "message": f"Adicionadas {added_count} de {len(tracks)} músicas à fila",
+                "message": f"Adicionadas {added_count} de {found} músicas à fila",
                 "tracks_added": added_count,
-                "tracks_found": len(tracks),
+                "tracks_found": found,
                 "query": query,
                 "added_tracks": tracks[:added_count],
                 "failed_tracks": failed_tracks,
+                "skipped_duplicates": duplicates,
             }
 
+            if duplicates:
+                result["message"] += f" ({len(duplicates)} repetidas)"
+
             if failed_tracks:
                 result["message"] += f" ({len(failed_tracks)} falharam)"
 
@@ -1331,23 +2248,40 @@ class SpotifyService:
                     "tracks_found": 0,
                 }
 
+            # Edições diferentes da mesma música (single, álbum) entram uma vez
+            found = len(tracks)
+            tracks, duplicates = self._skip_repeats(tracks)
+
+            # Uma consulta aos favoritos (lotes de 50) para todas as músicas e
+            # as outras edições delas já conhecidas pelo índice de equivalência
+            track_ids = spotify_ids((track["uri"] for track in tracks), "track")
+            equivalents = {i: self.equivalence.equivalents(i) for i in track_ids}
+            check = list(dict.fromkeys(track_ids + sum(equivalents.values(), [])))
+            saved = dict(zip(check, self.saved_tracks_loader.load_many(check)))
+
             # Adicionar cada música aos favoritos
             added_count = 0
             already_saved = 0
+            saved_as_other_edition = []
             failed_tracks = []
 
-            for track in tracks:
+            for track, track_id in zip(tracks, track_ids):
                 try:
-                    track_id = track["uri"].split(":")[-1]
-
                     # Verificar se já está nos favoritos
-                    check_result = self.check_track_in_favorites(track_id)
-                    if check_result.get("is_saved", False):
+                    if saved.get(track_id):
                         already_saved += 1
                         continue
+                    saved_as = next(
+                        (i for i in equivalents[track_id] if saved.get(i)), None
+                    )
+                    if saved_as:
+                        saved_as_other_edition.append(
+                            {**track, "saved_as": f"spotify:track:{saved_as}"}
+                        )
+                        continue
 
-                    # Adicionar aos favoritos
-                    self.add_track_to_favorites(track_id)
+                    # Adicionar aos favoritos (o artista já veio da busca)
+                    self._save_favorite(track_id, track["artist"])
                     added_count += 1
 
                 except Exception as e:
@@ -1363,16 +2297,26 @@ class SpotifyService:
             result = {
                 "message": f"Adicionadas {added_count} músicas aos favoritos",
                 "tracks_added": added_count,
-                "tracks_found": len(tracks),
+                "tracks_found": found,
                 "already_saved": already_saved,
+                "saved_as_other_edition": saved_as_other_edition,
                 "query": query,
                 "added_tracks": tracks[:added_count],
                 "failed_tracks": failed_tracks,
+                "skipped_duplicates": duplicates,
             }
 
             if already_saved > 0:
                 result["message"] += f" ({already_saved} já estavam salvas)"
 
+            if saved_as_other_edition:
+                result[
+                    "message"
+                ] += f" ({len(saved_as_other_edition)} salvas em outra edição)"
+
+            if duplicates:
+                result["message"] += f" ({len(duplicates)} repetidas)"
+
             if failed_tracks:
                 result["message"] += f" ({len(failed_tracks)} falharam)"
 
@@ -1398,6 +2342,10 @@ class SpotifyService:
                     "tracks_found": 0,
                 }
 
+            # Edições diferentes da mesma música (single, álbum) tocam uma vez
+            found = len(tracks)
+            tracks, duplicates = self._skip_repeats(tracks)
+
             # Reproduzir a primeira música
             first_track = tracks[0]
             self.play_music(first_track["uri"])
@@ -1425,12 +2373,16 @@ class SpotifyService:
                 "message": f"Reproduzindo '{first_track['name']}' e adicionadas {queued_count} músicas à fila",
                 "now_playing": first_track,
                 "tracks_queued": queued_count,
-                "tracks_found": len(tracks),
+                "tracks_found": found,
                 "query": query,
                 "queued_tracks": tracks[1 : queued_count + 1],
                 "failed_tracks": failed_tracks,
+                "skipped_duplicates": duplicates,
             }
 
+            if duplicates:
+                result["message"] += f" ({len(duplicates)} repetidas)"
+
             if failed_tracks:
                 result["message"] += f" ({len(failed_tracks)} falharam)"
 
@@ -1439,6 +2391,243 @@ class SpotifyService:
         except Exception as e:
             raise ValueError(f"Erro ao buscar e reproduzir: {str(e)}")
 
+    def _collect_flow_tracks(
+        self,
+        track_uris: Optional[List[str]],
+        playlist_id: Optional[str],
+        query: Optional[str],
+        use_saved_tracks: bool,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """Reúne músicas (uri, nome, artista) da fonte indicada, sem repetições
+
+        Outras edições de uma música já reunida (single x álbum, mesmo ISRC)
+        também contam como repetição.
+        """
+        tracks: List[Dict[str, Any]] = []
+        seen = set()
+
+        def add(track: Optional[Dict[str, Any]]) -> None:
+            if not track or not track.get("uri"):
+                return
+            if not track["uri"].startswith("spotify:track:"):
+                return
+            self.equivalence.add(track)
+            recording = self.equivalence.root(track["uri"].rsplit(":", 1)[1])
+            if recording in seen:
+                return
+            seen.add(recording)
+            artists = track.get("artists") or [{}]
+            tracks.append(
+                {
+                    "name": track.get("name"),
+                    "artist": artists[0].get("name"),
+                    "uri": track["uri"],
+                }
+            )
+
+        if track_uris:
+            for track_id in spotify_ids(track_uris[:limit], "track"):
+                add({"uri": f"spotify:track:{track_id}"})
+
+        if playlist_id and len(tracks) < limit:
+            page = self.client.playlist_items(
+                spotify_id(playlist_id, "playlist"),
+                fields=(
+                    "items(track(name,uri,duration_ms,external_ids,artists(name))),next"
+                ),
+                limit=PLAYLIST_PAGE_SIZE,
+                additional_types=("track",),
+            )
+            while page and len(tracks) < limit:
+                for item in page["items"]:
+                    add(item.get("track"))
+                page = self.client.next(page) if page.get("next") else None
+
+        if query and len(tracks) < limit:
+            offset = 0
+            while len(tracks) < limit:
+                page_size = min(SEARCH_PAGE_SIZE, limit - len(tracks))
+                results = self.client.search(
+                    q=query, type="track", limit=page_size, offset=offset
+                )
+                items = results["tracks"]["items"]
+                for track in items:
+                    add(track)
+                if len(items) < page_size or not results["tracks"].get("next"):
+                    break
+                offset += page_size
+
+        if use_saved_tracks and len(tracks) < limit:
+            page = self.client.current_user_saved_tracks(limit=SAVED_TRACKS_PAGE_SIZE)
+            while page and len(tracks) < limit:
+                for item in page["items"]:
+                    add(item.get("track"))
+                page = self.client.next(page) if page.get("next") else None
+
+        return tracks[:limit]
+
+    def _fetch_audio_features(self, track_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Busca audio features (lotes de 100 IDs), usando o cache de catálogo"""
+        cached = catalog_cache.get_many(f"audio_features:{i}" for i in track_ids)
+        features: Dict[str, Dict[str, Any]] = {
+            key.split(":", 1)[1]: value for key, value in cached.items()
+        }
+        missing = [i for i in dict.fromkeys(track_ids) if i not in features]
+        # Endpoint indisponível: o que já está em cache serve de resposta parcial
+        if features and missing and self.breakers.is_open(AUDIO_FEATURES_ENDPOINT):
+            return features
+        # Em lotes de 100, junto com buscas de outras tools em andamento
+        for track_id, feature in zip(
+            missing, self.audio_features_loader.load_many(missing)
+        ):
+            if feature:
+                features[track_id] = feature
+        return features
+
+    def build_flow_queue(
+        self,
+        track_uris: Optional[List[str]] = None,
+        playlist_id: Optional[str] = None,
+        query: Optional[str] = None,
+        use_saved_tracks: bool = False,
+        limit: int = 100,
+        action: str = "play",
+    ) -> Dict[str, Any]:
+        """Ordenar músicas por BPM/tom/energia e tocar ou enfileirar o resultado
+
+        As músicas podem vir de URIs explícitas, de uma playlist, de uma busca ou
+        das músicas salvas. As características de áudio são buscadas em lotes de
+        100 e a ordem é otimizada (guloso + 2-opt) para minimizar saltos de
+        batida e tom. Com action="play" a sequência inteira é enviada em uma
+        única chamada de start_playback; com action="queue" cada música é
+        adicionada à fila (a API não tem endpoint de fila em lote); com
+        action="none" apenas a ordem é retornada.
+        """
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        if action not in ("play", "queue", "none"):
+            raise ValueError("action deve ser 'play', 'queue' ou 'none'")
+
+        if not (track_uris or playlist_id or query or use_saved_tracks):
+            raise ValueError(
+                "Informe track_uris, playlist_id, query ou use_saved_tracks"
+            )
+
+        try:
+            tracks = self._collect_flow_tracks(
+                track_uris, playlist_id, query, use_saved_tracks, limit
+            )
+            if not tracks:
+                return {"message": "Nenhuma música encontrada", "tracks": []}
+
+            try:
+                features = self._fetch_audio_features(
+                    spotify_ids((track["uri"] for track in tracks), "track")
+                )
+            except Exception as e:
+                error_text = str(e)
+                if "403" in error_text or "forbidden" in error_text.lower():
+                    return {
+                        "tracks": [],
+                        "message": (
+                            "Características de áudio não disponíveis (erro 403). "
+                            "Pode requerer Spotify Premium."
+                        ),
+                        "error": {"status": 403, "type": "forbidden"},
+                    }
+                raise
+
+            for track in tracks:
+                feature = features.get(spotify_id(track["uri"], "track")) or {}
+                track["tempo"] = feature.get("tempo")
+                track["key"] = feature.get("key")
+                track["mode"] = feature.get("mode")
+                track["energy"] = feature.get("energy")
+
+            flow = order_by_flow(tracks)
+            ordered = flow["tracks"]
+            uris = [track["uri"] for track in ordered]
+
+            result = {
+                "tracks": ordered,
+                "tracks_found": len(ordered),
+                "tracks_without_features": sum(
+                    1 for track in ordered if not track["tempo"]
+                ),
+                "total_cost": flow["total_cost"],
+                "greedy_cost": flow["greedy_cost"],
+                "action": action,
+            }
+
+            if action == "none":
+                result["message"] = f"Ordenadas {len(ordered)} músicas"
+            else:
+                self._send_to_player(uris, action, result)
+
+            return result
+
+        except Exception as e:
+            raise ValueError(f"Erro ao montar fila por batida: {str(e)}")
+
+    def _send_to_player(
+        self, uris: List[str], action: str, result: Dict[str, Any]
+    ) -> None:
+        """Toca (action="play") ou enfileira (action="queue") as URIs em ordem
+
+        URIs da mesma gravação que uma anterior (mesmo ISRC) ficam de fora.
+        """
+        if action in ("play", "queue"):
+            kept, result["skipped_duplicates"] = self._skip_repeats(
+                [{"uri": uri} for uri in uris]
+            )
+            uris = [track["uri"] for track in kept]
+        if action == "play":
+            self._ensure_active_device()
+            self.client.start_playback(uris=uris[:MAX_PLAYBACK_URIS])
+            result["tracks_played"] = min(len(uris), MAX_PLAYBACK_URIS)
+            result["message"] = (
+                f"Reproduzindo {result['tracks_played']} músicas em sequência"
+            )
+            # start_playback aceita até 100 URIs; o restante vai para a fila
+            rest = uris[MAX_PLAYBACK_URIS:]
+            if rest:
+                self._queue_uris(rest, result)
+                result["message"] += f" e adicionadas {result['tracks_queued']} à fila"
+        elif action == "queue":
+            self._queue_uris(uris, result)
+            result["message"] = f"Adicionadas {result['tracks_queued']} músicas à fila"
+
+    def _queue_uris(self, uris: List[str], result: Dict[str, Any]) -> None:
+        """Adiciona as URIs à fila, uma a uma, registrando as falhas"""
+        queued = 0
+        failed_tracks = []
+        for uri in uris:
+            try:
+                self.client.add_to_queue(uri=uri)
+                queued += 1
+            except Exception as e:
+                failed_tracks.append({"uri": uri, "error": str(e)})
+        result["tracks_queued"] = queued
+        result["failed_tracks"] = failed_tracks
+
+    def _skip_repeats(self, tracks: List[Dict[str, Any]]) -> tuple:
+        """Músicas sem gravações repetidas e as descartadas (com a que ficou)
+
+        Usa só o índice de equivalência (ISRC), sem requisições.
+        """
+        repeats = self.equivalence.repeats(
+            track["uri"].rsplit(":", 1)[-1] for track in tracks
+        )
+        kept = [track for track, same in zip(tracks, repeats) if same is None]
+        skipped = [
+            {**track, "same_as": f"spotify:track:{same}"}
+            for track, same in zip(tracks, repeats)
+            if same is not None
+        ]
+        return kept, skipped
+
     def get_recently_played(self, limit: int = 20) -> Dict[str, List[Dict[str, Any]]]:
         """Obter músicas reproduzidas recentemente"""
         if not self.client:
@@ -1459,6 +2648,8 @@ class SpotifyService:
                         "played_at": item["played_at"],
                     }
                 )
+            self.aggregates.ingest_recent(tracks)
+            self.aggregates.save()
             return {"tracks": tracks}
         except Exception as e:
             if "403" in str(e) or "Insufficient client scope" in str(e):
@@ -1498,6 +2689,7 @@ class SpotifyService:
             artists = self.client.current_user_followed_artists(limit=limit)
             followed_artists = []
             for artist in artists["artists"]["items"]:
+                self.aggregates.record_artist_genres(artist["name"], artist["genres"])
                 followed_artists.append(
                     {
                         "name": artist["name"],
@@ -1506,6 +2698,7 @@ class SpotifyService:
                         "popularity": artist["popularity"],
                     }
                 )
+            self.aggregates.save()
             return {"artists": followed_artists}
         except Exception as e:
             if "403" in str(e) or "Insufficient client scope" in str(e):
@@ -1523,17 +2716,8 @@ class SpotifyService:
 
         try:
             results = self.client.search(q=query, type="artist", limit=limit)
-            artists = []
-            for artist in results["artists"]["items"]:
-                artists.append(
-                    {
-                        "name": artist["name"],
-                        "uri": artist["uri"],
-                        "genres": artist["genres"],
-                        "popularity": artist["popularity"],
-                    }
-                )
-            return {"artists": artists}
+            items = results["artists"]["items"]
+            return {"artists": [artist_summary(item) for item in items]}
         except Exception as e:
             raise ValueError(f"Erro na busca de artistas: {str(e)}")
 
@@ -1546,17 +2730,8 @@ class SpotifyService:
 
         try:
             results = self.client.search(q=query, type="album", limit=limit)
-            albums = []
-            for album in results["albums"]["items"]:
-                albums.append(
-                    {
-                        "name": album["name"],
-                        "artist": album["artists"][0]["name"],
-                        "uri": album["uri"],
-                        "release_date": album["release_date"],
-                    }
-                )
-            return {"albums": albums}
+            items = results["albums"]["items"]
+            return {"albums": [album_summary(item) for item in items]}
         except Exception as e:
             raise ValueError(f"Erro na busca de álbuns: {str(e)}")
 
@@ -1569,17 +2744,8 @@ class SpotifyService:
 
         try:
             results = self.client.search(q=query, type="playlist", limit=limit)
-            playlists = []
-            for playlist in results["playlists"]["items"]:
-                playlists.append(
-                    {
-                        "name": playlist["name"],
-                        "owner": playlist["owner"]["display_name"],
-                        "uri": playlist["uri"],
-                        "tracks_total": playlist["tracks"]["total"],
-                    }
-                )
-            return {"playlists": playlists}
+            items = results["playlists"]["items"]
+            return {"playlists": [playlist_summary(item) for item in items]}
         except Exception as e:
             raise ValueError(f"Erro na busca de playlists: {str(e)}")
 
@@ -1589,7 +2755,7 @@ class SpotifyService:
             raise ValueError("Cliente Spotipy não inicializado")
 
         try:
-            album = self.client.album_tracks(album_id)
+            album = self.client.album_tracks(spotify_id(album_id, "album"))
             tracks = []
             for track in album["items"]:
                 tracks.append(
@@ -1604,6 +2770,450 @@ class SpotifyService:
         except Exception as e:
             raise ValueError(f"Erro ao obter músicas do álbum: {str(e)}")
 
+    def get_artist_top_tracks(self, artist_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Obter músicas mais populares de um artista"""
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        try:
+            results = self.client.artist_top_tracks(spotify_id(artist_id, "artist"))
+            tracks = []
+            for track in results["tracks"]:
+                tracks.append(
+                    {
+                        "name": track["name"],
+                        "artist": track["artists"][0]["name"],
+                        "album": track["album"]["name"],
+                        "uri": track["uri"],
+                        "popularity": track.get("popularity"),
+                    }
+                )
+            return {"tracks": tracks}
+        except Exception as e:
+            raise ValueError(f"Erro ao obter músicas do artista: {str(e)}")
+
+    def get_artist_albums(
+        self, artist_id: str, limit: int = 20
+    ) -> Dict[str, List[Dict[str, Any]]]:
+        """Obter álbuns de um artista"""
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        try:
+            results = self.client.artist_albums(
+                spotify_id(artist_id, "artist"), limit=limit
+            )
+            albums = []
+            for album in results["items"]:
+                albums.append(
+                    {
+                        "name": album["name"],
+                        "uri": album["uri"],
+                        "release_date": album.get("release_date"),
+                        "total_tracks": album.get("total_tracks"),
+                    }
+                )
+            return {"albums": albums}
+        except Exception as e:
+            raise ValueError(f"Erro ao obter álbuns do artista: {str(e)}")
+
+    def _fetch_related_artists(self, artist_id: str) -> List[str]:
+        """Busca os relacionados (arestas) e guarda os artistas (nós) no catálogo"""
+        results = self.client.artist_related_artists(artist_id)
+        records = [compact_artist(a) for a in results["artists"] if a]
+        catalog_cache.set_many({f"artist:{r['id']}": r for r in records})
+        related = [record["id"] for record in records]
+        related_cache.set(artist_id, related)
+        return related
+
+    def _artist_records(self, artist_ids: List[str]) -> Dict[str, Any]:
+        """Registros compactos dos artistas (cache de catálogo, senão em lotes)"""
+        hydrated = hydrate(
+            "artist",
+            artist_ids,
+            self.artist_loader,
+            HYDRATE_CONCURRENCY,
+            max(1, len(artist_ids)),
+        )
+        return dict(zip(artist_ids, hydrated["artists"]))
+
+    def _explore_artists(
+        self, seed: str, hops: int, target: Optional[str] = None
+    ) -> Dict[str, Any]:
+        if not 1 <= hops <= ARTIST_GRAPH_MAX_HOPS:
+            raise ValueError(f"hops deve estar entre 1 e {ARTIST_GRAPH_MAX_HOPS}")
+        level = current_priority.get() or INTERACTIVE
+        slots = upstream_scheduler.concurrency.get(level, 1)
+        graph = expand(
+            [seed],
+            hops,
+            self._fetch_related_artists,
+            min(ARTIST_GRAPH_CONCURRENCY, slots),
+            ARTIST_GRAPH_MAX_ARTISTS,
+            cached=related_cache.get,
+            target=target,
+        )
+        if seed in graph["failed"]:
+            raise ValueError(graph["failed"][seed])
+        return graph
+
+    @staticmethod
+    def _graph_stats(graph: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "visited": len(graph["distance"]),
+            "fetched": graph["fetched"],
+            "cached": graph["cached"],
+            "truncated": graph["truncated"],
+            "failed": sorted(graph["failed"]),
+        }
+
+    def get_related_artists(self, artist_id: str) -> Dict[str, List[Dict[str, Any]]]:
+        """Obter artistas relacionados"""
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        try:
+            artist_id = spotify_id(artist_id, "artist")
+            related = related_cache.get(artist_id)
+            if related is None:
+                related = self._fetch_related_artists(artist_id)
+            records = self._artist_records(related)
+            artists = []
+            for related_id in related:
+                artist = records.get(related_id)
+                if artist:
+                    artists.append(
+                        {
+                            "name": artist["name"],
+                            "uri": artist["uri"],
+                            "genres": artist.get("genres", []),
+                            "popularity": artist.get("popularity"),
+                        }
+                    )
+            return {"artists": artists}
+        except Exception as e:
+            raise ValueError(f"Erro ao obter artistas relacionados: {str(e)}")
+
+    def explore_artist_graph(
+        self,
+        artist_id: str,
+        hops: int = 2,
+        genre: Optional[str] = None,
+        limit: int = 50,
+    ) -> Dict[str, Any]:
+        """Artistas a até `hops` saltos de relacionados, opcionalmente por gênero
+
+        A expansão é feita por camadas, com as listas de relacionados em cache
+        e as que faltam buscadas em paralelo.
+        """
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        try:
+            seed = spotify_id(artist_id, "artist")
+            graph = self._explore_artists(seed, hops)
+            records = self._artist_records(list(graph["distance"]))
+            artists = neighbourhood(graph, records, genre)
+        except Exception as e:
+            raise ValueError(f"Erro ao explorar artistas relacionados: {str(e)}")
+
+        return {
+            "artist": records.get(seed),
+            "hops": hops,
+            "genre": genre,
+            "artists": artists[:limit],
+            "total": len(artists),
+            "top_genres": genre_counts(artists),
+            **self._graph_stats(graph),
+        }
+
+    def find_artist_path(
+        self,
+        source_artist_id: str,
+        target_artist_id: str,
+        max_hops: int = ARTIST_GRAPH_MAX_HOPS,
+    ) -> Dict[str, Any]:
+        """Menor sequência de artistas relacionados entre dois artistas"""
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        try:
+            source = spotify_id(source_artist_id, "artist")
+            target = spotify_id(target_artist_id, "artist")
+            graph = self._explore_artists(source, max_hops, target)
+            path = path_to(graph, target) or []
+            records = self._artist_records(path)
+        except Exception as e:
+            raise ValueError(f"Erro ao buscar caminho entre artistas: {str(e)}")
+
+        result = {
+            "found": bool(path),
+            "hops": len(path) - 1 if path else None,
+            "path": [records.get(artist_id) for artist_id in path],
+            **self._graph_stats(graph),
+        }
+        if not path:
+            result["message"] = f"Nenhum caminho em até {max_hops} saltos"
+            if graph["truncated"]:
+                result[
+                    "message"
+                ] += f" (limite de {ARTIST_GRAPH_MAX_ARTISTS} artistas atingido)"
+        return result
+
+    def _hydrate(self, kind: str, values: List[str], loader) -> Dict[str, Any]:
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+        try:
+            result = hydrate(kind, values, loader, HYDRATE_CONCURRENCY, HYDRATE_MAX_IDS)
+        except Exception as e:
+            raise ValueError(f"Erro ao obter detalhes ({kind}): {str(e)}")
+        if kind == "track":
+            # Registros vindos do cache de catálogo também têm o ISRC
+            self.equivalence.add_many(result["tracks"])
+        return result
+
+    def hydrate_tracks(self, tracks: List[str]) -> Dict[str, Any]:
+        """Metadados compactos de várias músicas (IDs, URIs ou URLs), na ordem"""
+        return self._hydrate("track", tracks, self.track_loader)
+
+    def hydrate_artists(self, artists: List[str]) -> Dict[str, Any]:
+        """Metadados compactos de vários artistas (IDs, URIs ou URLs), na ordem"""
+        return self._hydrate("artist", artists, self.artist_loader)
+
+    def hydrate_albums(self, albums: List[str]) -> Dict[str, Any]:
+        """Metadados compactos de vários álbuns (IDs, URIs ou URLs), na ordem"""
+        return self._hydrate("album", albums, self.album_loader)
+
+    def _market(self) -> str:
+        """País da conta, que define o mercado das buscas (chave dos caches)
+
+        Sem o país (escopo user-read-private ausente ou falha) os resultados
+        ficam separados por usuário.
+        """
+        market = getattr(self, "_user_market", None)
+        if market is None:
+            try:
+                market = (self.client.current_user() or {}).get("country")
+            except Exception as e:
+                logger.warning(f"País da conta indisponível: {e}")
+            market = self._user_market = market or f"user:{self.user_id}"
+        return market
+
+    def _library_index(self) -> LibraryIndex:
+        """Índice das músicas já ouvidas, refeito quando os agregados crescem"""
+        aggregates = getattr(self, "aggregates", None)
+        labels = dict(aggregates.track_labels) if aggregates else {}
+        index = getattr(self, "_resolve_index", None)
+        if index is None or index.size != len(labels):
+            index = self._resolve_index = LibraryIndex(labels)
+        return index
+
+    def _search_match(
+        self, key: tuple, artist: Optional[str], title: str
+    ) -> Dict[str, Any]:
+        """Melhor candidato da busca remota para uma linha (guardado em cache)"""
+        best = None
+        for query in search_queries(artist, title):
+            results = self.client.search(
+                q=query, type="track", limit=RESOLVE_CANDIDATES
+            )
+            candidates = [
+                {
+                    "uri": item["uri"],
+                    "name": item["name"],
+                    "artists": [a["name"] for a in item.get("artists") or []],
+                }
+                for item in results["tracks"]["items"]
+                if item
+            ]
+            match = best_match(*key, candidates)
+            if match and (best is None or match["confidence"] > best["confidence"]):
+                best = match
+            if best and best["confidence"] >= RESOLVE_MIN_CONFIDENCE:
+                break
+        best = best or {"uri": None, "name": None, "artist": None, "confidence": 0.0}
+        resolve_cache.set((self._market(), *key), best)
+        return best
+
+    def resolve_tracks(
+        self,
+        tracks: List[str],
+        min_confidence: float = RESOLVE_MIN_CONFIDENCE,
+        action: str = "none",
+    ) -> Dict[str, Any]:
+        """Converter linhas "artista - título" em URIs com grau de confiança
+
+        Cada linha é procurada no índice local (músicas já ouvidas), depois no
+        cache de resoluções e só então na busca da Web API; as buscas saem em
+        paralelo, limitadas pelas vagas do escalonador. Linhas repetidas são
+        resolvidas uma vez. Com action="play" ou "queue" as URIs resolvidas
+        são tocadas ou enfileiradas na ordem da lista.
+        """
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        if action not in ("play", "queue", "none"):
+            raise ValueError("action deve ser 'play', 'queue' ou 'none'")
+
+        if len(tracks) > RESOLVE_MAX_TRACKS:
+            raise ValueError(f"Máximo de {RESOLVE_MAX_TRACKS} músicas por chamada")
+
+        try:
+            parsed = [parse_line(line) for line in tracks]
+            keys = [(normalize(artist), normalize(title)) for artist, title in parsed]
+            index = self._library_index()
+            market = self._market()
+
+            matches: Dict[tuple, Dict[str, Any]] = {}
+            pending: Dict[tuple, tuple] = {}
+            for key, (artist, title) in zip(keys, parsed):
+                if not key[1] or key in matches or key in pending:
+                    continue
+                local = index.lookup(*key)
+                if local and local["confidence"] >= min_confidence:
+                    matches[key] = {**local, "source": "library"}
+                    continue
+                cached = resolve_cache.get((market, *key))
+                if cached is not None:
+                    matches[key] = {**cached, "source": "cache"}
+                    continue
+                pending[key] = (artist, title)
+
+            if pending:
+                level = current_priority.get() or INTERACTIVE
+                slots = upstream_scheduler.concurrency.get(level, 1)
+                workers = max(1, min(RESOLVE_CONCURRENCY, slots, len(pending)))
+                with ThreadPoolExecutor(max_workers=workers) as pool:
+                    # Cada busca leva o contexto da tool (usuário, prioridade)
+                    futures = {
+                        key: pool.submit(
+                            contextvars.copy_context().run,
+                            self._search_match,
+                            key,
+                            *line,
+                        )
+                        for key, line in pending.items()
+                    }
+                    for key, future in futures.items():
+                        try:
+                            matches[key] = {**future.result(), "source": "search"}
+                        except Exception as e:
+                            matches[key] = {"uri": None, "error": str(e)}
+
+            results = []
+            for line, key in zip(tracks, keys):
+                match = matches.get(key) or {"uri": None, "confidence": 0.0}
+                resolved = bool(
+                    match.get("uri") and match.get("confidence", 0) >= min_confidence
+                )
+                results.append({"query": line, "resolved": resolved, **match})
+
+            uris = [item["uri"] for item in results if item["resolved"]]
+            result = {
+                "tracks": results,
+                "uris": uris,
+                "resolved": len(uris),
+                "unresolved": [
+                    item["query"] for item in results if not item["resolved"]
+                ],
+                "sources": dict(
+                    Counter(item["source"] for item in results if item.get("source"))
+                ),
+                "action": action,
+            }
+            if action != "none" and uris:
+                self._send_to_player(uris, action, result)
+            else:
+                result["message"] = f"Resolvidas {len(uris)} de {len(tracks)} músicas"
+            return result
+        except Exception as e:
+            raise ValueError(f"Erro ao resolver músicas: {str(e)}")
+
+    def _batch_call(self, method: str, args: Dict[str, Any]) -> Any:
+        with metrics.tool_call(method):
+            return getattr(self, method)(**args)
+
+    def execute_batch(self, operations: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Executar várias operações do service em uma chamada
+
+        Leituras independentes rodam em paralelo; comandos e escritas rodam um
+        de cada vez, na ordem da lista. Operações que citam resultados
+        anteriores ("$id.caminho") ou têm depends_on esperam por eles. Falhas
+        ficam no resultado da própria operação, e as dependentes são puladas.
+        Cada operação aparece nas métricas com o nome do seu método.
+        """
+        if not self.client:
+            raise ValueError("Cliente Spotipy não inicializado")
+
+        if not operations:
+            raise ValueError("Informe ao menos uma operação")
+
+        if len(operations) > BATCH_MAX_OPERATIONS:
+            raise ValueError(f"Máximo de {BATCH_MAX_OPERATIONS} operações por lote")
+
+        try:
+            steps = plan(operations, BATCH_METHODS, BATCH_READ_METHODS)
+            started = time.perf_counter()
+            results = run_batch(steps, self._batch_call, BATCH_CONCURRENCY)
+        except Exception as e:
+            raise ValueError(f"Erro ao executar lote: {str(e)}")
+
+        metrics.record_event("batch_operations", len(steps))
+        statuses = Counter(result["status"] for result in results)
+        return {
+            "results": results,
+            "succeeded": statuses[OK],
+            "failed": statuses[ERROR],
+            "skipped": statuses[SKIPPED],
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+
+# Tokens por usuário e um SpotifyService por usuário ativo
+token_store = SQLiteTokenStore(TOKEN_STORE_PATH, default_cache_path=TOKEN_CACHE_PATH)
+user_clients = UserClientRegistry(
+    lambda user_id: SpotifyService(user_id=user_id, token_store=token_store),
+    max_clients=MAX_USER_CLIENTS,
+    idle_ttl=USER_CLIENT_IDLE_TTL,
+)
+
+metrics.register_gauge(
+    "spotify_mcp_user_clients",
+    lambda: len(user_clients),
+    help_text="Clientes Spotify de usuários mantidos em memória",
+)
+metrics.register_gauge(
+    "spotify_mcp_cache_entries",
+    lambda: sum(len(s.aggregates.tracks) for s in user_clients.services()),
+    {"cache": "analytics_tracks"},
+    "Entradas mantidas em cache",
+)
+metrics.register_gauge(
+    "spotify_mcp_cache_entries",
+    lambda: sum(len(s.aggregates.saved_tracks) for s in user_clients.services()),
+    {"cache": "analytics_saved_tracks"},
+    "Entradas mantidas em cache",
+)
+
+for endpoint in sorted(GUARDED_ENDPOINTS):
+    metrics.register_gauge(
+        "spotify_mcp_circuit_open",
+        lambda endpoint=endpoint: sum(
+            s.breakers.is_open(endpoint)
+            for s in user_clients.services()
+            if hasattr(s, "breakers")
+        ),
+        {"endpoint": endpoint},
+        "Usuários com o circuito do endpoint aberto (chamadas respondidas localmente)",
+    )
+
+metrics.register_gauge(
+    "spotify_mcp_http_cache_bytes",
+    lambda: sum(
+        s.http_cache.size for s in user_clients.services() if hasattr(s, "http_cache")
+    ),
+    help_text="Bytes de respostas com ETag guardados para requisições condicionais",
+)
 
-# Instância global do serviço
-spotify_service = SpotifyService()
+# Instância global do serviço: encaminha ao usuário da sessão atual
+spotify_service = UserServiceProxy(user_clients)
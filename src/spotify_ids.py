@@ -0,0 +1,98 @@
+"""
+Leitura de IDs, URIs e URLs do Spotify
+
+Todas as tools que recebem uma música, álbum, artista ou playlist aceitam
+qualquer um dos formatos abaixo, para qualquer tipo de entidade:
+
+- "spotify:track:ID" (e o formato antigo "spotify:user:X:playlist:ID");
+- "https://open.spotify.com/track/ID?si=...", com ou sem esquema, com
+  prefixo de idioma ("/intl-pt/") ou "/embed/";
+- "ID" (22 caracteres base62).
+
+A validação usa expressões compiladas uma única vez e o resultado fica em
+cache (LRU): ferramentas em lote repetem as mesmas entradas e só a primeira
+ocorrência de cada uma é analisada.
+"""
+
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+ENTITY_TYPES = ("track", "album", "artist", "playlist", "show", "episode")
+
+# Entradas distintas guardadas por cache
+PARSE_CACHE_SIZE = 65536
+
+_TYPES = "|".join(ENTITY_TYPES)
+_TYPE_SET = frozenset(ENTITY_TYPES)
+_SHARE_PREFIX = "https://open.spotify.com/"
+_URL_END = frozenset(("", "?", "/", "#"))
+_BARE_ID = re.compile(r"[A-Za-z0-9]{22}")
+_URI = re.compile(rf"spotify:(?:user:[^:\s]+:)?({_TYPES}):([A-Za-z0-9]{{22}})")
+_URL = re.compile(
+    r"(?:https?://)?(?:open|play)\.spotify\.com/"
+    r"(?:intl-[A-Za-z]{2,3}(?:[-_][A-Za-z]{2,4})?/)?"
+    r"(?:embed/)?(?:user/[^/?#\s]+/)?"
+    rf"({_TYPES})/([A-Za-z0-9]{{22}})(?:[/?#]\S*)?"
+)
+
+
+class SpotifyRef(NamedTuple):
+    """Tipo da entidade (None para um ID puro) e seu ID"""
+
+    type: Optional[str]
+    id: str
+
+
+def _is_id(text: str) -> bool:
+    return len(text) == 22 and text.isascii() and text.isalnum()
+
+
+def _parse(value: str) -> Tuple[Optional[str], str]:
+    if not isinstance(value, str):
+        raise ValueError(f"ID do Spotify inválido: {value!r}")
+    # Caminhos rápidos (ID puro, URI simples, link de compartilhamento)
+    # dispensam as regex
+    if _is_id(value):
+        return None, value
+    if value.startswith("spotify:"):
+        parts = value.split(":")
+        if len(parts) == 3 and parts[1] in _TYPE_SET and _is_id(parts[2]):
+            return parts[1], parts[2]
+    elif value.startswith(_SHARE_PREFIX):
+        kind, _, rest = value[len(_SHARE_PREFIX) :].partition("/")
+        if kind in _TYPE_SET and _is_id(rest[:22]) and rest[22:23] in _URL_END:
+            return kind, rest[:22]
+    text = value.strip()
+    if _BARE_ID.fullmatch(text):
+        return None, text
+    match = _URI.fullmatch(text) or _URL.fullmatch(text)
+    if match is None:
+        raise ValueError(f"ID, URI ou URL do Spotify inválido: {value!r}")
+    return match.group(1), match.group(2)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_spotify_ref(value: str) -> SpotifyRef:
+    """Tipo e ID de um ID, URI ou URL do Spotify (ValueError se inválido)"""
+    return SpotifyRef(*_parse(value))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def spotify_id(value: str, kind: str) -> str:
+    """ID de uma entidade do tipo `kind` (URIs e URLs de outro tipo são erro)"""
+    found, entity_id = _parse(value)
+    if found is not None and found != kind:
+        raise ValueError(f"Esperado um {kind} do Spotify, recebido {found}")
+    return entity_id
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def spotify_uri(value: str, kind: str) -> str:
+    """URI canônica ("spotify:<kind>:<id>") de um ID, URI ou URL"""
+    return f"spotify:{kind}:{spotify_id(value, kind)}"
+
+
+def spotify_ids(values: Iterable[str], kind: str) -> List[str]:
+    """IDs de várias entradas do mesmo tipo (para tools em lote)"""
+    return [spotify_id(value, kind) for value in values]
@@ -0,0 +1,271 @@
+"""
+Suporte a vários usuários do Spotify em um único servidor
+
+- SQLiteTokenStore: tokens OAuth persistidos por usuário;
+- UserClientRegistry: um SpotifyService por usuário, com descarte LRU dos
+  clientes ociosos;
+- UserServiceProxy: objeto usado pelas tools que repassa cada chamada ao
+  serviço do usuário da sessão atual;
+- UserRoutingMiddleware: identifica o usuário de cada requisição MCP.
+
+No transporte stdio tudo roda como o usuário "default", que usa o cache de
+token original (TOKEN_CACHE_PATH). No HTTP/SSE o cabeçalho é obrigatório,
+salvo com MCP_ALLOW_DEFAULT_USER=true.
+"""
+
+import json
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastmcp.exceptions import ToolError
+from fastmcp.server.dependencies import get_http_headers, get_http_request
+from fastmcp.server.middleware import Middleware, MiddlewareContext
+from spotipy.cache_handler import CacheFileHandler, CacheHandler
+
+try:
+    from .cache import TTLCache
+except ImportError:
+    from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_USER = "default"
+
+# Validade (segundos) e limite dos links de autorização ainda não usados
+AUTH_STATE_TTL = 600.0
+AUTH_STATE_MAX_PENDING = 1000
+
+# IDs aceitos (também usados em nomes de diretório do cache local)
+_USER_ID = re.compile(r"^[A-Za-z0-9_.@-]{1,64}$")
+
+# Usuário da requisição em curso (definido pelo UserRoutingMiddleware)
+current_user: ContextVar[str] = ContextVar("spotify_user", default=DEFAULT_USER)
+
+
+def validate_user_id(user_id: str) -> str:
+    if not user_id or not _USER_ID.match(user_id) or user_id in (".", ".."):
+        raise ValueError(f"ID de usuário inválido: {user_id!r}")
+    return user_id
+
+
+class SQLiteTokenStore:
+    """Tokens OAuth por usuário em um arquivo SQLite.
+
+    O usuário "default" continua usando o arquivo de cache do Spotipy
+    (TOKEN_CACHE_PATH) para manter instalações de um usuário só intactas.
+    """
+
+    def __init__(self, path: str, default_cache_path: Optional[str] = None):
+        self.path = path
+        self.default_cache_path = default_cache_path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS tokens ("
+                "user_id TEXT PRIMARY KEY, token_info TEXT NOT NULL, "
+                "updated_at REAL NOT NULL)"
+            )
+
+    def load(self, user_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT token_info FROM tokens WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, user_id: str, token_info: Dict[str, Any]) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO tokens (user_id, token_info, updated_at) "
+                "VALUES (?, ?, ?) ON CONFLICT(user_id) DO UPDATE SET "
+                "token_info = excluded.token_info, updated_at = excluded.updated_at",
+                (user_id, json.dumps(token_info), time.time()),
+            )
+
+    def delete(self, user_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM tokens WHERE user_id = ?", (user_id,))
+
+    def users(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id FROM tokens ORDER BY user_id")
+            return [row[0] for row in rows]
+
+    def cache_handler(self, user_id: str) -> CacheHandler:
+        """CacheHandler do Spotipy que lê e grava o token do usuário"""
+        if user_id == DEFAULT_USER and self.default_cache_path:
+            return CacheFileHandler(cache_path=self.default_cache_path)
+        return _StoreCacheHandler(self, user_id)
+
+
+class _StoreCacheHandler(CacheHandler):
+    def __init__(self, store: SQLiteTokenStore, user_id: str):
+        self.store = store
+        self.user_id = user_id
+
+    def get_cached_token(self):
+        return self.store.load(self.user_id)
+
+    def save_token_to_cache(self, token_info):
+        self.store.save(self.user_id, token_info)
+
+
+class UserClientRegistry:
+    """Um serviço por usuário, criado sob demanda e descartado por LRU.
+
+    Clientes sem uso há mais de `idle_ttl` segundos, ou além de
+    `max_clients`, são descartados (o token fica no store e o cliente é
+    recriado no próximo acesso).
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], Any],
+        max_clients: int = 100,
+        idle_ttl: float = 1800.0,
+        auth_ttl: float = AUTH_STATE_TTL,
+    ):
+        self.factory = factory
+        self.max_clients = max_clients
+        self.idle_ttl = idle_ttl
+        self._services: "OrderedDict[str, Any]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        # States OAuth ainda sem retorno do /callback (expiram e têm limite)
+        self._pending_auth = TTLCache(
+            "pending_authorizations", AUTH_STATE_MAX_PENDING, auth_ttl
+        )
+        self._lock = threading.RLock()
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._services)
+
+    def services(self) -> List[Any]:
+        with self._lock:
+            return list(self._services.values())
+
+    def get(self, user_id: str) -> Any:
+        with self._lock:
+            service = self._services.get(user_id)
+            evicted = self._touch(user_id) if service is not None else []
+        if service is None:
+            # O cliente é criado fora da trava para não bloquear os outros usuários
+            created = self.factory(validate_user_id(user_id))
+            with self._lock:
+                service = self._services.setdefault(user_id, created)
+                evicted = self._touch(user_id)
+            if service is not created:
+                # Outra requisição criou o cliente do mesmo usuário antes
+                evicted.append((user_id, created))
+        # Encerrar salva arquivos: fica fora da trava, como a criação
+        for evicted_user, evicted_service in evicted:
+            self._close(evicted_user, evicted_service)
+        return service
+
+    def _touch(self, user_id: str) -> List[Tuple[str, Any]]:
+        """Marca o uso e devolve os clientes descartados (ainda abertos)"""
+        now = time.monotonic()
+        self._services.move_to_end(user_id)
+        self._last_used[user_id] = now
+        return self._evict(now)
+
+    def _evict(self, now: float) -> List[Tuple[str, Any]]:
+        # Ociosos primeiro (ordem LRU), depois o excesso acima do limite
+        evicted = []
+        while self._services:
+            oldest = next(iter(self._services))
+            idle = now - self._last_used.get(oldest, now) > self.idle_ttl
+            if not idle and len(self._services) <= self.max_clients:
+                break
+            evicted.append((oldest, self._services.pop(oldest)))
+            self._last_used.pop(oldest, None)
+            self.evictions += 1
+        return evicted
+
+    @staticmethod
+    def _close(user_id: str, service: Any) -> None:
+        if hasattr(service, "close"):
+            try:
+                service.close()
+            except Exception as e:
+                logger.warning(f"Erro ao encerrar cliente de {user_id}: {e}")
+
+    def remove(self, user_id: str) -> None:
+        with self._lock:
+            service = self._services.pop(user_id, None)
+            self._last_used.pop(user_id, None)
+        if service is not None:
+            self._close(user_id, service)
+
+    def close_all(self) -> None:
+        for user_id in list(self._services):
+            self.remove(user_id)
+
+    def begin_authorization(self, user_id: str) -> str:
+        """Gera o state OAuth que liga o retorno do /callback ao usuário"""
+        state = secrets.token_urlsafe(24)
+        self._pending_auth.set(state, user_id)
+        return state
+
+    def complete_authorization(self, state: str) -> Optional[str]:
+        """Usuário do state (uma única vez); None se desconhecido ou expirado"""
+        return self._pending_auth.pop(state)
+
+
+class UserServiceProxy:
+    """Repassa atributos ao SpotifyService do usuário da requisição atual"""
+
+    def __init__(self, registry: UserClientRegistry):
+        self._registry = registry
+
+    def for_user(self, user_id: str) -> Any:
+        return self._registry.get(user_id)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._registry.get(current_user.get()), name)
+
+
+class UserRoutingMiddleware(Middleware):
+    """Associa cada requisição MCP a um usuário pelo cabeçalho HTTP.
+
+    O cabeçalho (ex.: X-Spotify-User) deve ser definido por um proxy
+    autenticado na frente do servidor. Requisições HTTP sem ele são recusadas,
+    a menos que `allow_default` libere o usuário "default" (dono do token
+    original); no stdio não há cabeçalho e tudo roda como "default".
+    """
+
+    def __init__(self, header: str, allow_default: bool = False):
+        self.header = header.lower()
+        self.allow_default = allow_default
+
+    def resolve_user(self) -> str:
+        try:
+            get_http_request()
+        except RuntimeError:
+            return DEFAULT_USER
+        user_id = get_http_headers().get(self.header)
+        if user_id:
+            return validate_user_id(user_id)
+        if self.allow_default:
+            return DEFAULT_USER
+        raise ToolError(
+            f"Cabeçalho {self.header} obrigatório para identificar o usuário"
+        )
+
+    async def on_request(self, context: MiddlewareContext, call_next):
+        token = current_user.set(self.resolve_user())
+        try:
+            return await call_next(context)
+        finally:
+            current_user.reset(token)
@@ -0,0 +1,30 @@
+"""
+Configuração compartilhada dos testes
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from src.analytics import ListeningAggregates  # noqa: E402
+from src.fake_spotify import FakeSpotifyServer  # noqa: E402
+from src.service import SpotifyService  # noqa: E402
+
+
+@pytest.fixture
+def make_service():
+    """SpotifyService apontado para a Web API falsa (contadores só em memória)"""
+
+    def build(server: FakeSpotifyServer) -> SpotifyService:
+        service = SpotifyService(
+            api_base_url=server.api_base_url,
+            accounts_url=server.accounts_url,
+            auth_manager=server.create_auth_manager(),
+        )
+        service.aggregates = ListeningAggregates()
+        return service
+
+    return build
@@ -0,0 +1,128 @@
+"""
+Testes para os agregados incrementais de escuta
+"""
+
+from unittest.mock import MagicMock
+
+from src.analytics import ListeningAggregates
+from src.cache import catalog_cache
+from src.service import SpotifyService
+
+
+def _play(uri, artist, played_at, name="Song"):
+    return {"uri": uri, "name": name, "artist": artist, "played_at": played_at}
+
+
+class TestListeningAggregates:
+    """Testes dos contadores incrementais"""
+
+    def test_only_new_plays_are_counted(self):
+        """Testa que reproduções já ingeridas não são contadas de novo"""
+        aggregates = ListeningAggregates()
+        batch = [
+            _play("spotify:track:a", "Queen", "2024-05-01T10:00:00.000Z"),
+            _play("spotify:track:b", "Queen", "2024-05-01T10:05:00.000Z"),
+        ]
+        assert aggregates.ingest_recent(batch) == 2
+        assert aggregates.ingest_recent(batch) == 0
+
+        newer = batch + [
+            _play("spotify:track:a", "Queen", "2024-05-02T21:00:00.000Z"),
+        ]
+        assert aggregates.ingest_recent(newer) == 1
+        assert aggregates.total_plays == 3
+        assert aggregates.most_played_artist() == {"name": "Queen", "count": 3}
+        assert aggregates.most_played_track()["uri"] == "spotify:track:a"
+
+        summary = aggregates.summary()
+        assert summary["plays_by_hour"]["10"] == 2
+        assert summary["plays_by_day"] == {"2024-05-01": 2, "2024-05-02": 1}
+
+    def test_genres_are_credited_retroactively(self):
+        """Testa que gêneros aprendidos depois creditam reproduções anteriores"""
+        aggregates = ListeningAggregates()
+        aggregates.ingest_recent(
+            [
+                _play("spotify:track:a", "Queen", "2024-05-01T10:00:00Z"),
+                _play("spotify:track:b", "Queen", "2024-05-01T11:00:00Z"),
+            ]
+        )
+        aggregates.record_artist_genres("Queen", ["rock", "glam rock"])
+        aggregates.ingest_recent(
+            [_play("spotify:track:c", "Queen", "2024-05-01T12:00:00Z")]
+        )
+        assert aggregates.genres["rock"] == 3
+        assert aggregates.genres["glam rock"] == 3
+
+    def test_saved_tracks(self):
+        """Testa contagem de músicas salvas"""
+        aggregates = ListeningAggregates()
+        tracks = [
+            {"uri": "spotify:track:a", "artist": "Queen"},
+            {"uri": "spotify:track:b", "artist": "Queen"},
+        ]
+        assert aggregates.record_saved(tracks) == 2
+        assert aggregates.record_saved(tracks) == 0
+        aggregates.record_unsaved("spotify:track:a", "Queen")
+        assert aggregates.summary()["total_saved_tracks"] == 1
+        assert aggregates.saved_artists["Queen"] == 1
+
+    def test_persistence_roundtrip(self, tmp_path):
+        """Testa que os contadores são salvos e recarregados do disco"""
+        path = str(tmp_path / "cache" / "analytics.json")
+        aggregates = ListeningAggregates(path)
+        aggregates.record_artist_genres("Queen", ["rock"])
+        aggregates.ingest_recent(
+            [_play("spotify:track:a", "Queen", "2024-05-01T10:00:00Z")]
+        )
+        aggregates.save()
+
+        reloaded = ListeningAggregates(path)
+        assert reloaded.total_plays == 1
+        assert reloaded.genres["rock"] == 1
+        assert reloaded.hours[10] == 1
+        assert reloaded.most_played_artist() == {"name": "Queen", "count": 1}
+        assert (
+            reloaded.ingest_recent(
+                [_play("spotify:track:a", "Queen", "2024-05-01T10:00:00Z")]
+            )
+            == 0
+        )
+
+    def test_unsave_uses_recorded_artist(self, tmp_path):
+        """Testa que remover sem informar o artista desconta o artista salvo"""
+        path = str(tmp_path / "analytics.json")
+        aggregates = ListeningAggregates(path)
+        aggregates.record_saved([{"uri": "spotify:track:a"}])
+        aggregates.record_saved([{"uri": "spotify:track:a", "artist": "Queen"}])
+        aggregates.record_saved([{"uri": "spotify:track:b", "artist": "Queen"}])
+        assert aggregates.saved_artists["Queen"] == 2
+        aggregates.save()
+
+        reloaded = ListeningAggregates(path)
+        reloaded.record_unsaved("spotify:track:a")
+        reloaded.record_unsaved("spotify:track:b")
+        assert "Queen" not in reloaded.saved_artists
+        assert reloaded.saved_track_artists == {}
+
+
+class TestFavoritesAggregates:
+    """Testes dos agregados atualizados pelas tools de favoritos"""
+
+    def test_add_and_remove_favorite(self, tmp_path):
+        """Testa o artista vindo do catálogo e a gravação após cada mudança"""
+        catalog_cache.clear()
+        track_id = "4uLU6hMCjMI75M1A2tKUQC"
+        catalog_cache.set(f"track:{track_id}", {"id": track_id, "artists": ["Queen"]})
+        path = str(tmp_path / "analytics.json")
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        service.aggregates = ListeningAggregates(path)
+
+        service.add_track_to_favorites(track_id)
+        assert ListeningAggregates(path).saved_artists["Queen"] == 1
+
+        service.remove_track_from_favorites(track_id)
+        reloaded = ListeningAggregates(path)
+        assert reloaded.saved_tracks == set()
+        assert "Queen" not in reloaded.saved_artists
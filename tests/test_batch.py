@@ -0,0 +1,223 @@
+"""
+Testes da execução de operações em lote (execute_batch)
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.batch import called_tools, plan, run_batch
+from src.equivalence import TrackEquivalenceIndex
+from src.metrics import metrics
+from src.scheduler import CONTROL, INTERACTIVE, current_priority
+from src.service import BATCH_METHODS, SpotifyService
+
+ALLOWED = {"search", "queue", "volume"}
+
+
+class TestPlan:
+    """Testes da validação das operações"""
+
+    def test_ids_and_implicit_dependencies(self):
+        """Testa IDs padrão e dependências vindas das referências"""
+        steps = plan(
+            [
+                {"method": "search", "args": {"q": "x"}},
+                {"id": "fila", "method": "queue", "args": {"uri": "$0.items.0"}},
+                {"method": "volume", "depends_on": ["fila"]},
+            ],
+            ALLOWED,
+        )
+        assert [s["id"] for s in steps] == ["0", "fila", "2"]
+        assert steps[1]["depends_on"] == {"0"}
+        assert steps[2]["depends_on"] == {"fila"}
+
+    def test_rejects_invalid_operations(self):
+        """Testa método fora da lista, IDs repetidos e referências adiante"""
+        with pytest.raises(ValueError, match="não permitido"):
+            plan([{"method": "authenticate"}], ALLOWED)
+        with pytest.raises(ValueError, match="repetido"):
+            plan([{"id": "a", "method": "search"}] * 2, ALLOWED)
+        with pytest.raises(ValueError, match="posteriores"):
+            plan(
+                [
+                    {"id": "a", "method": "queue", "args": {"uri": "$b.uri"}},
+                    {"id": "b", "method": "search"},
+                ],
+                ALLOWED,
+            )
+
+
+class TestRunBatch:
+    """Testes da execução"""
+
+    def test_independent_operations_run_together(self):
+        """Testa que operações independentes rodam em paralelo"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def call(method, args):
+            barrier.wait()
+            return method
+
+        steps = plan([{"method": "search"}] * 2, ALLOWED, reads={"search"})
+        results = run_batch(steps, call, concurrency=2)
+        assert [r["status"] for r in results] == ["ok", "ok"]
+
+    def test_writes_run_in_list_order(self):
+        """Testa que escritas independentes rodam uma de cada vez, em ordem"""
+        order = []
+
+        def call(method, args):
+            time.sleep(args["delay"])
+            order.append(args["n"])
+            if args["n"] == 1:
+                raise ValueError("falhou")
+            return args["n"]
+
+        steps = plan(
+            [
+                {"method": "queue", "args": {"n": n, "delay": 0.05 - n / 100}}
+                for n in range(4)
+            ],
+            ALLOWED,
+            reads={"search"},
+        )
+        results = run_batch(steps, call, concurrency=4)
+
+        assert order == [0, 1, 2, 3]
+        assert [r["status"] for r in results] == ["ok", "error", "ok", "ok"]
+        assert steps[2]["after"] == {"1"} and steps[2]["depends_on"] == set()
+
+    def test_called_tools(self):
+        """Testa que os middlewares só recebem métodos que chegaram a rodar"""
+
+        def call(method, args):
+            if method == "create_playlist":
+                raise ValueError("sem permissão")
+            return {"items": []}
+
+        steps = plan(
+            [
+                {"id": "s", "method": "search_tracks"},
+                {"method": "add_to_queue", "args": {"uri": "$s.items.0.uri"}},
+                {"id": "p", "method": "create_playlist"},
+                {"method": "pause_music", "depends_on": ["p"]},
+            ],
+            {"search_tracks", "add_to_queue", "create_playlist", "pause_music"},
+        )
+        results = run_batch(steps, call, concurrency=2)
+        assert [r["status"] for r in results] == ["ok", "error", "error", "skipped"]
+
+        result = SimpleNamespace(structured_content={"results": results})
+        assert called_tools("execute_batch", result) == [
+            "execute_batch",
+            "search_tracks",
+            "create_playlist",
+        ]
+        assert called_tools("pause_music", result) == ["pause_music"]
+        error = SimpleNamespace(structured_content={"error": "x"})
+        assert called_tools("execute_batch", error) == ["execute_batch"]
+
+    def test_references_failures_and_priorities(self):
+        """Testa substituição, operações puladas e prioridade por método"""
+        seen = {}
+
+        def call(method, args):
+            seen[method] = (args, current_priority.get())
+            if method == "set_volume":
+                raise ValueError("sem dispositivo")
+            return {"items": [{"uri": "spotify:track:a"}]}
+
+        steps = plan(
+            [
+                {"id": "s", "method": "search_tracks"},
+                {"id": "v", "method": "set_volume"},
+                {"method": "add_to_queue", "args": {"uris": ["$s.items.0.uri"]}},
+                {"method": "add_to_queue", "depends_on": ["v"]},
+                {"method": "search_tracks", "args": {"q": "$s.items.9.uri"}},
+            ],
+            {"search_tracks", "add_to_queue", "set_volume"},
+        )
+        results = run_batch(steps, call, concurrency=4)
+
+        assert [r["status"] for r in results] == [
+            "ok",
+            "error",
+            "ok",
+            "skipped",
+            "error",
+        ]
+        assert results[1]["error"] == "sem dispositivo"
+        assert "Referência" in results[4]["error"]
+        assert seen["add_to_queue"] == ({"uris": ["spotify:track:a"]}, CONTROL)
+        assert seen["search_tracks"][1] == INTERACTIVE
+
+
+class TestServiceBatch:
+    """Testes de SpotifyService.execute_batch"""
+
+    def test_allowed_methods_exist(self):
+        """Testa que todos os métodos permitidos existem no service"""
+        for name in BATCH_METHODS:
+            assert callable(getattr(SpotifyService, name))
+        assert "execute_batch" not in BATCH_METHODS
+        assert "authenticate" not in BATCH_METHODS
+
+    def test_search_then_queue(self):
+        """Testa busca seguida de fila com o resultado da busca"""
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        service.equivalence = TrackEquivalenceIndex()
+        service.client.search.return_value = {
+            "tracks": {
+                "items": [
+                    {
+                        "name": "Música",
+                        "artists": [{"name": "Artista"}],
+                        "album": {"name": "Álbum"},
+                        "uri": "spotify:track:4uLU6hMCjMI75M1A2tKUQC",
+                        "duration_ms": 1000,
+                    }
+                ]
+            }
+        }
+
+        result = service.execute_batch(
+            [
+                {"id": "busca", "method": "search_tracks", "args": {"query": "x"}},
+                {
+                    "method": "add_to_queue",
+                    "args": {"track_uri": "$busca.tracks.0.uri"},
+                },
+                {"method": "get_genres", "args": {"inexistente": 1}},
+            ]
+        )
+
+        service.client.add_to_queue.assert_called_once_with(
+            "spotify:track:4uLU6hMCjMI75M1A2tKUQC"
+        )
+        assert result["succeeded"] == 2
+        assert result["failed"] == 1
+        assert result["results"][0]["result"]["tracks"][0]["name"] == "Música"
+
+    def test_operations_are_measured_per_method(self):
+        """Testa que cada operação do lote aparece nas métricas do seu método"""
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        service.client.recommendation_genre_seeds.return_value = {"genres": []}
+        calls = metrics.snapshot()["tools"].get("get_genres", {}).get("calls", 0)
+
+        with metrics.tool_call("execute_batch"):
+            service.execute_batch([{"method": "get_genres"}] * 2)
+
+        assert metrics.snapshot()["tools"]["get_genres"]["calls"] == calls + 2
+
+    def test_too_many_operations(self):
+        """Testa o limite de operações por lote"""
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        with pytest.raises(ValueError, match="Máximo"):
+            service.execute_batch([{"method": "get_genres"}] * 500)
@@ -0,0 +1,58 @@
+"""
+Testes da comparação de resultados de benchmark
+"""
+
+from benchmarks.compare import compare
+
+
+def report(p50: float, calls_per_second: float, upstream: float = 1.0):
+    return {
+        "meta": {"commit": "abc"},
+        "tools": {
+            "search_tracks": {
+                "p50_ms": p50,
+                "p95_ms": p50 * 2,
+                "upstream_calls_per_call": upstream,
+            }
+        },
+        "throughput": [
+            {"concurrency": 8, "calls_per_second": calls_per_second, "p95_ms": 50.0}
+        ],
+        "cold_start": {"p50_ms": 1000.0},
+        "peak_rss_mb": 100.0,
+    }
+
+
+class TestCompare:
+    """Testes da detecção de regressões"""
+
+    def test_no_regression(self):
+        """Testa resultados equivalentes"""
+        rows = compare(report(10.0, 100.0), report(10.2, 99.0), 0.15)
+        assert not any(row[-1] for row in rows)
+
+    def test_latency_and_throughput_regressions(self):
+        """Testa piora de latência, vazão e chamadas à API"""
+        rows = compare(report(10.0, 100.0), report(20.0, 50.0, upstream=3.0), 0.15)
+        regressions = {(row[0], row[1]) for row in rows if row[-1]}
+        assert ("search_tracks", "p50_ms") in regressions
+        assert ("search_tracks", "upstream_calls_per_call") in regressions
+        assert ("concorrência 8", "calls_per_second") in regressions
+
+    def test_small_absolute_changes_are_noise(self):
+        """Testa que variações absolutas mínimas não contam como regressão"""
+        rows = compare(report(0.1, 100.0), report(0.3, 100.0), 0.15)
+        assert not any(row[-1] for row in rows)
+
+
+class TestIdParserBenchmark:
+    """Testes do benchmark do parser de IDs"""
+
+    def test_measure_id_parser(self):
+        """Testa que o benchmark mede entradas novas e repetidas"""
+        from benchmarks.run import measure_id_parser
+
+        result = measure_id_parser(2000)
+        assert result["inputs"] == 2000
+        assert result["cold_per_second"] > 0
+        assert result["warm_per_second"] > 0
@@ -0,0 +1,219 @@
+"""
+Testes do circuit breaker por endpoint
+"""
+
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+import spotipy
+
+from src.breaker import CLOSED, HALF_OPEN, OPEN, EndpointBreakers
+from src.metrics import MetricsRegistry
+from src.service import SpotifyService
+
+URL = "https://api.spotify.com/v1/audio-features/?ids=abc"
+
+
+def response(status: int, body: bytes = b"{}") -> requests.Response:
+    result = requests.Response()
+    result.status_code = status
+    result._content = body
+    return result
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class Upstream:
+    """Requisição HTTP simulada que responde com o status configurado"""
+
+    def __init__(self, status: int):
+        self.status = status
+        self.calls = 0
+
+    def __call__(self, method, url, *args, **kwargs):
+        self.calls += 1
+        return response(self.status, b'{"error": {"status": %d}}' % self.status)
+
+
+def make_breakers(registry=None, clock=None):
+    return EndpointBreakers(
+        threshold=2, cooldown=60, registry=registry, clock=clock or FakeClock()
+    )
+
+
+class TestEndpointBreakers:
+    """Testes dos estados do circuito"""
+
+    def test_opens_after_repeated_failures(self):
+        """Testa que 403 seguidos abrem o circuito e as chamadas param"""
+        registry = MetricsRegistry()
+        breakers = make_breakers(registry)
+        upstream = Upstream(403)
+
+        for _ in range(2):
+            assert breakers.send(upstream, "GET", URL).status_code == 403
+        assert breakers.states() == {"GET /audio-features": OPEN}
+
+        replayed = breakers.send(upstream, "GET", URL)
+        assert replayed.status_code == 403
+        assert replayed.json() == {"error": {"status": 403}}
+        assert upstream.calls == 2
+        assert registry.events["circuit_opened"] == 1
+        assert registry.events["circuit_short_circuited"] == 1
+
+    def test_half_open_probe_closes_on_success(self):
+        """Testa a requisição de teste após o intervalo"""
+        clock = FakeClock()
+        breakers = make_breakers(clock=clock)
+        upstream = Upstream(404)
+        for _ in range(2):
+            breakers.send(upstream, "GET", URL)
+
+        clock.now = 61
+        assert breakers.states() == {"GET /audio-features": HALF_OPEN}
+        upstream.status = 200
+        assert breakers.send(upstream, "GET", URL).status_code == 200
+        assert upstream.calls == 3
+        assert breakers.states() == {"GET /audio-features": CLOSED}
+
+    def test_half_open_probe_reopens_on_failure(self):
+        """Testa que uma falha no teste reabre o circuito na hora"""
+        clock = FakeClock()
+        breakers = make_breakers(clock=clock)
+        upstream = Upstream(403)
+        for _ in range(2):
+            breakers.send(upstream, "GET", URL)
+
+        clock.now = 61
+        breakers.send(upstream, "GET", URL)
+        assert breakers.is_open("GET /audio-features")
+        breakers.send(upstream, "GET", URL)
+        assert upstream.calls == 3
+
+    def test_inconclusive_probe_is_released(self):
+        """Testa que um 5xx no teste libera um novo teste"""
+        clock = FakeClock()
+        breakers = make_breakers(clock=clock)
+        upstream = Upstream(403)
+        for _ in range(2):
+            breakers.send(upstream, "GET", URL)
+
+        clock.now = 61
+        upstream.status = 502
+        breakers.send(upstream, "GET", URL)
+        upstream.status = 200
+        breakers.send(upstream, "GET", URL)
+        assert upstream.calls == 4
+        assert not breakers.is_open("GET /audio-features")
+
+    def test_unguarded_endpoints_pass_through(self):
+        """Testa que 404 de um ID em outros endpoints não abre circuito"""
+        breakers = make_breakers()
+        upstream = Upstream(404)
+        for _ in range(5):
+            breakers.send(upstream, "GET", "https://api.spotify.com/v1/tracks/abc")
+        assert upstream.calls == 5
+        assert breakers.states() == {}
+
+    def test_install_wraps_session_once(self):
+        """Testa a instalação no cliente Spotipy"""
+        breakers = make_breakers()
+        upstream = Upstream(403)
+        client = SimpleNamespace(_session=SimpleNamespace(request=upstream))
+        breakers.install(client)
+        breakers.install(client)
+        for _ in range(4):
+            client._session.request("GET", URL)
+        assert upstream.calls == 2
+
+
+class TestServiceFallbacks:
+    """Testes das alternativas locais do service"""
+
+    def make_service(self) -> SpotifyService:
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        service.breakers = make_breakers()
+        return service
+
+    def open_circuit(self, service: SpotifyService, url: str) -> None:
+        for _ in range(2):
+            service.breakers.send(Upstream(404), "GET", url)
+
+    def test_recommendations_fall_back_to_top_tracks(self):
+        """Testa recomendações montadas com as músicas populares do artista"""
+        service = self.make_service()
+        self.open_circuit(service, "https://api.spotify.com/v1/recommendations")
+        track = {
+            "name": "Música",
+            "artists": [{"name": "Artista"}],
+            "album": {"name": "Álbum"},
+            "uri": "spotify:track:4uLU6hMCjMI75M1A2tKUQC",
+            "duration_ms": 1000,
+            "popularity": 50,
+        }
+        service.client.artist_top_tracks.return_value = {"tracks": [track, track]}
+
+        result = service.get_recommendations(seed_artists="0TnOYISbd1XYRBk9myaseg")
+
+        assert result["fallback"] is True
+        assert [t["uri"] for t in result["tracks"]] == [track["uri"]]
+        service.client.recommendations.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_recommendations_tool_with_open_circuit(self, monkeypatch):
+        """Testa a resposta alternativa passando pela validação da tool MCP"""
+        from fastmcp import Client
+
+        from src.mcp_server import app
+
+        service = self.make_service()
+        self.open_circuit(service, "https://api.spotify.com/v1/recommendations")
+        service.client.search.return_value = {"tracks": {"items": []}}
+        monkeypatch.setattr("src.mcp_server.spotify_service", service)
+
+        async with Client(app) as client:
+            result = await client.call_tool(
+                "get_recommendations", {"request": {"seed_genres": "samba"}}
+            )
+
+        assert result.data["fallback"] is True
+        assert result.data["tracks"] == []
+        assert isinstance(result.data["message"], str)
+        service.client.recommendations.assert_not_called()
+
+    def test_recommendations_fall_back_when_circuit_opens(self):
+        """Testa a alternativa na chamada que abre o circuito"""
+        service = self.make_service()
+        service.breakers.send(
+            Upstream(404), "GET", "https://api.spotify.com/v1/recommendations"
+        )
+
+        def fail(**kwargs):
+            service.breakers.send(
+                Upstream(404), "GET", "https://api.spotify.com/v1/recommendations"
+            )
+            raise spotipy.SpotifyException(404, -1, "not found")
+
+        service.client.recommendations.side_effect = fail
+        service.client.search.return_value = {"tracks": {"items": []}}
+
+        result = service.get_recommendations(seed_genres="samba")
+        assert result["fallback"] is True
+
+    def test_recommendations_error_before_threshold(self):
+        """Testa que a primeira falha mantém a mensagem original"""
+        service = self.make_service()
+        service.client.recommendations.side_effect = spotipy.SpotifyException(
+            404, -1, "not found"
+        )
+        with pytest.raises(ValueError, match="temporariamente indisponível"):
+            service.get_recommendations(seed_genres="samba")
@@ -0,0 +1,116 @@
+"""
+Testes do agrupamento de comandos de playback
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.coalescer import CommandCoalescer, add
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.metrics import MetricsRegistry
+
+
+def burst(fn, values, gap=0.01):
+    """Dispara as chamadas em threads, na ordem, com um pequeno intervalo"""
+    with ThreadPoolExecutor(len(values)) as pool:
+        futures = []
+        for value in values:
+            futures.append(pool.submit(fn, value))
+            time.sleep(gap)
+        return [future.result() for future in futures]
+
+
+class TestCommandCoalescer:
+    """Testes do CommandCoalescer"""
+
+    def test_disabled_runs_every_command(self):
+        """Testa que sem janela cada comando é executado"""
+        applied = []
+        coalescer = CommandCoalescer(0)
+        for value in (40, 45, 50):
+            coalescer.submit("volume", value, lambda v: applied.append(v) or {})
+        assert applied == [40, 45, 50]
+
+    def test_burst_keeps_last_value(self):
+        """Testa que uma rajada aplica só o último valor"""
+        registry = MetricsRegistry()
+        applied = []
+        coalescer = CommandCoalescer(0.1, registry)
+
+        def apply(volume):
+            applied.append(volume)
+            return {"volume": volume}
+
+        results = burst(lambda v: coalescer.submit("volume", v, apply), [40, 45, 50])
+
+        assert applied == [50]
+        assert all(r == {"volume": 50, "coalesced": 3} for r in results)
+        assert registry.snapshot()["events"]["playback_coalesced"] == 2
+
+    def test_skips_are_counted(self):
+        """Testa que pulos consecutivos são somados"""
+        coalescer = CommandCoalescer(0.1)
+        results = burst(
+            lambda _: coalescer.submit("next", 1, lambda n: {"skipped": n}, add),
+            range(4),
+        )
+        assert {r["skipped"] for r in results} == {4}
+
+    def test_keys_are_independent(self):
+        """Testa que comandos diferentes não se misturam"""
+        coalescer = CommandCoalescer(0.05)
+        results = burst(
+            lambda key: coalescer.submit(key, key, lambda v: {"value": v}),
+            ["volume", "seek"],
+        )
+        assert results == [{"value": "volume"}, {"value": "seek"}]
+
+    def test_error_reaches_every_caller(self):
+        """Testa que a falha da ação é repassada a todos da rajada"""
+        coalescer = CommandCoalescer(0.1)
+
+        def fail(_):
+            raise RuntimeError("sem dispositivo ativo")
+
+        errors = []
+
+        def call(value):
+            try:
+                coalescer.submit("seek", value, fail)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        burst(call, [1000, 2000])
+        assert errors == ["sem dispositivo ativo"] * 2
+
+
+class TestServiceCoalescing:
+    """Testes das rajadas contra a Web API falsa"""
+
+    @pytest.fixture
+    def server(self):
+        with FakeSpotifyServer(FakeLibrary(tracks=50)) as server:
+            yield server
+
+    @pytest.fixture
+    def service(self, server, make_service):
+        service = make_service(server)
+        service.coalescer = CommandCoalescer(0.15)
+        return service
+
+    def test_volume_burst_sends_one_request(self, server, service):
+        """Testa que uma rajada de volume gera uma requisição com o último valor"""
+        results = burst(service.set_volume, [40, 45, 50])
+
+        assert server.state.endpoints["PUT /v1/me/player/volume"] == 1
+        assert server.state.library.player["volume_percent"] == 50
+        assert all(r["message"] == "Volume ajustado para 50%" for r in results)
+
+    def test_skip_burst_reports_total(self, server, service):
+        """Testa que pulos agrupados informam o total pulado"""
+        results = burst(lambda _: service.skip_to_next(), range(3))
+
+        assert server.state.endpoints["POST /v1/me/player/next"] == 3
+        assert all(r["message"] == "Pulou 3 músicas" for r in results)
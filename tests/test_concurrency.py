@@ -0,0 +1,111 @@
+"""
+Testes do pool de workers das tools
+"""
+
+import asyncio
+import time
+
+import pytest
+from fastmcp import Client, FastMCP
+
+from src.concurrency import ToolWorkerPool
+from src.metrics import MetricsMiddleware, MetricsRegistry
+
+
+def make_app(workers: int, max_pending: int, registry: MetricsRegistry):
+    pool = ToolWorkerPool(workers, max_pending, registry)
+    app = FastMCP(name="teste", lifespan=pool.lifespan)
+    app.add_middleware(MetricsMiddleware(registry))
+    app.add_middleware(pool)
+
+    @app.tool()
+    def slow(seconds: float = 0.2) -> dict:
+        """Simula uma chamada bloqueante à Web API"""
+        registry.record_upstream("GET", "https://x/v1/me", 200, seconds, 10)
+        time.sleep(seconds)
+        return {"ok": True}
+
+    return app
+
+
+class TestToolWorkerPool:
+    """Testes da execução concorrente e da contrapressão"""
+
+    @pytest.mark.asyncio
+    async def test_sync_tools_run_concurrently(self):
+        """Testa que tools síncronas não bloqueiam o event loop"""
+        registry = MetricsRegistry()
+        app = make_app(workers=4, max_pending=10, registry=registry)
+
+        async with Client(app) as client:
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(client.call_tool("slow", {"seconds": 0.2}) for _ in range(4))
+            )
+            elapsed = time.perf_counter() - start
+
+        assert all(result.data["ok"] for result in results)
+        assert elapsed < 0.6
+        # Chamadas feitas na thread continuam atribuídas à tool
+        assert registry.snapshot()["tools"]["slow"]["upstream_calls"] == 4
+
+    @pytest.mark.asyncio
+    async def test_excess_calls_are_rejected(self):
+        """Testa a recusa quando pool e fila de espera estão cheios"""
+        registry = MetricsRegistry()
+        app = make_app(workers=1, max_pending=1, registry=registry)
+
+        async with Client(app) as client:
+            calls = []
+            for _ in range(4):
+                calls.append(
+                    asyncio.create_task(
+                        client.call_tool("slow", {"seconds": 0.3}, raise_on_error=False)
+                    )
+                )
+                await asyncio.sleep(0.05)
+            results = await asyncio.gather(*calls)
+
+        rejected = [r for r in results if r.is_error]
+        assert len(rejected) == 2
+        assert "Servidor ocupado" in rejected[0].content[0].text
+        assert registry.snapshot()["events"]["tool_call_rejected"] == 2
+
+    @pytest.mark.asyncio
+    async def test_class_workers_are_reserved(self):
+        """Testa que tools de uma classe com threads próprias não esperam as demais"""
+        registry = MetricsRegistry()
+        pool = ToolWorkerPool(
+            1,
+            10,
+            registry,
+            classify=lambda name: "control" if name == "pause" else "interactive",
+            class_workers={"control": 1},
+        )
+        app = FastMCP(name="teste", lifespan=pool.lifespan)
+        app.add_middleware(pool)
+
+        @app.tool()
+        def slow(seconds: float = 0.2) -> dict:
+            """Tool lenta que ocupa o único worker comum"""
+            time.sleep(seconds)
+            return {"ok": True}
+
+        @app.tool()
+        def pause() -> dict:
+            """Tool de controle de playback"""
+            return {"ok": True}
+
+        async with Client(app) as client:
+            busy = [
+                asyncio.create_task(client.call_tool("slow", {"seconds": 0.4}))
+                for _ in range(2)
+            ]
+            await asyncio.sleep(0.05)
+            start = time.perf_counter()
+            result = await client.call_tool("pause", {})
+            elapsed = time.perf_counter() - start
+            await asyncio.gather(*busy)
+
+        assert result.data["ok"]
+        assert elapsed < 0.2
@@ -0,0 +1,102 @@
+"""
+Testes das requisições condicionais e do cache de playlists por snapshot
+"""
+
+from unittest.mock import MagicMock
+
+import requests
+
+from src.cache import playlist_cache
+from src.conditional import ConditionalRequestCache, request_key
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.metrics import MetricsRegistry
+
+
+def response(status: int, body: bytes = b"", etag: str = None):
+    result = requests.Response()
+    result.status_code = status
+    result._content = body
+    if etag:
+        result.headers["ETag"] = etag
+    return result
+
+
+class TestConditionalRequestCache:
+    """Testes do cache de respostas com ETag"""
+
+    def test_request_key_is_canonical(self):
+        """Testa que a ordem e parâmetros None não mudam a chave"""
+        url = "https://api.spotify.com/v1/me/playlists"
+        assert request_key(url, {"offset": 0, "limit": 50, "x": None}) == (
+            request_key(url, {"limit": 50, "offset": 0})
+        )
+        assert request_key(url, None) == url
+
+    def test_not_modified_replays_body(self):
+        """Testa que um 304 devolve o corpo guardado como 200"""
+        registry = MetricsRegistry()
+        cache = ConditionalRequestCache(1024, registry)
+        upstream = MagicMock(
+            side_effect=[response(200, b'{"a": 1}', '"v1"'), response(304)]
+        )
+
+        first = cache.send(upstream, "GET", "https://x/v1/me")
+        second = cache.send(upstream, "GET", "https://x/v1/me")
+
+        assert second.status_code == 200
+        assert second.json() == first.json() == {"a": 1}
+        assert upstream.call_args.kwargs["headers"]["If-None-Match"] == '"v1"'
+        assert registry.snapshot()["caches"]["http_etag"]["hits"] == 1
+
+    def test_size_limit_evicts_oldest(self):
+        """Testa o descarte LRU pelo total de bytes"""
+        cache = ConditionalRequestCache(10)
+        for name in ("a", "b", "c"):
+            cache.store(name, response(200, b"12345", f'"{name}"'))
+        assert cache.get("a") is None
+        assert cache.get("c") is not None
+        assert cache.size == 10
+
+
+class TestConditionalWithFakeApi:
+    """Testes contra a Web API falsa"""
+
+    def test_unchanged_playlist_is_not_downloaded_again(self, make_service):
+        """Testa 304 para a mesma página e 200 depois de uma alteração"""
+        library = FakeLibrary(tracks=60, playlists=1, playlist_size=30)
+        playlist_id = next(iter(library.playlists))
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            first = service.get_playlist_tracks(playlist_id)
+            second = service.get_playlist_tracks(playlist_id)
+            assert server.state.not_modified == 1
+            assert second == first
+
+            track_uri = library.tracks[next(iter(library.tracks))]["uri"]
+            service.client.playlist_add_items(playlist_id, [track_uri])
+            third = service.get_playlist_tracks(playlist_id)
+
+        assert server.state.not_modified == 1
+        assert len(third["tracks"]) == len(first["tracks"]) + 1
+
+    def test_export_skips_unchanged_playlists(
+        self, make_service, tmp_path, monkeypatch
+    ):
+        """Testa que playlists com o mesmo snapshot_id não são relidas"""
+        monkeypatch.setattr("src.service.EXPORT_DIR", str(tmp_path))
+        playlist_cache.clear()
+        library = FakeLibrary(tracks=60, playlists=3, playlist_size=20)
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            runs = [
+                service.export_library(datasets=["playlist_tracks"], output_dir=str(n))
+                for n in range(2)
+            ]
+            items_requests = server.state.endpoints[
+                f"GET /v1/playlists/{next(iter(library.playlists))}/items"
+            ]
+
+        assert runs[0]["playlists_unchanged"] == 0
+        assert runs[1]["playlists_unchanged"] == 3
+        assert runs[1]["files"]["playlist_tracks"]["rows"] == 60
+        assert items_requests == 1
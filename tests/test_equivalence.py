@@ -0,0 +1,197 @@
+"""
+Testes do índice de equivalência de gravações (ISRC)
+"""
+
+from unittest.mock import MagicMock
+
+from src.cache import catalog_cache, playlist_cache
+from src.equivalence import TrackEquivalenceIndex
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.service import SpotifyService
+
+SINGLE = "1" * 22
+ALBUM = "2" * 22
+DELUXE = "3" * 22
+LIVE = "4" * 22
+
+
+def track(track_id, isrc=None, name="Águas de Março", artist="Elis", duration=190000):
+    return {
+        "id": track_id,
+        "uri": f"spotify:track:{track_id}",
+        "name": name,
+        "artists": [{"name": artist}],
+        "album": {"name": "Álbum"},
+        "duration_ms": duration,
+        "external_ids": {"isrc": isrc} if isrc else {},
+    }
+
+
+class TestTrackEquivalenceIndex:
+    """Testes dos grupos por ISRC e pela reserva de título"""
+
+    def test_groups_by_isrc(self):
+        """Testa single, álbum e deluxe com o mesmo ISRC"""
+        index = TrackEquivalenceIndex()
+        index.add_many(
+            [
+                track(SINGLE, "BRABC0000001"),
+                track(ALBUM, "brabc0000001 ", name="Outro nome"),
+                track(LIVE, "BRABC0000002", name="Águas de Março - Live"),
+            ]
+        )
+        assert index.equivalents(SINGLE) == [ALBUM]
+        assert index.equivalents(LIVE) == []
+        assert index.isrc_of(ALBUM) == "BRABC0000001"
+        assert index.equivalents("desconhecida") == []
+
+    def test_title_fallback_without_isrc(self):
+        """Testa a reserva por título, artista e duração próxima"""
+        index = TrackEquivalenceIndex()
+        index.add(track(SINGLE, "BRABC0000001"))
+        index.add(
+            {
+                "name": "Águas de Março (Remastered)",
+                "artist": "Elis",
+                "uri": f"spotify:track:{ALBUM}",
+                "duration_ms": 191500,
+            }
+        )
+        index.add(track(DELUXE, duration=250000))
+        assert index.equivalents(SINGLE) == [ALBUM]
+
+    def test_different_isrcs_are_never_bridged(self):
+        """Testa que uma música sem ISRC não junta dois ISRCs diferentes"""
+        index = TrackEquivalenceIndex()
+        index.add(track(SINGLE, "BRABC0000001"))
+        index.add(track(LIVE, "BRABC0000002"))
+        index.add(track(ALBUM))
+        assert LIVE not in index.equivalents(SINGLE)
+        assert len([g for g in (SINGLE, LIVE) if ALBUM in index.equivalents(g)]) == 1
+
+    def test_summary_completed_later(self):
+        """Testa um resumo de busca que ganha o ISRC depois"""
+        index = TrackEquivalenceIndex()
+        index.add({"uri": f"spotify:track:{ALBUM}", "name": "X", "artist": "Y"})
+        index.add(track(SINGLE, "BRABC0000001"))
+        assert index.equivalents(SINGLE) == []
+        assert index.add(track(ALBUM, "BRABC0000001", name="X")) is False
+        assert index.equivalents(SINGLE) == [ALBUM]
+
+    def test_repeats(self):
+        """Testa que cada gravação aponta para a primeira ocorrência"""
+        index = TrackEquivalenceIndex()
+        index.add_many([track(SINGLE, "I1"), track(ALBUM, "I1"), track(LIVE, "I2")])
+        assert index.repeats([ALBUM, LIVE, SINGLE, ALBUM, "nova"]) == [
+            None,
+            None,
+            ALBUM,
+            ALBUM,
+            None,
+        ]
+
+
+def make_service() -> SpotifyService:
+    catalog_cache.clear()
+    service = SpotifyService.__new__(SpotifyService)
+    service.client = MagicMock()
+    service.equivalence = TrackEquivalenceIndex()
+    service.aggregates = MagicMock()
+    service._create_loaders()
+    service.client.search.return_value = {
+        "tracks": {
+            "items": [
+                track(ALBUM, "BRABC0000001"),
+                track(SINGLE, "BRABC0000001"),
+                track(LIVE, "BRABC0000002", name="Águas de Março - Live"),
+            ]
+        }
+    }
+    return service
+
+
+class TestServiceWithEquivalence:
+    """Testes das tools de favoritos e fila usando o índice"""
+
+    def test_queue_skips_other_editions(self):
+        """Testa que a fila recebe cada gravação uma vez"""
+        service = make_service()
+        result = service.search_and_add_to_queue("águas")
+
+        queued = [c.kwargs["uri"] for c in service.client.add_to_queue.call_args_list]
+        assert queued == [f"spotify:track:{ALBUM}", f"spotify:track:{LIVE}"]
+        assert result["tracks_found"] == 3
+        assert result["skipped_duplicates"][0]["same_as"] == f"spotify:track:{ALBUM}"
+
+    def test_favorites_skip_saved_edition(self):
+        """Testa que uma edição já salva evita salvar outra, na mesma consulta"""
+        service = make_service()
+        service.equivalence.add(track(DELUXE, "BRABC0000002"))
+        service.client.current_user_saved_tracks_contains.side_effect = lambda tracks: [
+            i == DELUXE for i in tracks
+        ]
+
+        result = service.search_and_add_to_favorites("águas")
+
+        service.client.current_user_saved_tracks_contains.assert_called_once()
+        service.client.current_user_saved_tracks_add.assert_called_once_with(
+            tracks=[ALBUM]
+        )
+        assert result["saved_as_other_edition"][0]["saved_as"] == (
+            f"spotify:track:{DELUXE}"
+        )
+        assert len(result["skipped_duplicates"]) == 1
+
+    def test_check_favorites_reports_saved_edition(self):
+        """Testa a verificação de favoritos com outra edição salva"""
+        service = make_service()
+        service.equivalence.add_many([track(SINGLE, "I1"), track(ALBUM, "I1")])
+        service.client.current_user_saved_tracks_contains.return_value = [False, True]
+
+        result = service.check_track_in_favorites(SINGLE)
+
+        assert result["is_saved"] is False
+        assert result["saved_equivalents"] == [f"spotify:track:{ALBUM}"]
+
+    def test_find_equivalent_tracks(self):
+        """Testa a hidratação de uma música desconhecida e a busca por ISRC"""
+        service = make_service()
+        service.client.tracks.return_value = {"tracks": [track(SINGLE, "BRABC0000001")]}
+
+        result = service.find_equivalent_tracks(SINGLE, search=True)
+
+        service.client.search.assert_called_once_with(
+            q="isrc:BRABC0000001", type="track", limit=50
+        )
+        assert result["isrc"] == "BRABC0000001"
+        assert [t["id"] for t in result["equivalents"]] == [ALBUM]
+
+
+class TestPlaylistEquivalence:
+    """Testes das edições equivalentes nas playlists (Web API falsa)"""
+
+    def test_duplicates_include_other_editions(self, make_service):
+        """Testa que IDs diferentes com o mesmo ISRC aparecem juntos"""
+        playlist_cache.clear()
+        library = FakeLibrary(tracks=50, playlists=2, playlist_size=5)
+        first, second = library.playlists
+        single = library.playlists[first]["track_ids"][0]
+        album = next(
+            i
+            for i in library.tracks
+            if i not in library.playlists[first]["track_ids"]
+            and i not in library.playlists[second]["track_ids"]
+        )
+        library.tracks[album]["external_ids"] = dict(
+            library.tracks[single]["external_ids"]
+        )
+        library.playlists[second]["track_ids"].append(album)
+
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            result = service.find_playlist_duplicates(second)
+
+        assert len(result["equivalent"]) == 1
+        group = result["equivalent"][0]
+        assert {t["track_id"] for t in group["tracks"]} == {single, album}
+        assert group["isrc"] == library.tracks[single]["external_ids"]["isrc"]
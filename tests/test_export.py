@@ -0,0 +1,111 @@
+"""
+Testes para a exportação em streaming da biblioteca
+"""
+
+import json
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.export import LibraryExporter
+
+
+def _track(i):
+    return {
+        "id": f"t{i}",
+        "uri": f"spotify:track:t{i}",
+        "name": f"Song {i}",
+        "artists": [{"id": "a1", "name": "Artist"}],
+        "album": {"id": "al1", "name": "Album"},
+        "duration_ms": 180000,
+        "popularity": 50,
+        "explicit": False,
+        "external_ids": {"isrc": f"ISRC{i}"},
+    }
+
+
+def _paged_client(total_saved=230, page_size=50):
+    """Cliente simulado com músicas salvas paginadas via campo "next" """
+    client = MagicMock()
+    pages = []
+    for start in range(0, total_saved, page_size):
+        items = [
+            {"added_at": "2024-01-01T00:00:00Z", "track": _track(i)}
+            for i in range(start, min(start + page_size, total_saved))
+        ]
+        pages.append({"items": items, "next": None})
+    for current, following in zip(pages, pages[1:]):
+        current["next"] = "next"
+        current["_following"] = following
+
+    client.current_user_saved_tracks.return_value = pages[0]
+    client.next.side_effect = lambda page: page["_following"]
+    client.audio_features.side_effect = lambda ids: [
+        {"id": track_id, "tempo": 120.0, "key": 1, "mode": 1} for track_id in ids
+    ]
+    client.current_user_playlists.return_value = {"items": [], "next": None}
+    client.current_user_recently_played.return_value = {
+        "items": [
+            {
+                "played_at": "2024-01-02T10:00:00Z",
+                "track": _track(1),
+                "context": {"uri": "spotify:playlist:p1"},
+            }
+        ],
+        "next": None,
+    }
+    return client
+
+
+class TestLibraryExporter:
+    """Testes do exportador"""
+
+    def test_jsonl_export_streams_all_pages(self, tmp_path):
+        """Testa exportação jsonl percorrendo todas as páginas"""
+        client = _paged_client()
+        result = LibraryExporter(client, str(tmp_path)).run(
+            ["saved_tracks", "audio_features", "listening_history"]
+        )
+
+        files = result["files"]
+        assert files["saved_tracks"]["rows"] == 230
+        assert files["audio_features"]["rows"] == 230
+        assert files["listening_history"]["rows"] == 1
+        # 230 IDs em lotes de 100
+        assert client.audio_features.call_count == 3
+
+        with open(files["saved_tracks"]["path"], encoding="utf-8") as f:
+            first = json.loads(f.readline())
+        assert first["uri"] == "spotify:track:t0"
+        assert first["isrc"] == "ISRC0"
+
+    def test_features_only_does_not_write_tracks(self, tmp_path):
+        """Testa que só audio features usam músicas salvas sem gravá-las"""
+        client = _paged_client(total_saved=20)
+        result = LibraryExporter(client, str(tmp_path)).run(["audio_features"])
+        assert set(result["files"]) == {"audio_features"}
+        assert result["files"]["audio_features"]["rows"] == 20
+
+    def test_unknown_dataset(self, tmp_path):
+        """Testa validação de conjuntos desconhecidos"""
+        with pytest.raises(ValueError):
+            LibraryExporter(MagicMock(), str(tmp_path)).run(["nope"])
+
+    @pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+    def test_columnar_export(self, tmp_path, file_format):
+        """Testa exportação colunar com pyarrow"""
+        pa = pytest.importorskip("pyarrow")
+        client = _paged_client(total_saved=120)
+        result = LibraryExporter(client, str(tmp_path), file_format).run(
+            ["saved_tracks"]
+        )
+        path = result["files"]["saved_tracks"]["path"]
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            table = pq.read_table(path)
+        else:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all()
+        assert table.num_rows == 120
+        assert table.column("duration_ms").type == pa.int64()
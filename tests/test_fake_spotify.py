@@ -0,0 +1,99 @@
+"""
+Testes do servidor falso da Web API do Spotify
+"""
+
+import pytest
+import requests
+
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.metrics import metrics
+from src.service import SpotifyService
+
+
+class TestFakeLibrary:
+    """Testes da geração da biblioteca"""
+
+    def test_seed_is_deterministic(self):
+        """Testa que a mesma semente gera os mesmos dados"""
+        first = FakeLibrary(tracks=50, playlists=2, seed=7)
+        second = FakeLibrary(tracks=50, playlists=2, seed=7)
+        assert list(first.tracks) == list(second.tracks)
+        assert len(first.tracks) == 50
+        assert len(first.saved_tracks) == 50
+
+
+class TestFakeSpotifyServer:
+    """Testes do SpotifyService contra a Web API falsa"""
+
+    def test_service_paginates_library(self, make_service, tmp_path, monkeypatch):
+        """Testa a paginação da biblioteca pelo SpotifyService"""
+        monkeypatch.setattr("src.service.EXPORT_DIR", str(tmp_path))
+        library = FakeLibrary(tracks=120, playlists=3, playlist_size=30)
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            assert len(service.get_saved_tracks(limit=10)["tracks"]) == 10
+            result = service.export_library(
+                datasets=["saved_tracks", "playlist_tracks"],
+                output_dir="biblioteca",
+            )
+            stats = requests.get(f"{server.accounts_url}/_fake/stats").json()
+
+        assert result["files"]["saved_tracks"]["rows"] == 120
+        assert (tmp_path / "default" / "biblioteca").is_dir()
+        assert result["files"]["playlist_tracks"]["rows"] == 90
+        assert stats["endpoints"]["GET /v1/me/tracks"] == 4
+
+    def test_export_stays_inside_user_dir(self, tmp_path, monkeypatch):
+        """Testa que a exportação não escreve fora de EXPORT_DIR/<usuário>"""
+        monkeypatch.setattr("src.service.EXPORT_DIR", str(tmp_path))
+        service = SpotifyService.__new__(SpotifyService)
+        service.user_id = "ana"
+
+        assert service._export_dir(None).startswith(str(tmp_path / "ana"))
+        for output_dir in (str(tmp_path / "bia"), "../bia", "/tmp"):
+            with pytest.raises(ValueError, match="output_dir"):
+                service._export_dir(output_dir)
+
+    def test_rate_limit_returns_retry_after(self):
+        """Testa respostas 429 com Retry-After"""
+        with FakeSpotifyServer(FakeLibrary(tracks=10), rate_limit=2) as server:
+            token = server.state.issue_token()["access_token"]
+            headers = {"Authorization": f"Bearer {token}"}
+            statuses = [
+                requests.get(f"{server.api_base_url}me", headers=headers)
+                for _ in range(3)
+            ]
+
+        assert [r.status_code for r in statuses] == [200, 200, 429]
+        assert int(statuses[-1].headers["Retry-After"]) >= 1
+
+    def test_token_expiry_and_refresh(self, make_service):
+        """Testa tokens expirados e renovação pelo auth manager"""
+        with FakeSpotifyServer(FakeLibrary(tracks=10), token_ttl=30) as server:
+            before = metrics.snapshot()["events"].get("token_refresh", 0)
+            service = make_service(server)
+            # Validade menor que a margem do Spotipy força a renovação
+            assert service.get_user_profile()["user"]["id"] == "fakeuser"
+            assert metrics.snapshot()["events"]["token_refresh"] > before
+
+            # Próxima renovação emite um token longo; depois ele é revogado
+            server.state.token_ttl = 3600
+            service.get_user_profile()
+            requests.post(f"{server.accounts_url}/_fake/expire-tokens")
+            with pytest.raises(ValueError, match="expired"):
+                service.get_user_profile()
+
+    def test_latency_is_injected(self, make_service):
+        """Testa a latência injetada"""
+        with FakeSpotifyServer(FakeLibrary(tracks=10), latency=0.05) as server:
+            service = make_service(server)
+            response_time = requests.get(
+                f"{server.api_base_url}me",
+                headers={
+                    "Authorization": "Bearer "
+                    + server.state.issue_token()["access_token"]
+                },
+            ).elapsed.total_seconds()
+            assert service.get_devices()["devices"]
+
+        assert response_time >= 0.05
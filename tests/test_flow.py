@@ -0,0 +1,151 @@
+"""
+Testes para a ordenação de músicas por batida (build_flow_queue)
+"""
+
+import random
+import time
+from unittest.mock import MagicMock
+
+from src.cache import catalog_cache
+from src.equivalence import TrackEquivalenceIndex
+from src.flow import camelot_position, key_distance, order_by_flow, path_cost
+from src.service import SpotifyService
+
+
+def _random_tracks(count, seed=42):
+    rng = random.Random(seed)
+    return [
+        {
+            "uri": f"spotify:track:{i:022d}",
+            "tempo": rng.uniform(70, 180),
+            "key": rng.randint(-1, 11),
+            "mode": rng.randint(0, 1),
+            "energy": rng.random(),
+        }
+        for i in range(count)
+    ]
+
+
+class TestFlowOrdering:
+    """Testes do algoritmo de ordenação"""
+
+    def test_camelot_position(self):
+        """Testa a conversão de tom para a roda Camelot"""
+        assert camelot_position(0, 1) == 8  # C maior = 8B
+        assert camelot_position(9, 0) == 8  # A menor = 8A
+        assert camelot_position(7, 1) == 9  # G maior = 9B
+        assert camelot_position(-1, 1) is None
+
+    def test_relative_keys_are_close(self):
+        """Testa que tons relativos têm distância mínima"""
+        c_major = {"key": 0, "mode": 1}
+        a_minor = {"key": 9, "mode": 0}
+        f_sharp_major = {"key": 6, "mode": 1}
+        assert key_distance(c_major, a_minor) == 1
+        assert key_distance(c_major, f_sharp_major) == 6
+
+    def test_order_keeps_all_tracks(self):
+        """Testa que nenhuma música é perdida ou duplicada"""
+        tracks = _random_tracks(300)
+        tracks.append({"uri": "spotify:track:sem_tempo", "tempo": None})
+        result = order_by_flow(tracks)
+        uris = [track["uri"] for track in result["tracks"]]
+        assert sorted(uris) == sorted(track["uri"] for track in tracks)
+        assert uris[-1] == "spotify:track:sem_tempo"
+
+    def test_two_opt_improves_greedy(self):
+        """Testa que a otimização não piora a construção gulosa"""
+        tracks = _random_tracks(500)
+        result = order_by_flow(tracks)
+        assert result["total_cost"] <= result["greedy_cost"]
+        assert result["total_cost"] < path_cost(tracks)
+
+    def test_large_input_is_fast(self):
+        """Testa que 1000+ músicas são ordenadas dentro do orçamento"""
+        tracks = _random_tracks(1500)
+        start = time.monotonic()
+        result = order_by_flow(tracks, time_budget=2.0)
+        assert time.monotonic() - start < 5.0
+        assert len(result["tracks"]) == 1500
+
+
+class TestBuildFlowQueueService:
+    """Testes do fluxo completo no service com cliente simulado"""
+
+    def _service(self, tracks):
+        catalog_cache.clear()
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        service.equivalence = TrackEquivalenceIndex()
+        service._create_loaders()
+        service.client.search.return_value = {
+            "tracks": {
+                "items": [
+                    {"name": f"t{i}", "uri": t["uri"], "artists": [{"name": "a"}]}
+                    for i, t in enumerate(tracks)
+                ],
+                "next": None,
+            }
+        }
+        service.client.audio_features.side_effect = lambda ids: [
+            dict(t, id=t["uri"].split(":")[-1])
+            for t in tracks
+            if t["uri"].split(":")[-1] in ids
+        ]
+        service.client.devices.return_value = {
+            "devices": [{"id": "d1", "is_active": True, "type": "Computer"}]
+        }
+        return service
+
+    def test_play_uses_single_playback_call(self):
+        """Testa que a sequência é tocada com uma única chamada"""
+        tracks = _random_tracks(40)
+        service = self._service(tracks)
+        result = service.build_flow_queue(query="rock", limit=40, action="play")
+
+        assert result["tracks_played"] == 40
+        assert service.client.audio_features.call_count == 1
+        service.client.start_playback.assert_called_once()
+        played = service.client.start_playback.call_args.kwargs["uris"]
+        assert played == [track["uri"] for track in result["tracks"]]
+
+    def test_play_queues_beyond_playback_limit(self):
+        """Testa que as músicas além das 100 do start_playback vão para a fila"""
+        tracks = _random_tracks(150)
+        service = self._service(tracks)
+        result = service.build_flow_queue(
+            track_uris=[t["uri"] for t in tracks], limit=150, action="play"
+        )
+
+        ordered = [track["uri"] for track in result["tracks"]]
+        played = service.client.start_playback.call_args.kwargs["uris"]
+        queued = [c.kwargs["uri"] for c in service.client.add_to_queue.call_args_list]
+        assert played == ordered[:100]
+        assert queued == ordered[100:]
+        assert result["tracks_played"] == 100
+        assert result["tracks_queued"] == 50
+
+    def test_features_are_fetched_in_batches(self):
+        """Testa que audio features são buscadas em lotes de 100"""
+        tracks = _random_tracks(250)
+        service = self._service(tracks)
+        result = service.build_flow_queue(
+            track_uris=[t["uri"] for t in tracks], limit=250, action="none"
+        )
+        assert service.client.audio_features.call_count == 3
+        assert result["tracks_found"] == 250
+        service.client.start_playback.assert_not_called()
+
+    def test_tracks_without_features(self):
+        """Testa a ordenação quando nenhuma música tem audio features"""
+        tracks = _random_tracks(5)
+        service = self._service(tracks)
+        service.client.audio_features.side_effect = lambda ids: [None] * len(ids)
+
+        result = service.build_flow_queue(
+            track_uris=[t["uri"] for t in tracks], limit=5, action="none"
+        )
+
+        assert result["tracks_found"] == 5
+        assert result["tracks_without_features"] == 5
+        assert result["greedy_cost"] == 0.0
@@ -0,0 +1,175 @@
+"""
+Testes do grafo de artistas relacionados (BFS em camadas)
+"""
+
+import threading
+
+import pytest
+
+from src.cache import catalog_cache, related_cache
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.graph import expand, genre_counts, matches_genre, neighbourhood, path_to
+
+#   a -> b, c      b -> d      c -> d, e      d -> f      e -> a
+EDGES = {
+    "a": ["b", "c"],
+    "b": ["d"],
+    "c": ["d", "e"],
+    "d": ["f"],
+    "e": ["a"],
+    "f": [],
+}
+
+
+class Fetcher:
+    """Relacionados simulados que registram cada busca"""
+
+    def __init__(self, edges=EDGES, fail=()):
+        self.edges = edges
+        self.fail = set(fail)
+        self.calls = []
+
+    def __call__(self, artist_id):
+        self.calls.append(artist_id)
+        if artist_id in self.fail:
+            raise RuntimeError("403")
+        return list(self.edges[artist_id])
+
+
+class TestExpand:
+    """Testes da expansão por camadas"""
+
+    def test_distances_and_parents(self):
+        """Testa distâncias, antecessores e buscas por camada"""
+        fetch = Fetcher()
+        graph = expand(["a"], 2, fetch, concurrency=4, max_artists=100)
+
+        assert graph["distance"] == {"a": 0, "b": 1, "c": 1, "d": 2, "e": 2}
+        assert graph["parent"]["d"] == "b"
+        assert sorted(fetch.calls) == ["a", "b", "c"]
+        assert graph["fetched"] == 3
+        assert path_to(graph, "e") == ["a", "c", "e"]
+        assert path_to(graph, "f") is None
+
+    def test_layer_is_fetched_in_parallel(self):
+        """Testa que os artistas de uma camada são buscados ao mesmo tempo"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def fetch(artist_id):
+            if artist_id in ("b", "c"):
+                barrier.wait()
+            return EDGES[artist_id]
+
+        graph = expand(["a"], 2, fetch, concurrency=2, max_artists=100)
+        assert "e" in graph["distance"]
+
+    def test_cached_edges_and_target(self):
+        """Testa arestas em cache e a parada ao achar o destino"""
+        fetch = Fetcher()
+        cache = {"a": ["b", "c"]}
+        graph = expand(["a"], 5, fetch, 4, 100, cached=cache.get, target="d")
+
+        assert path_to(graph, "d") == ["a", "b", "d"]
+        assert graph["cached"] == 1
+        assert "d" not in fetch.calls
+        assert "f" not in graph["distance"]
+
+    def test_limits_and_failures(self):
+        """Testa o limite de artistas e buscas que falham"""
+        graph = expand(["a"], 3, Fetcher(fail={"c"}), 4, max_artists=3)
+        assert len(graph["distance"]) == 3
+        assert graph["truncated"] is True
+        assert graph["failed"] == {"c": "403"}
+
+
+class TestQueries:
+    """Testes das consultas sobre o grafo"""
+
+    def test_neighbourhood_by_genre(self):
+        """Testa o filtro por gênero e a ordem por distância e popularidade"""
+        graph = expand(["a"], 2, Fetcher(), 4, 100)
+        records = {
+            "a": {"id": "a", "genres": ["samba"], "popularity": 90},
+            "b": {"id": "b", "genres": ["brazilian rock"], "popularity": 10},
+            "c": {"id": "c", "genres": ["samba"], "popularity": 50},
+            "d": {"id": "d", "genres": ["rock"], "popularity": 80},
+            "e": None,
+        }
+        assert [a["id"] for a in neighbourhood(graph, records)] == ["c", "b", "d"]
+        rock = neighbourhood(graph, records, "Rock")
+        assert [(a["id"], a["distance"], a["via"]) for a in rock] == [
+            ("b", 1, "a"),
+            ("d", 2, "b"),
+        ]
+        assert genre_counts(rock)[0] == {"name": "brazilian rock", "count": 1}
+        assert matches_genre(["mpb"], None)
+
+
+def related_requests(server: FakeSpotifyServer) -> int:
+    return sum(
+        count
+        for label, count in server.state.endpoints.items()
+        if label.endswith("/related-artists")
+    )
+
+
+class TestArtistGraphWithFakeApi:
+    """Testes contra a Web API falsa"""
+
+    def setup_method(self):
+        catalog_cache.clear()
+        related_cache.clear()
+
+    def test_explore_uses_cached_graph(self, make_service):
+        """Testa que a segunda exploração sai inteira do cache"""
+        library = FakeLibrary(tracks=300)
+        seed = next(iter(library.artists))
+        genre = library.artists[seed]["genres"][0]
+
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            first = service.explore_artist_graph(seed, hops=2, genre=genre)
+            requests = server.state.requests
+            second = service.explore_artist_graph(seed, hops=2, genre=genre)
+            assert server.state.requests == requests
+            related = service.get_related_artists(seed)
+            assert server.state.requests == requests
+
+        assert first["fetched"] == related_requests(server)
+        assert second["fetched"] == 0
+        assert second["cached"] == first["fetched"]
+        assert first["artists"] == second["artists"]
+        assert all(genre in a["genres"] for a in first["artists"])
+        assert related["artists"]
+        seed_genres = set(library.artists[seed]["genres"])
+        assert all(seed_genres & set(a["genres"]) for a in related["artists"])
+        assert first["artist"]["id"] == seed
+
+    def test_find_path(self, make_service):
+        """Testa o caminho entre dois artistas sem gênero em comum"""
+        library = FakeLibrary(tracks=300)
+        artists = list(library.artists.values())
+        source = artists[0]
+        target = next(
+            a for a in artists if not set(a["genres"]) & set(source["genres"])
+        )
+
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            result = service.find_artist_path(source["uri"], target["id"])
+
+        assert result["found"] is True
+        assert result["hops"] >= 2
+        assert result["path"][0]["id"] == source["id"]
+        assert result["path"][-1]["id"] == target["id"]
+        for current, following in zip(result["path"], result["path"][1:]):
+            assert set(current["genres"]) & set(following["genres"])
+
+    def test_invalid_hops(self, make_service):
+        """Testa o limite de saltos"""
+        library = FakeLibrary(tracks=50)
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            with pytest.raises(ValueError, match="hops"):
+                service.explore_artist_graph(next(iter(library.artists)), 9)
+            assert related_requests(server) == 0
@@ -0,0 +1,92 @@
+"""
+Testes da hidratação em lote de músicas, artistas e álbuns
+"""
+
+import pytest
+
+from src.cache import catalog_cache
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.hydrate import compact_track
+from src.service import SpotifyService
+
+
+class TestCompactRecords:
+    """Testes dos registros compactos"""
+
+    def test_compact_track(self):
+        """Testa os campos mantidos de uma música"""
+        record = compact_track(
+            {
+                "id": "t1",
+                "uri": "spotify:track:t1",
+                "name": "Música",
+                "artists": [{"id": "a1", "name": "Artista"}],
+                "album": {"id": "b1", "name": "Álbum", "release_date": "2020"},
+                "duration_ms": 1000,
+                "popularity": 10,
+                "external_ids": {"isrc": "BR1234"},
+                "available_markets": ["BR"] * 100,
+            }
+        )
+        assert record["artists"] == ["Artista"]
+        assert record["artist_ids"] == ["a1"]
+        assert record["isrc"] == "BR1234"
+        assert "available_markets" not in record
+
+
+class TestHydrateWithFakeApi:
+    """Testes contra a Web API falsa"""
+
+    def test_tracks_in_order_with_chunks_and_cache(self, make_service):
+        """Testa ordem, repetições, inválidos, lotes de 50 e cache"""
+        catalog_cache.clear()
+        library = FakeLibrary(tracks=150, playlists=1)
+        ids = list(library.tracks)[:120]
+        values = [
+            f"https://open.spotify.com/intl-pt/track/{i}" if n % 2 else i
+            for n, i in enumerate(ids)
+        ]
+        values += [f"spotify:track:{ids[0]}", "inválido"]
+
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            first = service.hydrate_tracks(values)
+            requests_after_first = server.state.endpoints.get("GET /v1/tracks")
+            second = service.hydrate_tracks(values[:10])
+            requests_after_second = server.state.endpoints.get("GET /v1/tracks")
+
+        assert [t["id"] for t in first["tracks"][:120]] == ids
+        assert first["tracks"][120]["id"] == ids[0]
+        assert first["tracks"][121] is None
+        assert first["invalid"] == ["inválido"]
+        assert first["unique"] == 120
+        assert first["fetched"] == 120
+        assert requests_after_first == 3
+
+        assert second["cached"] == 10
+        assert second["fetched"] == 0
+        assert requests_after_second == requests_after_first
+
+    def test_artists_and_albums(self, make_service):
+        """Testa artistas e álbuns (lotes de 20)"""
+        catalog_cache.clear()
+        library = FakeLibrary(tracks=400, playlists=1)
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            artists = service.hydrate_artists(list(library.artists)[:5])
+            album_ids = list(library.albums)[:25]
+            albums = service.hydrate_albums(album_ids)
+            album_requests = server.state.endpoints.get("GET /v1/albums")
+
+        assert [a["id"] for a in artists["artists"]] == list(library.artists)[:5]
+        assert "genres" in artists["artists"][0]
+        assert [a["id"] for a in albums["albums"]] == album_ids
+        assert album_requests == 2
+
+    def test_too_many_ids(self):
+        """Testa o limite de IDs por chamada"""
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = object()
+        service._create_loaders()
+        with pytest.raises(ValueError, match="Máximo"):
+            service.hydrate_tracks(["x"] * 5000)
@@ -0,0 +1,134 @@
+"""
+Testes do agrupamento automático de buscas por ID
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.cache import catalog_cache
+from src.equivalence import TrackEquivalenceIndex
+from src.loader import BatchLoader
+from src.metrics import MetricsRegistry
+from src.service import SpotifyService
+
+
+class Recorder:
+    """fetch_many simulado que registra os lotes recebidos"""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def __call__(self, ids):
+        with self.lock:
+            self.batches.append(list(ids))
+        if self.fail:
+            raise RuntimeError("falhou")
+        return {i: f"valor-{i}" for i in ids if not i.startswith("x")}
+
+
+def run_together(fn, args):
+    """Executa fn para cada argumento em threads liberadas ao mesmo tempo"""
+    barrier = threading.Barrier(len(args))
+
+    def call(arg):
+        barrier.wait()
+        return fn(arg)
+
+    with ThreadPoolExecutor(max_workers=len(args)) as pool:
+        return list(pool.map(call, args))
+
+
+class TestBatchLoader:
+    """Testes do BatchLoader"""
+
+    def test_concurrent_loads_share_one_call(self):
+        """Testa que buscas concorrentes viram uma chamada só"""
+        fetch = Recorder()
+        registry = MetricsRegistry()
+        loader = BatchLoader("tracks", fetch, 50, window=0.2, registry=registry)
+
+        results = run_together(loader.load, [f"id{i}" for i in range(10)])
+
+        assert results == [f"valor-id{i}" for i in range(10)]
+        assert len(fetch.batches) == 1
+        assert sorted(fetch.batches[0]) == sorted(f"id{i}" for i in range(10))
+        assert registry.events["loader_tracks_batches"] == 1
+        assert registry.events["loader_tracks_keys"] == 10
+
+    def test_batches_respect_max_size(self):
+        """Testa o limite de IDs por chamada e a ordem dos resultados"""
+        fetch = Recorder()
+        loader = BatchLoader("albums", fetch, 20, window=0.01)
+        keys = [f"id{i}" for i in range(45)] + ["id0", "xmissing"]
+
+        results = loader.load_many(keys)
+
+        assert [len(batch) for batch in fetch.batches] == [20, 20, 6]
+        assert results[:45] == [f"valor-id{i}" for i in range(45)]
+        assert results[45] == "valor-id0"
+        assert results[46] is None
+
+    def test_errors_reach_every_caller(self):
+        """Testa que a falha do lote chega a todos os chamadores"""
+        loader = BatchLoader("artists", Recorder(fail=True), 50, window=0.05)
+
+        def load(key):
+            with pytest.raises(RuntimeError):
+                loader.load(key)
+
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            list(pool.map(load, ["a", "b", "c", "d"]))
+
+    def test_zero_window_loads_immediately(self):
+        """Testa que sem janela cada chamada sai na hora"""
+        fetch = Recorder()
+        loader = BatchLoader("tracks", fetch, 50, window=0)
+        assert loader.load("a") == "valor-a"
+        assert loader.load("b") == "valor-b"
+        assert fetch.batches == [["a"], ["b"]]
+
+
+class TestServiceBatching:
+    """Testes das buscas individuais do service"""
+
+    def make_service(self) -> SpotifyService:
+        catalog_cache.clear()
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        service.equivalence = TrackEquivalenceIndex()
+        service._create_loaders()
+        for name in ("audio_features_loader", "saved_tracks_loader"):
+            getattr(service, name).window = 0.2
+        return service
+
+    def test_concurrent_audio_features_are_batched(self):
+        """Testa que get_audio_features em paralelo usa uma chamada"""
+        service = self.make_service()
+        ids = [f"{i:022d}" for i in range(8)]
+        service.client.audio_features.side_effect = lambda chunk: [
+            {"id": i, "tempo": 120.0} for i in chunk
+        ]
+
+        results = run_together(service.get_audio_features, ids)
+
+        assert [r["track_id"] for r in results] == ids
+        assert all(r["features"]["tempo"] == 120.0 for r in results)
+        assert service.client.audio_features.call_count == 1
+
+    def test_concurrent_favorite_checks_are_batched(self):
+        """Testa que check_track_in_favorites em paralelo usa uma chamada"""
+        service = self.make_service()
+        ids = [f"{i:022d}" for i in range(6)]
+        service.client.current_user_saved_tracks_contains.side_effect = lambda tracks: [
+            int(i) % 2 == 0 for i in tracks
+        ]
+
+        results = run_together(service.check_track_in_favorites, ids)
+
+        assert [r["is_saved"] for r in results] == [True, False] * 3
+        service.client.current_user_saved_tracks_contains.assert_called_once()
@@ -4,9 +4,11 @@ Testes abrangentes para o Spotipy MCP Server
 
 import os
 import sys
+from unittest.mock import MagicMock
 
 import pytest
 from fastapi.testclient import TestClient
+from fastmcp import Client
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 
@@ -140,6 +142,88 @@ class TestMCPTools:
         tools = await app.get_tools()
         assert "add_to_queue" in tools
 
+    @pytest.mark.asyncio
+    async def test_build_flow_queue_tool_exists(self):
+        """Testa se a tool build_flow_queue existe"""
+        tools = await app.get_tools()
+        assert "build_flow_queue" in tools
+
+    @pytest.mark.asyncio
+    async def test_get_listening_aggregates_tool_exists(self):
+        """Testa se a tool get_listening_aggregates existe"""
+        tools = await app.get_tools()
+        assert "get_listening_aggregates" in tools
+
+    @pytest.mark.asyncio
+    async def test_export_library_tool_exists(self):
+        """Testa se a tool export_library existe"""
+        tools = await app.get_tools()
+        assert "export_library" in tools
+
+    @pytest.mark.asyncio
+    async def test_get_server_metrics_tool_exists(self):
+        """Testa se a tool get_server_metrics existe"""
+        tools = await app.get_tools()
+        assert "get_server_metrics" in tools
+
+    @pytest.mark.asyncio
+    async def test_get_authorization_url_tool_exists(self):
+        """Testa se a tool get_authorization_url existe"""
+        tools = await app.get_tools()
+        assert "get_authorization_url" in tools
+
+    @pytest.mark.asyncio
+    async def test_hydrate_tools_exist(self):
+        """Testa se as tools de hidratação em lote existem"""
+        tools = await app.get_tools()
+        for name in ("hydrate_tracks", "hydrate_artists", "hydrate_albums"):
+            assert name in tools
+
+    @pytest.mark.asyncio
+    async def test_resolve_tracks_tool_exists(self):
+        """Testa se a tool resolve_tracks existe"""
+        tools = await app.get_tools()
+        assert "resolve_tracks" in tools
+
+    @pytest.mark.asyncio
+    async def test_execute_batch_tool_exists(self):
+        """Testa se a tool execute_batch existe"""
+        tools = await app.get_tools()
+        assert "execute_batch" in tools
+
+    @pytest.mark.asyncio
+    async def test_playlist_write_tools_exist(self):
+        """Testa se as tools de escrita em playlists existem"""
+        tools = await app.get_tools()
+        for name in (
+            "create_playlist",
+            "add_tracks_to_playlist",
+            "replace_playlist_tracks",
+            "remove_tracks_from_playlist",
+            "reorder_playlist_tracks",
+        ):
+            assert name in tools
+
+    @pytest.mark.asyncio
+    async def test_playlist_index_tools_exist(self):
+        """Testa se as tools do índice de playlists existem"""
+        tools = await app.get_tools()
+        assert "find_track_in_playlists" in tools
+        assert "find_playlist_duplicates" in tools
+
+    @pytest.mark.asyncio
+    async def test_find_equivalent_tracks_tool_exists(self):
+        """Testa se a tool find_equivalent_tracks existe"""
+        tools = await app.get_tools()
+        assert "find_equivalent_tracks" in tools
+
+    @pytest.mark.asyncio
+    async def test_artist_graph_tools_exist(self):
+        """Testa se as tools do grafo de artistas existem"""
+        tools = await app.get_tools()
+        assert "explore_artist_graph" in tools
+        assert "find_artist_path" in tools
+
     @pytest.mark.asyncio
     async def test_skip_to_next_tool_exists(self):
         """Testa se a tool skip_to_next existe"""
@@ -212,6 +296,12 @@ class TestMCPTools:
         tools = await app.get_tools()
         assert "search_playlists" in tools
 
+    @pytest.mark.asyncio
+    async def test_search_all_tool_exists(self):
+        """Testa se a tool search_all existe"""
+        tools = await app.get_tools()
+        assert "search_all" in tools
+
     @pytest.mark.asyncio
     async def test_get_playlist_tracks_tool_exists(self):
         """Testa se a tool get_playlist_tracks existe"""
@@ -367,6 +457,12 @@ class TestMCPResources:
         resources = await app.get_resources()
         assert "spotify://user/followed-artists" in resources
 
+    @pytest.mark.asyncio
+    async def test_server_metrics_resource_exists(self):
+        """Testa se o resource server_metrics existe"""
+        resources = await app.get_resources()
+        assert "spotify://server/metrics" in resources
+
 
 class TestToolFunctionality:
     """Testes para funcionalidade das tools"""
@@ -473,6 +569,16 @@ class TestIntegration:
             "get_genres",
             "get_audio_features",
             "add_to_queue",
+            "build_flow_queue",
+            "get_listening_aggregates",
+            "export_library",
+            "get_server_metrics",
+            "get_authorization_url",
+            "hydrate_tracks",
+            "hydrate_artists",
+            "hydrate_albums",
+            "resolve_tracks",
+            "execute_batch",
             "skip_to_next",
             "skip_to_previous",
             "seek_to_position",
@@ -485,11 +591,22 @@ class TestIntegration:
             "search_artists",
             "search_albums",
             "search_playlists",
+            "search_all",
             "get_playlist_tracks",
+            "create_playlist",
+            "add_tracks_to_playlist",
+            "replace_playlist_tracks",
+            "remove_tracks_from_playlist",
+            "reorder_playlist_tracks",
+            "find_track_in_playlists",
+            "find_playlist_duplicates",
+            "find_equivalent_tracks",
             "get_album_tracks",
             "get_artist_top_tracks",
             "get_artist_albums",
             "get_related_artists",
+            "explore_artist_graph",
+            "find_artist_path",
         ]
 
         for tool_name in expected_tools:
@@ -521,6 +638,7 @@ class TestIntegration:
             "spotify://user/saved-tracks",
             "spotify://user/saved-albums",
             "spotify://user/followed-artists",
+            "spotify://server/metrics",
         ]
 
         for resource_name in expected_resources:
@@ -529,5 +647,31 @@ class TestIntegration:
             ), f"Resource {resource_name} não encontrado"
 
 
+class TestToolOutputs:
+    """Testes das respostas das tools validadas pelo cliente MCP"""
+
+    @pytest.fixture
+    def service(self, monkeypatch):
+        service = MagicMock()
+        monkeypatch.setattr("src.mcp_server.spotify_service", service)
+        return service
+
+    @pytest.mark.asyncio
+    async def test_playback_tools_return_counts(self, service):
+        """Testa next_track, previous_track e set_volume com valores numéricos"""
+        service.next_track.return_value = {"skipped": 2, "message": "Avançou 2"}
+        service.previous_track.return_value = {"skipped": 1, "message": "Anterior"}
+        service.set_volume.return_value = {"volume": 40, "message": "Volume 40%"}
+
+        async with Client(app) as mcp:
+            forward = await mcp.call_tool("next_track", {})
+            back = await mcp.call_tool("previous_track", {})
+            volume = await mcp.call_tool("set_volume", {"request": {"volume": 40}})
+
+        assert forward.data["skipped"] == 2
+        assert back.data["skipped"] == 1
+        assert volume.data["volume"] == 40
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
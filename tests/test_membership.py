@@ -0,0 +1,186 @@
+"""
+Testes do índice reverso de playlists e da busca de duplicadas
+"""
+
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+import spotipy
+
+from src.cache import playlist_cache
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.membership import PlaylistMembershipIndex
+from src.service import SpotifyService
+
+
+def item_requests(server: FakeSpotifyServer) -> int:
+    return sum(
+        count
+        for label, count in server.state.endpoints.items()
+        if label.startswith("GET /v1/playlists/") and label.endswith("/items")
+    )
+
+
+class TestPlaylistMembershipIndex:
+    """Testes do índice em memória"""
+
+    def test_update_applies_only_differences(self):
+        """Testa posições, repetições e a troca de conteúdo"""
+        index = PlaylistMembershipIndex()
+        index.update("p1", "Um", "s1", ["a", "b", "a", None])
+        index.update("p2", "Dois", "s1", ["b"])
+
+        assert index.lookup("a") == [{"id": "p1", "name": "Um", "positions": [0, 2]}]
+        assert {p["id"] for p in index.lookup("b")} == {"p1", "p2"}
+
+        changed = index.update("p1", "Um", "s2", ["a", "b", "c"])
+        assert changed == 2
+        assert index.lookup("a")[0]["positions"] == [0]
+        assert index.lookup("c")[0]["positions"] == [2]
+
+        index.remove("p2")
+        assert [p["id"] for p in index.lookup("b")] == ["p1"]
+        index.update("p1", "Um", "s3", [])
+        assert index.lookup("a") == []
+        assert len(index) == 0
+
+    def test_duplicates(self):
+        """Testa repetidas na mesma playlist e entre playlists"""
+        index = PlaylistMembershipIndex()
+        index.update("p1", "Um", "s1", ["a", "b", "a"], {"a": "Música A - X"})
+        index.update("p2", "Dois", "s1", ["b", "c"])
+        index.update("p3", "Três", "s1", ["c", "c"])
+
+        result = index.duplicates()
+        assert {(d["track_id"], d["playlist_id"]) for d in result["within"]} == {
+            ("a", "p1"),
+            ("c", "p3"),
+        }
+        assert {d["track_id"] for d in result["across"]} == {"b", "c"}
+        assert result["within"][0]["name"] == "Música A - X"
+
+        only_p2 = index.duplicates("p2")
+        assert only_p2["within"] == []
+        assert {d["track_id"] for d in only_p2["across"]} == {"b", "c"}
+
+    def test_lookup_during_removals(self):
+        """Testa consultas enquanto outra thread tira e repõe playlists"""
+        index = PlaylistMembershipIndex()
+        stop = threading.Event()
+
+        def churn():
+            while not stop.is_set():
+                for n in range(20):
+                    index.update(f"p{n}", "P", "s", ["a"])
+                for n in range(20):
+                    index.remove(f"p{n}")
+
+        worker = threading.Thread(target=churn)
+        worker.start()
+        try:
+            for _ in range(2000):
+                for entry in index.lookup("a"):
+                    assert entry["name"] == "P"
+        finally:
+            stop.set()
+            worker.join()
+
+    def test_sync_overtaken_by_invalidation(self):
+        """Testa que uma sincronização anterior à invalidação não vale"""
+        index = PlaylistMembershipIndex()
+        generation = index.generation
+        index.invalidate()
+        index.mark_synced(generation)
+        assert index.synced_at is None
+        index.mark_synced(index.generation)
+        assert index.synced_at is not None
+
+
+class TestPlaylistWriteInvalidation:
+    """Testes da invalidação do índice pelas escritas em playlist"""
+
+    def make_service(self) -> SpotifyService:
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        service.playlist_index = PlaylistMembershipIndex()
+        service.playlist_index.mark_synced(0)
+        return service
+
+    def test_index_is_invalidated_after_the_write(self):
+        """Testa que uma sincronização durante a escrita não fica valendo"""
+        service = self.make_service()
+        index = service.playlist_index
+
+        def write(playlist_id, items, position=None):
+            # Uma sincronização concorrente termina antes da escrita
+            assert index.synced_at is not None
+            index.mark_synced(index.generation)
+            return {"snapshot_id": "s2"}
+
+        service.client.playlist_add_items.side_effect = write
+        service.add_tracks_to_playlist("p" * 22, ["spotify:track:" + "a" * 22])
+
+        assert index.synced_at is None
+
+    def test_failed_write_also_invalidates(self):
+        """Testa a invalidação quando a escrita falha"""
+        service = self.make_service()
+        service.client.playlist_reorder_items.side_effect = spotipy.SpotifyException(
+            400, -1, "Bad request"
+        )
+        with pytest.raises(ValueError):
+            service.reorder_playlist_tracks("p" * 22, 0, 2)
+        assert service.playlist_index.synced_at is None
+
+
+class TestPlaylistIndexWithFakeApi:
+    """Testes da sincronização por snapshot_id contra a Web API falsa"""
+
+    def test_lookup_and_snapshot_diff(self, make_service):
+        """Testa que só playlists alteradas são lidas de novo"""
+        playlist_cache.clear()
+        library = FakeLibrary(tracks=200, playlists=5, playlist_size=30)
+        playlist_ids = list(library.playlists)
+        target = library.playlists[playlist_ids[0]]["track_ids"][3]
+
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            found = service.find_track_in_playlists(f"spotify:track:{target}")
+            first_reads = item_requests(server)
+
+            # Nova consulta dentro da validade: nenhuma requisição
+            requests = server.state.requests
+            service.find_track_in_playlists(target)
+            assert server.state.requests == requests
+
+            # Escrita em uma playlist: só ela é lida de novo
+            service.add_tracks_to_playlist(playlist_ids[1], [target, target])
+            again = service.find_track_in_playlists(target)
+            second_reads = item_requests(server) - first_reads
+
+        assert first_reads == 5
+        assert any(
+            p["id"] == playlist_ids[0] and 3 in p["positions"]
+            for p in found["playlists"]
+        )
+        assert second_reads == 1
+        assert again["sync"]["refreshed"] == 1
+        positions = {p["id"]: p["positions"] for p in again["playlists"]}
+        assert positions[playlist_ids[1]][-2:] == [30, 31]
+
+    def test_duplicates_tool(self, make_service):
+        """Testa a busca de duplicadas de uma playlist"""
+        playlist_cache.clear()
+        library = FakeLibrary(tracks=100, playlists=2, playlist_size=10)
+        playlist_id = next(iter(library.playlists))
+        repeated = library.playlists[playlist_id]["track_ids"][0]
+        library.playlists[playlist_id]["track_ids"].append(repeated)
+
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            result = service.find_playlist_duplicates(playlist_id)
+
+        assert result["within"][0]["track_id"] == repeated
+        assert result["within"][0]["positions"] == [0, 10]
+        assert result["within"][0]["name"]
@@ -0,0 +1,206 @@
+"""
+Testes para as métricas do servidor
+"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from src.metrics import (
+    Histogram,
+    MetricsRegistry,
+    endpoint_label,
+    instrument_auth_manager,
+    instrument_client,
+)
+
+
+class TestHistogram:
+    """Testes do histograma de latência"""
+
+    def test_quantiles(self):
+        """Testa estimativa de quantis"""
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.observe(0.02)
+        for _ in range(10):
+            histogram.observe(0.9)
+        assert 0.01 <= histogram.quantile(0.5) <= 0.025
+        assert 0.75 <= histogram.quantile(0.95) <= 0.9
+        assert histogram.quantile(1.0) == pytest.approx(0.9)
+
+    def test_empty(self):
+        """Testa histograma vazio"""
+        assert Histogram().snapshot()["p99"] == 0.0
+
+
+class TestEndpointLabel:
+    """Testes da normalização de endpoints"""
+
+    def test_ids_are_collapsed(self):
+        """Testa que IDs viram {id}"""
+        assert (
+            endpoint_label("get", "https://api.spotify.com/v1/tracks/abc?market=BR")
+            == "GET /tracks/{id}"
+        )
+        assert (
+            endpoint_label(
+                "GET",
+                "https://api.spotify.com/v1/playlists/37i9dQZF1DXcBWIGoYBM5M/tracks",
+            )
+            == "GET /playlists/{id}/tracks"
+        )
+        assert (
+            endpoint_label("GET", "https://api.spotify.com/v1/me/tracks/contains")
+            == "GET /me/tracks/contains"
+        )
+
+
+class TestMetricsRegistry:
+    """Testes do registro de métricas"""
+
+    def test_upstream_calls_are_attributed_to_tool(self):
+        """Testa que chamadas à API são contadas na tool em execução"""
+        registry = MetricsRegistry()
+        with registry.tool_call("search_tracks"):
+            registry.record_upstream("GET", "https://x/v1/search", 200, 0.05, 1000)
+            registry.record_upstream("GET", "https://x/v1/search", 200, 0.05, 500, 1)
+            registry.record_cache("search", hit=True)
+        registry.record_upstream("GET", "https://x/v1/me", 200, 0.01, 10)
+
+        snapshot = registry.snapshot()
+        tool = snapshot["tools"]["search_tracks"]
+        assert tool["calls"] == 1
+        assert tool["upstream_calls"] == 2
+        assert tool["bytes_received"] == 1500
+        assert tool["retries"] == 1
+        assert tool["cache_hits"] == 1
+        assert snapshot["upstream"]["GET /search"]["calls"] == 2
+        assert snapshot["upstream"]["GET /me"]["calls"] == 1
+
+    def test_nested_calls_count_in_both_tools(self):
+        """Testa operações de lote medidas no método e no execute_batch"""
+        registry = MetricsRegistry()
+        with registry.tool_call("execute_batch"):
+            with registry.tool_call("search_tracks"):
+                assert registry.in_flight == 1
+                registry.record_upstream("GET", "https://x/v1/search", 200, 0.05, 100)
+
+        tools = registry.snapshot()["tools"]
+        assert tools["search_tracks"]["upstream_calls"] == 1
+        assert tools["execute_batch"]["upstream_calls"] == 1
+        assert registry.in_flight == 0
+
+    def test_exceptions_count_as_errors(self):
+        """Testa que exceções são contadas como erro"""
+        registry = MetricsRegistry()
+        with pytest.raises(RuntimeError):
+            with registry.tool_call("play_music"):
+                raise RuntimeError("falhou")
+        assert registry.snapshot()["tools"]["play_music"]["errors"] == 1
+
+    def test_instrumented_session_hook(self):
+        """Testa o hook de resposta instalado na sessão do Spotipy"""
+        registry = MetricsRegistry()
+        client = SimpleNamespace(_session=SimpleNamespace(hooks={"response": []}))
+        instrument_client(client, registry)
+
+        retries = SimpleNamespace(history=(SimpleNamespace(status=429),))
+        response = SimpleNamespace(
+            request=SimpleNamespace(method="GET"),
+            url="https://api.spotify.com/v1/me/player",
+            status_code=200,
+            elapsed=SimpleNamespace(total_seconds=lambda: 0.2),
+            content=b"{}",
+            raw=SimpleNamespace(retries=retries),
+        )
+        client._session.hooks["response"][0](response)
+
+        snapshot = registry.snapshot()
+        assert snapshot["upstream"]["GET /me/player"]["retries"] == 1
+        assert snapshot["events"]["rate_limited"] == 1
+
+
+class TestOpenMetrics:
+    """Testes da exportação no formato OpenMetrics"""
+
+    def test_render(self):
+        """Testa contadores, histogramas e gauges renderizados"""
+        registry = MetricsRegistry()
+        with registry.tool_call("search_tracks"):
+            registry.record_upstream("GET", "https://x/v1/search", 200, 0.05, 100)
+        registry.record_event("rate_limited")
+        registry.register_gauge(
+            "spotify_mcp_cache_entries", lambda: 42, {"cache": 'a"b'}, "Entradas"
+        )
+
+        text = registry.render_openmetrics()
+        assert 'spotify_mcp_tool_calls_total{tool="search_tracks"} 1' in text
+        assert (
+            'spotify_mcp_upstream_requests_total{endpoint="GET /search",status="200"} 1'
+            in text
+        )
+        assert (
+            'spotify_mcp_tool_duration_seconds_bucket{tool="search_tracks",le="+Inf"} 1'
+            in text
+        )
+        assert "spotify_mcp_rate_limited_total 1" in text
+        assert 'spotify_mcp_cache_entries{cache="a\\"b"} 42' in text
+        assert "# TYPE spotify_mcp_tool_duration_seconds histogram" in text
+        assert text.endswith("# EOF\n")
+
+    def test_token_refresh_events(self):
+        """Testa a contagem de renovações de token"""
+        registry = MetricsRegistry()
+        calls = []
+
+        def refresh(token):
+            calls.append(token)
+            if token == "bad":
+                raise RuntimeError("invalid_grant")
+            return {"access_token": "novo"}
+
+        auth_manager = SimpleNamespace(refresh_access_token=refresh)
+        instrument_auth_manager(auth_manager, registry)
+        auth_manager.refresh_access_token("ok")
+        with pytest.raises(RuntimeError):
+            auth_manager.refresh_access_token("bad")
+
+        assert calls == ["ok", "bad"]
+        events = registry.snapshot()["events"]
+        assert events["token_refresh"] == 1
+        assert events["token_refresh_failed"] == 1
+
+    def test_http_endpoint(self):
+        """Testa a rota /metrics do transporte HTTP"""
+        from starlette.testclient import TestClient
+
+        from src.mcp_server import app
+
+        with TestClient(app.http_app()) as client:
+            response = client.get("/metrics")
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith(
+            "application/openmetrics-text"
+        )
+        assert response.text.endswith("# EOF\n")
+
+
+class TestMetricsMiddleware:
+    """Testes da instrumentação das tools do servidor MCP"""
+
+    @pytest.mark.asyncio
+    async def test_tool_calls_are_measured(self):
+        """Testa que chamadas de tool aparecem em get_server_metrics"""
+        from fastmcp import Client
+
+        from src.mcp_server import app
+        from src.metrics import metrics
+
+        async with Client(app) as client:
+            await client.call_tool("get_genres", {})
+            result = await client.call_tool("get_server_metrics", {})
+
+        assert metrics.snapshot()["tools"]["get_genres"]["calls"] >= 1
+        assert "get_genres" in result.data["tools"]
@@ -0,0 +1,163 @@
+"""
+Testes do poller de playback e das assinaturas de recursos
+"""
+
+import asyncio
+
+import pytest
+from fastmcp import Client, FastMCP
+from fastmcp.client.messages import MessageHandler
+
+from src.metrics import MetricsRegistry
+from src.playback import CURRENT_URI, QUEUE_URI, PlaybackPoller
+
+
+def playing(progress_ms, duration_ms=200000, uri="spotify:track:a", is_playing=True):
+    return {
+        "is_playing": is_playing,
+        "track": {
+            "name": "Faixa",
+            "uri": uri,
+            "duration_ms": duration_ms,
+            "progress_ms": progress_ms,
+        },
+    }
+
+
+class FakePlayer:
+    """Fonte dos recursos com contagem de chamadas"""
+
+    def __init__(self):
+        self.state = playing(0)
+        self.calls = 0
+
+    def current(self, user_id):
+        self.calls += 1
+        return self.state
+
+    def queue(self, user_id):
+        return {"queue": []}
+
+
+def make_poller(player, **kwargs):
+    return PlaybackPoller(
+        {CURRENT_URI: player.current, QUEUE_URI: player.queue},
+        MetricsRegistry(),
+        **kwargs,
+    )
+
+
+class TestPlaybackPoller:
+    """Testes do intervalo adaptativo e da detecção de mudanças"""
+
+    def test_interval_adapts_to_player(self):
+        """Testa intervalo lento pausado e curto perto do fim da faixa"""
+        poller = make_poller(
+            FakePlayer(), playing_interval=5, paused_interval=15, min_interval=1
+        )
+        assert poller.next_interval(playing(0, is_playing=False)) == 15
+        assert poller.next_interval({"message": "Nenhuma música tocando"}) == 15
+        assert poller.next_interval(playing(0)) == 5
+        assert poller.next_interval(playing(197000)) == 3.5
+        assert poller.next_interval(playing(199900)) == 1
+
+    def test_progress_alone_is_not_a_change(self):
+        """Testa que só trocas de faixa, pausa ou seek geram notificação"""
+        poller = make_poller(FakePlayer())
+        assert not poller._changed(CURRENT_URI, playing(0), playing(5000), 5.0)
+        assert poller._changed(CURRENT_URI, playing(0), playing(90000), 5.0)
+        assert poller._changed(
+            CURRENT_URI, playing(0), playing(5000, uri="spotify:track:b"), 5.0
+        )
+        assert poller._changed(
+            CURRENT_URI, playing(0), playing(0, is_playing=False), 5.0
+        )
+
+    def test_reads_without_subscribers_are_briefly_cached(self):
+        """Testa que leituras seguidas sem assinatura reutilizam o snapshot"""
+        player = FakePlayer()
+        poller = make_poller(player, min_interval=60)
+
+        for _ in range(3):
+            assert poller.read(CURRENT_URI, "default") == player.state
+        assert player.calls == 1
+
+        poller.min_interval = 0
+        poller.read(CURRENT_URI, "default")
+        assert player.calls == 2
+
+    def test_read_survives_unsubscribe_after_refresh(self):
+        """Testa a leitura quando o snapshot some logo depois da busca"""
+        player = FakePlayer()
+        poller = make_poller(player)
+        refresh = poller.refresh
+
+        def refresh_then_unsubscribe(user_id, uris):
+            result = refresh(user_id, uris)
+            poller._snapshots.pop(user_id, None)
+            return result
+
+        poller.refresh = refresh_then_unsubscribe
+        assert poller.read(CURRENT_URI, "default") == player.state
+
+
+class Notifications(MessageHandler):
+    def __init__(self):
+        self.updated = []
+
+    async def on_resource_updated(self, message):
+        self.updated.append(str(message.params.uri))
+
+
+class TestSubscriptions:
+    """Testes de resources/subscribe com o poller em execução"""
+
+    @pytest.mark.asyncio
+    async def test_subscribers_are_notified(self):
+        """Testa notificação de mudança e leitura servida pelo snapshot"""
+        player = FakePlayer()
+        poller = make_poller(player, playing_interval=0.05, min_interval=0.05)
+        app = FastMCP(name="teste", lifespan=poller.lifespan)
+        poller.install(app)
+        app.add_middleware(poller)
+
+        @app.resource(CURRENT_URI)
+        def current_playback() -> dict:
+            """Estado atual do player"""
+            return poller.read(CURRENT_URI)
+
+        @app.tool()
+        def pause_music() -> dict:
+            """Pausa o player"""
+            player.state = playing(0, is_playing=False)
+            return {"message": "Música pausada"}
+
+        handler = Notifications()
+        async with Client(app, message_handler=handler) as client:
+            caps = client.initialize_result.capabilities
+            assert caps.resources.subscribe
+
+            await client.session.subscribe_resource(CURRENT_URI)
+            await asyncio.sleep(0.1)
+            assert poller.running
+
+            # Leituras vêm do snapshot (no máximo uma consulta do próprio poller)
+            calls = player.calls
+            for _ in range(5):
+                await client.read_resource(CURRENT_URI)
+            assert player.calls - calls <= 2
+
+            player.state = playing(0, uri="spotify:track:b")
+            await asyncio.sleep(0.15)
+            assert handler.updated == [CURRENT_URI]
+
+            await client.call_tool("pause_music", {})
+            await asyncio.sleep(0.7)
+            assert handler.updated == [CURRENT_URI, CURRENT_URI]
+
+            await client.session.unsubscribe_resource(CURRENT_URI)
+            await asyncio.sleep(0.1)
+            calls = player.calls
+            await asyncio.sleep(0.2)
+            assert player.calls == calls
+            assert not poller.running
@@ -0,0 +1,164 @@
+"""
+Testes da escrita em lote em playlists
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+import spotipy
+
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.playlists import PlaylistWriter
+
+
+def uris(count: int, prefix: str = "t") -> list:
+    return [f"spotify:track:{prefix}{i:021d}" for i in range(count)]
+
+
+class FlakyClient:
+    """Cliente simulado: falha nas chamadas indicadas de playlist_add_items"""
+
+    def __init__(self, failures=None, applied_on_failure=False):
+        self.failures = dict(failures or {})
+        self.applied_on_failure = applied_on_failure
+        self.snapshot_id = "s0"
+        self.sent = []
+        self.calls = 0
+
+    def _bump(self):
+        self.snapshot_id = f"s{int(self.snapshot_id[1:]) + 1}"
+
+    def playlist(self, playlist_id, fields=None):
+        return {"snapshot_id": self.snapshot_id}
+
+    def playlist_add_items(self, playlist_id, items, position=None):
+        self.calls += 1
+        error = self.failures.pop(self.calls, None)
+        if error is not None:
+            if self.applied_on_failure:
+                self.sent.append(list(items))
+                self._bump()
+            raise error
+        self.sent.append(list(items))
+        self._bump()
+        return {"snapshot_id": self.snapshot_id}
+
+
+def server_error() -> Exception:
+    return spotipy.SpotifyException(502, -1, "bad gateway")
+
+
+class TestPlaylistWriter:
+    """Testes de lotes, repetições e snapshots"""
+
+    def make_writer(self, client) -> PlaylistWriter:
+        return PlaylistWriter(client, retries=2, sleep=lambda _: None)
+
+    def test_retries_only_the_failed_chunk(self):
+        """Testa que só o lote que falhou é reenviado"""
+        client = FlakyClient(failures={2: server_error()})
+        result = self.make_writer(client).add("p", uris(250))
+
+        assert [len(chunk) for chunk in client.sent] == [100, 100, 50]
+        assert sum(client.sent, []) == uris(250)
+        assert result["retried_chunks"] == [100]
+        assert result["added"] == 250
+        assert result["snapshot_id"] == client.snapshot_id
+
+    def test_applied_write_is_not_resent(self):
+        """Testa que um lote aplicado com resposta perdida não é duplicado"""
+        client = FlakyClient(failures={1: ConnectionError()}, applied_on_failure=True)
+        result = self.make_writer(client).add("p", uris(150))
+
+        assert sum(client.sent, []) == uris(150)
+        assert client.calls == 2
+        assert result["retried_chunks"] == [0]
+
+    def test_stops_in_order_on_permanent_failure(self):
+        """Testa que lotes seguintes não saem e resume_from aponta o ponto"""
+        client = FlakyClient(
+            failures={2: spotipy.SpotifyException(400, -1, "Invalid track uri")}
+        )
+        result = self.make_writer(client).add("p", uris(300))
+
+        assert client.calls == 2
+        assert result["added"] == 100
+        assert result["resume_from"] == 100
+        assert result["failed_chunk"]["count"] == 100
+
+    def test_gives_up_after_retries(self):
+        """Testa o limite de repetições de um lote"""
+        client = FlakyClient(failures={i: server_error() for i in range(1, 10)})
+        result = self.make_writer(client).add("p", uris(10))
+        assert client.calls == 3
+        assert result["resume_from"] == 0
+
+    def test_no_retry_without_known_snapshot(self):
+        """Testa que sem snapshot anterior uma escrita ambígua não se repete"""
+        client = MagicMock()
+        client.playlist_reorder_items.side_effect = server_error()
+        writer = self.make_writer(client)
+        with pytest.raises(spotipy.SpotifyException):
+            writer._commit(
+                "p", None, lambda s: client.playlist_reorder_items("p", 0, 2)
+            )
+        assert client.playlist_reorder_items.call_count == 1
+
+
+class TestPlaylistWritesWithFakeApi:
+    """Testes contra a Web API falsa"""
+
+    def test_create_large_playlist_in_chunks(self, make_service):
+        """Testa 2.000 músicas em 20 inclusões, na ordem"""
+        library = FakeLibrary(tracks=2000, playlists=1)
+        track_ids = list(library.tracks)
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            result = service.create_playlist("Longa", track_ids)
+            playlist_id = result["playlist"]["id"]
+            add_requests = server.state.endpoints.get(
+                f"POST /v1/playlists/{playlist_id}/items"
+            )
+            creates = server.state.endpoints.get("POST /v1/me/playlists")
+
+        assert creates == 1
+        assert add_requests == 20
+        assert result["added"] == 2000
+        assert result["chunks"] == 20
+        assert library.playlists[playlist_id]["track_ids"] == track_ids
+        assert result["snapshot_id"] == library.playlists[playlist_id]["snapshot_id"]
+
+    def test_insert_reorder_remove_replace(self, make_service):
+        """Testa inclusão com posição, reordenação, remoção e substituição"""
+        library = FakeLibrary(tracks=400, playlists=1, playlist_size=10)
+        playlist_id = next(iter(library.playlists))
+        original = list(library.playlists[playlist_id]["track_ids"])
+        extra = [i for i in library.tracks if i not in original][:150]
+
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            service.add_tracks_to_playlist(playlist_id, extra, position=5)
+            track_ids = library.playlists[playlist_id]["track_ids"]
+            assert track_ids == original[:5] + extra + original[5:]
+
+            service.reorder_playlist_tracks(playlist_id, 0, 160, range_length=5)
+            assert track_ids == extra + original[5:] + original[:5]
+
+            removed = service.remove_tracks_from_playlist(
+                playlist_id, [f"spotify:track:{i}" for i in extra]
+            )
+            assert removed["removed"] == 150
+            assert removed["chunks"] == 2
+            assert track_ids == original[5:] + original[:5]
+
+            replaced = service.replace_playlist_tracks(playlist_id, extra[::-1])
+            assert replaced["chunks"] == 2
+            assert library.playlists[playlist_id]["track_ids"] == extra[::-1]
+
+    def test_invalid_uri(self, make_service):
+        """Testa que URIs inválidas são recusadas antes de qualquer escrita"""
+        with FakeSpotifyServer(FakeLibrary(tracks=20, playlists=1)) as server:
+            service = make_service(server)
+            with pytest.raises(ValueError, match="Erro ao criar playlist"):
+                service.create_playlist("X", ["spotify:album:abc"])
+            assert server.state.endpoints.get("POST /v1/me/playlists") is None
@@ -0,0 +1,244 @@
+"""
+Testes da resolução de listas "artista - título" para URIs
+"""
+
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.analytics import ListeningAggregates
+from src.cache import resolve_cache
+from src.equivalence import TrackEquivalenceIndex
+from src.resolve import (
+    LibraryIndex,
+    best_match,
+    normalize,
+    parse_line,
+    score,
+    similarity,
+)
+from src.service import SpotifyService
+
+
+def item(track_id: str, name: str, artist: str) -> dict:
+    return {
+        "uri": f"spotify:track:{track_id}",
+        "name": name,
+        "artists": [{"name": artist}],
+    }
+
+
+CATALOG = [
+    item("t1", "Garota de Ipanema", "Tom Jobim"),
+    item("t2", "Águas de Março - Remastered 2005", "Elis Regina"),
+    item("t3", "Garota de Ipanema (Live)", "Outro Artista"),
+]
+
+
+class FakeSearch:
+    """client.search simulado: procura título e artista no catálogo acima"""
+
+    def __init__(self):
+        self.queries = []
+        self.lock = threading.Lock()
+
+    def __call__(self, q, type, limit):
+        with self.lock:
+            self.queries.append(q)
+        text = normalize(q.replace("track:", "").replace("artist:", ""))
+        items = [
+            track
+            for track in CATALOG
+            if normalize(track["name"]) in text or text in normalize(track["name"])
+        ]
+        return {"tracks": {"items": items[:limit]}}
+
+
+def make_service(labels=None) -> SpotifyService:
+    resolve_cache.clear()
+    service = SpotifyService.__new__(SpotifyService)
+    service.user_id = "default"
+    service.client = MagicMock()
+    service.client.current_user.return_value = {"country": "BR"}
+    service.client.search.side_effect = FakeSearch()
+    service.aggregates = ListeningAggregates()
+    service.equivalence = TrackEquivalenceIndex()
+    service.aggregates.track_labels.update(labels or {})
+    return service
+
+
+class TestMatching:
+    """Testes da normalização e da pontuação"""
+
+    def test_parse_line(self):
+        """Testa a separação entre artista e título"""
+        assert parse_line("Tom Jobim - Garota de Ipanema") == (
+            "Tom Jobim",
+            "Garota de Ipanema",
+        )
+        assert parse_line("Elis Regina – Águas de Março") == (
+            "Elis Regina",
+            "Águas de Março",
+        )
+        assert parse_line("Garota de Ipanema") == (None, "Garota de Ipanema")
+
+    def test_normalize(self):
+        """Testa acentos, pontuação e sufixos de versão"""
+        assert normalize("Águas de Março - Remastered 2005") == "aguas de marco"
+        assert normalize("Garota de Ipanema (Live)") == "garota de ipanema"
+        assert normalize("Song feat. Someone") == "song"
+
+    def test_score_prefers_matching_artist(self):
+        """Testa que o artista certo vence um título igual"""
+        title = normalize("Garota de Ipanema")
+        artist = normalize("Tom Jobim")
+        right = score(artist, title, "Garota de Ipanema", ["Tom Jobim"])
+        wrong = score(artist, title, "Garota de Ipanema (Live)", ["Outro Artista"])
+        assert right == 1.0
+        assert wrong < 0.8
+        assert similarity("the beatles", "beatles") >= 0.9
+
+    def test_other_artist_is_rejected(self):
+        """Testa que um título igual de outro artista não é aceito"""
+        yesterday = normalize("Yesterday")
+        hello = normalize("Hello")
+        assert (
+            score(normalize("Metallica"), yesterday, "Yesterday", ["The Beatles"]) == 0
+        )
+        assert score(normalize("Adele"), hello, "Hello", ["Lionel Richie"]) == 0
+        assert (
+            score(normalize("Beatles"), yesterday, "Yesterday", ["The Beatles"]) > 0.9
+        )
+
+    def test_cover_loses_to_original_artist(self):
+        """Testa que o cover listado primeiro não vence a gravação pedida"""
+        candidates = [
+            {"uri": "spotify:track:cover", "name": "Hurt", "artists": ["Johnny Cash"]},
+            {
+                "uri": "spotify:track:nin",
+                "name": "Hurt",
+                "artists": ["Nine Inch Nails"],
+            },
+        ]
+        match = best_match(normalize("Nine Inch Nails"), normalize("Hurt"), candidates)
+        assert match["uri"] == "spotify:track:nin"
+        assert best_match(normalize("Adele"), normalize("Hurt"), candidates) is None
+        assert best_match("", normalize("Hurt"), candidates)["confidence"] == 1.0
+
+    def test_library_index(self):
+        """Testa a busca no índice local pelo título normalizado"""
+        index = LibraryIndex(
+            {
+                "spotify:track:t9": "Garota de Ipanema - Tom Jobim",
+                "Música sem URI - Alguém": "Música sem URI - Alguém",
+            }
+        )
+        match = index.lookup(normalize("tom jobim"), normalize("garota de ipanema"))
+        assert match["uri"] == "spotify:track:t9"
+        assert match["confidence"] == 1.0
+        assert len(index) == 1
+        assert (
+            index.lookup(normalize("caetano"), normalize("garota de ipanema")) is None
+        )
+
+
+class TestResolveTracks:
+    """Testes de resolve_tracks"""
+
+    def test_resolves_in_order_with_confidence(self):
+        """Testa ordem, repetições, fontes e linhas não encontradas"""
+        service = make_service()
+        lines = [
+            "Tom Jobim - Garota de Ipanema",
+            "Elis Regina - Águas de Março",
+            "tom jobim - garota de ipanema",
+            "Ninguém - Música Inexistente",
+        ]
+
+        result = service.resolve_tracks(lines)
+
+        assert [t["uri"] for t in result["tracks"][:3]] == [
+            "spotify:track:t1",
+            "spotify:track:t2",
+            "spotify:track:t1",
+        ]
+        assert result["tracks"][0]["confidence"] == 1.0
+        assert result["uris"] == [
+            "spotify:track:t1",
+            "spotify:track:t2",
+            "spotify:track:t1",
+        ]
+        assert result["unresolved"] == ["Ninguém - Música Inexistente"]
+        assert result["sources"] == {"search": 4}
+        # A linha repetida é buscada uma vez; a inexistente tenta as duas consultas
+        assert service.client.search.call_count == 4
+
+    def test_cache_and_library_skip_the_search(self):
+        """Testa que o índice local e o cache evitam novas buscas"""
+        service = make_service({"spotify:track:local": "Águas de Março - Elis Regina"})
+        service.resolve_tracks(["Tom Jobim - Garota de Ipanema"])
+        calls = service.client.search.call_count
+
+        result = service.resolve_tracks(
+            ["Tom Jobim - Garota de Ipanema", "Elis Regina - Águas de Março"]
+        )
+
+        assert service.client.search.call_count == calls
+        assert result["tracks"][0]["source"] == "cache"
+        assert result["tracks"][1]["source"] == "library"
+        assert result["tracks"][1]["uri"] == "spotify:track:local"
+
+    def test_cache_is_per_market(self):
+        """Testa que outra conta do mesmo país reusa a resolução e de outro não"""
+        make_service().resolve_tracks(["Tom Jobim - Garota de Ipanema"])
+        same_market = SpotifyService.__new__(SpotifyService)
+        other = SpotifyService.__new__(SpotifyService)
+        for service, country in ((same_market, "BR"), (other, "PT")):
+            service.user_id = "outro"
+            service.client = MagicMock()
+            service.client.current_user.return_value = {"country": country}
+            service.client.search.side_effect = FakeSearch()
+            service.equivalence = TrackEquivalenceIndex()
+            service.resolve_tracks(["Tom Jobim - Garota de Ipanema"])
+
+        same_market.client.search.assert_not_called()
+        assert other.client.search.call_count >= 1
+
+    def test_same_title_other_artist_is_not_resolved(self):
+        """Testa que o índice local e a busca não aceitam homônimas"""
+        service = make_service({"spotify:track:local": "Hello - Lionel Richie"})
+        service.client.search.side_effect = lambda q, type, limit: {
+            "tracks": {"items": [item("lr", "Hello", "Lionel Richie")]}
+        }
+
+        result = service.resolve_tracks(["Adele - Hello"], min_confidence=0.1)
+
+        assert result["tracks"][0]["uri"] is None
+        assert result["resolved"] == 0
+
+    def test_queue_resolved_tracks(self):
+        """Testa o envio das URIs resolvidas para a fila"""
+        service = make_service()
+        result = service.resolve_tracks(
+            ["Tom Jobim - Garota de Ipanema", "Ninguém - Nada"], action="queue"
+        )
+        service.client.add_to_queue.assert_called_once_with(uri="spotify:track:t1")
+        assert result["tracks_queued"] == 1
+
+    def test_search_errors_stay_per_line(self):
+        """Testa que uma falha na busca não derruba a lista"""
+        service = make_service()
+        service.client.search.side_effect = RuntimeError("429")
+        result = service.resolve_tracks(["Tom Jobim - Garota de Ipanema"])
+        assert result["resolved"] == 0
+        assert result["tracks"][0]["error"] == "429"
+        assert len(resolve_cache) == 0
+
+    def test_limits(self):
+        """Testa o limite de linhas e a ação inválida"""
+        service = make_service()
+        with pytest.raises(ValueError, match="Máximo"):
+            service.resolve_tracks(["a - b"] * 1000)
+        with pytest.raises(ValueError, match="action"):
+            service.resolve_tracks(["a - b"], action="shuffle")
@@ -0,0 +1,207 @@
+"""
+Testes do cache dos recursos spotify://
+"""
+
+import json
+import time
+
+import pytest
+from fastmcp import Client, FastMCP
+
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.resources import INVALIDATED_BY, ResourceCache, content_etag
+
+URI = "spotify://user/saved-tracks"
+
+
+class FakeService:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.version = 1
+        self.calls = 0
+
+    def get_saved_tracks(self):
+        self.calls += 1
+        return {"user": self.user_id, "version": self.version}
+
+
+def make_cache(ttl=60.0, max_stale=60.0, **kwargs):
+    services = {}
+
+    def service_for(user_id):
+        return services.setdefault(user_id, FakeService(user_id))
+
+    cache = ResourceCache(service_for, ttls={URI: (ttl, max_stale)}, **kwargs)
+    return cache, service_for
+
+
+def fetch(service):
+    return service.get_saved_tracks()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+class TestResourceCache:
+    """Testes de validade, revalidação e versões"""
+
+    def test_fresh_reads_hit_cache(self):
+        """Testa que leituras dentro da validade não chamam a Web API"""
+        cache, service_for = make_cache()
+        first = cache.read(URI, fetch, "alice")
+        second = cache.read(URI, fetch, "alice")
+
+        assert service_for("alice").calls == 1
+        assert first == second
+        assert first["stale"] is False
+        assert first["etag"].startswith('W/"')
+
+    def test_stale_while_revalidate(self):
+        """Testa que o valor vencido é servido enquanto o novo é buscado"""
+        cache, service_for = make_cache(ttl=0.05)
+        service = service_for("alice")
+        first = cache.read(URI, fetch, "alice")
+
+        time.sleep(0.06)
+        service.version = 2
+        stale = cache.read(URI, fetch, "alice")
+        assert stale["stale"] is True
+        assert stale["data"]["version"] == 1
+
+        assert wait_for(lambda: service.calls == 2)
+        assert wait_for(lambda: cache.read(URI, fetch, "alice")["data"]["version"] == 2)
+        assert cache.read(URI, fetch, "alice")["etag"] != first["etag"]
+
+    def test_expired_value_is_reloaded(self):
+        """Testa a busca síncrona depois da janela de tolerância"""
+        cache, service_for = make_cache(ttl=0.01, max_stale=0.01)
+        cache.read(URI, fetch, "alice")
+        time.sleep(0.03)
+        service_for("alice").version = 2
+
+        result = cache.read(URI, fetch, "alice")
+        assert result["stale"] is False
+        assert result["data"]["version"] == 2
+
+    def test_users_are_isolated(self):
+        """Testa que cada usuário tem o próprio valor em cache"""
+        cache, _ = make_cache()
+        assert cache.read(URI, fetch, "alice")["data"]["user"] == "alice"
+        assert cache.read(URI, fetch, "bob")["data"]["user"] == "bob"
+
+    def test_scale_zero_disables_cache(self):
+        """Testa que a escala 0 desativa o cache"""
+        cache, service_for = make_cache(ttl_scale=0)
+        cache.read(URI, fetch, "alice")
+        cache.read(URI, fetch, "alice")
+        assert service_for("alice").calls == 2
+
+    def test_etag_ignores_key_order(self):
+        """Testa que a versão depende só do conteúdo"""
+        assert content_etag({"a": 1, "b": 2}) == content_etag({"b": 2, "a": 1})
+        assert content_etag({"a": 1}) != content_etag({"a": 2})
+
+    @pytest.mark.asyncio
+    async def test_write_tools_invalidate(self):
+        """Testa que tools de escrita invalidam o recurso afetado"""
+        cache, service_for = make_cache()
+        app = FastMCP(name="teste")
+        app.add_middleware(cache)
+
+        @app.resource(URI)
+        def saved_tracks() -> dict:
+            """Músicas salvas"""
+            return cache.read(URI, fetch)
+
+        @app.tool()
+        def add_track_to_favorites(track_id: str) -> dict:
+            """Salva uma música"""
+            service_for("default").version += 1
+            return {"message": "ok"}
+
+        async with Client(app) as client:
+            await client.read_resource(URI)
+            await client.read_resource(URI)
+            await client.call_tool("add_track_to_favorites", {"track_id": "x"})
+            await client.read_resource(URI)
+
+        assert service_for("default").calls == 2
+
+    def test_playlist_writes_invalidate_playlists(self):
+        """Testa que toda escrita em playlist invalida a lista de playlists"""
+        for tool in (
+            "create_playlist",
+            "add_tracks_to_playlist",
+            "replace_playlist_tracks",
+            "remove_tracks_from_playlist",
+            "reorder_playlist_tracks",
+        ):
+            assert "spotify://playlists/user" in INVALIDATED_BY[tool]
+
+    @pytest.mark.asyncio
+    async def test_batch_invalidates_executed_methods(self):
+        """Testa que um lote invalida o recurso de cada operação executada"""
+        cache, service_for = make_cache()
+        app = FastMCP(name="teste")
+        app.add_middleware(cache)
+
+        @app.resource(URI)
+        def saved_tracks() -> dict:
+            """Músicas salvas"""
+            return cache.read(URI, fetch)
+
+        @app.tool()
+        def execute_batch(operations: list) -> dict:
+            """Lote simulado"""
+            service_for("default").version += 1
+            return {"results": operations}
+
+        async with Client(app) as client:
+            await client.read_resource(URI)
+            await client.call_tool(
+                "execute_batch",
+                {
+                    "operations": [
+                        {"method": "get_genres", "status": "ok", "started": True}
+                    ]
+                },
+            )
+            await client.read_resource(URI)
+            await client.call_tool(
+                "execute_batch",
+                {
+                    "operations": [
+                        {
+                            "method": "add_track_to_favorites",
+                            "status": "ok",
+                            "started": True,
+                        }
+                    ]
+                },
+            )
+            await client.read_resource(URI)
+
+        assert service_for("default").calls == 2
+
+    @pytest.mark.asyncio
+    async def test_top_tracks_resource(self, monkeypatch, make_service):
+        """Testa a leitura de spotify://user/top-tracks pelo servidor MCP"""
+        from src.mcp_server import app
+
+        with FakeSpotifyServer(FakeLibrary(tracks=30)) as server:
+            service = make_service(server)
+            monkeypatch.setattr(
+                "src.mcp_server.resource_cache",
+                ResourceCache(lambda user_id: service),
+            )
+            async with Client(app) as client:
+                contents = await client.read_resource("spotify://user/top-tracks")
+
+        resource = json.loads(contents[0].text)
+        assert "error" not in resource["data"]
+        assert len(resource["data"]["tracks"]) == 20
+        assert server.state.endpoints["GET /v1/me/top/tracks"] == 1
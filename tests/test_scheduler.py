@@ -0,0 +1,124 @@
+"""
+Testes do escalonador de requisições à Web API por prioridade
+"""
+
+import threading
+import time
+from unittest.mock import MagicMock
+
+from src.metrics import MetricsRegistry
+from src.scheduler import (
+    BULK,
+    CONTROL,
+    INTERACTIVE,
+    UpstreamScheduler,
+    priority,
+    request_priority,
+    tool_priority,
+)
+
+API = "https://api.spotify.com/v1/"
+
+
+class TestClassification:
+    """Testes da classificação de tools e requisições"""
+
+    def test_tool_priority(self):
+        """Testa a classe de algumas tools"""
+        assert tool_priority("pause_music") == CONTROL
+        assert tool_priority("export_library") == BULK
+        assert tool_priority("search_tracks") == INTERACTIVE
+        assert tool_priority("get_listening_aggregates") == INTERACTIVE
+
+    def test_player_writes_are_control(self):
+        """Testa que escritas no player são urgentes mesmo dentro de lote"""
+        with priority(BULK):
+            assert request_priority("PUT", API + "me/player/play") == CONTROL
+            assert request_priority("GET", API + "me/player") == BULK
+            assert request_priority("GET", API + "me/tracks") == BULK
+        assert request_priority("GET", API + "search") == INTERACTIVE
+
+
+class TestUpstreamScheduler:
+    """Testes dos limites por classe"""
+
+    def test_concurrency_per_class(self):
+        """Testa que o limite de uma classe não afeta as outras"""
+        scheduler = UpstreamScheduler({CONTROL: 1, INTERACTIVE: 1, BULK: 1})
+        release = threading.Event()
+
+        def hold_bulk():
+            with scheduler.slot(BULK):
+                release.wait(2)
+
+        worker = threading.Thread(target=hold_bulk)
+        worker.start()
+        time.sleep(0.05)
+
+        start = time.perf_counter()
+        with scheduler.slot(CONTROL):
+            pass
+        assert time.perf_counter() - start < 0.05
+
+        blocked = threading.Thread(target=hold_bulk)
+        blocked.start()
+        time.sleep(0.05)
+        assert scheduler.waiting[BULK] == 1
+        release.set()
+        worker.join()
+        blocked.join()
+        assert scheduler.in_flight[BULK] == 0
+
+    def test_rate_share_is_reserved(self):
+        """Testa que o lote esgota só a própria fatia da taxa"""
+        scheduler = UpstreamScheduler(
+            {CONTROL: 4, INTERACTIVE: 4, BULK: 4},
+            rate=10,
+            shares={CONTROL: 0.5, BULK: 0.5},
+        )
+        for _ in range(5):
+            with scheduler.slot(BULK):
+                pass
+
+        start = time.perf_counter()
+        with scheduler.slot(BULK):
+            pass
+        assert time.perf_counter() - start >= 0.1
+
+        start = time.perf_counter()
+        for _ in range(5):
+            with scheduler.slot(CONTROL):
+                pass
+        assert time.perf_counter() - start < 0.05
+
+    def test_control_borrows_idle_share(self):
+        """Testa que o controle usa a fatia ociosa das classes abaixo"""
+        scheduler = UpstreamScheduler(
+            {CONTROL: 4, INTERACTIVE: 4, BULK: 4},
+            rate=4,
+            shares={CONTROL: 0.25, BULK: 0.75},
+        )
+        start = time.perf_counter()
+        for _ in range(4):
+            with scheduler.slot(CONTROL):
+                pass
+        assert time.perf_counter() - start < 0.05
+
+    def test_install_wraps_session(self):
+        """Testa que as requisições do cliente passam pelo escalonador"""
+        registry = MetricsRegistry()
+        scheduler = UpstreamScheduler({INTERACTIVE: 1}, registry=registry)
+        seen = []
+        client = MagicMock()
+        client._session.request = lambda method, url, **kw: seen.append(
+            dict(scheduler.in_flight)
+        )
+
+        scheduler.install(client)
+        scheduler.install(client)
+        client._session.request("PUT", API + "me/player/pause")
+
+        assert seen == [{CONTROL: 1, INTERACTIVE: 0, BULK: 0}]
+        assert 'spotify_mcp_upstream_in_flight{priority="control"}' in (
+            registry.gauges()
+        )
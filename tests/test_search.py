@@ -0,0 +1,129 @@
+"""
+Testes da busca em vários tipos com uma requisição
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.cache import search_cache
+from src.equivalence import TrackEquivalenceIndex
+from src.fake_spotify import FakeLibrary, FakeSpotifyServer
+from src.search import normalize_query, search_types, split_results
+from src.service import SpotifyService
+
+
+class TestSearchHelpers:
+    """Testes da normalização e da divisão do resultado"""
+
+    def test_normalize_query(self):
+        """Testa maiúsculas, espaços e formas Unicode"""
+        assert normalize_query("  Chico   BUARQUE ") == "chico buarque"
+        assert normalize_query("ｆｏｏ") == "foo"
+
+    def test_search_types(self):
+        """Testa a validação e a ordem dos tipos"""
+        assert search_types(None) == ("track", "artist", "album", "playlist")
+        assert search_types(["Playlist", "track", "track"]) == ("track", "playlist")
+        assert search_types("album, artist") == ("artist", "album")
+        with pytest.raises(ValueError, match="inválido"):
+            search_types(["show"])
+
+    def test_split_skips_null_items(self):
+        """Testa que itens nulos da busca de playlists são ignorados"""
+        playlist = {
+            "name": "Lista",
+            "owner": {"display_name": "Dono"},
+            "uri": "spotify:playlist:p1",
+            "tracks": {"total": 3},
+        }
+        results = {"playlists": {"items": [None, playlist]}}
+        split = split_results(results, ("playlist",))
+        assert split == {
+            "playlists": [
+                {
+                    "name": "Lista",
+                    "owner": "Dono",
+                    "uri": "spotify:playlist:p1",
+                    "tracks_total": 3,
+                }
+            ]
+        }
+
+
+class TestSearchAll:
+    """Testes de search_all"""
+
+    def test_one_request_for_all_types(self, make_service):
+        """Testa que todos os tipos vêm de uma requisição e do cache depois"""
+        search_cache.clear()
+        library = FakeLibrary(tracks=50, playlists=2)
+        name = next(iter(library.tracks.values()))["name"]
+
+        with FakeSpotifyServer(library) as server:
+            service = make_service(server)
+            first = service.search_all(name, limit=5)
+            requests_after_first = server.state.endpoints.get("GET /v1/search")
+            second = service.search_all(f"  {name.upper()} ", limit=5)
+            requests_after_second = server.state.endpoints.get("GET /v1/search")
+
+        assert requests_after_first == 1
+        assert requests_after_second == 1
+        assert first["cached"] is False
+        assert second["cached"] is True
+        assert set(first) >= {"tracks", "artists", "albums", "playlists"}
+        assert first["tracks"][0]["name"] == name
+        assert set(first["tracks"][0]) == {
+            "name",
+            "artist",
+            "album",
+            "uri",
+            "duration_ms",
+        }
+        assert second["tracks"] == first["tracks"]
+
+    def mock_service(self, user_id="default", country="BR") -> SpotifyService:
+        service = SpotifyService.__new__(SpotifyService)
+        service.user_id = user_id
+        service.client = MagicMock()
+        service.client.current_user.return_value = {"country": country}
+        service.equivalence = TrackEquivalenceIndex()
+        service.client.search.return_value = {"tracks": {"items": []}}
+        return service
+
+    def test_types_and_limit_are_part_of_the_key(self):
+        """Testa que tipos e limite diferentes fazem uma nova busca"""
+        search_cache.clear()
+        service = self.mock_service()
+
+        service.search_all("samba", ["track"], 5)
+        service.search_all("SAMBA", "track", 5)
+        service.search_all("samba", ["track"], 10)
+
+        assert service.client.search.call_count == 2
+        service.client.search.assert_called_with(q="samba", type="track", limit=10)
+
+    def test_market_is_part_of_the_key(self):
+        """Testa que o cache só é compartilhado entre contas do mesmo país"""
+        search_cache.clear()
+        brazil, portugal = self.mock_service("ana"), self.mock_service("rui", "PT")
+        same_market = self.mock_service("bia")
+        no_country = self.mock_service("leo", None)
+
+        for service in (brazil, portugal, same_market, no_country):
+            service.search_all("samba", ["track"], 5)
+            service.search_all("samba", ["track"], 5)
+
+        assert brazil.client.search.call_count == 1
+        assert portugal.client.search.call_count == 1
+        assert same_market.client.search.call_count == 0
+        assert no_country.client.search.call_count == 1
+        brazil.client.current_user.assert_called_once()
+
+    def test_empty_query(self):
+        """Testa que uma busca vazia é recusada"""
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        with pytest.raises(ValueError, match="termo"):
+            service.search_all("   ")
+        service.client.search.assert_not_called()
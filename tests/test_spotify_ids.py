@@ -0,0 +1,133 @@
+"""
+Testes da leitura de IDs, URIs e URLs do Spotify
+"""
+
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.service import SpotifyService
+from src.spotify_ids import (
+    SpotifyRef,
+    parse_spotify_ref,
+    spotify_id,
+    spotify_ids,
+    spotify_uri,
+)
+
+TRACK_ID = "4uLU6hMCjMI75M1A2tKUQC"
+
+
+class TestParseSpotifyRef:
+    """Testes dos formatos aceitos"""
+
+    @pytest.mark.parametrize(
+        "value,expected",
+        [
+            (TRACK_ID, SpotifyRef(None, TRACK_ID)),
+            (f"spotify:track:{TRACK_ID}", SpotifyRef("track", TRACK_ID)),
+            (
+                f"spotify:user:fulano:playlist:{TRACK_ID}",
+                SpotifyRef("playlist", TRACK_ID),
+            ),
+            (
+                f"https://open.spotify.com/track/{TRACK_ID}?si=abc123",
+                SpotifyRef("track", TRACK_ID),
+            ),
+            (
+                f"https://open.spotify.com/intl-pt/album/{TRACK_ID}",
+                SpotifyRef("album", TRACK_ID),
+            ),
+            (
+                f"https://open.spotify.com/intl-pt-BR/artist/{TRACK_ID}/",
+                SpotifyRef("artist", TRACK_ID),
+            ),
+            (
+                f"open.spotify.com/embed/playlist/{TRACK_ID}",
+                SpotifyRef("playlist", TRACK_ID),
+            ),
+            (f"  spotify:episode:{TRACK_ID}\n", SpotifyRef("episode", TRACK_ID)),
+        ],
+    )
+    def test_accepted_formats(self, value, expected):
+        """Testa URI, URL (com idioma/embed), formato antigo e ID puro"""
+        assert parse_spotify_ref(value) == expected
+
+    @pytest.mark.parametrize(
+        "value",
+        [
+            "",
+            "abc",
+            f"{TRACK_ID}x",
+            f"spotify:track:{TRACK_ID[:-1]}",
+            f"spotify:banana:{TRACK_ID}",
+            f"https://example.com/track/{TRACK_ID}",
+            f"https://open.spotify.com/track/{TRACK_ID}x",
+            None,
+            42,
+        ],
+    )
+    def test_invalid_inputs(self, value):
+        """Testa entradas inválidas"""
+        with pytest.raises(ValueError):
+            parse_spotify_ref(value)
+
+    def test_results_are_memoized(self):
+        """Testa que entradas repetidas vêm do cache"""
+        value = f"https://open.spotify.com/track/{TRACK_ID}?si=memo"
+        spotify_id(value, "track")
+        hits = spotify_id.cache_info().hits
+        spotify_id(value, "track")
+        assert spotify_id.cache_info().hits == hits + 1
+
+
+class TestSpotifyId:
+    """Testes da conversão para ID e URI de um tipo"""
+
+    def test_id_and_uri(self):
+        """Testa ID e URI canônica a partir de qualquer formato"""
+        url = f"https://open.spotify.com/intl-es/album/{TRACK_ID}"
+        assert spotify_id(url, "album") == TRACK_ID
+        assert spotify_uri(TRACK_ID, "album") == f"spotify:album:{TRACK_ID}"
+        assert spotify_ids([url, TRACK_ID], "album") == [TRACK_ID, TRACK_ID]
+
+    def test_wrong_type(self):
+        """Testa URI de outro tipo de entidade"""
+        with pytest.raises(ValueError, match="Esperado um album"):
+            spotify_id(f"spotify:track:{TRACK_ID}", "album")
+
+
+class TestServiceEntryPoints:
+    """Testes do uso do parser nas tools"""
+
+    def make_service(self) -> SpotifyService:
+        service = SpotifyService.__new__(SpotifyService)
+        service.client = MagicMock()
+        return service
+
+    def test_entry_points_accept_urls(self):
+        """Testa álbum, artista, playlist e play com URLs"""
+        service = self.make_service()
+        service.client.album_tracks.return_value = {"items": []}
+        service.client.artist_top_tracks.return_value = {"tracks": []}
+        service.client.playlist_tracks.return_value = {"items": []}
+
+        service.get_album_tracks(f"https://open.spotify.com/intl-pt/album/{TRACK_ID}")
+        service.get_artist_top_tracks(f"spotify:artist:{TRACK_ID}")
+        service.get_playlist_tracks(f"https://open.spotify.com/playlist/{TRACK_ID}")
+        service._ensure_active_device = MagicMock()
+        service.play_music(track_uri=f"https://open.spotify.com/track/{TRACK_ID}")
+
+        service.client.album_tracks.assert_called_once_with(TRACK_ID)
+        service.client.artist_top_tracks.assert_called_once_with(TRACK_ID)
+        service.client.playlist_tracks.assert_called_once_with(TRACK_ID, limit=100)
+        service.client.start_playback.assert_called_once_with(
+            uris=[f"spotify:track:{TRACK_ID}"]
+        )
+
+    def test_invalid_id_is_rejected(self):
+        """Testa que IDs inválidos não chegam à Web API"""
+        service = self.make_service()
+        with pytest.raises(ValueError, match="inválido"):
+            service.check_track_in_favorites("not-a-track")
+        service.client.current_user_saved_tracks_contains.assert_not_called()
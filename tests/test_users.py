@@ -0,0 +1,272 @@
+"""
+Testes do suporte a vários usuários e do cache de catálogo
+"""
+
+import threading
+import time
+
+import pytest
+from fastmcp.exceptions import ToolError
+from fastmcp.server.http import _current_http_request
+from spotipy.cache_handler import CacheFileHandler
+from starlette.requests import Request
+
+from src.cache import TTLCache
+from src.users import (
+    DEFAULT_USER,
+    SQLiteTokenStore,
+    UserClientRegistry,
+    UserRoutingMiddleware,
+    UserServiceProxy,
+    current_user,
+    validate_user_id,
+)
+
+
+class FakeService:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.closed = False
+
+    def whoami(self):
+        return self.user_id
+
+    def close(self):
+        self.closed = True
+
+
+class TestTokenStore:
+    """Testes do armazenamento de tokens por usuário"""
+
+    def test_round_trip(self, tmp_path):
+        """Testa gravar, ler e remover o token de um usuário"""
+        store = SQLiteTokenStore(str(tmp_path / "tokens.db"))
+        token = {"access_token": "a", "refresh_token": "r", "expires_at": 1}
+
+        store.save("alice", token)
+        store.save("alice", {**token, "access_token": "b"})
+
+        assert store.load("alice")["access_token"] == "b"
+        assert store.load("bob") is None
+        assert store.users() == ["alice"]
+
+        store.delete("alice")
+        assert store.load("alice") is None
+
+    def test_cache_handler_per_user(self, tmp_path):
+        """Testa que o usuário default mantém o arquivo de cache do Spotipy"""
+        store = SQLiteTokenStore(":memory:", default_cache_path=str(tmp_path / "t"))
+
+        assert isinstance(store.cache_handler(DEFAULT_USER), CacheFileHandler)
+
+        handler = store.cache_handler("alice")
+        handler.save_token_to_cache({"access_token": "x"})
+        assert handler.get_cached_token() == {"access_token": "x"}
+        assert store.load("alice") == {"access_token": "x"}
+
+    def test_validate_user_id(self):
+        """Testa que IDs perigosos para caminhos são recusados"""
+        assert validate_user_id("alice@example.com") == "alice@example.com"
+        for bad in ["", "..", "a/b", "a b", "x" * 65]:
+            with pytest.raises(ValueError):
+                validate_user_id(bad)
+
+
+class TestUserClientRegistry:
+    """Testes do pool de clientes por usuário"""
+
+    def test_reuses_client(self):
+        """Testa que o mesmo usuário recebe o mesmo serviço"""
+        registry = UserClientRegistry(FakeService, max_clients=2)
+        assert registry.get("alice") is registry.get("alice")
+        assert len(registry) == 1
+
+    def test_lru_eviction(self):
+        """Testa o descarte do cliente usado há mais tempo"""
+        registry = UserClientRegistry(FakeService, max_clients=2)
+        alice = registry.get("alice")
+        registry.get("bob")
+        registry.get("alice")
+        bob = registry.services()[0]
+        registry.get("carol")
+
+        assert bob.closed and not alice.closed
+        assert [s.user_id for s in registry.services()] == ["alice", "carol"]
+        assert registry.evictions == 1
+
+    def test_idle_eviction(self):
+        """Testa o descarte de clientes ociosos"""
+        registry = UserClientRegistry(FakeService, max_clients=10, idle_ttl=0.01)
+        alice = registry.get("alice")
+        time.sleep(0.02)
+        registry.get("bob")
+
+        assert alice.closed
+        assert len(registry) == 1
+
+    def test_authorization_state(self):
+        """Testa que o state OAuth identifica o usuário uma única vez"""
+        registry = UserClientRegistry(FakeService)
+        state = registry.begin_authorization("alice")
+
+        assert registry.complete_authorization(state) == "alice"
+        assert registry.complete_authorization(state) is None
+
+    def test_authorization_state_expires(self):
+        """Testa que um state não usado expira"""
+        registry = UserClientRegistry(FakeService, auth_ttl=0.01)
+        state = registry.begin_authorization("alice")
+        time.sleep(0.02)
+
+        assert registry.complete_authorization(state) is None
+
+    def test_close_runs_outside_lock(self):
+        """Testa que encerrar um cliente despejado não trava o registro"""
+        acquired = []
+
+        class ClosingService(FakeService):
+            def close(self):
+                # Outra thread precisa conseguir a trava durante o close
+                probe = threading.Thread(target=self.probe)
+                probe.start()
+                probe.join()
+                super().close()
+
+            def probe(self):
+                got = registry._lock.acquire(timeout=1)
+                acquired.append(got)
+                if got:
+                    registry._lock.release()
+
+        registry = UserClientRegistry(ClosingService, max_clients=1)
+        alice = registry.get("alice")
+        registry.get("bob")
+        registry.remove("bob")
+
+        assert alice.closed
+        assert acquired == [True, True]
+
+    def test_factory_runs_outside_lock(self):
+        """Testa que criar um cliente lento não bloqueia os outros usuários"""
+        started, release = threading.Event(), threading.Event()
+
+        def factory(user_id):
+            if user_id == "lento":
+                started.set()
+                release.wait(5)
+            return FakeService(user_id)
+
+        registry = UserClientRegistry(factory)
+        slow = threading.Thread(target=registry.get, args=("lento",))
+        slow.start()
+        started.wait(5)
+        try:
+            assert registry.get("alice").user_id == "alice"
+        finally:
+            release.set()
+            slow.join()
+        assert len(registry) == 2
+
+    def test_concurrent_creation_keeps_one_client(self):
+        """Testa que duas criações simultâneas do mesmo usuário viram uma"""
+        barrier = threading.Barrier(2, timeout=5)
+        created = []
+
+        def factory(user_id):
+            service = FakeService(user_id)
+            created.append(service)
+            barrier.wait()
+            return service
+
+        registry = UserClientRegistry(factory)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(registry.get("alice")))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results[0] is results[1]
+        assert len(registry) == 1
+        assert [s.closed for s in created].count(True) == 1
+        assert results[0].closed is False
+
+    def test_proxy_routes_by_current_user(self):
+        """Testa que o proxy usa o serviço do usuário da requisição"""
+        proxy = UserServiceProxy(UserClientRegistry(FakeService))
+
+        assert proxy.whoami() == DEFAULT_USER
+        token = current_user.set("alice")
+        try:
+            assert proxy.whoami() == "alice"
+        finally:
+            current_user.reset(token)
+        assert proxy.for_user("bob").whoami() == "bob"
+
+
+def http_request(headers):
+    return Request(
+        {
+            "type": "http",
+            "method": "POST",
+            "path": "/mcp",
+            "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+class TestUserRoutingMiddleware:
+    """Testes da identificação do usuário pelo cabeçalho"""
+
+    def resolve(self, middleware, headers=None):
+        token = _current_http_request.set(
+            http_request(headers) if headers is not None else None
+        )
+        try:
+            return middleware.resolve_user()
+        finally:
+            _current_http_request.reset(token)
+
+    def test_stdio_uses_default_user(self):
+        """Testa que sem requisição HTTP o usuário é o default"""
+        assert self.resolve(UserRoutingMiddleware("X-Spotify-User")) == DEFAULT_USER
+
+    def test_http_requires_header(self):
+        """Testa que HTTP sem cabeçalho é recusado salvo com opt-in"""
+        middleware = UserRoutingMiddleware("X-Spotify-User")
+        with pytest.raises(ToolError, match="x-spotify-user"):
+            self.resolve(middleware, {})
+        assert self.resolve(middleware, {"X-Spotify-User": "alice"}) == "alice"
+        with pytest.raises(ValueError):
+            self.resolve(middleware, {"X-Spotify-User": "../bob"})
+
+        allowed = UserRoutingMiddleware("X-Spotify-User", allow_default=True)
+        assert self.resolve(allowed, {}) == DEFAULT_USER
+
+
+class TestTTLCache:
+    """Testes do cache de catálogo"""
+
+    def test_expiry(self):
+        """Testa que entradas vencidas não são retornadas"""
+        cache = TTLCache("teste_ttl", max_size=10, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2, ttl=-1)
+
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        assert cache.get_many(["a", "b", "c"]) == {"a": 1}
+
+    def test_lru_limit(self):
+        """Testa o descarte LRU ao passar do tamanho máximo"""
+        cache = TTLCache("teste_lru", max_size=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3}
+        assert len(cache) == 2